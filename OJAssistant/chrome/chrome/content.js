@@ -29,6 +29,38 @@ class EducoderFloatingAssistant {
         // 新：控制是否显示进度条
         this.shouldShowProgress = false;
 
+        // 推测式生成：页面加载后提前上报题目（需用户开启）
+        this.speculativeEnabled = false;
+        this.speculativeSentUrl = null;
+
+        // 协议握手：服务器确认的特性（binary_frames：大消息使用二进制帧；progress_push：服务器推送进度）
+        this.protocolFeatures = [];
+        this.lastProgressSeq = 0;
+        this.typingQueued = false;
+        // 会话恢复：令牌与已收到的最大消息序号保存在本标签页的 sessionStorage 中
+        this.sessionToken = sessionStorage.getItem('ojaSessionToken');
+        this.lastSessionSeq = Number(sessionStorage.getItem('ojaSessionSeq') || 0);
+        // 解题任务：服务器重启后会话无法恢复时，用解题编号查询任务状态并取回结果
+        this.pendingSolveId = sessionStorage.getItem('ojaSolveId');
+        this.binaryFrameTypes = ['code_solution', 'code_revision', 'test_results'];
+        this.minBlobChars = 256;
+        this.minBinaryBytes = 2048;
+        // 分块上传（chunked_upload）：超过阈值的消息拆分后上传，参数以服务器 hello_ack 为准
+        this.chunkSize = 256 * 1024;
+        this.chunkThreshold = 512 * 1024;
+        this.nextTransferId = 0;
+        this.abortedTransfers = new Set();
+        // 代码去重（content_refs）：最近出现过的代码 哈希 -> 文本，双方已有的代码只发送哈希或行级差异
+        this.contentStore = new Map();
+        this.contentStoreCapacity = 16;
+        this.minRefChars = 256;
+        this.codeRefFields = { code_solution: 'code', code_revision: 'revised_code' };
+        this.codeRefSenders = ['educoder_content_auto_input', 'test_results'];
+        this.lastRefMessages = {}; // 消息类型 -> 最近一次发送的完整消息，服务器无法还原时补发
+        // 输入方式：本扩展支持页面内直写（page_inject）；服务器随代码下发本站点的尝试顺序
+        this.inputModes = ['page_inject'];
+        this.inputPlan = null;
+
         this.init();
     }
 
@@ -115,6 +147,11 @@ class EducoderFloatingAssistant {
             this.progressUpdateInterval = null;
         }
 
+        // 服务器推送进度时无需轮询
+        if (this.protocolFeatures.includes('progress_push')) {
+            return;
+        }
+
         // 每500毫秒请求一次服务器进度
         this.progressUpdateInterval = setInterval(() => {
             if (this.socket && this.socket.readyState === WebSocket.OPEN) {
@@ -277,6 +314,11 @@ class EducoderFloatingAssistant {
                         </button>
                     </div>
 
+                    <label class="ea-option">
+                        <input type="checkbox" id="eaSpeculativeCheckbox">
+                        <span>页面加载后预生成代码（含下一关）</span>
+                    </label>
+
                     <div class="ea-preview-section">
                         <div class="ea-preview">
                             <div class="ea-preview-header">
@@ -327,6 +369,7 @@ class EducoderFloatingAssistant {
 
         this.getContentBtn = document.getElementById('eaGetContentBtn');
         this.smartFixBtn = document.getElementById('eaSmartFixBtn');
+        this.speculativeCheckbox = document.getElementById('eaSpeculativeCheckbox');
         this.remoteAssistBtn = document.getElementById('eaRemoteAssistBtn'); // 新增
         this.clearLogsBtn = document.getElementById('eaClearLogsBtn');
 
@@ -356,6 +399,7 @@ class EducoderFloatingAssistant {
 
         this.getContentBtn.addEventListener('click', () => this.getEducoderContent());
         this.smartFixBtn.addEventListener('click', () => this.smartFix());
+        this.speculativeCheckbox.addEventListener('change', () => this.toggleSpeculative(this.speculativeCheckbox.checked));
         this.remoteAssistBtn.addEventListener('click', () => this.toggleRemoteAssistance()); // 新增
         this.clearLogsBtn.addEventListener('click', () => this.clearLogs());
 
@@ -499,13 +543,17 @@ class EducoderFloatingAssistant {
 
     async loadSettings() {
         try {
-            const result = await chrome.storage.local.get(['windowPosition']);
+            const result = await chrome.storage.local.get(['windowPosition', 'speculativeEnabled']);
             if (result.windowPosition && this.container) {
                 this.container.style.left = result.windowPosition.x + 'px';
                 this.container.style.top = result.windowPosition.y + 'px';
 
                 setTimeout(() => this.autoSnapToEdge(), 100);
             }
+            this.speculativeEnabled = !!result.speculativeEnabled;
+            if (this.speculativeCheckbox) {
+                this.speculativeCheckbox.checked = this.speculativeEnabled;
+            }
             return result;
         } catch (error) {
             this.showMessage(`加载设置失败: ${error.message}`, 'error');
@@ -542,15 +590,35 @@ class EducoderFloatingAssistant {
         return new Promise((resolve, reject) => {
             try {
                 this.socket = new WebSocket(url);
+                this.socket.binaryType = 'arraybuffer';
+                this.protocolFeatures = [];
+                this.lastProgressSeq = 0;
                 this.updateConnectionState('CONNECTING');
 
                 this.socket.onopen = (event) => {
                     this.updateConnectionState('OPEN');
                     this.showMessage('✅ 连接服务器成功', 'system');
+                    this.socket.send(JSON.stringify({
+                        type: 'hello',
+                        features: ['binary_frames', 'progress_push', 'chunked_upload', 'content_refs'],
+                        resume_token: this.sessionToken,
+                        last_seq: this.lastSessionSeq,
+                        content_hashes: Array.from(this.contentStore.keys()),
+                        input_modes: this.inputModes
+                    }));
+                    this.scheduleSpeculativePrefetch();
                     resolve(event);
                 };
 
                 this.socket.onmessage = (event) => {
+                    if (event.data instanceof ArrayBuffer) {
+                        try {
+                            this.handleServerMessage(this.decodeBinaryFrame(event.data));
+                        } catch (error) {
+                            console.error('二进制帧解析失败:', error);
+                        }
+                        return;
+                    }
                     this.handleServerMessage(event.data);
                 };
 
@@ -691,9 +759,41 @@ class EducoderFloatingAssistant {
 
     handleServerMessage(message) {
         try {
-            const data = JSON.parse(message);
+            const data = typeof message === 'string' ? JSON.parse(message) : message;
+
+            // 代码引用无法还原时请服务器补发全文，序号暂不推进
+            if (data.code_ref && !this.resolveCodeRef(data)) {
+                return;
+            }
 
-            if (data.type === 'code_solution') {
+            // 会话内的结果消息带有序号，重连补发时跳过已处理过的
+            if (Number.isFinite(data.session_seq)) {
+                if (data.session_seq <= this.lastSessionSeq) {
+                    return;
+                }
+                this.lastSessionSeq = data.session_seq;
+                sessionStorage.setItem('ojaSessionSeq', String(this.lastSessionSeq));
+            }
+
+            if (data.type === 'hello_ack') {
+                this.protocolFeatures = data.features || [];
+                this.chunkSize = data.chunk_size || this.chunkSize;
+                this.chunkThreshold = data.chunk_threshold || this.chunkThreshold;
+                this.handleSessionAck(data);
+                if (this.protocolFeatures.includes('progress_push')) {
+                    // 服务器会主动推送进度，不再需要轮询
+                    this.stopProgressPolling();
+                }
+            } else if (data.type === 'content_miss') {
+                this.resendFullMessage(data);
+            } else if (data.type === 'job_status') {
+                this.handleJobStatus(data);
+            } else if (data.type === 'chunk_ack') {
+                console.debug(`分块上传完成: ${data.size} 字节`);
+            } else if (data.type === 'chunk_error') {
+                this.abortedTransfers.add(data.transfer_id);
+                this.showMessage(`大消息上传失败: ${data.message}`, 'error');
+            } else if (data.type === 'code_solution') {
                 this.handleCodeSolution(data);
             } else if (data.type === 'server_ack') {
                 this.handleServerAck(data);
@@ -711,6 +811,8 @@ class EducoderFloatingAssistant {
                 this.handleInputError(data);
             } else if (data.type === 'progress_update') {
                 this.handleProgressUpdate(data);
+            } else if (data.type === 'speculative_ack') {
+                this.handleSpeculativeAck(data);
             } else {
                 this.showMessage(`服务器: ${JSON.stringify(data)}`, 'received');
             }
@@ -724,6 +826,495 @@ class EducoderFloatingAssistant {
         }
     }
 
+    // 开关推测式生成
+    toggleSpeculative(enabled) {
+        this.speculativeEnabled = !!enabled;
+        chrome.storage.local.set({ speculativeEnabled: this.speculativeEnabled });
+
+        if (this.speculativeEnabled) {
+            this.showMessage('已开启预生成：页面加载后将提前生成代码', 'system');
+            this.speculativeSentUrl = null;
+            this.scheduleSpeculativePrefetch();
+        } else {
+            this.showMessage('已关闭预生成', 'system');
+            if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+                this.socket.send(JSON.stringify({ type: 'speculative_cancel' }));
+            }
+        }
+    }
+
+    // 等待页面题面渲染后再上报，单页应用的题面通常晚于document_end出现
+    scheduleSpeculativePrefetch(delay = 2000) {
+        if (!this.speculativeEnabled) {
+            return;
+        }
+        setTimeout(() => {
+            this.sendSpeculativePrefetch().catch(error => {
+                console.error('预生成请求失败:', error);
+            });
+        }, delay);
+    }
+
+    async sendSpeculativePrefetch() {
+        if (!this.speculativeEnabled || this.isInputInProgress) {
+            return;
+        }
+        if (!this.socket || this.socket.readyState !== WebSocket.OPEN) {
+            return;
+        }
+        if (this.speculativeSentUrl === window.location.href) {
+            return;
+        }
+
+        // 与“自动答题”使用完全相同的题面与已有代码，保证服务器端能命中缓存
+        const content = this.extractPageContent();
+        if (!content.text || content.text.length < 50) {
+            return;
+        }
+        const enrichedContent = await this.enrichContentWithImageOCR(content);
+        const editorSnapshot = await this.extractCurrentEditorCode();
+        let currentEditorCode = editorSnapshot.code || '';
+        if (editorSnapshot.source === 'dom_monaco_view_lines') {
+            currentEditorCode = '';
+        }
+
+        const nextTask = await this.extractNextTaskContent();
+
+        this.speculativeSentUrl = window.location.href;
+        await this.sendProtocolMessage({
+            type: 'speculative_prefetch',
+            timestamp: new Date().toISOString(),
+            url: window.location.href,
+            content: enrichedContent,
+            current_code: currentEditorCode,
+            next_tasks: nextTask ? [nextTask] : []
+        });
+    }
+
+    // 在多关卡题目中查找“下一关/下一题”，若其页面为服务端渲染则提取题面用于预取。
+    // 与点击“自动答题”时使用同一套提取与OCR流程，保证服务器端按题面生成的缓存键一致
+    async extractNextTaskContent() {
+        try {
+            const links = Array.from(document.querySelectorAll('a[href]'));
+            const nextLink = links.find(link => {
+                const text = (link.textContent || '').trim();
+                return /下一关|下一题|Next/i.test(text);
+            });
+            if (!nextLink) {
+                return null;
+            }
+
+            const nextUrl = new URL(nextLink.getAttribute('href'), window.location.href);
+            if (nextUrl.origin !== window.location.origin || nextUrl.href === window.location.href) {
+                return null;
+            }
+
+            const response = await fetch(nextUrl.href, { credentials: 'include' });
+            if (!response.ok) {
+                return null;
+            }
+            const html = await response.text();
+            const doc = new DOMParser().parseFromString(html, 'text/html');
+            const content = this.extractPageContent(doc, nextUrl.href);
+            if (content.text.length >= 50) {
+                return { url: nextUrl.href, content: await this.enrichContentWithImageOCR(content) };
+            }
+        } catch (error) {
+            console.error('提取下一关题面失败:', error);
+        }
+        return null;
+    }
+
+    handleSessionAck(data) {
+        if (!data.session_token) {
+            return;
+        }
+        if (!data.resumed) {
+            // 服务器端没有旧会话的代码存储，本地的也不再可用
+            this.contentStore.clear();
+        }
+        if (data.session_token !== this.sessionToken) {
+            // 新会话：序号从头开始
+            this.sessionToken = data.session_token;
+            this.lastSessionSeq = 0;
+            sessionStorage.setItem('ojaSessionToken', this.sessionToken);
+            sessionStorage.setItem('ojaSessionSeq', '0');
+        }
+        if (data.resumed && data.pending > 0) {
+            this.showMessage(`已恢复会话，正在接收断线期间的 ${data.pending} 条结果`, 'system');
+        }
+        if (!data.resumed && this.pendingSolveId && this.socket && this.socket.readyState === WebSocket.OPEN) {
+            // 服务器重启过：查询未完成的解题任务，不重新提交题目
+            this.socket.send(JSON.stringify({ type: 'job_status', solve_id: this.pendingSolveId }));
+        }
+    }
+
+    setPendingSolve(solveId) {
+        this.pendingSolveId = solveId || null;
+        if (this.pendingSolveId) {
+            sessionStorage.setItem('ojaSolveId', this.pendingSolveId);
+        } else {
+            sessionStorage.removeItem('ojaSolveId');
+        }
+    }
+
+    handleJobStatus(data) {
+        const state = data.state || 'unknown';
+        if (state === 'queued' || state === 'running') {
+            this.showMessage('服务器重启前的解题任务仍在生成，完成后将自动下发代码', 'system');
+        } else if (state === 'succeeded' || state === 'delivered') {
+            this.showMessage('已取回服务器重启前生成的代码', 'system');
+        } else {
+            if (state === 'failed') {
+                this.showMessage(`服务器重启前的解题任务失败: ${data.error || '未知原因'}`, 'error');
+            }
+            this.setPendingSolve(null);
+        }
+    }
+
+    // 发送JSON消息；协商了二进制帧时，大体积的消息使用二进制帧；超过阈值时分块上传
+    async sendProtocolMessage(message, allowRefs = true) {
+        if (this.protocolFeatures.includes('content_refs') && this.codeRefSenders.includes(message.type)) {
+            message = await this.attachCodeRef(message, allowRefs);
+        }
+        const text = JSON.stringify(message);
+        let payload = text;
+        let encoding = 'json';
+        if (this.protocolFeatures.includes('binary_frames') &&
+            this.binaryFrameTypes.includes(message.type) &&
+            text.length >= this.minBinaryBytes) {
+            payload = this.encodeBinaryFrame(message);
+            encoding = 'binary';
+        }
+
+        // 按UTF-16长度粗判，可能超限时再编码为字节精确判断
+        const roughSize = typeof payload === 'string' ? text.length * 3 : payload.byteLength;
+        if (this.protocolFeatures.includes('chunked_upload') && roughSize > this.chunkThreshold) {
+            const bytes = typeof payload === 'string' ? new TextEncoder().encode(payload) : new Uint8Array(payload);
+            if (bytes.length > this.chunkThreshold) {
+                await this.sendChunked(bytes, encoding);
+                return;
+            }
+        }
+        this.socket.send(payload);
+    }
+
+    async contentHash(text) {
+        const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(text));
+        return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('').slice(0, 32);
+    }
+
+    rememberContent(hash, text) {
+        this.contentStore.delete(hash);
+        this.contentStore.set(hash, text);
+        while (this.contentStore.size > this.contentStoreCapacity) {
+            this.contentStore.delete(this.contentStore.keys().next().value);
+        }
+    }
+
+    // 行级差异 [[起始行, 删除行数, [新行...]], ...]：先去掉相同的首尾行，
+    // 中间部分不太大时用最长公共子序列拆成多处替换，否则整体作为一处替换
+    diffLines(base, text) {
+        const oldLines = base.split('\n');
+        const newLines = text.split('\n');
+        let start = 0;
+        while (start < oldLines.length && start < newLines.length && oldLines[start] === newLines[start]) {
+            start++;
+        }
+        let oldEnd = oldLines.length;
+        let newEnd = newLines.length;
+        while (oldEnd > start && newEnd > start && oldLines[oldEnd - 1] === newLines[newEnd - 1]) {
+            oldEnd--;
+            newEnd--;
+        }
+        const n = oldEnd - start;
+        const m = newEnd - start;
+        if (n === 0 || m === 0 || n * m > 4000000) {
+            return [[start, n, newLines.slice(start, newEnd)]];
+        }
+
+        // lcs[i * (m + 1) + j]：oldLines[start+i..] 与 newLines[start+j..] 的最长公共子序列长度
+        const lcs = new Uint32Array((n + 1) * (m + 1));
+        for (let i = n - 1; i >= 0; i--) {
+            for (let j = m - 1; j >= 0; j--) {
+                lcs[i * (m + 1) + j] = oldLines[start + i] === newLines[start + j]
+                    ? lcs[(i + 1) * (m + 1) + j + 1] + 1
+                    : Math.max(lcs[(i + 1) * (m + 1) + j], lcs[i * (m + 1) + j + 1]);
+            }
+        }
+        const ops = [];
+        let hunk = null;
+        let i = 0;
+        let j = 0;
+        while (i < n || j < m) {
+            if (i < n && j < m && oldLines[start + i] === newLines[start + j]) {
+                hunk = null;
+                i++;
+                j++;
+                continue;
+            }
+            if (!hunk) {
+                hunk = [start + i, 0, []];
+                ops.push(hunk);
+            }
+            if (j < m && (i === n || lcs[i * (m + 1) + j + 1] >= lcs[(i + 1) * (m + 1) + j])) {
+                hunk[2].push(newLines[start + j]);
+                j++;
+            } else {
+                hunk[1]++;
+                i++;
+            }
+        }
+        return ops;
+    }
+
+    applyLineOps(base, ops) {
+        const lines = base.split('\n');
+        let previousStart = lines.length + 1;
+        for (let i = ops.length - 1; i >= 0; i--) {
+            const [start, deleteCount, newLines] = ops[i];
+            if (start < 0 || deleteCount < 0 || start + deleteCount > lines.length ||
+                start + deleteCount > previousStart || !Array.isArray(newLines)) {
+                throw new Error('差异超出范围');
+            }
+            lines.splice(start, deleteCount, ...newLines);
+            previousStart = start;
+        }
+        return lines.join('\n');
+    }
+
+    // 发送编辑器代码：服务器已有的只发哈希，与最近的版本相近时只发行级差异
+    async attachCodeRef(message, allowRefs) {
+        const code = message.current_code;
+        if (typeof code !== 'string' || !code) {
+            return message;
+        }
+        this.lastRefMessages[message.type] = message;
+        const hash = await this.contentHash(code);
+        const ref = { hash };
+        let sendFull = !allowRefs || code.length < this.minRefChars;
+        if (!sendFull && !this.contentStore.has(hash)) {
+            let bestSize = Math.floor(code.length / 2);
+            let best = null;
+            const candidates = Array.from(this.contentStore.keys()).reverse().slice(0, 3);
+            for (const baseHash of candidates) {
+                const ops = this.diffLines(this.contentStore.get(baseHash), code);
+                const size = JSON.stringify(ops).length;
+                if (size < bestSize) {
+                    bestSize = size;
+                    best = { base: baseHash, ops };
+                }
+            }
+            if (best) {
+                Object.assign(ref, best);
+            } else {
+                sendFull = true;
+            }
+        }
+        this.rememberContent(hash, code);
+        if (sendFull) {
+            return { ...message, code_ref: ref };
+        }
+
+        const slim = { ...message, code_ref: ref };
+        ['currentCode', 'current_code', 'existing_code', 'editor_code'].forEach(key => delete slim[key]);
+        if (slim.content && typeof slim.content === 'object') {
+            slim.content = { ...slim.content };
+            delete slim.content.current_code;
+            delete slim.content.existing_code;
+        }
+        return slim;
+    }
+
+    // 还原服务器发来的代码引用；本地没有对应版本时回复 content_miss，返回 false
+    resolveCodeRef(data) {
+        const field = this.codeRefFields[data.type];
+        const ref = data.code_ref;
+        if (!field || !ref || typeof ref.hash !== 'string') {
+            return true;
+        }
+        let code = data[field];
+        try {
+            if (typeof code !== 'string') {
+                if (Array.isArray(ref.ops)) {
+                    const base = this.contentStore.get(ref.base);
+                    code = base === undefined ? undefined : this.applyLineOps(base, ref.ops);
+                } else {
+                    code = this.contentStore.get(ref.hash);
+                }
+            }
+        } catch (error) {
+            console.error('代码差异还原失败:', error);
+            code = undefined;
+        }
+        if (typeof code !== 'string') {
+            this.socket.send(JSON.stringify({
+                type: 'content_miss',
+                hash: ref.hash,
+                message_type: data.type,
+                session_seq: data.session_seq
+            }));
+            return false;
+        }
+        data[field] = code;
+        this.rememberContent(ref.hash, code);
+        return true;
+    }
+
+    // 服务器无法还原代码引用：补发该类型最近一次的完整消息
+    async resendFullMessage(data) {
+        const message = this.lastRefMessages[data.message_type];
+        if (!message) {
+            this.showMessage('服务器缺少代码内容，请重新发送', 'error');
+            return;
+        }
+        await this.sendProtocolMessage(message, false);
+    }
+
+    // 分块帧: 0xEB | 版本 | 传输编号(uint32) | 分块序号(uint32) | 数据，先发送 chunk_begin 声明长度与SHA-256
+    async sendChunked(bytes, encoding) {
+        const digest = await crypto.subtle.digest('SHA-256', bytes);
+        const sha256 = Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+        const socket = this.socket;
+        const chunkSize = this.chunkSize;
+        const transferId = this.nextTransferId = (this.nextTransferId + 1) >>> 0;
+
+        socket.send(JSON.stringify({
+            type: 'chunk_begin',
+            transfer_id: transferId,
+            total_size: bytes.length,
+            chunk_size: chunkSize,
+            sha256,
+            encoding
+        }));
+        this.showMessage(`消息较大（${Math.round(bytes.length / 1024)} KB），分块上传中...`, 'system');
+
+        for (let index = 0, offset = 0; offset < bytes.length; index++, offset += chunkSize) {
+            if (socket.readyState !== WebSocket.OPEN) {
+                throw new Error('连接已断开，分块上传中止');
+            }
+            if (this.abortedTransfers.delete(transferId)) {
+                // 服务器已拒绝本次传输，不再发送剩余分块
+                return;
+            }
+            const part = bytes.subarray(offset, Math.min(bytes.length, offset + chunkSize));
+            const frame = new Uint8Array(10 + part.length);
+            const view = new DataView(frame.buffer);
+            view.setUint8(0, 0xEB);
+            view.setUint8(1, 1);
+            view.setUint32(2, transferId);
+            view.setUint32(6, index);
+            frame.set(part, 10);
+            socket.send(frame.buffer);
+
+            // 发送缓冲积压过多时稍等，避免一次性占用大量内存
+            while (socket.bufferedAmount > chunkSize * 4 && socket.readyState === WebSocket.OPEN) {
+                await new Promise(resolve => setTimeout(resolve, 20));
+            }
+        }
+    }
+
+    // 二进制帧: 0xEA | 版本 | 头部长度(uint32, 大端) | 头部JSON | 正文
+    // 大段文本以UTF-8原样放入正文，头部 _blobs 记录 [字段路径, 偏移, 长度]，相同文本只存一份
+    encodeBinaryFrame(message) {
+        const encoder = new TextEncoder();
+        const header = {};
+        const blobs = [];
+        const isBlob = value => typeof value === 'string' && value.length >= this.minBlobChars;
+
+        Object.entries(message).forEach(([key, value]) => {
+            if (isBlob(value)) {
+                blobs.push([key, value]);
+            } else if (value && typeof value === 'object' && !Array.isArray(value)) {
+                const nested = {};
+                Object.entries(value).forEach(([subKey, subValue]) => {
+                    if (isBlob(subValue)) {
+                        blobs.push([`${key}.${subKey}`, subValue]);
+                    } else {
+                        nested[subKey] = subValue;
+                    }
+                });
+                header[key] = nested;
+            } else {
+                header[key] = value;
+            }
+        });
+
+        const parts = [];
+        const offsets = new Map();
+        const blobIndex = [];
+        let bodyLength = 0;
+        blobs.forEach(([path, text]) => {
+            let location = offsets.get(text);
+            if (!location) {
+                const bytes = encoder.encode(text);
+                location = [bodyLength, bytes.length];
+                offsets.set(text, location);
+                parts.push(bytes);
+                bodyLength += bytes.length;
+            }
+            blobIndex.push([path, location[0], location[1]]);
+        });
+        header._blobs = blobIndex;
+
+        const headerBytes = encoder.encode(JSON.stringify(header));
+        const frame = new Uint8Array(6 + headerBytes.length + bodyLength);
+        const view = new DataView(frame.buffer);
+        view.setUint8(0, 0xEA);
+        view.setUint8(1, 1);
+        view.setUint32(2, headerBytes.length);
+        frame.set(headerBytes, 6);
+        let offset = 6 + headerBytes.length;
+        parts.forEach(bytes => {
+            frame.set(bytes, offset);
+            offset += bytes.length;
+        });
+        return frame.buffer;
+    }
+
+    decodeBinaryFrame(buffer) {
+        const view = new DataView(buffer);
+        if (buffer.byteLength < 6 || view.getUint8(0) !== 0xEA) {
+            throw new Error('不是有效的协议帧');
+        }
+        if (view.getUint8(1) !== 1) {
+            throw new Error(`不支持的帧版本: ${view.getUint8(1)}`);
+        }
+        const headerLength = view.getUint32(2);
+        const bodyStart = 6 + headerLength;
+        const decoder = new TextDecoder();
+        const message = JSON.parse(decoder.decode(new Uint8Array(buffer, 6, headerLength)));
+
+        (message._blobs || []).forEach(([path, offset, length]) => {
+            const text = decoder.decode(new Uint8Array(buffer, bodyStart + offset, length));
+            const dot = path.indexOf('.');
+            if (dot >= 0) {
+                const key = path.slice(0, dot);
+                message[key] = message[key] || {};
+                message[key][path.slice(dot + 1)] = text;
+            } else {
+                message[path] = text;
+            }
+        });
+        delete message._blobs;
+        return message;
+    }
+
+    handleSpeculativeAck(data) {
+        if (!data.enabled) {
+            this.showMessage('服务器未开启预生成（配置项 speculative_enabled）', 'warning');
+            return;
+        }
+        (data.results || []).forEach(result => {
+            const label = result.source === 'next_task' ? '下一关' : '当前题目';
+            if (result.status === 'started' || result.status === 'running' || result.status === 'cached') {
+                this.showMessage(`预生成已受理（${label}）`, 'system');
+            } else if (result.status === 'budget_exhausted') {
+                this.showMessage(`预生成预算已用尽（${label}）`, 'warning');
+            }
+        });
+    }
+
     handleServerAck(data) {
         const stage = data.stage || 'unknown';
         const existingLen = Number.isFinite(data.existing_code_length) ? data.existing_code_length : -1;
@@ -731,6 +1322,9 @@ class EducoderFloatingAssistant {
         const reason = data.editor_code_reason ? `, 原因: ${data.editor_code_reason}` : '';
 
         if (stage === 'content_received') {
+            if (data.solve_id) {
+                this.setPendingSolve(data.solve_id);
+            }
             if (existingLen >= 0) {
                 this.showMessage(`服务器确认收到题目，编辑器代码长度: ${existingLen}, 来源: ${source}${reason}`, 'system');
             } else {
@@ -744,12 +1338,37 @@ class EducoderFloatingAssistant {
 
     // 处理服务器进度更新
     handleProgressUpdate(data) {
+        // 推送的进度带有递增序号，丢弃乱序到达的旧值
+        if (Number.isFinite(data.seq)) {
+            if (data.seq < this.lastProgressSeq) {
+                return;
+            }
+            this.lastProgressSeq = data.seq;
+        }
         const progress = data.progress || 0;
         if (progress > 0) {
             this.isServerProgressActive = true;
             this.serverProgress = progress;
             this.updateTopTipProgress(progress);
         }
+        this.updateTypingQueue(data);
+    }
+
+    // 多个标签页同时解题时键盘输入按顺序排队，在提示条副标题中显示排队位置与等待时间
+    updateTypingQueue(data) {
+        const subtitle = this.topTipOverlay && this.topTipOverlay.querySelector('.ea-top-tip-subtitle');
+        if (!subtitle) {
+            return;
+        }
+        if (data.stage === 'queued' && data.queue_position > 0) {
+            const waited = Math.round((data.queue_wait_ms || 0) / 1000);
+            subtitle.textContent = `其他页面正在输入，前面还有 ${data.queue_position} 个，已等待 ${waited} 秒`;
+            this.typingQueued = true;
+        } else if (data.stage === 'typing' && this.typingQueued) {
+            this.typingQueued = false;
+            subtitle.textContent = '请保持页面焦点，请勿触碰鼠标和键盘';
+            this.showMessage(`排队 ${Math.round((data.queue_wait_ms || 0) / 1000)} 秒后开始输入`, 'system');
+        }
     }
 
     checkMessageForProgress(message) {
@@ -764,6 +1383,7 @@ class EducoderFloatingAssistant {
 
     handleCodeSolution(data) {
         this.generatedCode = data.code;
+        this.inputPlan = Array.isArray(data.input_plan) ? data.input_plan : null;
         this.showMessage('✅ 代码生成完成，准备自动输入...', 'system');
 
         // 切换到服务器进度
@@ -783,6 +1403,7 @@ class EducoderFloatingAssistant {
 
     handleCodeRevision(data) {
         this.generatedCode = data.revised_code;
+        this.inputPlan = Array.isArray(data.input_plan) ? data.input_plan : null;
         this.retryCount = data.retry_count;
 
         // 更新智能纠错按钮文字
@@ -889,6 +1510,7 @@ class EducoderFloatingAssistant {
 
     handleInputComplete(data) {
         if (data.success) {
+            this.setPendingSolve(null);
             this.showMessage('✅ 代码输入完成', 'system');
             // 设置进度为100%
             this.updateTopTipProgress(100);
@@ -1048,7 +1670,7 @@ class EducoderFloatingAssistant {
                 const readReason = editorSnapshot.reason ? `, 原因: ${editorSnapshot.reason}` : '';
                 this.showMessage(`检测到编辑器现有代码长度: ${(currentEditorCode || '').length} 字符, 来源: ${readSource}${readReason}`, 'system');
 
-                this.socket.send(JSON.stringify(messageData, null, 2));
+                await this.sendProtocolMessage(messageData);
                 this.showMessage('题目内容已发送到服务器，开始生成并输入代码...', 'sent');
 
             } else {
@@ -1070,7 +1692,8 @@ class EducoderFloatingAssistant {
         }
     }
 
-    extractPageContent() {
+    // root: 要提取的文档（默认当前页面，预取下一关时为抓取到的页面），baseUrl: 该文档的地址
+    extractPageContent(root = document, baseUrl = window.location.href) {
         const targetSelectors = [
             '.tab-panel-body___iueV_.markdown-body.mdBody___raKXb',
             '.markdown-body',
@@ -1085,7 +1708,7 @@ class EducoderFloatingAssistant {
         let allText = '';
 
         for (const selector of targetSelectors) {
-            const foundElements = document.querySelectorAll(selector);
+            const foundElements = root.querySelectorAll(selector);
             if (foundElements.length > 0) {
                 elements = Array.from(foundElements);
                 break;
@@ -1093,7 +1716,7 @@ class EducoderFloatingAssistant {
         }
 
         if (elements.length === 0) {
-            const possibleElements = document.querySelectorAll('div, section, article');
+            const possibleElements = root.querySelectorAll('div, section, article');
             elements = Array.from(possibleElements).filter(el => {
                 const text = el.textContent || '';
                 const hasContent = text.length > 200 &&
@@ -1122,22 +1745,24 @@ class EducoderFloatingAssistant {
                 className: el.className,
                 textLength: (el.textContent || '').length
             })),
-            imageUrls: this.extractImageUrlsFromElements(elements),
+            imageUrls: this.extractImageUrlsFromElements(elements, baseUrl),
             text: allText,
             timestamp: new Date().toISOString(),
-            url: window.location.href
+            url: baseUrl
         };
     }
 
-    extractImageUrlsFromElements(elements) {
+    extractImageUrlsFromElements(elements, baseUrl = window.location.href) {
         const set = new Set();
 
         for (const el of elements || []) {
             const imgs = el.querySelectorAll('img');
             imgs.forEach((img) => {
+                // 抓取到的页面中 img.src 按当前页面地址解析，需改用原始属性按该页面地址解析
+                const rendered = el.ownerDocument === document;
                 const candidates = [
-                    img.currentSrc,
-                    img.src,
+                    rendered ? img.currentSrc : '',
+                    rendered ? img.src : img.getAttribute('src'),
                     img.getAttribute('data-src'),
                     img.getAttribute('data-original'),
                     img.getAttribute('data-lazy-src')
@@ -1145,7 +1770,7 @@ class EducoderFloatingAssistant {
 
                 candidates.forEach((rawUrl) => {
                     try {
-                        const absolute = new URL(rawUrl, window.location.href).href;
+                        const absolute = new URL(rawUrl, baseUrl).href;
                         if (/^https?:\/\//i.test(absolute) || absolute.startsWith('data:image/')) {
                             set.add(absolute);
                         }
@@ -1670,7 +2295,7 @@ class EducoderFloatingAssistant {
                 structured_test_data: testResults.structured || null
             };
 
-            this.socket.send(JSON.stringify(testData, null, 2));
+            await this.sendProtocolMessage(testData);
             this.showMessage('测试结果已发送到服务器，正在进行纠错...', 'sent');
 
         } catch (error) {
@@ -1865,8 +2490,18 @@ class EducoderFloatingAssistant {
             return;
         }
 
-        // 优先尝试页面内直接输入（头歌适配），失败再回退到服务端输入
-        this.tryDirectAutoInput(this.generatedCode).then((directSuccess) => {
+        // 按服务器下发的本站点顺序输入：页面内直写（头歌适配）排在最前，失败再回退到服务端输入；
+        // 近期在本站点失败过的方式服务器不会下发，直接跳过，无需等待其超时
+        const plan = this.inputPlan || ['page_inject', 'paste', 'stream'];
+        const serverModes = plan.filter(mode => mode !== 'page_inject');
+        let pageAttempt = Promise.resolve(false);
+        if (plan.includes('page_inject')) {
+            pageAttempt = this.tryDirectAutoInput(this.generatedCode);
+        } else {
+            this.showMessage('本站点页面内写入近期不可用，直接使用服务端输入', 'system');
+        }
+
+        pageAttempt.then((directSuccess) => {
             if (directSuccess) {
                 return;
             }
@@ -1878,7 +2513,9 @@ class EducoderFloatingAssistant {
                     is_retry: this.retryCount > 0,
                     retry_count: this.retryCount,
                     // 如果是智能纠错，告诉服务器这是纠错后的输入
-                    is_smart_fix: this.isSmartFixInProgress
+                    is_smart_fix: this.isSmartFixInProgress,
+                    input_modes: this.inputPlan ? serverModes : [],
+                    url: window.location.href
                 }));
             } else {
                 this.showMessage('服务端未连接，且页面内输入失败', 'error');
@@ -1889,26 +2526,23 @@ class EducoderFloatingAssistant {
     }
 
     async tryDirectAutoInput(code) {
+        const startedAt = performance.now();
         try {
             this.showMessage('正在尝试页面内直接输入代码...', 'system');
 
             const directResult = await this.setCodeToPageEditor(code);
+            const elapsedMs = Math.round(performance.now() - startedAt);
             if (!directResult.ok) {
                 const reason = directResult.reason ? `，原因: ${directResult.reason}` : '';
                 this.showMessage(`未找到可写入的编辑器，回退到服务端输入${reason}`, 'warning');
+                this.reportDirectInput(false, elapsedMs, directResult.reason);
                 return false;
             }
 
             this.handleInputComplete({ success: true });
             this.showMessage('✅ 页面内直接输入成功（头歌适配）', 'system');
 
-            if (this.socket && this.socket.readyState === WebSocket.OPEN) {
-                this.socket.send(JSON.stringify({
-                    type: 'direct_input_complete',
-                    success: true,
-                    timestamp: new Date().toISOString()
-                }));
-            }
+            this.reportDirectInput(true, elapsedMs, directResult.reason);
 
             // 通知远程协助侧
             this.sendRemoteMessage({
@@ -1920,10 +2554,25 @@ class EducoderFloatingAssistant {
             return true;
         } catch (error) {
             this.showMessage(`页面内输入失败: ${error.message}`, 'error');
+            this.reportDirectInput(false, Math.round(performance.now() - startedAt), error.message);
             return false;
         }
     }
 
+    // 上报页面内直写的结果与耗时，服务器据此维护本站点的输入方式顺序
+    reportDirectInput(success, elapsedMs, reason) {
+        if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+            this.socket.send(JSON.stringify({
+                type: 'direct_input_complete',
+                success,
+                elapsed_ms: elapsedMs,
+                reason: reason || '',
+                url: window.location.href,
+                timestamp: new Date().toISOString()
+            }));
+        }
+    }
+
     async setCodeToPageEditor(code) {
         const hasMonacoDom = !!document.querySelector('.monaco-editor');
 
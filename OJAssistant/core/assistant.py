@@ -1,11 +1,29 @@
-﻿import json
+﻿import asyncio
+import hashlib
+import json
 import re
+import time
+import uuid
+import weakref
 from datetime import datetime
 
 import websockets
-from openai import AsyncOpenAI
 
+from core import protocol
+from core.chunked import ChunkAssembler, ChunkError
+from core.content_refs import CODE_REF_FIELDS, ContentMiss, ContentRefs
+from core.input_strategy import CLIENT_MODES, SERVER_MODES, StrategyCache, host_of
+from core.job_queue import HAS_RESULT, UNFINISHED, JobQueue, correction_job_id
+from core.llm_backend import create_backend
+from core.messages import build_dispatch_table
+from core.progress import ProgressChannel
+from core.sessions import RESUMABLE_TYPES, SessionStore, SolveState
+from core.speculative import SpeculativeGenerator
+from core.typing_scheduler import TypingScheduler
+from core.usage_ledger import UsageLedger
+from utils.input_service import PRIORITY_SOLVE, InputQueueFull, input_service
 from utils.input_simulator import InputSimulator
+from utils.keystroke_planner import profile_for_source
 
 
 class OJAssistant:
@@ -23,80 +41,102 @@ class OJAssistant:
             self.base_url = 'https://dashscope.aliyuncs.com/compatible-mode/v1'
             self.api_key = ''
 
-        # 初始化OpenAI客户端
-        self.client = AsyncOpenAI(
-            api_key=self.api_key,
-            base_url=self.base_url
-        )
+        # 初始化模型后端（OpenAI兼容接口，或 mock:// 进程内模拟后端）
+        self.backend = create_backend(self.model_name, self.base_url, self.api_key)
 
-        self.last_question = None
-        self.is_first_chunk = True
         self.typing_active = True
         self.input_simulator = InputSimulator(gui)
+        # 键盘输入统一提交到进程内的输入服务，在其工作线程中执行（见 utils/input_service.py）
+        self.input_service = input_service(log=gui.log)
         self.current_language = gui.selected_language.get().lower()
 
-        # 新增：保存测试失败信息和状态
-        self.test_failures = []
-        self.retry_count = 0
+        # 纠错次数上限；题目、当前代码与纠错次数按客户端分别保存（见 _solve_state）
         self.max_retries = 3
         self.is_input_in_progress = False
-        self.current_code = None
-        self.current_progress = 0  # 当前进度
-        self.current_existing_code = ""
+        self.legacy_solves = weakref.WeakKeyDictionary()  # 未握手的旧版客户端：连接 -> SolveState
+        # 多个客户端共享同一个键盘焦点：输入按先后顺序排队，生成仍并行进行
+        self.typing = TypingScheduler()
+        # 输入方式：扩展在 hello 中声明的方式，以及按站点记录的成功率与耗时
+        self.client_input_modes = {}
+        self.input_strategies = StrategyCache.from_config(gui.config_manager, log=gui.log)
+        self.client_features = {}  # 每个连接在 hello 握手中协商的协议特性
+        self.dropped_messages = {}  # 未知或无法解析的消息计数
+        self.dispatch_table = build_dispatch_table(self)
+
+        # 可恢复会话：断线期间产生的结果在扩展重连后补发
+        self.sessions = SessionStore(
+            ttl=int(gui.config_manager.get_setting('session_ttl', '1800', 'PROTOCOL'))
+        )
+
+        # 超大消息的分块上传
+        self.transfer_limits = protocol.transfer_limits(gui.config_manager)
+        self.chunks = ChunkAssembler(
+            max_transfer_size=self.transfer_limits['max_upload_size'],
+            owner_memory_cap=self.transfer_limits['upload_memory_cap'],
+            max_chunk_size=self.transfer_limits['max_message_size'],
+        )
+
+        # 进度通道：合并后按最高频率推送给GUI与协商了 progress_push 的连接
+        self.progress = ProgressChannel(
+            gui, max_rate=float(gui.config_manager.get_setting('progress_max_rate', '10', 'PROTOCOL'))
+        )
+
+        # 模型调用账本（token用量与耗时）
+        self.usage_ledger = UsageLedger.from_config(gui.config_manager, log=gui.log)
+
+        # 解题任务队列：服务器重启后继续执行未完成的生成与纠错，扩展重连后可查询并取回结果
+        self.jobs = JobQueue.from_config(gui.config_manager, log=gui.log)
+        self.job_waiters = weakref.WeakValueDictionary()  # 解题编号 -> 等待该任务结果的连接
+        self.replay_tasks = set()
+
+        # 推测式生成（默认关闭，在配置文件 [SPECULATIVE] 中开启）
+        config_manager = gui.config_manager
+        self.speculative = SpeculativeGenerator(
+            gui,
+            lambda question_text, existing_code: self.get_complete_code_solution(
+                question_text, existing_code, speculative=True
+            ),
+            enabled=config_manager.get_setting('speculative_enabled', 'False', 'SPECULATIVE').lower() == 'true',
+            max_per_hour=int(config_manager.get_setting('speculative_max_per_hour', '20', 'SPECULATIVE')),
+            max_pending=int(config_manager.get_setting('speculative_max_pending', '2', 'SPECULATIVE')),
+        )
+
+    @property
+    def current_progress(self):
+        """当前进度"""
+        return self.progress.value
 
     def update_language(self, new_language):
         """更新当前语言设置"""
         self.current_language = new_language.lower()
+        # 语言变化后之前的推测结果不再可用
+        self.speculative.cancel_all()
 
     async def server(self, websocket):
         """WebSocket服务器处理函数"""
+        self.progress.start()
         try:
             async for message in websocket:
                 try:
-                    if isinstance(message, str):
+                    if isinstance(message, bytes):
+                        if protocol.is_chunk_frame(message):
+                            await self._handle_chunk(websocket, message)
+                            continue
+                        if not protocol.is_binary_frame(message):
+                            self._count_dropped('binary', f"{len(message)} 字节")
+                            continue
+                        try:
+                            data = protocol.decode_binary_frame(message)
+                        except protocol.ProtocolError as e:
+                            self._count_dropped('invalid_frame', str(e))
+                            continue
+                    else:
                         try:
                             data = json.loads(message)
-
-                            if data.get('type') in ('OJ_content_auto_input', 'educoder_content_auto_input'):
-                                question_content = data.get('content', {}) or {}
-                                existing_code = (
-                                    data.get('current_code')
-                                    or data.get('existing_code')
-                                    or data.get('editor_code')
-                                    or question_content.get('current_code')
-                                    or question_content.get('existing_code')
-                                    or ''
-                                )
-                                await websocket.send(json.dumps({
-                                    "type": "server_ack",
-                                    "stage": "content_received",
-                                    "message": "已收到题目内容，开始生成代码",
-                                    "existing_code_length": len(existing_code or ''),
-                                    "editor_code_source": data.get('editor_code_source', 'unknown'),
-                                    "editor_code_reason": data.get('editor_code_reason', ''),
-                                    "timestamp": datetime.now().isoformat()
-                                }, ensure_ascii=False))
-                                await self.handle_OJ_content_auto_input(websocket, data)
-                            elif data.get('type') == 'test_results':
-                                await self.handle_test_results(websocket, data)
-                            elif data.get('type') == 'ready_for_input':
-                                await self.handle_ready_for_input(websocket, data)
-                            elif data.get('type') == 'direct_input_complete':
-                                await self.handle_direct_input_complete(websocket, data)
-                            elif data.get('type') == 'progress_request':
-                                # 处理前端进度请求
-                                await self.send_progress_update(websocket)
-                            else:
-                                self.gui.log(f"收到消息: {message}")
-                                await websocket.send(f"服务器回复: {message}")
-
                         except json.JSONDecodeError:
-                            self.gui.log(f"收到文本: {message}")
-                            await websocket.send(f"服务器回复: {message}")
-
-                    elif isinstance(message, bytes):
-                        self.gui.log(f"收到二进制数据: {len(message)} 字节")
-                        await websocket.send(message[::-1])
+                            self._count_dropped('text', message[:80])
+                            continue
+                    await self._dispatch_message(websocket, data)
 
                 except Exception as e:
                     self.gui.log(f"处理消息时出错: {e}")
@@ -109,40 +149,269 @@ class OJAssistant:
         except Exception as e:
             self.gui.log(f"服务器错误: {e}")
         finally:
+            self.client_features.pop(websocket, None)
+            self.client_input_modes.pop(websocket, None)
+            self.progress.unsubscribe(websocket)
+            self.sessions.detach(websocket)
+            self.chunks.drop_connection(websocket)
             self.gui.log("连接关闭")
 
-    async def send_progress_update(self, websocket):
-        """发送当前进度到前端"""
+    async def _dispatch_message(self, websocket, data):
+        """按预先生成的分发表处理消息；未知类型只计数，不回显"""
         try:
+            entry = self.dispatch_table.get(data.get('type'))
+        except AttributeError:
+            # JSON 顶层不是对象
+            entry = None
+        if entry is None:
+            message_type = data.get('type') if isinstance(data, dict) else None
+            self._count_dropped('unknown', str(message_type))
+            return
+        if 'code_ref' in data:
+            data = await self._resolve_code_ref(websocket, data)
+            if data is None:
+                return
+        message_class, handler = entry
+        await handler(websocket, message_class.from_dict(data))
+
+    async def _resolve_code_ref(self, websocket, data):
+        """把扩展发来的 code_ref 还原为 current_code；无法还原时请扩展补发全文"""
+        session = self.sessions.get(websocket)
+        ref = data.get('code_ref')
+        text = data.get('current_code')
+        try:
+            if session is None or session.content_refs is None:
+                raise ContentMiss(ref)
+            code = session.content_refs.decode(ref, text if isinstance(text, str) else None)
+        except (ContentMiss, ValueError, TypeError) as e:
+            self._count_dropped('code_ref', str(e))
             await websocket.send(json.dumps({
-                "type": "progress_update",
-                "progress": self.current_progress,
-                "timestamp": datetime.now().isoformat()
+                "type": "content_miss",
+                "hash": ref.get('hash') if isinstance(ref, dict) else None,
+                "message_type": data.get('type'),
             }, ensure_ascii=False))
+            return None
+        data = dict(data)
+        del data['code_ref']
+        data['current_code'] = code
+        return data
+
+    def _count_dropped(self, kind, detail):
+        """统计被丢弃的消息，每种消息只记录一次日志"""
+        key = (kind, detail) if kind == 'unknown' else kind
+        self.dropped_messages[key] = self.dropped_messages.get(key, 0) + 1
+        if self.dropped_messages[key] == 1:
+            self.gui.log(f"忽略无法处理的消息（{kind}）: {detail}")
+
+    async def handle_hello(self, websocket, message):
+        """协议握手：确认客户端请求的特性，并告知连接实际使用的压缩扩展"""
+        features = protocol.negotiate_features(message.features)
+        self.client_features[websocket] = set(features)
+        self.client_input_modes[websocket] = [mode for mode in message.input_modes if mode in CLIENT_MODES]
+        extensions = [getattr(extension, 'name', type(extension).__name__)
+                      for extension in getattr(websocket, 'extensions', [])]
+        session, resumed, pending = self.sessions.attach(websocket, message.resume_token, message.last_seq)
+        if 'progress_push' in features:
+            self.progress.subscribe(websocket, session)
+        if 'content_refs' in features:
+            if session.content_refs is None or not resumed:
+                session.content_refs = ContentRefs()
+            # 扩展页面刷新后本地存储会清空，以扩展声明仍持有的哈希为准
+            session.content_refs.reset_peer(message.content_hashes if resumed else [])
+        await websocket.send(json.dumps({
+            "type": "hello_ack",
+            "protocol_version": protocol.PROTOCOL_VERSION,
+            "features": features,
+            "compression": extensions,
+            "session_token": session.token,
+            "chunk_size": self.transfer_limits['chunk_size'],
+            "chunk_threshold": self.transfer_limits['chunk_threshold'],
+            "max_upload_size": self.transfer_limits['max_upload_size'],
+            "input_modes": self.client_input_modes[websocket] + list(SERVER_MODES),
+            "resumed": resumed,
+            "pending": len(pending),
+            "timestamp": datetime.now().isoformat()
+        }, ensure_ascii=False))
+
+        if resumed:
+            self.gui.log(f"扩展已恢复会话，补发 {len(pending)} 条消息")
+            binary_frames = 'binary_frames' in features
+            for pending_message in pending:
+                await websocket.send(protocol.encode_message(pending_message, binary_frames))
+            if session in self.progress.states:
+                await websocket.send(json.dumps(self.progress.snapshot(session), ensure_ascii=False))
+
+    async def handle_chunk_begin(self, websocket, message):
+        """分块上传开始：校验大小与会话内存上限并预分配缓冲区"""
+        owner = self.sessions.get(websocket) or websocket
+        try:
+            self.chunks.begin(websocket, owner, message.transfer_id, message.total_size, message.chunk_size,
+                              message.sha256, message.encoding)
+        except ChunkError as e:
+            self.gui.log(f"拒绝分块上传: {e}")
+            await self._send_chunk_error(websocket, message.transfer_id, str(e))
+
+    async def _handle_chunk(self, websocket, frame):
+        """写入一个分块，收齐后按原始消息处理"""
+        try:
+            transfer_id, index, payload = protocol.decode_chunk(frame)
+        except protocol.ProtocolError as e:
+            self._count_dropped('invalid_frame', str(e))
+            return
+        try:
+            completed = self.chunks.add(websocket, transfer_id, index, payload)
+        except ChunkError as e:
+            self.gui.log(f"分块上传失败: {e}")
+            await self._send_chunk_error(websocket, transfer_id, str(e))
+            return
+        if completed is None:
+            return
+
+        encoding, payload = completed
+        await websocket.send(json.dumps({
+            "type": "chunk_ack",
+            "transfer_id": transfer_id,
+            "size": len(payload),
+        }, ensure_ascii=False))
+        try:
+            data = protocol.decode_binary_frame(payload) if encoding == 'binary' else json.loads(payload)
+        except (protocol.ProtocolError, ValueError) as e:
+            self._count_dropped('invalid_frame', str(e))
+            return
+        del payload
+        await self._dispatch_message(websocket, data)
+
+    async def _send_chunk_error(self, websocket, transfer_id, reason):
+        await websocket.send(json.dumps({
+            "type": "chunk_error",
+            "transfer_id": transfer_id,
+            "message": reason,
+        }, ensure_ascii=False))
+
+    async def send_message(self, websocket, message):
+        """
+        发送JSON消息；协商了二进制帧的连接对大消息使用二进制帧
+        属于会话的结果消息会先缓存，发往会话当前的连接；连接已断开时留待重连后补发
+        """
+        session = self.sessions.get(websocket)
+        if session is not None and session.content_refs is not None and message.get('type') in CODE_REF_FIELDS \
+                and 'content_refs' in self.client_features.get(websocket, ()):
+            message = self._attach_code_ref(session.content_refs, message)
+        if session is not None and message.get('type') in RESUMABLE_TYPES:
+            message = self.sessions.record(session, message)
+            if session.websocket is None:
+                self.gui.log(f"扩展连接已断开，{message['type']} 将在重连后补发")
+                return
+            websocket = session.websocket
+
+        binary_frames = 'binary_frames' in self.client_features.get(websocket, ())
+        try:
+            await websocket.send(protocol.encode_message(message, binary_frames))
+        except websockets.ConnectionClosed:
+            if session is None:
+                raise
+            self.gui.log(f"扩展连接已断开，{message['type']} 将在重连后补发")
+
+    @staticmethod
+    def _attach_code_ref(content_refs, message):
+        """扩展已持有的代码只发送哈希或相对旧版本的行级差异"""
+        field = CODE_REF_FIELDS[message['type']]
+        code = message.get(field)
+        if not isinstance(code, str):
+            return message
+        ref, send_full = content_refs.encode(code)
+        message = dict(message, code_ref=ref)
+        if not send_full:
+            del message[field]
+        return message
+
+    async def handle_content_miss(self, websocket, message):
+        """扩展无法还原代码引用：按会话序号找到原消息并补发全文"""
+        session = self.sessions.get(websocket)
+        buffered = session.find(message.session_seq) if session is not None else None
+        field = CODE_REF_FIELDS.get(message.message_type)
+        code = session.content_refs.get(message.content_hash) \
+            if field and buffered is not None and session.content_refs is not None else None
+        if code is None:
+            self.gui.log(f"无法补发 {message.message_type or '未知消息'} 的代码全文，请重新发起请求")
+            return
+        session.content_refs.add(code)
+        full_message = dict(buffered, code_ref={'hash': message.content_hash})
+        full_message[field] = code
+        binary_frames = 'binary_frames' in self.client_features.get(websocket, ())
+        await websocket.send(protocol.encode_message(full_message, binary_frames))
+
+    async def handle_progress_request(self, websocket, message):
+        """处理前端进度请求"""
+        await self.send_progress_update(websocket)
+
+    async def handle_speculative_cancel(self, websocket, message):
+        """扩展关闭预生成时取消所有推测任务"""
+        self.speculative.cancel_all()
+
+    async def send_progress_update(self, websocket):
+        """发送当前进度到前端；订阅了进度推送的连接由进度通道统一推送，这里不再重复发送"""
+        if websocket in self.progress.subscribers:
+            return
+        try:
+            await websocket.send(json.dumps(self.progress.snapshot(self._owner(websocket)), ensure_ascii=False))
         except Exception as e:
             self.gui.log(f"发送进度更新失败: {e}")
 
-    def update_progress(self, progress):
-        """更新进度"""
-        self.current_progress = max(0, min(100, progress))
-        self.gui.root.after(0, lambda: self.gui.update_status(f"进度: {self.current_progress}%"))  # 更新GUI状态
-
-    async def handle_OJ_content_auto_input(self, websocket, data):
+    def update_progress(self, progress, stage=None, websocket=None, **extra):
+        """更新进度（GUI与各连接的推送由进度通道合并完成）；websocket 指定进度所属的客户端"""
+        self.progress.set(progress, stage, self._owner(websocket) if websocket is not None else None, **extra)
+
+    def _owner(self, websocket):
+        """连接所属的会话；未握手的旧版客户端以连接本身区分"""
+        return self.sessions.get(websocket) or websocket
+
+    def _solve_state(self, websocket, new_solve=None):
+        """
+        客户端当前的解题状态
+        :param new_solve: 传入 SolveState 时替换为新的解题
+        """
+        session = self.sessions.get(websocket)
+        if new_solve is not None:
+            if session is not None:
+                session.solve = new_solve
+            else:
+                self.legacy_solves[websocket] = new_solve
+            return new_solve
+        if session is not None:
+            return session.solve
+        return self.legacy_solves.setdefault(websocket, SolveState())
+
+    async def _report_typing_queue(self, websocket, ticket, position, queue_length):
+        """排队等待输入期间向客户端报告位置与已等待时间"""
+        if getattr(websocket, 'closed', False):
+            raise websockets.ConnectionClosed(None, None)
+        self.update_progress(self.progress.snapshot(self._owner(websocket))['progress'], 'queued', websocket,
+                             queue_position=position, queue_length=queue_length, queue_wait_ms=ticket.wait_ms)
+        await self.send_progress_update(websocket)
+
+    async def handle_OJ_content_auto_input(self, websocket, message):
         """处理题目内容并自动输入"""
+        # 解题编号同时是首轮生成任务的编号，扩展保存后可在服务器重启后查询结果
+        solve_id = uuid.uuid4().hex if message.question_text else None
+        await websocket.send(json.dumps({
+            "type": "server_ack",
+            "stage": "content_received",
+            "message": "已收到题目内容，开始生成代码",
+            "existing_code_length": len(message.existing_code),
+            "editor_code_source": message.editor_code_source,
+            "editor_code_reason": message.editor_code_reason,
+            "solve_id": solve_id,
+            "timestamp": datetime.now().isoformat()
+        }, ensure_ascii=False))
+
         try:
             self.gui.log(f"当前使用语言: {self.current_language.upper()}")
             self.gui.log(f"当前使用模型: {self.model_name}")
 
-            question_content = data.get('content', {})
-            question_text = question_content.get('text', '')
-            existing_code = (
-                data.get('current_code')
-                or data.get('existing_code')
-                or data.get('editor_code')
-                or question_content.get('current_code')
-                or question_content.get('existing_code')
-                or ''
-            )
+            question_content = message.content
+            question_text = message.question_text
+            existing_code = message.existing_code
 
             # 发送题目内容到远程协助服务器（如果已启动）
             try:
@@ -191,17 +460,16 @@ class OJAssistant:
                 self.gui.log(f"发送题目到远程协助服务器失败: {e}")
 
             if question_text:
-                # 保存题目内容供后续使用
-                self.last_question = question_text
-                self.current_existing_code = existing_code
-                # 重置状态
-                self.retry_count = 0
-                self.test_failures = []
-                self.is_first_chunk = True
+                # 保存题目内容供后续纠错使用（每个客户端一份，其他标签页的解题不受影响）
+                state = self._solve_state(
+                    websocket, SolveState(solve_id, question_text, existing_code, host_of(message.url))
+                )
+                state.job_id = solve_id
+                state.editor = profile_for_source(message.editor_code_source)
+                self.jobs.create(solve_id, solve_id, 'solve', {'question': question_text, 'existing_code': existing_code},
+                                 host=state.host, language=self.current_language, model=self.model_name)
                 self.typing_active = True
-                self.input_simulator.reset()
-                self.is_input_in_progress = True
-                self.current_progress = 0  # 重置进度
+                self.update_progress(0, 'started', websocket)  # 重置进度
 
                 self.gui.log(f"题目内容长度: {len(question_text)} 字符")
                 self.gui.log(f"编辑器现有代码长度: {len(existing_code)} 字符")
@@ -209,57 +477,85 @@ class OJAssistant:
                                     lambda: self.gui.update_status(f"正在生成{self.current_language.upper()}代码..."))
 
                 # 发送初始进度
-                self.update_progress(10)
+                self.update_progress(10, 'generating', websocket)
                 await self.send_progress_update(websocket)
 
-                # 生成代码
-                full_code = await self.get_complete_code_solution(question_text, existing_code)
+                # 生成代码：优先取用推测生成的结果
+                self.jobs.transition(solve_id, 'running')
+                self.speculative.begin_foreground()
+                try:
+                    speculative_key = self.speculative.make_key(self.current_language, self.model_name, question_text)
+                    # 预取下一关时还没有该关编辑器中的代码：结果须包含当前已有代码才可取用
+                    full_code = await self.speculative.take(
+                        speculative_key, existing_code,
+                        accept=lambda code: self._is_complete_code_response(code, existing_code)[0]
+                    )
+                    if not full_code:
+                        full_code = await self.get_complete_code_solution(
+                            question_text, existing_code, solve_id=state.solve_id
+                        )
+                finally:
+                    self.speculative.end_foreground()
 
                 if full_code:
-                    self.current_code = full_code
-                    self.update_progress(30)  # 代码生成完成
+                    state.code = full_code
+                    # 先保存结果再发送，发送前服务器被停止时扩展重连后仍可取回
+                    self.jobs.transition(solve_id, 'succeeded', result=full_code)
+                    self.update_progress(30, 'generated', websocket)  # 代码生成完成
                     await self.send_progress_update(websocket)
 
                     # 通知前端开始输入
-                    await websocket.send(json.dumps({
-                        "type": "code_solution",
-                        "code": full_code,
-                        "timestamp": datetime.now().isoformat()
-                    }, ensure_ascii=False))
+                    await self._send_job_result(websocket, {
+                        'job_id': solve_id, 'solve_id': solve_id, 'kind': 'solve', 'result': full_code, 'payload': {}
+                    })
 
                     # 等待前端响应
                     self.gui.log("等待前端准备输入...")
                 else:
+                    self.jobs.fail(solve_id, "代码生成失败")
                     await websocket.send("代码生成失败")
-                    self.is_input_in_progress = False
             else:
                 await websocket.send("未找到有效的题目内容")
-                self.is_input_in_progress = False
 
         except Exception as e:
+            if solve_id:
+                self.jobs.fail(solve_id, e)
             self.gui.log(f"处理题目内容失败: {e}")
             await websocket.send(f"处理失败: {str(e)}")
-            self.is_input_in_progress = False
 
-    async def handle_test_results(self, websocket, data):
+    async def handle_speculative_prefetch(self, websocket, message):
+        """处理扩展在页面加载时上报的题目，提前在后台生成代码（含多关卡的下一关）"""
+        results = []
+        for item in message.tasks:
+            key = self.speculative.make_key(self.current_language, self.model_name, item['text'])
+            status = self.speculative.submit(key, item['text'], item['existing_code'], source=item['source'])
+            results.append({'url': item['url'], 'source': item['source'], 'status': status})
+            if status == 'started':
+                self.gui.log(f"已开始推测生成（{item['source']}），本小时剩余预算: {self.speculative.budget_left()}")
+
+        await websocket.send(json.dumps({
+            "type": "speculative_ack",
+            "enabled": self.speculative.enabled,
+            "results": results,
+            "budget_left": self.speculative.budget_left(),
+            "timestamp": datetime.now().isoformat()
+        }, ensure_ascii=False))
+
+    async def handle_test_results(self, websocket, message):
         """处理测试结果并智能纠错"""
         try:
             self.gui.log("收到测试结果")
-
-            test_results = data.get('results', {})
-            test_text = test_results.get('text', '')
-            current_code = (
-                data.get('currentCode')
-                or data.get('current_code')
-                or data.get('existing_code')
-                or data.get('editor_code')
-                or self.current_code
-                or self.current_existing_code
-                or ''
-            )
-            current_code_source = data.get('editor_code_source', 'unknown')
-            current_code_reason = data.get('editor_code_reason', '')
-            has_error = data.get('has_error', False)  # 获取前端传来的错误标记
+            state = self._solve_state(websocket)
+
+            test_results = message.results
+            test_text = message.test_text
+            current_code = message.current_code or state.code or state.existing_code or ''
+            current_code_source = message.editor_code_source
+            current_code_reason = message.editor_code_reason
+            if profile_for_source(current_code_source) != 'verbatim':
+                state.editor = profile_for_source(current_code_source)
+            state.editor_code = message.current_code or None
+            has_error = message.has_error  # 获取前端传来的错误标记
 
             self.gui.log(f"智能纠错代码长度: {len(current_code)} 字符, 来源: {current_code_source}, 原因: {current_code_reason}")
 
@@ -267,14 +563,14 @@ class OJAssistant:
             should_fix = has_error
 
             # 保存测试失败信息（直接使用test_results）
-            self.test_failures = test_results
+            state.test_failures = test_results
 
             if should_fix:
                 self.gui.log(f"检测到测试失败，准备纠错")
 
                 # 检查是否超过最大重试次数
-                if self.retry_count >= self.max_retries:
-                    await websocket.send(json.dumps({
+                if state.retry_count >= self.max_retries:
+                    await self.send_message(websocket, {
                         "type": "test_results_response",
                         "success": True,
                         "has_failures": True,
@@ -282,87 +578,128 @@ class OJAssistant:
                         "failures": [],
                         "test_results_text": test_text,
                         "message": f"已达到最大重试次数({self.max_retries}次)，请手动检查代码"
-                    }, ensure_ascii=False))
+                    })
                     return
 
                 # 增加重试计数
-                self.retry_count += 1
+                state.retry_count += 1
+                retry_count = state.retry_count
+                if state.solve_id is None:
+                    state.solve_id = uuid.uuid4().hex
+                job_id = state.job_id = correction_job_id(state.solve_id, retry_count)
+                self.jobs.create(job_id, state.solve_id, 'correction', {
+                    'question': state.question,
+                    'existing_code': state.existing_code,
+                    'test_text': test_text,
+                    'current_code': current_code,
+                    'retry_count': retry_count,
+                }, host=state.host, language=self.current_language, model=self.model_name)
 
                 # 更新进度
-                self.update_progress(20 + (self.retry_count * 10))
+                self.update_progress(20 + (retry_count * 10), 'correcting', websocket)
                 await self.send_progress_update(websocket)
 
-                await websocket.send(f"检测到测试失败，开始第 {self.retry_count} 次纠错...")
+                await websocket.send(f"检测到测试失败，开始第 {retry_count} 次纠错...")
 
                 # 开始纠错流程
-                revised_code = await self._generate_revised_code_with_failures(
-                    self.last_question,
-                    test_text,  # 直接使用test_text作为错误内容
-                    current_code
-                )
+                self.jobs.transition(job_id, 'running')
+                self.speculative.begin_foreground()
+                try:
+                    revised_code = await self._generate_revised_code_with_failures(
+                        state.question,
+                        test_text,  # 直接使用test_text作为错误内容
+                        current_code,
+                        solve_id=state.solve_id,
+                        retry_count=retry_count,
+                    )
+                finally:
+                    self.speculative.end_foreground()
 
                 if revised_code:
-                    self.current_code = revised_code
+                    state.code = revised_code
+                    self.jobs.transition(job_id, 'succeeded', result=revised_code)
 
                     # 更新进度
-                    self.update_progress(50)
+                    self.update_progress(50, 'revised', websocket)
                     await self.send_progress_update(websocket)
 
                     # 发送修订代码给前端
-                    await websocket.send(json.dumps({
-                        "type": "code_revision",
-                        "revised_code": revised_code,
-                        "retry_count": self.retry_count,
-                        "failure_count": 0,
-                        "revision_notes": f"第{self.retry_count}次纠错，修正了测试失败",
-                        "timestamp": datetime.now().isoformat()
-                    }, ensure_ascii=False))
+                    await self._send_job_result(websocket, {
+                        'job_id': job_id, 'solve_id': state.solve_id, 'kind': 'correction', 'result': revised_code,
+                        'payload': {'retry_count': retry_count}
+                    })
 
-                    self.gui.root.after(0, lambda: self.gui.update_status(f"代码纠错完成 (第{self.retry_count}次)"))
+                    self.gui.root.after(0, lambda: self.gui.update_status(f"代码纠错完成 (第{retry_count}次)"))
 
                 else:
-                    await websocket.send(json.dumps({
+                    self.jobs.fail(job_id, "代码纠错失败")
+                    await self.send_message(websocket, {
                         "type": "test_results_response",
                         "success": False,
                         "message": "代码纠错失败",
                         "test_results_text": test_text
-                    }, ensure_ascii=False))
+                    })
 
             else:
-                await websocket.send(json.dumps({
+                await self.send_message(websocket, {
                     "type": "test_results_response",
                     "success": True,
                     "has_failures": False,
                     "message": "所有测试通过！代码正确。",
                     "test_results_text": test_text
-                }, ensure_ascii=False))
+                })
 
         except Exception as e:
+            job_id = self._solve_state(websocket).job_id
+            if job_id:
+                self.jobs.fail(job_id, e)
             self.gui.log(f"处理测试结果失败: {e}")
-            await websocket.send(json.dumps({
+            await self.send_message(websocket, {
                 "type": "test_results_response",
                 "success": False,
                 "message": f"处理测试结果失败: {str(e)}"
-            }, ensure_ascii=False))
+            })
+
+    async def handle_ready_for_input(self, websocket, message):
+        """处理准备输入请求：多个客户端按先后顺序排队获得键盘输入权，再按站点策略依次尝试输入方式"""
+        code = message.code
+        is_retry = message.is_retry
+        retry_count = message.retry_count
+
+        if not code:
+            await websocket.send("错误: 没有可输入的代码")
+            return
+
+        state = self._solve_state(websocket)
+        host = host_of(message.url) or state.host
+        # 纠错时编辑器中已有上一轮的代码，只修改变化的行
+        base = (message.editor_code or state.editor_code) if is_retry else None
+        modes = [mode for mode in message.input_modes if mode in SERVER_MODES] or \
+            [mode for mode in self._input_plan(websocket, host) if mode in SERVER_MODES]
+        if base and 'stream' in modes:
+            # 粘贴会全选后重新粘贴整段代码，只修改变化的行需要逐键输入，因此先尝试 stream
+            modes = ['stream'] + [mode for mode in modes if mode != 'stream']
 
-    async def handle_ready_for_input(self, websocket, data):
-        """处理准备输入请求"""
         try:
-            code = data.get('code', '')
-            is_retry = data.get('is_retry', False)
-            retry_count = data.get('retry_count', 0)
-
-            if not code:
-                await websocket.send("错误: 没有可输入的代码")
-                return
+            ticket = await self.typing.acquire(
+                self._owner(websocket),
+                on_wait=lambda ticket, position, queue_length: self._report_typing_queue(
+                    websocket, ticket, position, queue_length
+                ),
+            )
+        except websockets.ConnectionClosed:
+            self.gui.log("扩展在排队等待输入时断开，已退出输入队列")
+            return
 
+        try:
             # 设置输入状态
             self.is_input_in_progress = True
             self.input_simulator.reset()
+            if ticket.wait_ms >= 100:
+                self.gui.log(f"排队 {ticket.wait_ms / 1000:.1f} 秒后开始输入")
 
-            # 更新进度
-            self.update_progress(60 if is_retry else 60)
-            self.update_progress(40 if is_retry else 40)
+            # 更新进度（附带本次排队等待时间）
+            self.update_progress(40, 'typing', websocket, queue_position=0, queue_wait_ms=ticket.wait_ms)
             await self.send_progress_update(websocket)
 
             if is_retry:
@@ -370,85 +707,341 @@ class OJAssistant:
             else:
                 await websocket.send("开始自动输入代码...")
 
-            # 优先使用清空后整段粘贴，避免逐字输入导致缩进漂移；失败时再回退流式输入
-            success = self.input_simulator.paste_code(code)
-
-            if success:
-                # 更新进度
-                self.update_progress(100)
-                await self.send_progress_update(websocket)
-
-                self.gui.root.after(0,
-                                    lambda: self.gui.update_status(f"{self.current_language.upper()}代码输入完成"))
-            else:
-                if self.input_simulator.esc_pressed:
-                    await websocket.send("用户按ESC键终止了代码输入")
+            # 按顺序尝试：已知在该站点可用且更快的方式在前，已知失败的方式不再尝试
+            used_mode = None
+            for index, mode in enumerate(modes):
+                started = time.monotonic()
+                if mode == 'paste':
+                    # 键盘模拟是阻塞调用，交给输入服务的工作线程执行，其他客户端的生成不受影响
+                    success = await self._run_input(self.input_simulator.paste_code, code)
                 else:
-                    await websocket.send("代码粘贴失败，回退到逐行输入")
-                    await self._stream_input_code(websocket, code)
+                    success = await self._stream_input_code(websocket, code, base=base)
+                # 失败的方式可能已清空编辑器或输入了一部分，之后的方式不能再按原有代码只修改变化的行
+                base = None
+                if self.input_simulator.esc_pressed:
+                    # 用户主动终止不计入站点策略
+                    break
+                elapsed_ms = int((time.monotonic() - started) * 1000)
+                self.input_strategies.record(host, mode, success, elapsed_ms)
+                if success:
+                    used_mode = mode
+                    break
+                if index + 1 < len(modes):
+                    await websocket.send(f"输入方式 {mode} 失败，改用 {modes[index + 1]}")
 
             # 输入完成
             self.is_input_in_progress = False
-            # 只有在未按下ESC键的情况下才显示完成消息
-            if not self.input_simulator.esc_pressed:
-                # 更新最终进度
-                self.update_progress(100)
-                await self.send_progress_update(websocket)
-
-                # 发送输入完成消息
+            state.editor_code = None
+            if self.input_simulator.esc_pressed:
+                await websocket.send("用户按ESC键终止了代码输入")
+            elif used_mode is None:
                 await websocket.send(json.dumps({
-                    "type": "input_complete",
-                    "success": True,
+                    "type": "input_error",
+                    "message": "所有输入方式均失败，请确认编辑器窗口处于激活状态",
+                    "tried": modes,
                     "timestamp": datetime.now().isoformat()
                 }, ensure_ascii=False))
-                await websocket.send("代码输入完成")
+            else:
+                await self._send_input_complete(websocket, used_mode, ticket)
 
+        except InputQueueFull as e:
+            self.gui.log(f"输入服务繁忙: {e}")
+            await websocket.send("输入失败: 本机输入任务过多，请稍后重试")
         except Exception as e:
             self.gui.log(f"处理输入请求失败: {e}")
             await websocket.send(f"输入失败: {str(e)}")
+        finally:
             self.is_input_in_progress = False
-
-    async def handle_direct_input_complete(self, websocket, data):
-        """处理前端页面内直接输入完成通知。"""
-        self.is_input_in_progress = False
-        self.current_progress = 100
-        self.gui.root.after(0, lambda: self.gui.update_status("代码输入完成（页面内直写）"))
-
-        await websocket.send(json.dumps({
+            self.typing.release(ticket)
+
+    async def _send_input_complete(self, websocket, mode, ticket):
+        """输入成功：更新最终进度、标记任务完成并通知扩展"""
+        self._solve_state(websocket).typing_plan = None  # 编辑器中已是完整代码，不能再继续输入
+        self.update_progress(100, 'complete', websocket)
+        await self.send_progress_update(websocket)
+        self._complete_job(websocket)
+        self.gui.root.after(0,
+                            lambda: self.gui.update_status(f"{self.current_language.upper()}代码输入完成"))
+
+        # 发送输入完成消息
+        await self.send_message(websocket, {
             "type": "input_complete",
             "success": True,
-            "source": "direct_page_injection",
+            "mode": mode,
+            "queue_wait_ms": ticket.wait_ms,
+            "paused_ms": self.input_simulator.paused_ms,  # 焦点离开编辑器窗口而暂停的时间
             "timestamp": datetime.now().isoformat()
-        }, ensure_ascii=False))
-
-    async def _stream_input_code(self, websocket, code):
-        """流式输入代码"""
-        full_code = ""
-        self.is_first_chunk = True
+        })
+        await websocket.send("代码输入完成")
+
+    async def handle_resume_input(self, websocket, message):
+        """从上次中断处继续输入（ESC、取消或出错后），不清空编辑器，只输入剩余部分"""
+        state = self._solve_state(websocket)
+        plan = state.typing_plan
+        if plan is None or plan.finished or (message.code and message.code != plan.code):
+            await self.send_message(websocket, {
+                "type": "input_error",
+                "message": "没有可以继续的输入，请重新开始输入",
+                "tried": ['resume'],
+                "timestamp": datetime.now().isoformat()
+            })
+            return
 
-        # 将代码分成小块进行输入
-        chunks = self._split_code_into_chunks(code)
+        try:
+            ticket = await self.typing.acquire(self._owner(websocket))
+        except websockets.ConnectionClosed:
+            return
 
-        for i, chunk in enumerate(chunks):
-            # 检查ESC键是否被按下
+        try:
+            self.is_input_in_progress = True
+            self.input_simulator.reset()
+            offset = plan.committed_chars()
+            self.gui.log(f"从第 {offset} 个字符处继续输入（共 {len(plan.code)} 个字符）")
+            await websocket.send(f"从中断处继续输入代码（已输入 {offset}/{len(plan.code)} 个字符）...")
+            success = await self._stream_input_code(websocket, plan.code, resume=True)
+            self.is_input_in_progress = False
             if self.input_simulator.esc_pressed:
                 await websocket.send("用户按ESC键终止了代码输入")
-                break
-
-            full_code += chunk
+            elif success:
+                await self._send_input_complete(websocket, 'type', ticket)
+        except InputQueueFull as e:
+            self.gui.log(f"输入服务繁忙: {e}")
+            await websocket.send("输入失败: 本机输入任务过多，请稍后重试")
+        except Exception as e:
+            self.gui.log(f"继续输入失败: {e}")
+            await websocket.send(f"输入失败: {str(e)}")
+        finally:
+            self.is_input_in_progress = False
+            self.typing.release(ticket)
+
+    async def handle_direct_input_complete(self, websocket, message):
+        """处理前端页面内直接输入的结果（成功或失败都会计入站点策略）"""
+        host = host_of(message.url) or self._solve_state(websocket).host
+        self.input_strategies.record(host, 'page_inject', message.success, message.elapsed_ms)
+        if not message.success:
+            self.gui.log(f"页面内直接输入失败（{host or '未知站点'}）: {message.reason or '未知原因'}")
+            return
+
+        self.update_progress(100, 'complete', websocket)
+        self._complete_job(websocket)
+        self.gui.root.after(0, lambda: self.gui.update_status("代码输入完成（页面内直写）"))
 
-            # 模拟输入
-            input_success = self.input_simulator.simulate_typing(
-                chunk,
-                is_first_chunk=self.is_first_chunk
+        await self.send_message(websocket, {
+            "type": "input_complete",
+            "success": True,
+            "source": "direct_page_injection",
+            "mode": "page_inject",
+            "timestamp": datetime.now().isoformat()
+        })
+
+    async def handle_job_status(self, websocket, message):
+        """扩展重连后（会话未能恢复）查询解题任务：已有结果时重新下发，仍在执行时完成后下发到该连接"""
+        job = self.jobs.latest(message.solve_id) if message.solve_id else None
+        reply = {
+            "type": "job_status",
+            "solve_id": message.solve_id,
+            "state": job['state'] if job else 'unknown',
+        }
+        if job is not None:
+            reply.update({
+                "job_id": job['job_id'],
+                "kind": job['kind'],
+                "attempts": job['attempts'],
+                "retry_count": job['payload'].get('retry_count', 0),
+                "error": job['error'],
+            })
+            # 恢复该连接的解题状态，后续纠错沿用原题目与纠错次数
+            if self._solve_state(websocket).solve_id != job['solve_id']:
+                self._solve_state(websocket, self._state_from_job(job))
+        reply["timestamp"] = datetime.now().isoformat()
+        await websocket.send(json.dumps(reply, ensure_ascii=False))
+
+        if job is None:
+            return
+        if job['state'] in HAS_RESULT:
+            self.gui.log(f"扩展重连后取回任务 {job['job_id']} 的结果")
+            await self._send_job_result(websocket, job)
+        elif job['state'] in UNFINISHED:
+            self.job_waiters[job['solve_id']] = websocket
+
+    def resume_jobs(self):
+        """服务器启动时在后台重新执行上次未完成的任务（切换模型重启或程序崩溃中断的生成与纠错）"""
+        jobs = self.jobs.take_unfinished()
+        if jobs:
+            self.gui.log(f"继续执行上次未完成的 {len(jobs)} 个任务")
+        for job in jobs:
+            task = asyncio.ensure_future(self._replay_job(job))
+            self.replay_tasks.add(task)
+            task.add_done_callback(self.replay_tasks.discard)
+
+    async def close_jobs(self):
+        """停止重新执行中的任务（保持未完成状态，下次启动时继续）并关闭任务队列"""
+        for task in list(self.replay_tasks):
+            task.cancel()
+        if self.replay_tasks:
+            await asyncio.gather(*self.replay_tasks, return_exceptions=True)
+        self.jobs.close()
+
+    async def _replay_job(self, job):
+        job_id = job['job_id']
+        payload = job['payload']
+        self.jobs.transition(job_id, 'running', detail="服务器重启后重新执行")
+        try:
+            if job['kind'] == 'solve':
+                code = await self.get_complete_code_solution(
+                    payload.get('question'), payload.get('existing_code', ''), solve_id=job['solve_id']
+                )
+            else:
+                code = await self._generate_revised_code_with_failures(
+                    payload.get('question'),
+                    payload.get('test_text', ''),
+                    payload.get('current_code', ''),
+                    solve_id=job['solve_id'],
+                    retry_count=payload.get('retry_count', 0),
+                )
+        except Exception as e:
+            self.gui.log(f"重新执行任务 {job_id} 失败: {e}")
+            self.jobs.fail(job_id, e)
+            return
+        if not code:
+            self.jobs.fail(job_id, "重新执行未得到代码")
+            return
+        self.jobs.transition(job_id, 'succeeded', result=code)
+        self.gui.log(f"任务 {job_id} 已重新生成，等待扩展取回")
+        await self._deliver_to_waiter(job['solve_id'])
+
+    async def _send_job_result(self, websocket, job):
+        """下发任务结果（code_solution 或 code_revision），并转给重连后在等待同一解题的连接"""
+        await self.send_message(websocket, self._job_result_message(websocket, job))
+        self.jobs.transition(job['job_id'], 'delivered')
+        await self._deliver_to_waiter(job['solve_id'], exclude=websocket)
+
+    async def _deliver_to_waiter(self, solve_id, exclude=None):
+        waiter = self.job_waiters.pop(solve_id, None)
+        if waiter is None or waiter is exclude or getattr(waiter, 'closed', False):
+            return
+        job = self.jobs.latest(solve_id)
+        if job is not None and job['state'] in HAS_RESULT:
+            self._solve_state(waiter, self._state_from_job(job))
+            await self.send_message(waiter, self._job_result_message(waiter, job))
+            self.jobs.transition(job['job_id'], 'delivered', detail="重连后下发")
+
+    def _job_result_message(self, websocket, job):
+        host = self._solve_state(websocket).host or job.get('host') or ''
+        if job['kind'] == 'solve':
+            message = {"type": "code_solution", "code": job['result']}
+        else:
+            retry_count = job['payload'].get('retry_count', 0)
+            message = {
+                "type": "code_revision",
+                "revised_code": job['result'],
+                "retry_count": retry_count,
+                "failure_count": 0,
+                "revision_notes": f"第{retry_count}次纠错，修正了测试失败",
+            }
+        message.update({
+            "solve_id": job['solve_id'],
+            "job_id": job['job_id'],
+            "input_plan": self._input_plan(websocket, host),
+            "timestamp": datetime.now().isoformat(),
+        })
+        return message
+
+    @staticmethod
+    def _state_from_job(job):
+        """由任务记录重建解题状态（服务器重启后内存中的状态已丢失）"""
+        payload = job['payload']
+        state = SolveState(job['solve_id'], payload.get('question'), payload.get('existing_code', ''),
+                           job.get('host') or '')
+        state.retry_count = payload.get('retry_count', 0)
+        state.code = job.get('result') or payload.get('current_code')
+        state.job_id = job['job_id']
+        return state
+
+    def _complete_job(self, websocket):
+        state = self._solve_state(websocket)
+        if state.job_id:
+            self.jobs.complete(state.job_id)
+
+    def _input_plan(self, websocket, host):
+        """本连接在该站点的输入方式尝试顺序"""
+        available = self.client_input_modes.get(websocket, []) + list(SERVER_MODES)
+        return self.input_strategies.plan(host, available)
+
+    async def _run_input(self, func, *args, **kwargs):
+        """在输入服务的工作线程中执行阻塞的键盘模拟调用"""
+        return await self.input_service.run(lambda token: func(*args, **kwargs), PRIORITY_SOLVE,
+                                            name=getattr(func, '__name__', ''), owner=self)
+
+    async def _stream_input_code(self, websocket, code, resume=False, base=None):
+        """
+        按输入计划逐段输入代码（调用方需持有输入权），返回是否全部输入成功
+        :param resume: 继续本连接上次中断的输入计划，而不是重新编译并清空编辑器
+        :param base: 编辑器中已有的代码，只修改变化的行
+        """
+        state = self._solve_state(websocket)
+        if resume:
+            plan = state.typing_plan
+        else:
+            # 输入前一次性编译整段代码的按键计划，执行时只做键盘 I/O
+            plan = self.input_simulator.compile_plan(code, self.current_language, state.editor, base)
+            state.typing_plan = plan
+        loop = asyncio.get_running_loop()
+        typed = asyncio.Queue()
+
+        def type_plan(token):
+            # 整段代码是输入服务中的一个任务，其他来源的输入不会插在中间；每段完成后汇报一次进度
+            return self.input_simulator.type_plan(
+                plan, resume=resume,
+                on_segment=lambda index, total: loop.call_soon_threadsafe(
+                    typed.put_nowait, plan.committed / len(plan.actions)
+                ),
             )
-            self.is_first_chunk = False
 
-            # 计算进度
-            progress = 60 + int((i + 1) / len(chunks) * 40)
-            self.update_progress(progress)
+        input_job = self.input_service.submit(type_plan, PRIORITY_SOLVE, name='stream', owner=self)
+        job = asyncio.wrap_future(input_job.future)
+        try:
+            while True:
+                next_segment = asyncio.ensure_future(typed.get())
+                await asyncio.wait({next_segment, job}, return_when=asyncio.FIRST_COMPLETED)
+                if not next_segment.done():
+                    next_segment.cancel()
+                    break
+                await self._report_typing_progress(websocket, next_segment.result())
+            while not typed.empty():
+                await self._report_typing_progress(websocket, typed.get_nowait())
+        except BaseException:
+            # 连接断开等：不再向该连接汇报，也不再继续输入
+            self.input_service.cancel(input_job, "进度汇报失败，输入已取消")
+            raise
+
+        input_success = not job.cancelled() and job.result()
+        if input_success:
+            state.typing_plan = None
+            return True
+        if plan.committed:
+            # 已输入的部分保留在编辑器中，扩展可以发送 resume_input 从这里继续
+            offset = plan.committed_chars()
+            await self.send_message(websocket, {
+                "type": "input_interrupted",
+                "committed_chars": offset,
+                "total_chars": len(plan.code),
+                "paused_ms": self.input_simulator.paused_ms,
+                "resumable": True,
+                "timestamp": datetime.now().isoformat()
+            })
+            self.gui.log(f"输入在第 {offset}/{len(plan.code)} 个字符处中断，可继续输入")
+        if not self.input_simulator.esc_pressed:
+            await websocket.send("代码输入出现错误")
+        return False
 
-            # 发送JSON格式的进度消息
+    async def _report_typing_progress(self, websocket, fraction):
+        """已提交的动作占整个输入计划的 fraction 时的进度"""
+        progress = 60 + int(fraction * 40)
+        self.update_progress(progress, 'typing', websocket)
+
+        if websocket not in self.progress.subscribers:
+            # 订阅了推送的连接由进度通道合并推送；其他连接发送JSON格式的进度消息
             await websocket.send(json.dumps({
                 "type": "input_progress",
                 "progress": progress,
@@ -458,71 +1051,68 @@ class OJAssistant:
             # 同时发送文本进度消息，兼容旧版本
             await websocket.send(f"输入进度: {progress}%")
 
-            if not input_success:
-                if self.input_simulator.esc_pressed:
-                    await websocket.send("用户按ESC键终止了代码输入")
-                else:
-                    await websocket.send("代码输入出现错误")
-                break
-
-        # 只有在未按下ESC键的情况下才显示完成消息
-        if not self.input_simulator.esc_pressed:
-            # 更新最终进度
-            self.update_progress(100)
-            await self.send_progress_update(websocket)
-
-            # 发送输入完成消息
-            await websocket.send(json.dumps({
-                "type": "input_complete",
-                "success": True,
-                "timestamp": datetime.now().isoformat()
-            }, ensure_ascii=False))
-
-    def _split_code_into_chunks(self, code, max_chunk_size=50):
-        """将代码分割成小块"""
-        lines = code.split('\n')
-        chunks = []
-        current_chunk = ""
-
-        for line in lines:
-            if len(current_chunk) + len(line) + 1 > max_chunk_size and current_chunk:
-                chunks.append(current_chunk)
-                current_chunk = line + '\n'
-            else:
-                current_chunk += line + '\n'
-
-        if current_chunk:
-            chunks.append(current_chunk)
-
-        return chunks
-
-    async def _generate_revised_code_with_failures(self, original_question, test_results_text, previous_code):
-        """根据测试失败重新生成代码"""
+    async def _chat_completion(self, kind, system_prompt, user_prompt, temperature=0, solve_id=None,
+                               question_text=None, speculative=False):
+        """调用模型并把用量与耗时记入账本"""
+        started = time.perf_counter()
         try:
-            self.gui.log(f"根据测试失败重新生成{self.current_language.upper()}代码，第{self.retry_count}次重试")
-
-            # 构建包含失败信息的提示词
-            prompt = self._build_retry_prompt(original_question, test_results_text, previous_code)
-
-            response = await self.client.chat.completions.create(
-                model=self.model_name,  # 使用当前选择的模型
-                messages=[
+            result = await self.backend.complete(
+                [
                     {
                         "role": "system",
-                        "content": self._get_retry_system_prompt()
+                        "content": system_prompt
                     },
                     {
                         "role": "user",
-                        "content": prompt
+                        "content": user_prompt
                     }
                 ],
                 max_tokens=8192,
+                temperature=temperature
+            )
+        except Exception as e:
+            self._record_usage(kind, started, None, solve_id, question_text, speculative, error=str(e))
+            raise
+
+        self._record_usage(kind, started, result.usage, solve_id, question_text, speculative)
+        return result
+
+    def _record_usage(self, kind, started, usage, solve_id, question_text, speculative, error=None):
+        """写入一条账本记录"""
+        problem_hash = hashlib.sha256(question_text.encode('utf-8')).hexdigest()[:16] if question_text else None
+        self.usage_ledger.record(
+            kind,
+            self.model_name,
+            self.current_language,
+            solve_id=solve_id,
+            problem_hash=problem_hash,
+            usage=usage,
+            latency_ms=(time.perf_counter() - started) * 1000,
+            success=error is None,
+            error=error,
+            speculative=speculative,
+        )
+
+    async def _generate_revised_code_with_failures(self, original_question, test_results_text, previous_code,
+                                                   solve_id=None, retry_count=0):
+        """根据测试失败重新生成代码"""
+        try:
+            self.gui.log(f"根据测试失败重新生成{self.current_language.upper()}代码，第{retry_count}次重试")
+
+            # 构建包含失败信息的提示词
+            prompt = self._build_retry_prompt(original_question, test_results_text, previous_code)
+
+            response = await self._chat_completion(
+                'correction',
+                self._get_retry_system_prompt(),
+                prompt,
                 temperature=0.3,  # 稍高的温度以获得更多样化的解决方案
-                stream=False
+                solve_id=solve_id,
+                question_text=original_question,
             )
 
-            if response.choices and response.choices[0].message.content:
-                full_code = response.choices[0].message.content
+            if response.text:
+                full_code = response.text
                 cleaned_code = self.clean_code_response(full_code)
 
                 is_complete, reason = self._is_complete_revised_code(cleaned_code, previous_code)
@@ -534,6 +1124,7 @@ class OJAssistant:
                         previous_code,
                         cleaned_code,
                         reason,
+                        solve_id=solve_id,
                     )
                     if retry_code:
                         cleaned_code = retry_code
@@ -570,6 +1161,7 @@ class OJAssistant:
         previous_code,
         first_try_code,
         incomplete_reason,
+        solve_id=None,
     ):
         """纠错输出不完整时重试一次。"""
         try:
@@ -582,25 +1174,16 @@ class OJAssistant:
 请重新输出完整最终代码文件（包含所有原有和修复后的代码，不能省略任何未改动部分）。
 """
 
-            retry_response = await self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self._get_retry_system_prompt()
-                    },
-                    {
-                        "role": "user",
-                        "content": retry_prompt
-                    }
-                ],
-                max_tokens=8192,
-                temperature=0,
-                stream=False
+            retry_response = await self._chat_completion(
+                'correction_retry',
+                self._get_retry_system_prompt(),
+                retry_prompt,
+                solve_id=solve_id,
+                question_text=original_question,
             )
 
-            if retry_response.choices and retry_response.choices[0].message.content:
-                retry_code = self.clean_code_response(retry_response.choices[0].message.content)
+            if retry_response.text:
+                retry_code = self.clean_code_response(retry_response.text)
                 is_complete, retry_reason = self._is_complete_revised_code(retry_code, previous_code)
                 if is_complete:
                     self.gui.log("纠错重试成功，已获得完整代码")
@@ -673,38 +1256,35 @@ class OJAssistant:
 专注于修复已知的错误，确保代码通过所有测试。"""
         return system_prompt
 
-    async def get_complete_code_solution(self, question_text, existing_code=""):
+    async def get_complete_code_solution(self, question_text, existing_code="", speculative=False, solve_id=None):
         """获取完整代码解决方案（非流式）"""
         try:
             self.gui.log(f"获取完整{self.current_language.upper()}代码解决方案...")
 
             prompt = self._build_prompt(question_text, existing_code)
-
-            response = await self.client.chat.completions.create(
-                model=self.model_name,  # 使用当前选择的模型
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self._get_system_prompt(bool(existing_code and existing_code.strip()))
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=8192,
-                temperature=0,
-                stream=False
+            # 推测生成使用独立的解题编号，避免与用户当前解题混在一起统计
+            if speculative:
+                solve_id = f"spec-{uuid.uuid4().hex}"
+
+            response = await self._chat_completion(
+                'initial',
+                self._get_system_prompt(bool(existing_code and existing_code.strip())),
+                prompt,
+                solve_id=solve_id,
+                question_text=question_text,
+                speculative=speculative,
             )
 
-            if response.choices and response.choices[0].message.content:
-                full_code = response.choices[0].message.content
+            if response.text:
+                full_code = response.text
                 cleaned_code = self.clean_code_response(full_code)
 
                 is_complete, reason = self._is_complete_code_response(cleaned_code, existing_code)
                 if not is_complete:
                     self.gui.log(f"首轮代码可能不完整({reason})，尝试自动重试一次")
-                    retry_code = await self._retry_complete_code_solution(question_text, existing_code, cleaned_code, reason)
+                    retry_code = await self._retry_complete_code_solution(
+                        question_text, existing_code, cleaned_code, reason, solve_id=solve_id, speculative=speculative
+                    )
                     if retry_code:
                         cleaned_code = retry_code
 
@@ -853,7 +1433,8 @@ class OJAssistant:
 
         return True, "ok"
 
-    async def _retry_complete_code_solution(self, question_text, existing_code, previous_code, reason):
+    async def _retry_complete_code_solution(self, question_text, existing_code, previous_code, reason,
+                                            solve_id=None, speculative=False):
         """当首轮输出可能不完整时进行一次重试。"""
         try:
             retry_prompt = self._build_prompt(question_text, existing_code) + f"""
@@ -865,25 +1446,17 @@ class OJAssistant:
 请重新输出完整最终代码（必须包含已有代码与新增实现），不要任何解释文字。
 """
 
-            retry_response = await self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self._get_system_prompt(bool(existing_code and existing_code.strip()))
-                    },
-                    {
-                        "role": "user",
-                        "content": retry_prompt
-                    }
-                ],
-                max_tokens=8192,
-                temperature=0,
-                stream=False
+            retry_response = await self._chat_completion(
+                'completeness_retry',
+                self._get_system_prompt(bool(existing_code and existing_code.strip())),
+                retry_prompt,
+                solve_id=solve_id,
+                question_text=question_text,
+                speculative=speculative,
             )
 
-            if retry_response.choices and retry_response.choices[0].message.content:
-                retry_code = self.clean_code_response(retry_response.choices[0].message.content)
+            if retry_response.text:
+                retry_code = self.clean_code_response(retry_response.text)
                 is_complete, retry_reason = self._is_complete_code_response(retry_code, existing_code)
                 if is_complete:
                     self.gui.log("重试成功，已获得完整代码输出")
@@ -0,0 +1,148 @@
+"""
+超大消息的分块上传
+扩展发送的消息超过阈值时，先发送 chunk_begin 声明总长度、分块大小与SHA-256，
+再以二进制分块帧（见 core.protocol.encode_chunk）逐块发送。服务器按声明的长度预分配缓冲区，
+分块直接写入对应位置，收齐后校验哈希再交给正常的消息处理流程。
+每个会话（未握手的连接按连接计）同时占用的缓冲区总量有上限，超出时拒绝传输而不是断开连接。
+"""
+import hashlib
+import time
+
+
+class ChunkError(Exception):
+    """分块传输失败"""
+
+
+class _Transfer:
+    __slots__ = ('owner', 'buffer', 'view', 'chunk_size', 'chunk_count', 'received', 'received_count', 'sha256',
+                 'encoding', 'started_at')
+
+    def __init__(self, owner, total_size, chunk_size, chunk_count, sha256, encoding):
+        self.owner = owner
+        self.buffer = bytearray(total_size)
+        self.view = memoryview(self.buffer)
+        self.chunk_size = chunk_size
+        self.chunk_count = chunk_count
+        self.received = bytearray(chunk_count)  # 每个分块是否已收到
+        self.received_count = 0
+        self.sha256 = sha256
+        self.encoding = encoding
+        self.started_at = time.monotonic()
+
+
+class ChunkAssembler:
+    def __init__(self, max_transfer_size=16 * 1024 * 1024, owner_memory_cap=32 * 1024 * 1024,
+                 max_chunk_size=512 * 1024, timeout=60):
+        """
+        初始化分块重组器
+        :param max_transfer_size: 单次传输的最大字节数
+        :param owner_memory_cap: 每个会话同时占用的缓冲区上限（字节）
+        :param max_chunk_size: 允许的最大分块大小（需小于 WebSocket 的 max_size）
+        :param timeout: 传输超时时间（秒），超时未收齐的传输会被丢弃
+        """
+        self.max_transfer_size = max_transfer_size
+        self.owner_memory_cap = owner_memory_cap
+        self.max_chunk_size = max_chunk_size
+        self.timeout = timeout
+
+        self.transfers = {}  # (连接, transfer_id) -> _Transfer
+        self.rejected = set()  # 已拒绝的 (连接, transfer_id)，其后续分块直接丢弃
+        self.owner_bytes = {}  # 会话或连接 -> 占用的缓冲区字节数
+        self.stats = {'completed': 0, 'rejected': 0, 'failed': 0, 'discarded_chunks': 0, 'bytes': 0}
+
+    def begin(self, connection, owner, transfer_id, total_size, chunk_size, sha256, encoding='json'):
+        """登记一次传输并预分配缓冲区"""
+        self._expire()
+        key = (connection, transfer_id)
+        if key in self.transfers:
+            self._fail(connection, transfer_id)
+            raise self._reject(key, f"传输编号重复: {transfer_id}")
+        if encoding not in ('json', 'binary'):
+            raise self._reject(key, f"不支持的编码: {encoding}")
+        if not isinstance(sha256, str) or len(sha256) != 64:
+            raise self._reject(key, "缺少有效的SHA-256")
+        if total_size <= 0 or total_size > self.max_transfer_size:
+            raise self._reject(key, f"消息大小 {total_size} 超出上限 {self.max_transfer_size}")
+        if chunk_size <= 0 or chunk_size > self.max_chunk_size:
+            raise self._reject(key, f"分块大小 {chunk_size} 超出上限 {self.max_chunk_size}")
+        in_use = self.owner_bytes.get(owner, 0)
+        if in_use + total_size > self.owner_memory_cap:
+            raise self._reject(key, f"需要 {total_size} 字节，会话缓冲区上限 {self.owner_memory_cap}（已占用 {in_use}）")
+        self.rejected.discard(key)
+
+        chunk_count = (total_size + chunk_size - 1) // chunk_size
+        self.transfers[(connection, transfer_id)] = _Transfer(
+            owner, total_size, chunk_size, chunk_count, sha256.lower(), encoding
+        )
+        self.owner_bytes[owner] = in_use + total_size
+
+    def add(self, connection, transfer_id, index, payload):
+        """
+        写入一个分块
+        :return: 收齐并校验通过时返回 (编码, 完整消息bytearray)，否则返回None
+        """
+        key = (connection, transfer_id)
+        transfer = self.transfers.get(key)
+        if transfer is None:
+            if key in self.rejected:
+                # 已拒绝或已失败的传输，其余分块静默丢弃
+                self.stats['discarded_chunks'] += 1
+                return None
+            raise self._reject(key, f"未知的传输编号: {transfer_id}")
+        if index >= transfer.chunk_count:
+            self._fail(connection, transfer_id)
+            raise ChunkError(f"分块序号越界: {index}")
+
+        start = index * transfer.chunk_size
+        expected = min(transfer.chunk_size, len(transfer.buffer) - start)
+        if len(payload) != expected:
+            self._fail(connection, transfer_id)
+            raise ChunkError(f"分块 {index} 长度为 {len(payload)}，应为 {expected}")
+
+        if not transfer.received[index]:
+            transfer.view[start:start + expected] = payload
+            transfer.received[index] = 1
+            transfer.received_count += 1
+        if transfer.received_count < transfer.chunk_count:
+            return None
+
+        self._release(connection, transfer_id)
+        if hashlib.sha256(transfer.buffer).hexdigest() != transfer.sha256:
+            self.stats['failed'] += 1
+            raise ChunkError("SHA-256 校验失败")
+        self.stats['completed'] += 1
+        self.stats['bytes'] += len(transfer.buffer)
+        return transfer.encoding, transfer.buffer
+
+    def drop_connection(self, connection):
+        """连接关闭时丢弃其未完成的传输"""
+        for key in [key for key in self.transfers if key[0] is connection]:
+            self._fail(*key)
+        self.rejected = {key for key in self.rejected if key[0] is not connection}
+
+    def _reject(self, key, reason):
+        self.stats['rejected'] += 1
+        self.rejected.add(key)
+        return ChunkError(reason)
+
+    def _fail(self, connection, transfer_id):
+        if self._release(connection, transfer_id):
+            self.stats['failed'] += 1
+            self.rejected.add((connection, transfer_id))
+
+    def _release(self, connection, transfer_id):
+        transfer = self.transfers.pop((connection, transfer_id), None)
+        if transfer is None:
+            return False
+        transfer.view.release()
+        remaining = self.owner_bytes.get(transfer.owner, 0) - len(transfer.buffer)
+        if remaining > 0:
+            self.owner_bytes[transfer.owner] = remaining
+        else:
+            self.owner_bytes.pop(transfer.owner, None)
+        return True
+
+    def _expire(self):
+        now = time.monotonic()
+        for key in [key for key, transfer in self.transfers.items() if now - transfer.started_at > self.timeout]:
+            self._fail(*key)
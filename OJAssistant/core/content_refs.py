@@ -0,0 +1,308 @@
+"""
+按内容寻址的代码去重
+扩展与服务器在每个会话中各自保留最近出现过的代码（哈希 -> 文本）。发送代码时先算哈希：
+- 对方已有该文本：只发送 {"hash": h}
+- 对方有相近的旧版本（例如纠错前的代码）：发送 {"hash": h, "base": 旧哈希, "ops": 行级差异}
+- 否则照常发送全文，并附带 {"hash": h} 方便对方登记
+消息中的代码字段因此换成 code_ref 字段；接收方无法还原时回复 content_miss，由发送方补发全文。
+
+行级差异 ops 为 [[起始行, 删除行数, [新行...]], ...]，行号相对于旧版本，按起始行升序排列。
+差异用 patience 算法计算（两边各只出现一次的行作锚点，锚点之间再比较首尾相同的行），比 difflib 快一个数量级；
+结果不一定最小，但接收方按哈希校验还原结果，正确性不受影响。
+"""
+import bisect
+import hashlib
+import json
+from collections import Counter, OrderedDict
+
+# 服务器发出的带代码消息 -> 代码所在字段
+CODE_REF_FIELDS = {'code_solution': 'code', 'code_revision': 'revised_code'}
+# 短于该长度的代码直接发送全文
+MIN_REF_CHARS = 256
+# 对方保留的条数（与扩展端一致），服务器据此判断对方是否还持有某个版本
+PEER_CAPACITY = 16
+# 计算差异时最多尝试的候选旧版本数
+MAX_BASE_CANDIDATES = 3
+# 差异小于全文的这个比例时直接采用，不再尝试更旧的版本
+GOOD_DIFF_RATIO = 1 / 16
+
+
+class ContentMiss(KeyError):
+    """引用的内容不在存储中"""
+
+
+def content_hash(text):
+    """代码的内容哈希（UTF-8 的 SHA-256 前32位十六进制）"""
+    return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()[:32]
+
+
+def _unique_anchors(a, b, a0, a1, b0, b1):
+    """a[a0:a1] 与 b[b0:b1] 中两边各只出现一次的相同行，取 a 中行号递增的最长一组（patience 排序）"""
+    a_lines = a[a0:a1]
+    b_lines = b[b0:b1]
+    a_counts = Counter(a_lines)
+    b_counts = Counter(b_lines)
+    a_index = {line: i for i, line in enumerate(a_lines, a0)}
+    pairs = [(a_index[line], j) for j, line in enumerate(b_lines, b0)
+             if b_counts[line] == 1 and a_counts.get(line) == 1]
+    a_order = [i for i, _ in pairs]
+    if a_order == sorted(a_order):
+        # 通常只改了几行，锚点本来就是递增的
+        return pairs
+    # 按 b 的顺序，求 a 行号的最长递增子序列
+    tails = []
+    tail_index = []
+    previous = [None] * len(pairs)
+    for index, i in enumerate(a_order):
+        position = bisect.bisect_left(tails, i)
+        if position == len(tails):
+            tails.append(i)
+            tail_index.append(index)
+        else:
+            tails[position] = i
+            tail_index[position] = index
+        previous[index] = tail_index[position - 1] if position else None
+    anchors = []
+    index = tail_index[-1] if tail_index else None
+    while index is not None:
+        anchors.append(pairs[index])
+        index = previous[index]
+    anchors.reverse()
+    return anchors
+
+
+def _common_prefix(a, b, a0, b0, limit):
+    """a[a0:] 与 b[b0:] 开头相同的行数：二分比较切片，逐行比较在 C 中完成"""
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[a0:a0 + middle] == b[b0:b0 + middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix(a, b, a1, b1, limit):
+    """a[:a1] 与 b[:b1] 末尾相同的行数"""
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[a1 - middle:a1] == b[b1 - middle:b1]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _matching_blocks(a, b):
+    """a 与 b 中按顺序对应的相同行块 [(i, j, 行数), ...]，按行号升序"""
+    blocks = []
+    pending = [(0, len(a), 0, len(b))]
+    while pending:
+        a0, a1, b0, b1 = pending.pop()
+        # 首尾相同的行
+        limit = min(a1 - a0, b1 - b0)
+        count = _common_prefix(a, b, a0, b0, limit)
+        if count:
+            blocks.append((a0, b0, count))
+            a0 += count
+            b0 += count
+            limit -= count
+        count = _common_suffix(a, b, a1, b1, limit)
+        if count:
+            a1 -= count
+            b1 -= count
+            blocks.append((a1, b1, count))
+        if a0 == a1 or b0 == b1:
+            continue
+        if a1 - a0 == b1 - b0:
+            # 行数相同且只有少数行不同（纠错最常见的原地修改）：逐行对齐，不同的行直接替换
+            changed = [k for k, (old, new) in enumerate(zip(a[a0:a1], b[b0:b1])) if old != new]
+            if len(changed) * 4 <= a1 - a0:
+                start = 0
+                for k in changed:
+                    if k > start:
+                        blocks.append((a0 + start, b0 + start, k - start))
+                    start = k + 1
+                if a1 - a0 > start:
+                    blocks.append((a0 + start, b0 + start, a1 - a0 - start))
+                continue
+        anchors = _unique_anchors(a, b, a0, a1, b0, b1)
+        for i, j in anchors:
+            if i - a0 == j - b0 and a[a0:i] == b[b0:j]:
+                # 与上一个锚点之间完全相同，连同锚点作为一块
+                blocks.append((a0, b0, i - a0 + 1))
+            else:
+                # 锚点之间的区间再分别比较
+                pending.append((a0, i, b0, j))
+                blocks.append((i, j, 1))
+            a0, b0 = i + 1, j + 1
+        if anchors:
+            pending.append((a0, a1, b0, b1))
+    blocks.sort()
+    return blocks
+
+
+def diff_lines(base, text, base_lines=None):
+    """
+    计算把 base 变为 text 的行级差异
+    :param base_lines: 按行拆分的 base（已缓存时传入，不再拆分）
+    """
+    a = base_lines if base_lines is not None else base.split('\n')
+    b = text.split('\n')
+    ops = []
+    i = j = 0
+    for block_i, block_j, count in _matching_blocks(a, b) + [(len(a), len(b), 0)]:
+        if block_i > i or block_j > j:
+            ops.append([i, block_i - i, b[j:block_j]])
+        i, j = block_i + count, block_j + count
+    return ops
+
+
+def apply_ops(base, ops):
+    """把行级差异应用到 base 上"""
+    lines = base.split('\n')
+    previous_start = len(lines) + 1
+    for start, delete_count, new_lines in reversed(ops):
+        if start < 0 or delete_count < 0 or start + delete_count > len(lines) or start + delete_count > previous_start:
+            raise ValueError(f"差异超出范围: {start}+{delete_count}")
+        lines[start:start + delete_count] = new_lines
+        previous_start = start
+    return '\n'.join(lines)
+
+
+class ContentRefs:
+    def __init__(self, max_entries=32, max_chars=4 * 1024 * 1024):
+        """
+        初始化一个会话的内容存储
+        :param max_entries: 本端最多保留的文本数
+        :param max_chars: 本端保留文本的字符总数上限
+        """
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+
+        self.texts = OrderedDict()  # 哈希 -> 文本（本端持有，用于还原对方的引用）
+        self.ids = {}  # 文本 -> 哈希，已登记的文本不再重复计算 SHA-256
+        self.lines = {}  # 哈希 -> 按行拆分的文本，作为差异基准时不再重复拆分
+        self.total_chars = 0
+        self.peer = OrderedDict()  # 估计对方仍持有的哈希（按最近使用排序）
+        self.stats = {'sent_full': 0, 'sent_ref': 0, 'sent_diff': 0, 'received_ref': 0, 'received_diff': 0,
+                      'misses': 0, 'chars_saved': 0}
+
+    def reset_peer(self, hashes):
+        """对方重新连接时以其声明持有的哈希为准"""
+        self.peer.clear()
+        for content_id in hashes[-PEER_CAPACITY:]:
+            if isinstance(content_id, str):
+                self.peer[content_id] = True
+
+    def encode(self, text):
+        """
+        为要发送的文本生成引用
+        :return: (code_ref, 是否仍需发送全文)
+        """
+        content_id = self._hash(text)
+        ref = {'hash': content_id}
+        send_full = True
+        if len(text) >= MIN_REF_CHARS:
+            if content_id in self.peer:
+                send_full = False
+                self.stats['sent_ref'] += 1
+            else:
+                best = self._best_diff(text)
+                if best is not None:
+                    ref['base'], ref['ops'] = best
+                    send_full = False
+                    self.stats['sent_diff'] += 1
+        if send_full:
+            self.stats['sent_full'] += 1
+        else:
+            self.stats['chars_saved'] += len(text) - len(json.dumps(ref, ensure_ascii=False))
+        self._remember(content_id, text)
+        return ref, send_full
+
+    def decode(self, ref, text=None):
+        """
+        还原对方发来的引用
+        :param text: 消息中附带的全文（如果有）
+        :raises ContentMiss: 本端没有引用的文本
+        """
+        content_id = ref.get('hash') if isinstance(ref, dict) else None
+        if not isinstance(content_id, str):
+            raise ValueError("code_ref 缺少 hash")
+        if text is None:
+            if 'ops' in ref:
+                base = self.texts.get(ref.get('base'))
+                if base is None:
+                    self.stats['misses'] += 1
+                    raise ContentMiss(content_id)
+                text = apply_ops(base, ref['ops'])
+                if content_hash(text) != content_id:
+                    raise ValueError("差异还原后的哈希不一致")
+                self.stats['received_diff'] += 1
+            else:
+                text = self.texts.get(content_id)
+                if text is None:
+                    self.stats['misses'] += 1
+                    raise ContentMiss(content_id)
+                self.stats['received_ref'] += 1
+        elif self._hash(text) != content_id:
+            # 哈希与全文不一致时以全文为准
+            content_id = content_hash(text)
+        self._remember(content_id, text)
+        return text
+
+    def get(self, content_id):
+        return self.texts.get(content_id)
+
+    def add(self, text):
+        """登记一段已以全文发给对方的文本，返回其哈希"""
+        content_id = self._hash(text)
+        self._remember(content_id, text)
+        return content_id
+
+    def _hash(self, text):
+        """文本的哈希；已登记的文本直接查表"""
+        content_id = self.ids.get(text)
+        return content_id if content_id is not None else content_hash(text)
+
+    def _best_diff(self, text):
+        """
+        在对方持有的最近几个版本中找差异最小的一个，差异不足全文一半时才使用；
+        从最近的版本开始，差异已足够小时不再尝试更旧的版本
+        """
+        best = None
+        best_size = len(text) // 2
+        good_size = len(text) * GOOD_DIFF_RATIO
+        candidates = [content_id for content_id in reversed(self.peer) if content_id in self.texts]
+        for base_id in candidates[:MAX_BASE_CANDIDATES]:
+            base_lines = self.lines.get(base_id)
+            if base_lines is None:
+                base_lines = self.lines[base_id] = self.texts[base_id].split('\n')
+            ops = diff_lines(None, text, base_lines)
+            size = len(json.dumps(ops, ensure_ascii=False))
+            if size < best_size:
+                best, best_size = (base_id, ops), size
+                if size <= good_size:
+                    break
+        return best
+
+    def _remember(self, content_id, text):
+        """登记文本：本端保存，并视为对方也已持有"""
+        if content_id in self.texts:
+            self.texts.move_to_end(content_id)
+        else:
+            self.texts[content_id] = text
+            self.ids[text] = content_id
+            self.total_chars += len(text)
+            while len(self.texts) > self.max_entries or (self.total_chars > self.max_chars and len(self.texts) > 1):
+                dropped_id, dropped = self.texts.popitem(last=False)
+                self.ids.pop(dropped, None)
+                self.lines.pop(dropped_id, None)
+                self.total_chars -= len(dropped)
+
+        self.peer[content_id] = True
+        self.peer.move_to_end(content_id)
+        while len(self.peer) > PEER_CAPACITY:
+            self.peer.popitem(last=False)
@@ -0,0 +1,221 @@
+"""
+无头模式（不启动 Tk 界面）
+从配置文件启动解题服务器（localhost:8000），可选同时启动远程协助服务器（8001），
+日志以 JSON 行输出，收到 SIGTERM / SIGINT 后按 [PROTOCOL] shutdown_grace 优雅停止。
+用于常开的工作站与自动化压测。
+
+用法（在 OJAssistant 目录下）:
+    python -m core.headless --config /path/to/config.ini
+
+配置文件示例（其余配置节与界面版的 config.ini 相同）:
+    [DAEMON]
+    model = qwen3-coder-plus
+    base_url = https://dashscope.aliyuncs.com/compatible-mode/v1
+    api_key = sk-...            ; 也可用环境变量 OJ_ASSISTANT_API_KEY 提供
+    language = C
+    remote_assist = False
+    remote_assist_port = 8001
+"""
+import argparse
+import concurrent.futures
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+from datetime import datetime
+
+API_KEY_ENV = 'OJ_ASSISTANT_API_KEY'
+
+
+class JsonLogFormatter(logging.Formatter):
+    """每条日志输出为一行 JSON：时间、级别、来源与消息，附加字段原样合并"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _Value:
+    """代替 tk.StringVar 的只读值"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class _NullWidget:
+    """服务器在启动失败时会更新界面按钮，无头模式下忽略"""
+
+    def config(self, **kwargs):
+        pass
+
+
+class _ImmediateRoot:
+    """代替 Tk 根窗口的 after：回调只写日志，直接在调用线程执行"""
+
+    def __init__(self, logger):
+        self.logger = logger
+
+    def after(self, ms, func=None, *args):
+        if func is None:
+            return None
+        if ms and ms > 0:
+            timer = threading.Timer(ms / 1000.0, self._call, (func, args))
+            timer.daemon = True
+            timer.start()
+            return timer
+        self._call(func, args)
+        return None
+
+    def after_idle(self, func, *args):
+        self._call(func, args)
+
+    def _call(self, func, args):
+        try:
+            func(*args)
+        except Exception:
+            self.logger.exception("回调执行失败")
+
+
+class HeadlessHost:
+    """
+    提供服务器所需的界面接口（log、root.after、update_status、selected_language 等），
+    全部转为结构化日志
+    """
+    headless = True
+
+    def __init__(self, config_manager, logger=None):
+        self.config_manager = config_manager
+        self.logger = logger or logging.getLogger('oj_assistant')
+        self.root = _ImmediateRoot(self.logger)
+        self.selected_language = _Value(config_manager.get_setting('language', 'C', 'DAEMON'))
+        self.start_button = _NullWidget()
+        self.stop_button = _NullWidget()
+        self.machine_code = None
+        self.remote_assist_server = None
+        self.server_status = None
+
+    def log(self, message):
+        self.logger.info(str(message))
+
+    def update_status(self, text):
+        self.logger.debug(text, extra={'fields': {'status': text}})
+
+    def update_server_status(self, text):
+        self.server_status = text
+        self.logger.info(text, extra={'fields': {'server_status': text}})
+
+    def model_info(self):
+        """从 [DAEMON] 读取模型配置；API Key 优先使用环境变量"""
+        config = self.config_manager
+        return {
+            'model': config.get_setting('model', 'qwen3-coder-plus', 'DAEMON'),
+            'base_url': config.get_setting('base_url', 'https://dashscope.aliyuncs.com/compatible-mode/v1', 'DAEMON'),
+            'api_key': os.getenv(API_KEY_ENV) or config.get_setting('api_key', '', 'DAEMON'),
+        }
+
+
+def setup_logging(log_format='json', level='info', log_file=None):
+    """配置根日志：json 为每行一个 JSON 对象，text 为普通文本"""
+    handler = logging.FileHandler(log_file, encoding='utf-8') if log_file else logging.StreamHandler(sys.stdout)
+    if log_format == 'json':
+        handler.setFormatter(JsonLogFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
+    return logging.getLogger('oj_assistant')
+
+
+def run(config_manager, logger, remote=None):
+    """
+    运行服务器直到收到停止信号或服务器自行退出
+    :param remote: 是否同时启动远程协助服务器，None 表示按配置
+    :return: 进程退出码
+    """
+    # 延迟导入：日志配置好之后再加载服务器及其依赖
+    from core.server import ServerManager
+
+    host = HeadlessHost(config_manager, logger)
+    model_info = host.model_info()
+    if not model_info['api_key']:
+        logger.error(f"未配置API Key：请在 [DAEMON] 中设置 api_key 或设置环境变量 {API_KEY_ENV}")
+        return 2
+
+    stop_requested = threading.Event()
+
+    def request_stop(signum, frame):
+        logger.info(f"收到信号 {signal.Signals(signum).name}，正在停止", extra={'fields': {'signal': signum}})
+        stop_requested.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    if hasattr(signal, 'SIGTERM'):
+        signal.signal(signal.SIGTERM, request_stop)
+
+    servers = []
+    if remote is None:
+        remote = config_manager.get_setting('remote_assist', 'False', 'DAEMON').lower() == 'true'
+    if remote:
+        from core.remote_assist_server import RemoteAssistServer
+        from utils.input_simulator import InputSimulator
+        port = int(config_manager.get_setting('remote_assist_port', '8001', 'DAEMON'))
+        host.remote_assist_server = RemoteAssistServer(host, InputSimulator(host), port=port)
+        if host.remote_assist_server.start():
+            servers.append(host.remote_assist_server)
+
+    manager = ServerManager(host, model_info)
+    if not manager.start():
+        for server in servers:
+            server.stop()
+        return 1
+    servers.append(manager)
+    logger.info("无头模式已启动", extra={'fields': {'model': model_info['model'], 'remote_assist': bool(remote)}})
+
+    # 定时醒来只为及时处理信号（Windows 下信号不会打断等待）并发现服务器线程意外退出
+    while not stop_requested.wait(1.0):
+        if manager.stopped.done():
+            break
+    exit_code = 0 if stop_requested.is_set() else 1
+
+    stopped = [server.stop() for server in servers]
+    done, pending = concurrent.futures.wait(stopped, timeout=manager.shutdown_grace + 5)
+    if pending:
+        logger.warning("部分服务器未在限定时间内停止")
+        exit_code = exit_code or 1
+    logger.info("无头模式已退出", extra={'fields': {'exit_code': exit_code}})
+    return exit_code
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OJ助手无头模式（不启动界面）")
+    parser.add_argument('--config', help="配置文件路径，默认使用应用数据目录下的 config.ini")
+    parser.add_argument('--data-dir', help="数据目录（任务队列、用量账本等），默认为配置文件所在目录")
+    parser.add_argument('--remote-assist', action='store_true', default=None, help="同时启动远程协助服务器")
+    parser.add_argument('--log-format', choices=('json', 'text'), default='json')
+    parser.add_argument('--log-level', default='info')
+    parser.add_argument('--log-file', help="日志文件，默认输出到标准输出")
+    args = parser.parse_args(argv)
+
+    logger = setup_logging(args.log_format, args.log_level, args.log_file)
+
+    from utils.config import ConfigManager
+    config_manager = ConfigManager(args.config, args.data_dir)
+    return run(config_manager, logger, remote=args.remote_assist)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
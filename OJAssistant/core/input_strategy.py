@@ -0,0 +1,134 @@
+"""
+输入方式协商与按站点的策略缓存
+输入方式:
+- page_inject: 扩展在页面内直接写入编辑器（不占用键盘焦点，由扩展执行）
+- paste: 服务器清空编辑器后整段粘贴
+- stream: 服务器逐段模拟键盘输入
+扩展在 hello 中声明自己支持的方式。服务器按站点（域名）记录每种方式的成功/失败次数与成功耗时，
+持久化到数据目录的 input_strategies.json，下发 code_solution / code_revision 时附带本站点的尝试顺序：
+已知可用的方式按耗时排序，近期在该站点连续失败的方式直接跳过，不再白等它的超时。
+"""
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+# 扩展执行的方式与服务器执行的方式
+CLIENT_MODES = ('page_inject',)
+SERVER_MODES = ('paste', 'stream')
+# 没有记录时的尝试顺序（与原先的固定流程一致）
+DEFAULT_ORDER = ('page_inject', 'paste', 'stream')
+
+# 连续失败达到该次数（或从未成功过的方式失败一次）即视为在该站点不可用
+FAILURE_STREAK = 2
+# 成功耗时的指数滑动平均系数
+EWMA_ALPHA = 0.3
+
+
+def host_of(url):
+    """URL 的域名（小写），无法解析时返回空字符串"""
+    try:
+        return (urlparse(url).hostname or '').lower() if url else ''
+    except ValueError:
+        return ''
+
+
+class StrategyCache:
+    def __init__(self, path=None, failure_ttl=7 * 24 * 3600, max_hosts=200, log=None):
+        """
+        初始化策略缓存
+        :param path: JSON 文件路径，None 表示只保存在内存中
+        :param failure_ttl: 失败记录的有效期（秒），过期后重新尝试该方式
+        :param max_hosts: 最多保留的站点数（按最近使用淘汰）
+        """
+        self.path = path
+        self.failure_ttl = failure_ttl
+        self.max_hosts = max_hosts
+        self.log = log or print
+        self.lock = threading.Lock()
+        self.hosts = self._load()  # 域名 -> {方式: 记录}
+
+    @classmethod
+    def from_config(cls, config_manager, log=None):
+        """根据配置文件 [INPUT] 创建缓存"""
+        path = os.path.join(config_manager.get_data_dir(), 'input_strategies.json')
+        ttl_days = float(config_manager.get_setting('strategy_failure_ttl_days', '7', 'INPUT'))
+        return cls(path, failure_ttl=ttl_days * 24 * 3600, log=log)
+
+    def plan(self, host, available):
+        """
+        本站点的尝试顺序
+        :param available: 本次可用的方式（扩展声明的方式 + 服务器方式）
+        :return: 方式列表；page_inject 不占用键盘焦点，未被判定不可用时总是排在最前
+        """
+        available = [mode for mode in DEFAULT_ORDER if mode in available]
+        records = self.hosts.get(host, {})
+        now = time.time()
+
+        usable = [mode for mode in available if not self._known_failing(records.get(mode), now)]
+        if not usable:
+            # 全部判定为不可用时仍按默认顺序尝试，避免无路可走
+            return available
+
+        def sort_key(mode):
+            record = records.get(mode)
+            if record and record.get('ok') and record.get('avg_ms') is not None:
+                return 0, record['avg_ms']
+            return 1, DEFAULT_ORDER.index(mode)
+
+        client_modes = [mode for mode in usable if mode in CLIENT_MODES]
+        server_modes = sorted((mode for mode in usable if mode in SERVER_MODES), key=sort_key)
+        return client_modes + server_modes
+
+    def record(self, host, mode, success, elapsed_ms=None):
+        """记录一次尝试结果并写回文件"""
+        if not host or mode not in DEFAULT_ORDER:
+            return
+        with self.lock:
+            records = self.hosts.pop(host, {})
+            self.hosts[host] = records  # 移到末尾，表示最近使用
+            record = records.setdefault(mode, {'ok': 0, 'fail': 0, 'streak': 0, 'avg_ms': None, 'last': 0})
+            record['last'] = time.time()
+            if success:
+                record['ok'] = record.get('ok', 0) + 1
+                record['streak'] = 0
+                if elapsed_ms is not None:
+                    previous = record.get('avg_ms')
+                    record['avg_ms'] = round(elapsed_ms if previous is None
+                                             else previous + EWMA_ALPHA * (elapsed_ms - previous), 1)
+            else:
+                record['fail'] = record.get('fail', 0) + 1
+                record['streak'] = record.get('streak', 0) + 1
+            while len(self.hosts) > self.max_hosts:
+                del self.hosts[next(iter(self.hosts))]
+            self._save()
+
+    def _known_failing(self, record, now):
+        if not record or not record.get('streak') or now - record.get('last', 0) > self.failure_ttl:
+            return False
+        return record['streak'] >= FAILURE_STREAK or not record.get('ok')
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                return {}
+            return {host: records for host, records in data.items() if isinstance(records, dict)}
+        except (OSError, ValueError) as e:
+            self.log(f"读取输入策略缓存失败，将重新记录: {e}")
+            return {}
+
+    def _save(self):
+        if not self.path:
+            return
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.hosts, f, ensure_ascii=False, indent=1)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            self.log(f"保存输入策略缓存失败: {e}")
@@ -0,0 +1,274 @@
+"""
+可恢复的解题任务队列
+每次生成与纠错请求都作为一个任务记录在 SQLite（WAL 模式）中，并记录每次状态变化:
+queued -> running -> succeeded -> delivered -> done，失败为 failed，过久未完成为 expired。
+切换模型会重启服务器，程序崩溃也会中断正在进行的生成；新的服务器启动后重新执行未完成的任务，
+结果保存在任务中。扩展重连时若会话无法恢复，可用 job_status 查询任务状态并取回结果，无需重新提交题目。
+
+用法（在 OJAssistant 目录下）:
+    python -m core.job_queue list --limit 20
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    solve_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    host TEXT,
+    language TEXT,
+    model TEXT,
+    payload TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_solve ON jobs (solve_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state);
+CREATE TABLE IF NOT EXISTS job_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    state TEXT NOT NULL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events (job_id);
+"""
+
+# 任务类型：首轮生成与纠错
+KINDS = ('solve', 'correction')
+# 尚未得到结果的状态，服务器重启后需要重新执行
+UNFINISHED = ('queued', 'running')
+# 已有结果、可以交给扩展的状态
+HAS_RESULT = ('succeeded', 'delivered')
+
+COLUMNS = ('job_id', 'solve_id', 'kind', 'state', 'attempts', 'host', 'language', 'model', 'payload', 'result',
+           'error', 'created_at', 'updated_at')
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def correction_job_id(solve_id, retry_count):
+    """纠错任务的编号：解题编号加纠错轮次"""
+    return f"{solve_id}.{retry_count}"
+
+
+class JobQueue:
+    def __init__(self, db_path, retention_days=7, replay_max_age=3600, max_attempts=3, log=None):
+        """
+        初始化任务队列
+        :param db_path: SQLite 数据库路径
+        :param retention_days: 已结束任务的保留天数，0 表示永久保留
+        :param replay_max_age: 未完成任务超过该秒数不再重新执行（标记为 expired）
+        :param max_attempts: 单个任务最多执行次数，避免导致崩溃的任务在每次启动时反复执行
+        """
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self.replay_max_age = replay_max_age
+        self.max_attempts = max_attempts
+        self.log = log or print
+        # 每次解题只有几次状态变化，直接在事件循环中同步写入（WAL + synchronous=NORMAL，单次约1毫秒）
+        self.lock = threading.Lock()
+        self.closed = False
+        self.stats = {'created': 0, 'transitions': 0, 'replayed': 0, 'expired': 0}
+        try:
+            self.conn = _connect(db_path)
+            self._apply_retention()
+        except Exception as e:
+            self.log(f"打开任务队列失败，本次运行的任务不会持久化: {e}")
+            self.conn = None
+
+    @classmethod
+    def from_config(cls, config_manager, log=None):
+        """根据配置文件 [JOBS] 创建任务队列"""
+        db_path = os.path.join(config_manager.get_data_dir(), 'jobs.db')
+        retention_days = int(config_manager.get_setting('retention_days', '7', 'JOBS'))
+        replay_max_age = int(config_manager.get_setting('replay_max_age', '3600', 'JOBS'))
+        return cls(db_path, retention_days=retention_days, replay_max_age=replay_max_age, log=log)
+
+    def create(self, job_id, solve_id, kind, payload, host='', language=None, model=None):
+        """记录新任务（状态为 queued）；同一编号的任务已存在时覆盖"""
+        now = time.time()
+        self._execute(
+            f"INSERT OR REPLACE INTO jobs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+            (job_id, solve_id, kind, 'queued', 0, host, language, model,
+             json.dumps(payload, ensure_ascii=False), None, None, now, now),
+            event=(job_id, now, 'queued', None),
+        )
+        self.stats['created'] += 1
+
+    def transition(self, job_id, state, result=None, error=None, detail=None):
+        """记录状态变化；进入 running 时累加执行次数，result / error 非空时一并保存"""
+        now = time.time()
+        self._execute(
+            """
+            UPDATE jobs SET state = ?, updated_at = ?, attempts = attempts + ?,
+                            result = COALESCE(?, result), error = COALESCE(?, error)
+            WHERE job_id = ?
+            """,
+            (state, now, 1 if state == 'running' else 0, result, error, job_id),
+            event=(job_id, now, state, detail or error),
+        )
+        self.stats['transitions'] += 1
+
+    def fail(self, job_id, error):
+        """任务失败；已有结果的任务（例如结果已生成但发送时连接断开）保持原状态"""
+        job = self.get(job_id)
+        if job is not None and job['state'] in UNFINISHED:
+            self.transition(job_id, 'failed', error=str(error)[:500])
+
+    def complete(self, job_id):
+        """结果已输入到编辑器；只对已有结果的任务生效，重复输入同一份代码不会重复记录"""
+        job = self.get(job_id)
+        if job is not None and job['state'] in HAS_RESULT:
+            self.transition(job_id, 'done')
+
+    def get(self, job_id):
+        """按编号读取任务，不存在时返回 None"""
+        return self._fetch_one("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+
+    def latest(self, solve_id):
+        """某次解题最近的任务（首轮生成或最后一次纠错）"""
+        return self._fetch_one(
+            "SELECT * FROM jobs WHERE solve_id = ? ORDER BY created_at DESC LIMIT 1", (solve_id,)
+        )
+
+    def take_unfinished(self):
+        """
+        服务器启动时取出需要重新执行的任务
+        过旧或已达到执行次数上限的任务不再执行，分别标记为 expired / failed
+        """
+        if self.conn is None:
+            return []
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT * FROM jobs WHERE state IN ({', '.join('?' * len(UNFINISHED))}) ORDER BY created_at",
+                UNFINISHED
+            ).fetchall()
+        jobs = []
+        now = time.time()
+        for row in rows:
+            job = self._to_dict(row)
+            if now - job['updated_at'] > self.replay_max_age:
+                self.transition(job['job_id'], 'expired', detail="服务器重启时任务已过期")
+                self.stats['expired'] += 1
+            elif job['attempts'] >= self.max_attempts:
+                self.transition(job['job_id'], 'failed', error=f"已执行 {job['attempts']} 次仍未完成")
+            else:
+                jobs.append(job)
+        self.stats['replayed'] += len(jobs)
+        return jobs
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.conn is not None:
+            with self.lock:
+                self.conn.close()
+            self.conn = None
+
+    def _execute(self, sql, params, event=None):
+        if self.conn is None:
+            return
+        try:
+            with self.lock, self.conn:
+                self.conn.execute(sql, params)
+                if event is not None:
+                    self.conn.execute("INSERT INTO job_events (job_id, ts, state, detail) VALUES (?, ?, ?, ?)", event)
+        except Exception as e:
+            self.log(f"写入任务队列失败: {e}")
+
+    def _fetch_one(self, sql, params):
+        if self.conn is None:
+            return None
+        try:
+            with self.lock:
+                row = self.conn.execute(sql, params).fetchone()
+        except Exception as e:
+            self.log(f"读取任务队列失败: {e}")
+            return None
+        return self._to_dict(row) if row else None
+
+    @staticmethod
+    def _to_dict(row):
+        job = dict(zip(COLUMNS, row))
+        try:
+            job['payload'] = json.loads(job['payload'])
+        except (TypeError, ValueError):
+            job['payload'] = {}
+        return job
+
+    def _apply_retention(self):
+        """删除超出保留期的已结束任务及其状态记录"""
+        if self.retention_days <= 0:
+            return
+        cutoff = time.time() - self.retention_days * 86400
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"DELETE FROM jobs WHERE updated_at < ? AND state NOT IN ({', '.join('?' * len(UNFINISHED))})",
+                (cutoff,) + UNFINISHED
+            )
+            self.conn.execute("DELETE FROM job_events WHERE job_id NOT IN (SELECT job_id FROM jobs)")
+
+
+def print_jobs(db_path, limit=20):
+    """打印最近的任务及其状态变化"""
+    conn = _connect(db_path)
+    try:
+        jobs = conn.execute(
+            "SELECT job_id, kind, state, attempts, model, created_at, updated_at, error "
+            "FROM jobs ORDER BY created_at DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+        print(f"{'任务':<36}{'类型':<12}{'状态':<12}{'次数':>4}  {'模型':<24}{'创建时间':<20}{'耗时(秒)':>8}")
+        for job_id, kind, state, attempts, model, created_at, updated_at, error in jobs:
+            created = datetime.fromtimestamp(created_at).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"{job_id:<36}{kind:<12}{state:<12}{attempts:>4}  {(model or '-'):<24}{created:<20}"
+                  f"{updated_at - created_at:>8.1f}")
+            if error:
+                print(f"    错误: {error}")
+            for ts, event_state, detail in conn.execute(
+                    "SELECT ts, state, detail FROM job_events WHERE job_id = ? ORDER BY id", (job_id,)):
+                suffix = f"  {detail}" if detail else ''
+                print(f"    {datetime.fromtimestamp(ts).strftime('%H:%M:%S')}  {event_state}{suffix}")
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OJ助手解题任务队列")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = subparsers.add_parser('list', help="列出最近的任务与状态变化")
+    list_parser.add_argument('--limit', type=int, default=20, help="最多显示多少个任务")
+    list_parser.add_argument('--db', help="数据库路径，默认使用应用数据目录下的 jobs.db")
+
+    args = parser.parse_args(argv)
+
+    db_path = args.db
+    if not db_path:
+        from utils.config import ConfigManager
+        db_path = os.path.join(ConfigManager().get_data_dir(), 'jobs.db')
+
+    if args.command == 'list':
+        print_jobs(db_path, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""
+大模型访问后端
+OJAssistant 通过统一的后端接口调用模型，支持流式与非流式两种方式。
+- OpenAIBackend: OpenAI兼容接口（各家模型平台）
+- MockBackend: 进程内模拟后端，可配置首token延迟、生成速度、失败率与固定回复，
+  用于在无网络、无费用的情况下做并发压测
+
+在模型的 base_url 中填写 mock://local?first_token_ms=300&tps=80&failure_rate=0.05 即可使用模拟后端，
+固定回复可用 response=（可重复）直接给出，或用 fixture= 指向回复文件。
+"""
+import asyncio
+import json
+import random
+from urllib.parse import urlparse, parse_qs
+
+from openai import AsyncOpenAI, BadRequestError
+
+
+class LLMResult:
+    def __init__(self, text, usage=None, finish_reason=None):
+        """
+        一次非流式调用的结果
+        :param text: 模型输出文本
+        :param usage: 用量字典 prompt_tokens/completion_tokens/total_tokens
+        :param finish_reason: 结束原因（stop/length等）
+        """
+        self.text = text
+        self.usage = usage or {}
+        self.finish_reason = finish_reason
+
+
+class LLMStream:
+    """流式调用结果：异步迭代得到文本片段，迭代结束后可读取 usage 与 finish_reason"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.usage = {}
+        self.finish_reason = None
+
+    def __aiter__(self):
+        return self._chunks.__aiter__()
+
+
+class MockBackendError(Exception):
+    """模拟后端注入的失败"""
+
+
+class LLMBackend:
+    name = 'base'
+
+    async def complete(self, messages, max_tokens=8192, temperature=0):
+        """非流式调用，返回 LLMResult"""
+        raise NotImplementedError
+
+    def stream(self, messages, max_tokens=8192, temperature=0):
+        """流式调用，返回 LLMStream"""
+        raise NotImplementedError
+
+    async def close(self):
+        """释放连接等资源"""
+
+
+class OpenAIBackend(LLMBackend):
+    name = 'openai'
+
+    def __init__(self, model_name, base_url, api_key):
+        self.model_name = model_name
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url
+        )
+        # 流式调用默认请求在最后一个分片中返回用量；不支持 stream_options 的平台拒绝一次后不再携带
+        self.stream_usage = True
+
+    @staticmethod
+    def _usage_dict(usage):
+        if usage is None:
+            return {}
+        return {
+            'prompt_tokens': getattr(usage, 'prompt_tokens', None),
+            'completion_tokens': getattr(usage, 'completion_tokens', None),
+            'total_tokens': getattr(usage, 'total_tokens', None),
+        }
+
+    async def complete(self, messages, max_tokens=8192, temperature=0):
+        response = await self.client.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=False
+        )
+        text = None
+        finish_reason = None
+        if response.choices:
+            text = response.choices[0].message.content
+            finish_reason = response.choices[0].finish_reason
+        return LLMResult(text, self._usage_dict(getattr(response, 'usage', None)), finish_reason)
+
+    def stream(self, messages, max_tokens=8192, temperature=0):
+        result = None
+
+        async def create(**options):
+            return await self.client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True,
+                **options
+            )
+
+        async def chunks():
+            if self.stream_usage:
+                try:
+                    response = await create(stream_options={'include_usage': True})
+                except BadRequestError:
+                    self.stream_usage = False
+                    response = await create()
+            else:
+                response = await create()
+            async for chunk in response:
+                # 用量在 choices 为空的最后一个分片中返回
+                if getattr(chunk, 'usage', None):
+                    result.usage = self._usage_dict(chunk.usage)
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    result.finish_reason = choice.finish_reason
+                if choice.delta and choice.delta.content:
+                    yield choice.delta.content
+
+        result = LLMStream(chunks())
+        return result
+
+    async def close(self):
+        await self.client.close()
+
+
+DEFAULT_MOCK_RESPONSE = """#include <stdio.h>
+
+int main() {
+    int a, b;
+    if (scanf("%d %d", &a, &b) != 2) {
+        return 0;
+    }
+    printf("%d\\n", a + b);
+    return 0;
+}"""
+
+
+class MockBackend(LLMBackend):
+    name = 'mock'
+
+    def __init__(self, first_token_latency=0.3, tokens_per_second=80.0, failure_rate=0.0,
+                 responses=None, chars_per_token=4, seed=None):
+        """
+        初始化模拟后端
+        :param first_token_latency: 首token延迟（秒）
+        :param tokens_per_second: 生成速度（token/秒），0 表示瞬间完成
+        :param failure_rate: 调用失败概率（0~1）
+        :param responses: 固定回复列表，按调用顺序循环使用
+        :param chars_per_token: 估算token数时每个token对应的字符数
+        :param seed: 随机种子，便于复现失败注入
+        """
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self.responses = list(responses or [DEFAULT_MOCK_RESPONSE])
+        self.chars_per_token = max(1, chars_per_token)
+        self.random = random.Random(seed)
+        self.call_count = 0
+
+    @classmethod
+    def from_url(cls, url):
+        """
+        从 mock://local?first_token_ms=300&tps=80&failure_rate=0.05 解析参数
+        固定回复：response=（可重复，按出现顺序循环使用）或 fixture=回复文件路径，两者可同时使用
+        """
+        query = parse_qs(urlparse(url).query)
+
+        def param(name, default, cast=float):
+            values = query.get(name)
+            return cast(values[0]) if values else default
+
+        responses = list(query.get('response', []))
+        for path in query.get('fixture', []):
+            responses.extend(cls.load_fixture(path))
+
+        return cls(
+            first_token_latency=param('first_token_ms', 300.0) / 1000.0,
+            tokens_per_second=param('tps', 80.0),
+            failure_rate=param('failure_rate', 0.0),
+            responses=responses,
+            chars_per_token=param('chars_per_token', 4, int),
+            seed=param('seed', None, int),
+        )
+
+    @staticmethod
+    def load_fixture(path):
+        """
+        读取回复文件
+        .json 文件为回复字符串或回复字符串列表，其他文件整个内容作为一条回复
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            if not path.lower().endswith('.json'):
+                return [f.read()]
+            data = json.load(f)
+        responses = [data] if isinstance(data, str) else data
+        if not isinstance(responses, list) or not all(isinstance(item, str) for item in responses):
+            raise ValueError(f"回复文件格式错误，应为字符串或字符串列表: {path}")
+        return responses
+
+    def _next_response(self):
+        response = self.responses[self.call_count % len(self.responses)]
+        self.call_count += 1
+        return response
+
+    def _usage(self, messages, text):
+        prompt_chars = sum(len(message.get('content') or '') for message in messages)
+        prompt_tokens = max(1, prompt_chars // self.chars_per_token)
+        completion_tokens = max(1, len(text) // self.chars_per_token)
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+        }
+
+    def _split_tokens(self, text):
+        step = self.chars_per_token
+        return [text[i:i + step] for i in range(0, len(text), step)]
+
+    def _maybe_fail(self):
+        if self.failure_rate > 0 and self.random.random() < self.failure_rate:
+            raise MockBackendError("模拟后端注入的调用失败")
+
+    async def complete(self, messages, max_tokens=8192, temperature=0):
+        text = self._next_response()
+        tokens = self._split_tokens(text)[:max_tokens]
+        text = ''.join(tokens)
+
+        await asyncio.sleep(self.first_token_latency)
+        self._maybe_fail()
+        if self.tokens_per_second > 0:
+            await asyncio.sleep(len(tokens) / self.tokens_per_second)
+
+        finish_reason = 'length' if len(tokens) >= max_tokens else 'stop'
+        return LLMResult(text, self._usage(messages, text), finish_reason)
+
+    def stream(self, messages, max_tokens=8192, temperature=0):
+        result = None
+
+        async def chunks():
+            text = self._next_response()
+            tokens = self._split_tokens(text)[:max_tokens]
+
+            await asyncio.sleep(self.first_token_latency)
+            self._maybe_fail()
+            interval = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+            for token in tokens:
+                yield token
+                if interval:
+                    await asyncio.sleep(interval)
+
+            emitted = ''.join(tokens)
+            result.usage = self._usage(messages, emitted)
+            result.finish_reason = 'length' if len(tokens) >= max_tokens else 'stop'
+
+        result = LLMStream(chunks())
+        return result
+
+
+def create_backend(model_name, base_url, api_key):
+    """根据模型信息创建后端：mock:// 开头的地址使用进程内模拟后端"""
+    if (base_url or '').startswith('mock://'):
+        return MockBackend.from_url(base_url)
+    return OpenAIBackend(model_name, base_url, api_key)
@@ -0,0 +1,286 @@
+"""
+扩展协议的消息定义
+每种消息对应一个 dict 子类，字段归一化（别名字段、默认值、类型转换）集中在消息类中，处理函数只读取归一化后的属性。
+字段是按需归一化的只读属性：构造只是 C 层的 dict 复制，处理函数没有读取的字段（及其别名探测）不产生开销；
+需要整理成列表的少见消息继承 EagerMessage，在构造时一次性归一化；没有字段的消息继承 EmptyMessage，复用同一个实例。
+服务器启动时用 build_dispatch_table 预先生成 消息类型 -> (消息类, 处理函数) 的分发表。
+"""
+from core.protocol import PROTOCOL_VERSION
+
+# 编辑器代码在不同版本扩展中使用的别名字段，按优先级排列
+CODE_ALIASES = ('currentCode', 'current_code', 'existing_code', 'editor_code')
+
+
+def _first_text(*values):
+    """返回第一个非空字符串"""
+    for value in values:
+        if value and isinstance(value, str):
+            return value
+    return ''
+
+
+def _str_list(value):
+    return [item for item in value if isinstance(item, str)] if isinstance(value, list) else []
+
+
+def _as_dict(value):
+    return value if isinstance(value, dict) else {}
+
+
+def _as_int(value, default=0):
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _editor_code(data, content=None):
+    """按别名优先级取编辑器代码：顶层字段优先，其次题目内容中的字段"""
+    for alias in CODE_ALIASES:
+        value = data.get(alias)
+        if value and isinstance(value, str):
+            return value
+    if content:
+        return _first_text(content.get('current_code'), content.get('existing_code'))
+    return ''
+
+
+def _field(normalize):
+    """按需归一化的只读字段：每次读取时由原始消息计算"""
+    return property(normalize)
+
+
+class Message(dict):
+    __slots__ = ()
+
+    # 对应的协议消息类型名
+    type_names = ()
+    # 处理该消息的 OJAssistant 方法名
+    handler = None
+
+    version = _field(lambda data: _as_int(data.get('v'), PROTOCOL_VERSION))
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # 分发时按 message_class.from_dict(data) 构造；直接指向类本身，省去一层 classmethod 调用
+        cls.from_dict = cls
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data)
+
+    def __repr__(self):
+        names = [name for klass in reversed(type(self).__mro__) for name, value in vars(klass).items()
+                 if isinstance(value, property)]
+        names += [name for name in self.__slots__ if not name.startswith('_')]
+        fields = ', '.join(f"{name}={getattr(self, name)!r:.40}" for name in names)
+        return f"{type(self).__name__}({fields})"
+
+
+class EagerMessage(Message):
+    """构造时由 _load 一次性归一化到 __slots__ 的消息"""
+    __slots__ = ()
+
+    def __init__(self, data):
+        super().__init__(data)
+        self._load(data)
+
+    def _load(self, data):
+        pass
+
+
+class EmptyMessage(Message):
+    """除协议版本外没有字段的消息：未带版本号时复用同一个实例，不再逐条复制"""
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        shared = cls()
+        cls.from_dict = staticmethod(lambda data: shared if 'v' not in data else cls(data))
+
+
+class HelloMessage(EagerMessage):
+    __slots__ = ('features', 'client_version', 'resume_token', 'last_seq', 'content_hashes', 'input_modes')
+    type_names = ('hello',)
+    handler = 'handle_hello'
+
+    def _load(self, data):
+        features = data.get('features')
+        self.features = [feature for feature in features if isinstance(feature, str)] \
+            if isinstance(features, list) else []
+        self.client_version = _as_int(data.get('protocol_version'), 1)
+        self.resume_token = _first_text(data.get('resume_token')) or None
+        self.last_seq = _as_int(data.get('last_seq'))
+        content_hashes = data.get('content_hashes')
+        self.content_hashes = [value for value in content_hashes if isinstance(value, str)] \
+            if isinstance(content_hashes, list) else []
+        self.input_modes = _str_list(data.get('input_modes'))
+
+
+class ContentMessage(Message):
+    __slots__ = ()
+    type_names = ('educoder_content_auto_input', 'OJ_content_auto_input')
+    handler = 'handle_OJ_content_auto_input'
+
+    content = _field(lambda data: _as_dict(data.get('content')))
+    question_text = _field(lambda data: _first_text(_as_dict(data.get('content')).get('text')))
+    existing_code = _field(lambda data: _editor_code(data, _as_dict(data.get('content'))))
+    editor_code_source = _field(lambda data: data.get('editor_code_source') or 'unknown')
+    editor_code_reason = _field(lambda data: data.get('editor_code_reason') or '')
+    auto_input = _field(lambda data: bool(data.get('auto_input', True)))
+    url = _field(lambda data: _first_text(data.get('url'), _as_dict(data.get('content')).get('url')))
+
+
+class TestResultsMessage(Message):
+    __slots__ = ()
+    type_names = ('test_results',)
+    handler = 'handle_test_results'
+
+    results = _field(lambda data: _as_dict(data.get('results')))
+    test_text = _field(lambda data: _first_text(_as_dict(data.get('results')).get('text')))
+    current_code = _field(_editor_code)
+    editor_code_source = _field(lambda data: data.get('editor_code_source') or 'unknown')
+    editor_code_reason = _field(lambda data: data.get('editor_code_reason') or '')
+    has_error = _field(lambda data: bool(data.get('has_error', False)))
+    structured_test_data = _field(lambda data: data.get('structured_test_data'))
+
+
+class ReadyForInputMessage(Message):
+    __slots__ = ()
+    type_names = ('ready_for_input',)
+    handler = 'handle_ready_for_input'
+
+    code = _field(lambda data: _first_text(data.get('code')))
+    is_retry = _field(lambda data: bool(data.get('is_retry', False)))
+    retry_count = _field(lambda data: _as_int(data.get('retry_count')))
+    is_smart_fix = _field(lambda data: bool(data.get('is_smart_fix', False)))
+    # 扩展按服务器下发的顺序请求的服务器端输入方式；旧版扩展不发送，由服务器自行决定
+    input_modes = _field(lambda data: _str_list(data.get('input_modes')))
+    url = _field(lambda data: _first_text(data.get('url')))
+    # 可选：输入前编辑器中的代码，纠错输入时优先于测试结果中的代码
+    editor_code = _field(_editor_code)
+
+
+class ResumeInputMessage(Message):
+    __slots__ = ()
+    type_names = ('resume_input',)
+    handler = 'handle_resume_input'
+
+    # 可选：扩展认为应继续输入的代码，与中断的输入不一致时拒绝继续
+    code = _field(lambda data: _first_text(data.get('code')))
+    url = _field(lambda data: _first_text(data.get('url')))
+
+
+class DirectInputCompleteMessage(Message):
+    __slots__ = ()
+    type_names = ('direct_input_complete',)
+    handler = 'handle_direct_input_complete'
+
+    success = _field(lambda data: bool(data.get('success', True)))
+    elapsed_ms = _field(lambda data: _as_int(data.get('elapsed_ms'), None))
+    reason = _field(lambda data: _first_text(data.get('reason')))
+    url = _field(lambda data: _first_text(data.get('url')))
+
+
+class ProgressRequestMessage(EmptyMessage):
+    __slots__ = ()
+    type_names = ('progress_request',)
+    handler = 'handle_progress_request'
+
+
+class SpeculativePrefetchMessage(EagerMessage):
+    # 不能命名为 items：消息本身是 dict，会遮蔽 dict.items
+    __slots__ = ('tasks',)
+    type_names = ('speculative_prefetch',)
+    handler = 'handle_speculative_prefetch'
+
+    def _load(self, data):
+        """当前题目与最多两个下一关题目，统一为 {text, existing_code, source, url}"""
+        content = _as_dict(data.get('content'))
+        self.tasks = []
+        if content.get('text'):
+            self.tasks.append({
+                'text': content.get('text'),
+                'existing_code': _first_text(data.get('current_code'), content.get('current_code')),
+                'source': 'page_load',
+                'url': _first_text(data.get('url')),
+            })
+        next_tasks = data.get('next_tasks')
+        for next_task in (next_tasks if isinstance(next_tasks, list) else [])[:2]:
+            next_task = _as_dict(next_task)
+            next_content = _as_dict(next_task.get('content'))
+            if next_content.get('text'):
+                self.tasks.append({
+                    'text': next_content.get('text'),
+                    'existing_code': _first_text(next_task.get('current_code')),
+                    'source': 'next_task',
+                    'url': _first_text(next_task.get('url')),
+                })
+
+
+class ChunkBeginMessage(Message):
+    __slots__ = ()
+    type_names = ('chunk_begin',)
+    handler = 'handle_chunk_begin'
+
+    transfer_id = _field(lambda data: _as_int(data.get('transfer_id'), -1))
+    total_size = _field(lambda data: _as_int(data.get('total_size')))
+    chunk_size = _field(lambda data: _as_int(data.get('chunk_size')))
+    sha256 = _field(lambda data: _first_text(data.get('sha256')))
+    encoding = _field(lambda data: _first_text(data.get('encoding')) or 'json')
+
+
+class ContentMissMessage(Message):
+    __slots__ = ()
+    type_names = ('content_miss',)
+    handler = 'handle_content_miss'
+
+    content_hash = _field(lambda data: _first_text(data.get('hash')))
+    message_type = _field(lambda data: _first_text(data.get('message_type')))
+    session_seq = _field(lambda data: _as_int(data.get('session_seq')))
+
+
+class JobStatusMessage(Message):
+    __slots__ = ()
+    type_names = ('job_status',)
+    handler = 'handle_job_status'
+
+    solve_id = _field(lambda data: _first_text(data.get('solve_id')))
+
+
+class SpeculativeCancelMessage(EmptyMessage):
+    __slots__ = ()
+    type_names = ('speculative_cancel',)
+    handler = 'handle_speculative_cancel'
+
+
+MESSAGE_CLASSES = (
+    HelloMessage,
+    ContentMessage,
+    TestResultsMessage,
+    ReadyForInputMessage,
+    ResumeInputMessage,
+    DirectInputCompleteMessage,
+    ProgressRequestMessage,
+    SpeculativePrefetchMessage,
+    SpeculativeCancelMessage,
+    ChunkBeginMessage,
+    ContentMissMessage,
+    JobStatusMessage,
+)
+
+
+def build_dispatch_table(target, classes=MESSAGE_CLASSES):
+    """
+    生成分发表
+    :param target: 提供处理函数的对象（OJAssistant）
+    :return: {消息类型: (消息类, 绑定的处理函数)}
+    """
+    table = {}
+    for message_class in classes:
+        handler = getattr(target, message_class.handler)
+        for type_name in message_class.type_names:
+            table[type_name] = (message_class, handler)
+    return table
@@ -0,0 +1,329 @@
+"""
+OpenAI兼容的本地模拟模型服务器
+实现 /v1/chat/completions（流式SSE与非流式）与 /v1/models，
+支持预设延迟档位、生成速度、截断与错误注入，用于离线压测 GUI → ServerManager → OJAssistant 全链路。
+
+用法（在 OJAssistant 目录下）:
+    python -m core.mock_llm_server --port 8100 --profile typical
+然后添加自定义模型，API基础URL填写 http://127.0.0.1:8100/v1，模型名填写 mock-coder，API Key任意。
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+from aiohttp import web
+
+# 延迟档位：首token延迟(ms)、抖动(ms)、生成速度(token/s)、错误率、429比例、截断率
+PROFILES = {
+    'instant': {'first_token_ms': 0, 'jitter_ms': 0, 'tps': 0, 'error_rate': 0.0, 'rate_limit_rate': 0.0,
+                'truncate_rate': 0.0},
+    'fast': {'first_token_ms': 150, 'jitter_ms': 50, 'tps': 200, 'error_rate': 0.0, 'rate_limit_rate': 0.0,
+             'truncate_rate': 0.0},
+    'typical': {'first_token_ms': 600, 'jitter_ms': 300, 'tps': 60, 'error_rate': 0.0, 'rate_limit_rate': 0.0,
+                'truncate_rate': 0.0},
+    'slow': {'first_token_ms': 2000, 'jitter_ms': 1000, 'tps': 20, 'error_rate': 0.0, 'rate_limit_rate': 0.0,
+             'truncate_rate': 0.0},
+    'flaky': {'first_token_ms': 600, 'jitter_ms': 400, 'tps': 60, 'error_rate': 0.1, 'rate_limit_rate': 0.05,
+              'truncate_rate': 0.05},
+}
+
+CANNED_CODE = {
+    'c': """#include <stdio.h>
+
+int main() {
+    int a, b;
+    if (scanf("%d %d", &a, &b) != 2) {
+        return 0;
+    }
+    printf("%d\\n", a + b);
+    return 0;
+}""",
+    'c++': """#include <iostream>
+using namespace std;
+
+int main() {
+    long long a, b;
+    cin >> a >> b;
+    cout << a + b << endl;
+    return 0;
+}""",
+    'java': """import java.util.Scanner;
+
+public class Main {
+    public static void main(String[] args) {
+        Scanner sc = new Scanner(System.in);
+        long a = sc.nextLong();
+        long b = sc.nextLong();
+        System.out.println(a + b);
+    }
+}""",
+    'python': """def main():
+    a, b = map(int, input().split())
+    print(a + b)
+
+
+if __name__ == "__main__":
+    main()""",
+    'javascript': """const lines = require('fs').readFileSync(0, 'utf8').trim().split(/\\s+/);
+const a = Number(lines[0]);
+const b = Number(lines[1]);
+console.log(a + b);""",
+    'c#': """using System;
+
+namespace Solution
+{
+    class Program
+    {
+        static void Main(string[] args)
+        {
+            var parts = Console.ReadLine().Split(' ');
+            Console.WriteLine(long.Parse(parts[0]) + long.Parse(parts[1]));
+        }
+    }
+}""",
+}
+
+# 系统提示词写作"负责生成{语言名}代码"（OJAssistant._get_system_prompt）：语言名是映射表中的名称（C语言、JavaScript 等），
+# 或映射不到时大写的当前语言（界面语言小写后为 c、c++、java、python、javascript、c#，提示词中为 JAVA、PYTHON 等）
+LANGUAGE_PATTERN = re.compile(r'生成(.+?)代码')
+# 语言名（小写）-> 固定回复
+LANGUAGE_NAMES = {
+    'c': 'c',
+    'c语言': 'c',
+    'c++': 'c++',
+    'cpp': 'c++',
+    'c#': 'c#',
+    'java': 'java',
+    'javascript': 'javascript',
+    'js': 'javascript',
+    'python': 'python',
+}
+
+
+class MockLLMServer:
+    def __init__(self, profile='typical', script=None, models=None, chars_per_token=4, seed=None):
+        """
+        初始化模拟服务器
+        :param profile: 延迟档位名称或参数字典
+        :param script: 按请求顺序循环使用的覆盖参数列表，如 [{"error": 500}, {"truncate": 0.5}, {}]
+        :param models: /v1/models 返回的模型ID列表
+        :param chars_per_token: 每个token对应的字符数
+        :param seed: 随机种子
+        """
+        self.profile = dict(PROFILES[profile]) if isinstance(profile, str) else dict(profile)
+        self.script = list(script or [])
+        self.models = list(models or ['mock-coder'])
+        self.chars_per_token = max(1, chars_per_token)
+        self.random = random.Random(seed)
+        self.request_count = 0
+        self.stats = {'requests': 0, 'errors': 0, 'rate_limited': 0, 'truncated': 0}
+        self.runner = None
+
+    def build_app(self):
+        app = web.Application()
+        app.router.add_get('/v1/models', self.handle_models)
+        app.router.add_post('/v1/chat/completions', self.handle_chat_completions)
+        return app
+
+    async def start(self, host='127.0.0.1', port=8100):
+        """启动HTTP服务"""
+        self.runner = web.AppRunner(self.build_app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+
+    async def stop(self):
+        """停止HTTP服务"""
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def handle_models(self, request):
+        created = int(time.time())
+        return web.json_response({
+            'object': 'list',
+            'data': [
+                {'id': model, 'object': 'model', 'created': created, 'owned_by': 'oj-assistant-mock'}
+                for model in self.models
+            ]
+        })
+
+    def _next_plan(self):
+        """决定本次请求的延迟、错误与截断"""
+        override = self.script[self.request_count % len(self.script)] if self.script else {}
+        self.request_count += 1
+
+        profile = dict(self.profile)
+        profile.update({key: value for key, value in override.items() if key in profile})
+
+        plan = {
+            'first_token': max(0.0, (profile['first_token_ms'] + self.random.uniform(0, profile['jitter_ms'])) / 1000.0),
+            'tps': profile['tps'],
+            'error': override.get('error'),
+            'truncate': override.get('truncate'),
+        }
+        if plan['error'] is None:
+            roll = self.random.random()
+            if roll < profile['rate_limit_rate']:
+                plan['error'] = 429
+            elif roll < profile['rate_limit_rate'] + profile['error_rate']:
+                plan['error'] = 500
+        if plan['truncate'] is None and self.random.random() < profile['truncate_rate']:
+            plan['truncate'] = self.random.uniform(0.2, 0.8)
+        return plan
+
+    @staticmethod
+    def _pick_response(messages):
+        system_prompt = next((m.get('content') or '' for m in messages if m.get('role') == 'system'), '')
+        match = LANGUAGE_PATTERN.search(system_prompt)
+        language = LANGUAGE_NAMES.get(match.group(1).strip().lower(), 'c') if match else 'c'
+        return CANNED_CODE[language]
+
+    def _tokens(self, text):
+        step = self.chars_per_token
+        return [text[i:i + step] for i in range(0, len(text), step)]
+
+    def _usage(self, messages, completion_tokens):
+        prompt_chars = sum(len(m.get('content') or '') for m in messages)
+        prompt_tokens = max(1, prompt_chars // self.chars_per_token)
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+        }
+
+    def _error_response(self, status):
+        self.stats['errors'] += 1
+        if status == 429:
+            self.stats['rate_limited'] += 1
+            message, error_type = 'Rate limit reached for mock-coder', 'rate_limit_error'
+        else:
+            message, error_type = 'The mock server had an error while processing your request', 'server_error'
+        return web.json_response({'error': {'message': message, 'type': error_type, 'code': status}}, status=status)
+
+    async def handle_chat_completions(self, request):
+        self.stats['requests'] += 1
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            return web.json_response({'error': {'message': 'Invalid JSON body', 'type': 'invalid_request_error'}},
+                                     status=400)
+
+        messages = body.get('messages') or []
+        model = body.get('model') or self.models[0]
+        max_tokens = int(body.get('max_tokens') or 8192)
+        plan = self._next_plan()
+
+        await asyncio.sleep(plan['first_token'])
+        if plan['error']:
+            return self._error_response(int(plan['error']))
+
+        tokens = self._tokens(self._pick_response(messages))
+        finish_reason = 'stop'
+        if plan['truncate']:
+            self.stats['truncated'] += 1
+            tokens = tokens[:max(1, int(len(tokens) * float(plan['truncate'])))]
+            finish_reason = 'length'
+        if len(tokens) > max_tokens:
+            tokens = tokens[:max_tokens]
+            finish_reason = 'length'
+
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        if body.get('stream'):
+            return await self._stream_response(request, body, messages, model, tokens, finish_reason,
+                                               completion_id, created, plan['tps'])
+
+        if plan['tps']:
+            await asyncio.sleep(len(tokens) / plan['tps'])
+        return web.json_response({
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': created,
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': ''.join(tokens)},
+                'finish_reason': finish_reason,
+            }],
+            'usage': self._usage(messages, len(tokens)),
+        })
+
+    async def _stream_response(self, request, body, messages, model, tokens, finish_reason,
+                               completion_id, created, tps):
+        response = web.StreamResponse(headers={
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+        })
+        await response.prepare(request)
+
+        def chunk(delta, reason=None):
+            return {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': created,
+                'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': reason}],
+            }
+
+        async def send(payload):
+            await response.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8'))
+
+        await send(chunk({'role': 'assistant', 'content': ''}))
+        interval = 1.0 / tps if tps else 0
+        for token in tokens:
+            await send(chunk({'content': token}))
+            if interval:
+                await asyncio.sleep(interval)
+        await send(chunk({}, finish_reason))
+
+        if (body.get('stream_options') or {}).get('include_usage'):
+            usage_chunk = chunk({})
+            usage_chunk['choices'] = []
+            usage_chunk['usage'] = self._usage(messages, len(tokens))
+            await send(usage_chunk)
+
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OpenAI兼容的本地模拟模型服务器")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='typical', help="延迟档位")
+    parser.add_argument('--script', help="JSON文件，按请求顺序循环使用的覆盖参数列表")
+    parser.add_argument('--models', default='mock-coder', help="逗号分隔的模型ID")
+    parser.add_argument('--seed', type=int, help="随机种子")
+    args = parser.parse_args(argv)
+
+    script = None
+    if args.script:
+        with open(args.script, 'r', encoding='utf-8') as f:
+            script = json.load(f)
+
+    server = MockLLMServer(args.profile, script=script, models=args.models.split(','), seed=args.seed)
+
+    async def run():
+        await server.start(args.host, args.port)
+        print(f"模拟模型服务器已启动: http://{args.host}:{args.port}/v1 (档位: {args.profile})")
+        try:
+            while True:
+                await asyncio.sleep(3600)
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print(f"已停止，统计: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
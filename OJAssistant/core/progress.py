@@ -0,0 +1,134 @@
+"""
+服务器推送的进度通道
+处理流程只需调用 set() 更新进度；后台任务按固定频率（默认最多10次/秒）把最新值
+推送给订阅的连接，并同步到GUI状态栏。两次推送之间的中间值会被合并，只保留最新一次。
+多个客户端同时解题时，进度按所属客户端（会话或连接）分别记录，每个连接只收到自己的进度；
+GUI状态栏显示最近一次更新。
+"""
+import asyncio
+import json
+import weakref
+from datetime import datetime
+
+import websockets
+
+
+class ProgressChannel:
+    def __init__(self, gui, max_rate=10.0):
+        """
+        初始化进度通道
+        :param gui: GUI对象（用于更新状态栏）
+        :param max_rate: 每秒最多推送次数
+        """
+        self.gui = gui
+        self.min_interval = 1.0 / max_rate if max_rate > 0 else 0
+        self.value = 0  # 最近一次更新的进度（任一客户端），显示在GUI状态栏
+        self.stage = None
+        self.seq = 0  # 每次值变化递增（全局单调），客户端据此丢弃过期的进度
+        self.states = weakref.WeakKeyDictionary()  # 会话或连接 -> 该客户端的进度字典
+        self.subscribers = {}  # 连接 -> [所属客户端, 已推送的 seq]
+        self.stats = {'updates': 0, 'pushes': 0}
+
+        self._published_seq = 0  # 最近一次推送的 seq
+        self._dirty = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        """在服务器事件循环中启动推送任务"""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def close(self):
+        """停止推送任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.subscribers.clear()
+
+    def subscribe(self, websocket, owner=None):
+        """订阅进度推送；owner 为该连接所属的会话（默认为连接本身）"""
+        self.subscribers[websocket] = [websocket if owner is None else owner, 0]
+
+    def unsubscribe(self, websocket):
+        self.subscribers.pop(websocket, None)
+
+    def set(self, progress, stage=None, owner=None, **extra):
+        """
+        更新进度（只记录最新值，由推送任务合并发送）
+        :param owner: 进度所属的会话或连接
+        :param extra: 附加字段（如排队位置与等待时间），同一次解题内保留，stage 为 started 时清空
+        """
+        progress = max(0, min(100, int(progress)))
+        state = self.states.get(owner) if owner is not None else None
+        if state is not None and progress == state['progress'] and stage in (None, state['stage']) \
+                and all(state.get(key) == value for key, value in extra.items()):
+            return
+        self.value = progress
+        if stage is not None:
+            self.stage = stage
+        self.seq += 1
+        self.stats['updates'] += 1
+
+        if owner is not None:
+            if state is None or stage == 'started':
+                state = self.states[owner] = {'progress': 0, 'stage': None}
+            state['progress'] = progress
+            if stage is not None:
+                state['stage'] = stage
+            state['seq'] = self.seq
+            state.update(extra)
+
+        if self._task is None:
+            # 推送任务未启动（服务器尚未运行）时直接更新GUI
+            self._update_gui()
+        else:
+            self._dirty.set()
+
+    def snapshot(self, owner=None):
+        """进度消息：指定客户端的进度，未指定或没有记录时为最近一次更新"""
+        state = self.states.get(owner) if owner is not None else None
+        message = {
+            "type": "progress_update",
+            "progress": self.value,
+            "stage": self.stage,
+            "seq": self.seq,
+        }
+        if state is not None:
+            message.update(state)
+        message["timestamp"] = datetime.now().isoformat()
+        return message
+
+    def _update_gui(self):
+        value = self.value
+        self.gui.root.after(0, lambda: self.gui.update_status(f"进度: {value}%"))
+
+    async def _run(self):
+        """前沿立即推送，之后的更新在间隔结束时合并为一次推送"""
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            await self._publish()
+            if self.min_interval:
+                await asyncio.sleep(self.min_interval)
+
+    async def _publish(self):
+        if self.seq == self._published_seq:
+            return
+        self._published_seq = self.seq
+
+        self._update_gui()
+        for websocket, subscription in list(self.subscribers.items()):
+            owner, sent_seq = subscription
+            state = self.states.get(owner)
+            if state is None or state['seq'] <= sent_seq:
+                continue
+            subscription[1] = state['seq']
+            self.stats['pushes'] += 1
+            try:
+                await websocket.send(json.dumps(self.snapshot(owner), ensure_ascii=False))
+            except websockets.ConnectionClosed:
+                self.subscribers.pop(websocket, None)
@@ -0,0 +1,209 @@
+﻿"""
+扩展通信协议的编解码
+- 连接建立后扩展发送 hello 声明支持的特性，服务器回复 hello_ack 确认协商结果
+- 协商了 progress_push 的连接由服务器主动推送合并后的进度，不再需要轮询 progress_request
+- 协商了 binary_frames 的连接，体积较大的 code_solution / code_revision / test_results
+  使用二进制帧传输：大段文本以原始UTF-8字节存放，不做JSON转义，相同内容只存一份
+- 协商了 chunked_upload 的连接，超过阈值的消息拆分为二进制分块帧上传（见 core.chunked）
+- 协商了 content_refs 的连接，双方已有的代码只发送哈希或行级差异（见 core.content_refs）
+- WebSocket 层使用 permessage-deflate 压缩，窗口大小与内存级别可在配置中调整
+
+二进制帧格式（大端序）:
+    0xEA | 版本(1字节) | 头部长度(4字节) | 头部JSON(UTF-8) | 正文
+头部为去掉大段文本后的消息，_blobs 字段记录 [字段路径, 正文偏移, 字节长度]
+
+分块帧格式（大端序）:
+    0xEB | 版本(1字节) | 传输编号(4字节) | 分块序号(4字节) | 分块数据
+"""
+import json
+import struct
+
+from websockets.extensions.permessage_deflate import ServerPerMessageDeflateFactory
+
+PROTOCOL_VERSION = 1
+
+BINARY_MAGIC = 0xEA
+BINARY_VERSION = 1
+_HEADER = struct.Struct('>BBI')
+
+CHUNK_MAGIC = 0xEB
+CHUNK_VERSION = 1
+_CHUNK_HEADER = struct.Struct('>BBII')
+
+# 允许使用二进制帧的消息类型
+BINARY_TYPES = frozenset({'code_solution', 'code_revision', 'test_results'})
+# 服务器支持的可协商特性
+SUPPORTED_FEATURES = ('binary_frames', 'progress_push', 'chunked_upload', 'content_refs')
+
+# 小于该长度的字符串字段保留在头部JSON中
+MIN_BLOB_CHARS = 256
+# 序列化后小于该字节数的消息仍使用文本帧
+MIN_BINARY_BYTES = 2048
+
+
+class ProtocolError(ValueError):
+    """无法解析的协议帧"""
+
+
+def is_binary_frame(data):
+    """判断二进制消息是否为本协议的帧"""
+    return len(data) >= _HEADER.size and data[0] == BINARY_MAGIC
+
+
+def is_chunk_frame(data):
+    """判断二进制消息是否为分块帧"""
+    return len(data) >= _CHUNK_HEADER.size and data[0] == CHUNK_MAGIC
+
+
+def encode_chunk(transfer_id, index, payload):
+    """把一个分块编码为分块帧"""
+    return _CHUNK_HEADER.pack(CHUNK_MAGIC, CHUNK_VERSION, transfer_id, index) + bytes(payload)
+
+
+def decode_chunk(data):
+    """解析分块帧，返回 (传输编号, 分块序号, 分块数据memoryview)"""
+    if not is_chunk_frame(data):
+        raise ProtocolError("不是有效的分块帧")
+    _, version, transfer_id, index = _CHUNK_HEADER.unpack_from(data)
+    if version != CHUNK_VERSION:
+        raise ProtocolError(f"不支持的分块帧版本: {version}")
+    return transfer_id, index, memoryview(data)[_CHUNK_HEADER.size:]
+
+
+def _collect_blobs(message, min_chars):
+    """取出顶层及一层嵌套字典中的大段字符串，返回 (头部字典, [(路径, 字符串)])"""
+    header = {}
+    blobs = []
+    for key, value in message.items():
+        if isinstance(value, str) and len(value) >= min_chars:
+            blobs.append((key, value))
+        elif isinstance(value, dict):
+            nested = {}
+            for sub_key, sub_value in value.items():
+                if isinstance(sub_value, str) and len(sub_value) >= min_chars:
+                    blobs.append((f"{key}.{sub_key}", sub_value))
+                else:
+                    nested[sub_key] = sub_value
+            header[key] = nested
+        else:
+            header[key] = value
+    return header, blobs
+
+
+def encode_binary_frame(message, min_blob_chars=MIN_BLOB_CHARS):
+    """把消息字典编码为二进制帧"""
+    header, blobs = _collect_blobs(message, min_blob_chars)
+
+    body = bytearray()
+    offsets = {}
+    blob_index = []
+    for path, text in blobs:
+        # 同一份代码常以多个别名字段出现，正文中只存一次
+        location = offsets.get(text)
+        if location is None:
+            encoded = text.encode('utf-8')
+            location = (len(body), len(encoded))
+            offsets[text] = location
+            body += encoded
+        blob_index.append([path, location[0], location[1]])
+    header['_blobs'] = blob_index
+
+    header_bytes = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return _HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(header_bytes)) + header_bytes + bytes(body)
+
+
+def decode_binary_frame(data):
+    """把二进制帧解码为消息字典"""
+    if not is_binary_frame(data):
+        raise ProtocolError("不是有效的协议帧")
+    _, version, header_length = _HEADER.unpack_from(data)
+    if version != BINARY_VERSION:
+        raise ProtocolError(f"不支持的帧版本: {version}")
+
+    body_start = _HEADER.size + header_length
+    if body_start > len(data):
+        raise ProtocolError("帧头部长度超出消息长度")
+
+    view = memoryview(data)
+    try:
+        message = json.loads(bytes(view[_HEADER.size:body_start]).decode('utf-8'))
+        for path, offset, length in message.pop('_blobs', []):
+            start = body_start + offset
+            if start + length > len(data):
+                raise ProtocolError(f"字段 {path} 超出消息长度")
+            text = bytes(view[start:start + length]).decode('utf-8')
+            key, _, sub_key = path.partition('.')
+            if sub_key:
+                message.setdefault(key, {})[sub_key] = text
+            else:
+                message[key] = text
+    except ProtocolError:
+        raise
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ProtocolError(f"帧内容无法解析: {e}") from e
+    return message
+
+
+def encode_message(message, binary_frames=False):
+    """
+    序列化待发送的消息
+    :param message: 消息字典
+    :param binary_frames: 连接是否协商了二进制帧
+    :return: str（文本帧）或 bytes（二进制帧）
+    """
+    text = json.dumps(message, ensure_ascii=False)
+    if binary_frames and message.get('type') in BINARY_TYPES and len(text) >= MIN_BINARY_BYTES:
+        return encode_binary_frame(message)
+    return text
+
+
+def negotiate_features(requested):
+    """返回客户端请求与服务器支持的特性交集"""
+    requested = set(requested or [])
+    return [feature for feature in SUPPORTED_FEATURES if feature in requested]
+
+
+def transfer_limits(config_manager):
+    """
+    根据配置文件 [PROTOCOL] 读取消息大小相关的上限（字节）
+    - max_message_size: 单个WebSocket消息的上限，超过即断开连接，因此扩展会把超过一半上限的消息分块上传
+    - chunk_size: 分块大小
+    - max_upload_size: 分块上传的单条消息上限
+    - upload_memory_cap: 每个会话同时用于重组分块的缓冲区上限
+    """
+    max_message_size = int(config_manager.get_setting('max_message_size', str(1024 * 1024), 'PROTOCOL'))
+    chunk_size = int(config_manager.get_setting('chunk_size', str(256 * 1024), 'PROTOCOL'))
+    return {
+        'max_message_size': max_message_size,
+        'chunk_size': min(chunk_size, max_message_size - _CHUNK_HEADER.size),
+        'chunk_threshold': max_message_size // 2,
+        'max_upload_size': int(config_manager.get_setting('max_upload_size', str(16 * 1024 * 1024), 'PROTOCOL')),
+        'upload_memory_cap': int(config_manager.get_setting('upload_memory_cap', str(32 * 1024 * 1024),
+                                                            'PROTOCOL')),
+    }
+
+
+def build_serve_kwargs(config_manager):
+    """
+    根据配置文件 [PROTOCOL] 生成 websockets.serve 的消息大小与压缩参数
+    代码与测试输出重复度高，默认使用最大窗口以换取更好的压缩率；本地连接数很少，内存开销可以忽略
+    """
+    max_size = transfer_limits(config_manager)['max_message_size']
+    compression = config_manager.get_setting('compression', 'deflate', 'PROTOCOL').lower()
+    if compression in ('none', 'off', 'false'):
+        return {'max_size': max_size, 'compression': None}
+
+    window_bits = int(config_manager.get_setting('deflate_window_bits', '15', 'PROTOCOL'))
+    mem_level = int(config_manager.get_setting('deflate_mem_level', '8', 'PROTOCOL'))
+    level = int(config_manager.get_setting('deflate_level', '6', 'PROTOCOL'))
+    return {
+        'max_size': max_size,
+        'compression': None,
+        'extensions': [
+            ServerPerMessageDeflateFactory(
+                server_max_window_bits=window_bits,
+                client_max_window_bits=window_bits,
+                compress_settings={'memLevel': mem_level, 'level': level},
+            )
+        ],
+    }
@@ -3,6 +3,7 @@
 处理一次性密码生成、验证和WebSocket连接
 """
 import asyncio
+import concurrent.futures
 import hashlib
 import json
 import os
@@ -17,6 +18,8 @@ from aiohttp import web
 import websockets
 from websockets.server import WebSocketServerProtocol
 
+from utils.input_service import PRIORITY_REMOTE, InputQueueFull, input_service
+
 
 class RemoteAssistServer:
     def __init__(self, gui, input_simulator, port=8001):
@@ -31,6 +34,10 @@ class RemoteAssistServer:
         self.port = port
         self.server_running = False
         self.server_thread = None
+        # 生命周期：stop() 通过事件立即唤醒主循环，服务器完全停止后 stopped 完成
+        self.loop = None
+        self._stop_event = None
+        self.stopped = concurrent.futures.Future()
         
         # 存储一次性密码和设备信息
         # 格式: {device_id: {password: str, expires_at: float, websocket: WebSocket}}
@@ -59,8 +66,12 @@ class RemoteAssistServer:
             return False
 
     def stop(self):
-        """停止服务器"""
+        """
+        停止服务器（立即返回，不阻塞调用方）
+        :return: 服务器完全停止后完成的 concurrent.futures.Future
+        """
         self.server_running = False
+        input_service().cancel_owner(self, "远程协助服务器已停止")
         # 关闭所有连接
         for device_id, ws in list(self.active_connections.items()):
             try:
@@ -70,6 +81,18 @@ class RemoteAssistServer:
         self.active_connections.clear()
         self.device_sessions.clear()
 
+        if self.server_thread is None:
+            if not self.stopped.done():
+                self.stopped.set_result(None)
+            return self.stopped
+        loop, stop_event = self.loop, self._stop_event
+        if loop is not None and stop_event is not None:
+            try:
+                loop.call_soon_threadsafe(stop_event.set)
+            except RuntimeError:
+                pass  # 事件循环已结束
+        return self.stopped
+
     def _run_server(self):
         """运行服务器的主循环"""
         try:
@@ -79,6 +102,9 @@ class RemoteAssistServer:
             loop.run_until_complete(self._server_main())
         except Exception as e:
             self.gui.log(f"远程协助服务器运行错误: {str(e)}")
+        finally:
+            if not self.stopped.done():
+                self.stopped.set_result(None)
 
     async def handle_http_request(self, request):
         """
@@ -130,6 +156,10 @@ class RemoteAssistServer:
         """
         服务器主函数 - 同时启动WebSocket和HTTP服务器
         """
+        # 先创建事件再检查标志：启动过程中调用的 stop() 不会丢失
+        self._stop_event = asyncio.Event()
+        if not self.server_running:
+            self._stop_event.set()
         try:
             # 创建事件循环
             loop = asyncio.get_event_loop()
@@ -161,9 +191,8 @@ class RemoteAssistServer:
             self.gui.root.after(0, lambda: self.gui.log(f"远程协助服务器运行中 (0.0.0.0:{self.port})"))
             self.gui.root.after(0, lambda: self.gui.log(f"静态文件服务已启动，可通过 http://0.0.0.0:{self.port}/ 访问"))
 
-            # 保持服务器运行
-            while self.server_running:
-                await asyncio.sleep(1)
+            # 保持服务器运行，直到 stop() 触发事件
+            await self._stop_event.wait()
 
             # 关闭服务器
             ws_server.close()
@@ -237,9 +266,17 @@ class RemoteAssistServer:
                             text = data.get('text', '')
 
                             if device_id in self.active_connections:
-                                # 模拟键盘输入
-                                self.gui.root.after(0, lambda t=text: self._simulate_input(t))
-                                
+                                # 模拟键盘输入：提交到输入服务，按顺序在其工作线程中执行
+                                try:
+                                    input_service().submit(lambda token, t=text: self._simulate_input(t),
+                                                           PRIORITY_REMOTE, name='remote', owner=self)
+                                except InputQueueFull:
+                                    await websocket.send(json.dumps({
+                                        'type': 'error',
+                                        'message': '电脑端输入任务过多，请稍后重试'
+                                    }, ensure_ascii=False))
+                                    continue
+
                                 await websocket.send(json.dumps({
                                     'type': 'text_sent',
                                     'message': '文本已发送'
@@ -342,15 +379,11 @@ class RemoteAssistServer:
             self.gui.log(f"设备 {device_id[:8]}... 未连接")
 
     def _simulate_input(self, text: str):
-        """模拟键盘输入文本"""
+        """模拟键盘输入文本（在输入服务的工作线程中执行）"""
         try:
             if self.input_simulator:
-                # 使用输入模拟器输入文本
-                # 将文本分成小块输入
-                chunk_size = 50
-                chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
-                for i, chunk in enumerate(chunks):
-                    self.input_simulator.simulate_typing(chunk, is_first_chunk=(i == 0))
+                # 输入计划一次性编译，按段执行；环境检查与目标窗口只在开始时进行
+                self.input_simulator.simulate_typing(text)
         except Exception as e:
             self.gui.log(f"模拟输入失败: {e}")
 
@@ -1,9 +1,13 @@
 ﻿import asyncio
+import concurrent.futures
+import inspect
 import threading
+import time
 
 import websockets
 
 from core.assistant import OJAssistant
+from core.protocol import build_serve_kwargs
 
 
 class ServerManager:
@@ -19,8 +23,18 @@ class ServerManager:
         self.server_thread = None
         self.assistant = None
 
-    def start(self):
-        """启动服务器"""
+        # 生命周期：stop() 通过事件立即唤醒服务器主循环，服务器完全停止后 stopped 完成
+        self.loop = None
+        self._stop_event = None
+        self.stopped = concurrent.futures.Future()
+        # 停止时等待进行中请求的秒数，超时后取消（未完成的解题任务下次启动时继续）
+        self.shutdown_grace = float(gui.config_manager.get_setting('shutdown_grace', '2', 'PROTOCOL'))
+
+    def start(self, wait_for=None):
+        """
+        启动服务器
+        :param wait_for: 上一个服务器的 stopped；新服务器在后台线程中等它释放端口后再监听，不阻塞调用方
+        """
         try:
             # 检查模型信息是否有效
             if not self.model_info or not self.model_info.get('api_key'):
@@ -29,7 +43,7 @@ class ServerManager:
                 return False
 
             self.server_running = True
-            self.server_thread = threading.Thread(target=self._run_server, daemon=True)
+            self.server_thread = threading.Thread(target=self._run_server, args=(wait_for,), daemon=True)
             self.server_thread.start()
 
             # 记录使用的模型信息
@@ -42,25 +56,58 @@ class ServerManager:
             self.gui.root.after(0, lambda: self.gui.update_status(f"启动失败: {e}"))
             return False
 
-    def stop(self):
-        """停止服务器"""
+    def stop(self, grace=None):
+        """
+        停止服务器（立即返回，不阻塞调用方）
+        :param grace: 等待进行中请求的秒数，默认使用配置 [PROTOCOL] shutdown_grace；多次调用取最小值
+        :return: 服务器完全停止（端口已释放）后完成的 concurrent.futures.Future
+        """
         self.server_running = False
+        if grace is not None:
+            self.shutdown_grace = min(self.shutdown_grace, grace)
         if self.assistant:
             # 重置assistant的一些状态
             self.assistant.is_input_in_progress = False
+            self.assistant.input_service.cancel_owner(self.assistant, "服务器已停止")
             self.assistant.input_simulator.reset()
 
-    def _run_server(self):
+        if self.server_thread is None:
+            # 从未启动
+            if not self.stopped.done():
+                self.stopped.set_result(None)
+            return self.stopped
+        loop, stop_event = self.loop, self._stop_event
+        if loop is not None and stop_event is not None:
+            try:
+                loop.call_soon_threadsafe(stop_event.set)
+            except RuntimeError:
+                pass  # 事件循环已结束
+        return self.stopped
+
+    def _run_server(self, wait_for=None):
         """运行服务器的主循环"""
         try:
+            if wait_for is not None:
+                # 等上一个服务器释放端口
+                concurrent.futures.wait([wait_for], timeout=self.shutdown_grace + 15)
             loop = asyncio.new_event_loop()
             asyncio.set_event_loop(loop)
+            self.loop = loop
             loop.run_until_complete(self._server_main())
         except Exception as e:
             self.gui.log(f"服务器运行错误: {str(e)}")
+        finally:
+            self.loop = None
+            if not self.stopped.done():
+                self.stopped.set_result(None)
 
     async def _server_main(self):
         """服务器主函数"""
+        # 先创建事件再检查标志：启动过程中调用的 stop() 不会丢失
+        self._stop_event = asyncio.Event()
+        if not self.server_running:
+            self._stop_event.set()
+        stop_started = None
         try:
             # 创建assistant时传入模型信息
             self.assistant = OJAssistant(self.gui, self.model_info)
@@ -75,28 +122,70 @@ class ServerManager:
                 8000,
                 ping_interval=20,
                 ping_timeout=10,
-                close_timeout=10
+                close_timeout=10,
+                **build_serve_kwargs(self.gui.config_manager)
             )
 
             self.gui.root.after(0, lambda: self.gui.update_server_status("服务器状态: 运行中 (localhost:8000)"))
             self.gui.root.after(0, lambda: self.gui.update_status(f"服务器运行中，使用模型: {model_name}"))
             self.gui.log("WebSocket服务器已启动，监听 localhost:8000")
+            # 继续执行上次（切换模型重启或程序崩溃前）未完成的解题任务
+            self.assistant.resume_jobs()
 
-            # 保持服务器运行
-            while self.server_running:
-                await asyncio.sleep(1)
+            # 保持服务器运行，直到 stop() 触发事件
+            await self._stop_event.wait()
+            stop_started = time.monotonic()
 
-            server.close()
-            await server.wait_closed()
-
-            self.gui.root.after(0, lambda: self.gui.update_server_status("服务器状态: 已停止"))
-            self.gui.root.after(0, lambda: self.gui.update_status("服务器已停止"))
-            self.gui.log("服务器已停止")
+            await self._close_server(server)
 
         except Exception as e:
+            if stop_started is not None:
+                self.gui.log(f"关闭服务器时出错: {e}")
+                return
             self.gui.root.after(0, lambda: self.gui.log(f"服务器启动失败: {str(e)}，请检查是否已有OJ助手正在运行"))
             self.gui.root.after(0, lambda: self.gui.update_server_status(
                 "服务器状态: 启动失败，请检查是否已有OJ助手正在运行"))
             self.gui.root.after(0, lambda: self.gui.update_status("服务器启动失败，请检查是否已有OJ助手正在运行"))
             self.gui.root.after(0, lambda: self.gui.start_button.config(state="normal"))
-            self.gui.root.after(0, lambda: self.gui.stop_button.config(state="disabled"))
\ No newline at end of file
+            self.gui.root.after(0, lambda: self.gui.stop_button.config(state="disabled"))
+        finally:
+            # 启动失败（如端口被占用）或关闭出错时同样释放助手持有的线程、连接与输入后端
+            if self.assistant is not None:
+                await self._close_assistant()
+            if stop_started is not None:
+                self.gui.root.after(0, lambda: self.gui.update_server_status("服务器状态: 已停止"))
+                self.gui.root.after(0, lambda: self.gui.update_status("服务器已停止"))
+                self.gui.log(f"服务器已停止（耗时 {(time.monotonic() - stop_started) * 1000:.0f} 毫秒）")
+
+    async def _close_assistant(self):
+        """依次释放助手的资源；某一步失败时记录日志并继续后面的步骤"""
+        assistant = self.assistant
+        steps = (
+            ('进度推送', assistant.progress.close),
+            ('用量账本', assistant.usage_ledger.close),
+            ('任务队列', assistant.close_jobs),
+            ('模型后端', assistant.backend.close),
+            ('输入模拟器', assistant.input_simulator.close),
+        )
+        for name, close in steps:
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                self.gui.log(f"关闭{name}失败: {e}")
+
+    async def _close_server(self, server):
+        """停止监听并关闭连接；进行中的请求最多等待 shutdown_grace 秒，超时后取消"""
+        server.close()
+        try:
+            await asyncio.wait_for(asyncio.shield(server.wait_closed()), self.shutdown_grace)
+        except asyncio.TimeoutError:
+            busy = [websocket for websocket in server.websockets if not websocket.handler_task.done()]
+            if busy:
+                self.gui.log(f"仍有 {len(busy)} 个连接未结束，已取消（未完成的解题任务将在下次启动时继续）")
+            for websocket in list(server.websockets):
+                # 未响应关闭握手的连接直接断开，不再等 close_timeout
+                websocket.handler_task.cancel()
+                websocket.transport.abort()
+            await server.wait_closed()
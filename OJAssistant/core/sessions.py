@@ -0,0 +1,165 @@
+"""
+可恢复的扩展会话
+扩展在 hello 中携带上次的会话令牌与已收到的最大序号；服务器为每个会话保留最近的结果消息
+（code_solution、code_revision 等），连接异常断开后重连即可补发，无需重新生成。
+每个会话还保存自己的解题状态（题目、当前代码、纠错次数），多个标签页可以同时解题互不干扰。
+"""
+import secrets
+import time
+import weakref
+from collections import OrderedDict, deque
+
+# 需要在断线后补发的消息类型
+RESUMABLE_TYPES = frozenset({'code_solution', 'code_revision', 'test_results_response', 'input_complete',
+                             'input_interrupted'})
+
+
+def _message_size(message):
+    """估算消息占用的字符数（只统计字符串字段）"""
+    return sum(len(value) for value in message.values() if isinstance(value, str))
+
+
+class SolveState:
+    """一个客户端当前解题的状态"""
+    __slots__ = ('solve_id', 'question', 'existing_code', 'code', 'retry_count', 'test_failures', 'host', 'job_id',
+                 'editor', 'typing_plan', 'editor_code')
+
+    def __init__(self, solve_id=None, question=None, existing_code='', host=''):
+        self.solve_id = solve_id  # 解题编号，用于在账本中关联首轮、重试与纠错调用
+        self.question = question
+        self.existing_code = existing_code
+        self.host = host  # 题目页面的域名，用于按站点选择输入方式
+        self.code = None  # 最近一次生成或纠错得到的代码
+        self.retry_count = 0
+        self.test_failures = []
+        self.job_id = None  # 最近一次生成或纠错对应的任务（core.job_queue），输入完成后标记为 done
+        self.editor = None  # 页面编辑器（monaco / codemirror），用于按键规划（utils.keystroke_planner）
+        self.typing_plan = None  # 最近一次键盘输入的计划（utils.input_plan），中断后可从已提交的位置继续
+        self.editor_code = None  # 扩展随测试结果报告的编辑器中的代码，纠错输入时只修改与之不同的行
+
+
+class Session:
+    __slots__ = ('token', 'websocket', 'buffer', 'buffer_size', 'next_seq', 'last_seen', 'content_refs', 'solve',
+                 '__weakref__')
+
+    def __init__(self, token):
+        self.token = token
+        self.websocket = None
+        self.buffer = deque()  # [(seq, message, size)]
+        self.buffer_size = 0
+        self.next_seq = 1
+        self.last_seen = time.time()
+        self.content_refs = None  # 协商了 content_refs 时的代码去重存储（core.content_refs.ContentRefs）
+        self.solve = SolveState()
+
+    def find(self, seq):
+        """按序号查找仍在缓存中的消息"""
+        for buffered_seq, message, _ in self.buffer:
+            if buffered_seq == seq:
+                return message
+        return None
+
+    def pending(self, last_seq):
+        """客户端尚未收到的消息"""
+        return [message for seq, message, _ in self.buffer if seq > last_seq]
+
+    def acknowledge(self, last_seq):
+        """丢弃客户端已确认收到的消息"""
+        while self.buffer and self.buffer[0][0] <= last_seq:
+            _, _, size = self.buffer.popleft()
+            self.buffer_size -= size
+
+
+class SessionStore:
+    def __init__(self, max_sessions=32, max_buffer=8, max_buffer_chars=2 * 1024 * 1024, ttl=1800):
+        """
+        初始化会话存储
+        :param max_sessions: 最多保留的会话数（按最近使用淘汰）
+        :param max_buffer: 每个会话最多缓存的消息数
+        :param max_buffer_chars: 每个会话缓存消息的字符总数上限
+        :param ttl: 断开连接的会话保留时间（秒）
+        """
+        self.max_sessions = max_sessions
+        self.max_buffer = max_buffer
+        self.max_buffer_chars = max_buffer_chars
+        self.ttl = ttl
+
+        self.sessions = OrderedDict()  # token -> Session
+        # 连接 -> 会话；连接对象释放后自动移除，已断开但仍在处理中的请求依然能找到所属会话
+        self.connections = weakref.WeakKeyDictionary()
+        self.stats = {'created': 0, 'resumed': 0, 'redelivered': 0, 'evicted': 0}
+
+    def attach(self, websocket, token=None, last_seq=0):
+        """
+        把连接绑定到会话
+        :return: (会话, 是否为恢复的会话, 待补发的消息列表)
+        """
+        self._prune()
+        session = self.sessions.get(token) if token else None
+        # 令牌对应的会话仍有活动连接（例如复制了标签页）时不抢占，另建新会话
+        if session is not None and session.websocket is not None and not _is_closed(session.websocket):
+            session = None
+
+        resumed = session is not None
+        if session is None:
+            session = Session(secrets.token_urlsafe(16))
+            self.sessions[session.token] = session
+            self.stats['created'] += 1
+            pending = []
+        else:
+            session.acknowledge(last_seq)
+            pending = session.pending(last_seq)
+            self.sessions.move_to_end(session.token)
+            self.stats['resumed'] += 1
+            self.stats['redelivered'] += len(pending)
+
+        session.websocket = websocket
+        session.last_seen = time.time()
+        self.connections[websocket] = session
+        self._prune()
+        return session, resumed, pending
+
+    def detach(self, websocket):
+        """连接关闭：保留会话以便重连"""
+        session = self.connections.get(websocket)
+        if session is not None and session.websocket is websocket:
+            session.websocket = None
+            session.last_seen = time.time()
+
+    def get(self, websocket):
+        """连接所属的会话（未握手的旧版客户端返回None）"""
+        return self.connections.get(websocket)
+
+    def record(self, session, message):
+        """为消息分配会话序号并缓存，返回带序号的消息"""
+        message = dict(message, session_seq=session.next_seq)
+        session.next_seq += 1
+        size = _message_size(message)
+        session.buffer.append((message['session_seq'], message, size))
+        session.buffer_size += size
+        while len(session.buffer) > self.max_buffer or \
+                (session.buffer_size > self.max_buffer_chars and len(session.buffer) > 1):
+            _, _, dropped_size = session.buffer.popleft()
+            session.buffer_size -= dropped_size
+        session.last_seen = time.time()
+        return message
+
+    def _prune(self):
+        """淘汰超时未重连的会话，并限制会话总数"""
+        now = time.time()
+        for token in list(self.sessions.keys()):
+            session = self.sessions[token]
+            if session.websocket is None and now - session.last_seen > self.ttl:
+                del self.sessions[token]
+                self.stats['evicted'] += 1
+
+        for token in list(self.sessions.keys()):
+            if len(self.sessions) <= self.max_sessions:
+                break
+            if self.sessions[token].websocket is None:
+                del self.sessions[token]
+                self.stats['evicted'] += 1
+
+
+def _is_closed(websocket):
+    return getattr(websocket, 'closed', False)
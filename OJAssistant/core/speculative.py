@@ -0,0 +1,194 @@
+"""
+推测式代码生成
+扩展在页面加载时即上报题目，服务器在后台以低优先级提前生成代码；
+用户真正点击“自动答题”时直接取用已生成的结果。
+缓存键只包含语言、模型与归一化后的题目：预取下一关时还拿不到该关编辑器中的代码，
+取用时再核对生成所用的已有代码与点击时编辑器中的代码。
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict, deque
+
+
+class SpeculativeGenerator:
+    def __init__(self, gui, generate, enabled=False, max_per_hour=20, max_pending=2, ttl=900, max_entries=8):
+        """
+        初始化推测式生成器
+        :param gui: GUI对象（用于日志）
+        :param generate: 协程函数 generate(question_text, existing_code) -> code
+        :param enabled: 是否启用推测式生成（默认关闭，需要用户主动开启）
+        :param max_per_hour: 每小时最多发起的推测生成次数（预算）
+        :param max_pending: 同时进行中的推测生成数量上限
+        :param ttl: 生成结果的有效期（秒）
+        :param max_entries: 缓存的最大条目数
+        """
+        self.gui = gui
+        self.generate = generate
+        self.enabled = enabled
+        self.max_per_hour = max_per_hour
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        # 格式: {key: {'task': Task, 'created_at': float, 'generating': bool, 'source': str, 'existing_code': str}}
+        self.entries = OrderedDict()
+        self.started_at = deque()  # 最近一小时内发起推测生成的时间戳
+        self.stats = {'submitted': 0, 'hits': 0, 'misses': 0, 'cancelled': 0, 'rejected': 0, 'reconciled': 0}
+
+        # 前台（用户主动触发）任务计数，推测任务只在空闲时才调用模型
+        self.foreground_count = 0
+        self.idle_event = asyncio.Event()
+        self.idle_event.set()
+        # 推测任务之间串行执行，避免占满模型并发
+        self.slot = asyncio.Semaphore(1)
+
+    @staticmethod
+    def make_key(language, model_name, question_text):
+        """根据语言、模型与题目生成缓存键（空白归一化，不含已有代码）"""
+        normalized_question = ' '.join((question_text or '').split())
+        raw = f"{language}\x00{model_name}\x00{normalized_question}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _normalize_code(code):
+        return (code or '').strip()
+
+    def begin_foreground(self):
+        """标记前台生成开始，推测任务暂停调用模型"""
+        self.foreground_count += 1
+        self.idle_event.clear()
+
+    def end_foreground(self):
+        """标记前台生成结束"""
+        self.foreground_count = max(0, self.foreground_count - 1)
+        if self.foreground_count == 0:
+            self.idle_event.set()
+
+    def _prune(self):
+        """清理过期条目与超出一小时窗口的预算记录"""
+        now = time.time()
+        while self.started_at and now - self.started_at[0] > 3600:
+            self.started_at.popleft()
+
+        for key in list(self.entries.keys()):
+            entry = self.entries[key]
+            if now - entry['created_at'] > self.ttl:
+                self._drop(key)
+
+        while len(self.entries) > self.max_entries:
+            oldest_key = next(iter(self.entries))
+            self._drop(oldest_key)
+
+    def _drop(self, key):
+        """移除条目，若仍在运行则取消"""
+        entry = self.entries.pop(key, None)
+        if entry and not entry['task'].done():
+            entry['task'].cancel()
+            self.stats['cancelled'] += 1
+
+    def _pending_count(self):
+        return sum(1 for entry in self.entries.values() if not entry['task'].done())
+
+    def submit(self, key, question_text, existing_code="", source="page_load"):
+        """
+        提交一次推测生成
+        :return: 状态字符串 disabled/cached/running/budget_exhausted/busy/started
+        """
+        if not self.enabled:
+            return 'disabled'
+
+        self._prune()
+
+        entry = self.entries.get(key)
+        if entry:
+            self.entries.move_to_end(key)
+            return 'running' if not entry['task'].done() else 'cached'
+
+        if len(self.started_at) >= self.max_per_hour:
+            self.stats['rejected'] += 1
+            return 'budget_exhausted'
+
+        if self._pending_count() >= self.max_pending:
+            self.stats['rejected'] += 1
+            return 'busy'
+
+        entry = {
+            'created_at': time.time(),
+            'generating': False,
+            'source': source,
+            'existing_code': self._normalize_code(existing_code),
+        }
+        entry['task'] = asyncio.ensure_future(self._run(question_text, existing_code, entry))
+        self.entries[key] = entry
+        self.started_at.append(time.time())
+        self.stats['submitted'] += 1
+        self._prune()
+        return 'started'
+
+    async def _run(self, question_text, existing_code, entry):
+        """低优先级执行：等待前台空闲后再调用模型"""
+        async with self.slot:
+            await self.idle_event.wait()
+            entry['generating'] = True
+            return await self.generate(question_text, existing_code)
+
+    async def take(self, key, existing_code="", accept=None):
+        """
+        取用推测生成的结果；已开始生成则等待其完成，尚在排队则取消并交由前台生成
+        :param existing_code: 点击时编辑器中的代码
+        :param accept: 生成所用的已有代码与 existing_code 不一致时的核对函数 accept(code) -> bool，
+                       未提供时视为未命中
+        :return: 代码字符串，未命中或失败时返回None
+        """
+        self._prune()
+        entry = self.entries.pop(key, None)
+        if not entry:
+            self.stats['misses'] += 1
+            return None
+
+        same_code = entry['existing_code'] == self._normalize_code(existing_code)
+        was_ready = entry['task'].done()
+        if not was_ready and (not entry['generating'] or (not same_code and accept is None)):
+            # 尚未开始调用模型，直接取消，由前台立即生成，避免排队等待
+            entry['task'].cancel()
+            self.stats['cancelled'] += 1
+            self.stats['misses'] += 1
+            return None
+
+        try:
+            code = await entry['task']
+        except asyncio.CancelledError:
+            code = None
+        except Exception as e:
+            self.gui.log(f"推测生成失败: {e}")
+            code = None
+
+        if code and not same_code:
+            if accept is not None and accept(code):
+                self.stats['reconciled'] += 1
+            else:
+                self.gui.log("推测生成时的已有代码与编辑器中的不一致，改为重新生成")
+                code = None
+
+        if code:
+            self.stats['hits'] += 1
+            state = "已完成" if was_ready else "等待生成完成"
+            self.gui.log(f"命中推测生成结果（来源: {entry['source']}，{state}）")
+        else:
+            self.stats['misses'] += 1
+        return code
+
+    def cancel(self, key):
+        """取消单个推测任务"""
+        self._drop(key)
+
+    def cancel_all(self):
+        """取消所有推测任务并清空缓存"""
+        for key in list(self.entries.keys()):
+            self._drop(key)
+
+    def budget_left(self):
+        """本小时剩余的推测生成预算"""
+        self._prune()
+        return max(0, self.max_per_hour - len(self.started_at))
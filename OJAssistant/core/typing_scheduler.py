@@ -0,0 +1,105 @@
+"""
+多客户端共享的键盘输入调度
+多个标签页可以同时连接并行生成代码，但模拟键盘输入作用于同一个系统焦点，同一时间只能有一个客户端在输入。
+输入请求按到达顺序排队（先进先出），等待中的客户端会收到排队位置与已等待时间。
+"""
+import asyncio
+import time
+from collections import deque
+
+
+class TypingTicket:
+    __slots__ = ('owner', 'label', 'enqueued_at', 'granted_at', 'granted', 'changed')
+
+    def __init__(self, owner, label=''):
+        self.owner = owner
+        self.label = label
+        self.enqueued_at = time.monotonic()
+        self.granted_at = None
+        self.granted = False
+        self.changed = asyncio.Event()  # 排队位置变化或获得输入权时触发
+
+    @property
+    def wait_ms(self):
+        """已等待（或最终等待）的毫秒数"""
+        end = self.granted_at if self.granted_at is not None else time.monotonic()
+        return int((end - self.enqueued_at) * 1000)
+
+
+class TypingScheduler:
+    def __init__(self, refresh_interval=2.0):
+        """
+        初始化输入调度器
+        :param refresh_interval: 排队期间即使位置不变，也按该间隔（秒）回调一次以更新等待时间
+        """
+        self.refresh_interval = refresh_interval
+        self.waiting = deque()
+        self.active = None
+        self.stats = {'granted': 0, 'queued': 0, 'abandoned': 0, 'max_wait_ms': 0}
+
+    @property
+    def busy(self):
+        """是否有客户端正在输入"""
+        return self.active is not None
+
+    def position(self, ticket):
+        """0 表示正在输入，n 表示前面还有 n 个客户端（含正在输入的）"""
+        if ticket is self.active:
+            return 0
+        try:
+            return self.waiting.index(ticket) + (1 if self.active is not None else 0)
+        except ValueError:
+            return -1
+
+    async def acquire(self, owner, label='', on_wait=None):
+        """
+        排队等待输入权
+        :param owner: 请求方（会话或连接），仅用于日志与统计
+        :param on_wait: 排队期间的异步回调 on_wait(ticket, 前面的客户端数, 队列总长度（含正在输入的）)
+        :return: 获得输入权的 TypingTicket，用完后必须调用 release
+        """
+        ticket = TypingTicket(owner, label)
+        self.waiting.append(ticket)
+        self._grant_next()
+        if not ticket.granted:
+            self.stats['queued'] += 1
+        try:
+            while True:
+                ticket.changed.clear()
+                if ticket.granted:
+                    break
+                if on_wait is not None:
+                    await on_wait(ticket, self.position(ticket), len(self.waiting) + 1)
+                try:
+                    await asyncio.wait_for(ticket.changed.wait(), self.refresh_interval)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            # 连接断开或任务被取消：退出队列，已获得的输入权交给下一位
+            self.stats['abandoned'] += 1
+            self.release(ticket)
+            raise
+        self.stats['max_wait_ms'] = max(self.stats['max_wait_ms'], ticket.wait_ms)
+        return ticket
+
+    def release(self, ticket):
+        """释放输入权（或放弃排队）"""
+        if ticket is self.active:
+            self.active = None
+        else:
+            try:
+                self.waiting.remove(ticket)
+            except ValueError:
+                return
+        self._grant_next()
+        for waiting in self.waiting:
+            waiting.changed.set()
+
+    def _grant_next(self):
+        if self.active is None and self.waiting:
+            ticket = self.waiting.popleft()
+            ticket.granted = True
+            ticket.granted_at = time.monotonic()
+            self.active = ticket
+            self.stats['granted'] += 1
+            ticket.changed.set()
@@ -0,0 +1,274 @@
+"""
+模型调用账本
+记录每次 chat.completions 调用的 token 用量与耗时（SQLite，WAL 模式，批量写入），
+并提供按天汇总、按模型 p95 延迟与每次解题重试次数的报表。
+
+用法（在 OJAssistant 目录下）:
+    python -m core.usage_ledger report --days 7
+"""
+import argparse
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    solve_id TEXT,
+    kind TEXT NOT NULL,
+    speculative INTEGER NOT NULL DEFAULT 0,
+    model TEXT,
+    language TEXT,
+    problem_hash TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    total_tokens INTEGER,
+    latency_ms REAL,
+    success INTEGER NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_llm_calls_ts ON llm_calls (ts);
+CREATE INDEX IF NOT EXISTS idx_llm_calls_solve ON llm_calls (solve_id);
+"""
+
+COLUMNS = (
+    'ts', 'day', 'solve_id', 'kind', 'speculative', 'model', 'language', 'problem_hash',
+    'prompt_tokens', 'completion_tokens', 'total_tokens', 'latency_ms', 'success', 'error',
+)
+
+
+def _connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=5, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _percentile(values, pct):
+    """最近秩法计算百分位数"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class UsageLedger:
+    def __init__(self, db_path, retention_days=30, batch_size=20, flush_interval=2.0, log=None):
+        """
+        初始化账本
+        :param db_path: SQLite 数据库路径
+        :param retention_days: 记录保留天数，0 表示永久保留
+        :param batch_size: 达到该条数时立即批量写入
+        :param flush_interval: 最长写入间隔（秒）
+        :param log: 日志函数
+        """
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.log = log or print
+
+        self.queue = queue.Queue()
+        self.closed = False
+        self.writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self.writer_thread.start()
+
+    @classmethod
+    def from_config(cls, config_manager, log=None):
+        """根据配置文件 [USAGE_LEDGER] 创建账本"""
+        db_path = os.path.join(config_manager.get_data_dir(), 'usage_ledger.db')
+        retention_days = int(config_manager.get_setting('retention_days', '30', 'USAGE_LEDGER'))
+        return cls(db_path, retention_days=retention_days, log=log)
+
+    def record(self, kind, model, language, solve_id=None, problem_hash=None, usage=None,
+               latency_ms=None, success=True, error=None, speculative=False):
+        """记录一次模型调用（非阻塞，由后台线程批量写入）"""
+        if self.closed:
+            return
+        now = time.time()
+        usage = usage or {}
+        self.queue.put((
+            now,
+            datetime.fromtimestamp(now).strftime('%Y-%m-%d'),
+            solve_id,
+            kind,
+            1 if speculative else 0,
+            model,
+            language,
+            problem_hash,
+            usage.get('prompt_tokens'),
+            usage.get('completion_tokens'),
+            usage.get('total_tokens'),
+            latency_ms,
+            1 if success else 0,
+            error,
+        ))
+
+    def close(self, timeout=5):
+        """停止后台线程并写入剩余记录"""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.writer_thread.join(timeout)
+
+    def _writer_loop(self):
+        """后台写入线程：攒批后一次事务写入"""
+        try:
+            conn = _connect(self.db_path)
+            self._apply_retention(conn)
+        except Exception as e:
+            self.log(f"打开用量账本失败: {e}")
+            return
+
+        pending = []
+        stop = False
+        while not stop:
+            deadline = time.monotonic() + self.flush_interval
+            while len(pending) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                pending.append(item)
+
+            if pending:
+                try:
+                    with conn:
+                        conn.executemany(
+                            f"INSERT INTO llm_calls ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                            pending
+                        )
+                except Exception as e:
+                    self.log(f"写入用量账本失败: {e}")
+                pending = []
+
+        conn.close()
+
+    def _apply_retention(self, conn):
+        """删除超出保留期的记录"""
+        if self.retention_days <= 0:
+            return
+        cutoff = time.time() - self.retention_days * 86400
+        with conn:
+            conn.execute("DELETE FROM llm_calls WHERE ts < ?", (cutoff,))
+
+
+def build_report(db_path, days=7):
+    """生成报表数据"""
+    conn = _connect(db_path)
+    since = time.time() - days * 86400
+    try:
+        daily = conn.execute(
+            """
+            SELECT day, model, COUNT(*), SUM(COALESCE(prompt_tokens, 0)), SUM(COALESCE(completion_tokens, 0)),
+                   SUM(COALESCE(total_tokens, 0)), SUM(1 - success)
+            FROM llm_calls WHERE ts >= ? GROUP BY day, model ORDER BY day, model
+            """,
+            (since,)
+        ).fetchall()
+
+        latencies = {}
+        for model, latency in conn.execute(
+                "SELECT model, latency_ms FROM llm_calls WHERE ts >= ? AND success = 1 AND latency_ms IS NOT NULL",
+                (since,)):
+            latencies.setdefault(model, []).append(latency)
+
+        per_solve = conn.execute(
+            """
+            SELECT solve_id, language, COUNT(*) - 1,
+                   SUM(kind = 'completeness_retry'), SUM(kind IN ('correction', 'correction_retry'))
+            FROM llm_calls WHERE ts >= ? AND solve_id IS NOT NULL AND speculative = 0
+            GROUP BY solve_id
+            """,
+            (since,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    retries_by_language = {}
+    for _, language, retries, completeness_retries, corrections in per_solve:
+        stats = retries_by_language.setdefault(language or '-', [0, 0, 0, 0])
+        stats[0] += 1
+        stats[1] += retries
+        stats[2] += completeness_retries or 0
+        stats[3] += corrections or 0
+
+    return {
+        'daily': daily,
+        'latency': {
+            model: (len(values), _percentile(values, 50), _percentile(values, 95))
+            for model, values in latencies.items()
+        },
+        'retries': retries_by_language,
+    }
+
+
+def print_report(db_path, days=7):
+    """打印报表"""
+    report = build_report(db_path, days)
+
+    print(f"== 每日用量（最近 {days} 天）==")
+    print(f"{'日期':<12}{'模型':<28}{'调用':>6}{'输入tokens':>12}{'输出tokens':>12}{'总tokens':>12}{'失败':>6}")
+    for day, model, calls, prompt, completion, total, failures in report['daily']:
+        print(f"{day:<12}{(model or '-'):<28}{calls:>6}{prompt:>12}{completion:>12}{total:>12}{failures:>6}")
+
+    print("\n== 模型延迟（成功调用，毫秒）==")
+    print(f"{'模型':<28}{'样本':>6}{'p50':>10}{'p95':>10}")
+    for model, (count, p50, p95) in sorted(report['latency'].items(), key=lambda item: item[0] or ''):
+        print(f"{(model or '-'):<28}{count:>6}{p50:>10.0f}{p95:>10.0f}")
+
+    print("\n== 每次解题的重试次数 ==")
+    print(f"{'语言':<12}{'解题数':>8}{'平均重试':>10}{'完整性重试':>12}{'纠错调用':>10}")
+    for language, (solves, retries, completeness, corrections) in sorted(report['retries'].items()):
+        print(f"{language:<12}{solves:>8}{retries / solves:>10.2f}{completeness:>12}{corrections:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OJ助手模型调用账本")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    report_parser = subparsers.add_parser('report', help="打印用量报表")
+    report_parser.add_argument('--days', type=int, default=7, help="统计最近多少天")
+    report_parser.add_argument('--db', help="数据库路径，默认使用应用数据目录下的 usage_ledger.db")
+
+    prune_parser = subparsers.add_parser('prune', help="按保留天数清理旧记录")
+    prune_parser.add_argument('--days', type=int, required=True, help="保留最近多少天")
+    prune_parser.add_argument('--db', help="数据库路径")
+
+    args = parser.parse_args(argv)
+
+    db_path = args.db
+    if not db_path:
+        from utils.config import ConfigManager
+        db_path = os.path.join(ConfigManager().get_data_dir(), 'usage_ledger.db')
+
+    if args.command == 'report':
+        print_report(db_path, args.days)
+    elif args.command == 'prune':
+        conn = _connect(db_path)
+        try:
+            cutoff = (datetime.now() - timedelta(days=args.days)).timestamp()
+            with conn:
+                deleted = conn.execute("DELETE FROM llm_calls WHERE ts < ?", (cutoff,)).rowcount
+            print(f"已删除 {deleted} 条记录")
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+输入后端校准
+在本地的捕获窗口中用每个可用后端输入同一段示例代码，测量速度并检查窗口收到的内容是否一致，
+结果由 BackendCalibration 保存（见 utils/input_backends.py）。每个运行环境只需校准一次。
+单独运行: python -m gui.input_calibration
+"""
+import difflib
+import time
+import tkinter as tk
+
+from utils.input_backends import BACKENDS, BackendCalibration, open_backend
+
+# 示例代码：缩进、括号、引号与中文注释覆盖各后端容易出错的字符
+SAMPLE_LINES = (
+    '#include <stdio.h>',
+    'int main(void) {',
+    '    int a[3] = {1, 2, 3}; // 数组',
+    '    printf("%d|%s\\n", a[0] * 2, "ok");',
+    '    return 0;',
+    '}',
+)
+SAMPLE = '\n'.join(SAMPLE_LINES) + '\n'
+# 每个后端等待捕获窗口收到全部内容的最长时间（秒）
+RESULT_TIMEOUT = 3.0
+
+
+class InputCalibration:
+    def __init__(self, root, calibration, setting=None, log=None):
+        """
+        :param root: Tk 根窗口；校准在 Tk 主线程中同步进行
+        :param calibration: BackendCalibration，保存结果
+        :param setting: 读取 [INPUT] 配置的函数 setting(key, default)，后端按实际配置的延迟测量
+        """
+        self.root = root
+        self.calibration = calibration
+        self.setting = setting or (lambda key, default: default)
+        self.log = log or print
+        self.window = None
+        self.text = None
+
+    def run(self):
+        """依次校准全部后端并保存结果；捕获窗口拿不到焦点时放弃，返回 None"""
+        self._open_window()
+        try:
+            if not self._focus_capture():
+                self.log("输入后端校准：捕获窗口无法获得焦点，跳过校准")
+                return None
+            results = {}
+            best_keys = None
+            for name, backend_class in BACKENDS.items():
+                key_backend = None
+                if backend_class.kind == 'paste':
+                    if best_keys is None:
+                        results[name] = self._failure('没有可用的逐键后端')
+                        continue
+                    key_backend = best_keys
+                results[name] = self._measure(name, key_backend)
+                if backend_class.kind == 'keys' and results[name]['ok']:
+                    previous = best_keys
+                    if previous is None or results[name]['chars_per_s'] > results[previous.name]['chars_per_s']:
+                        best_keys = self._reopen(name, previous)
+            if best_keys is not None:
+                best_keys.close()
+            self.calibration.save(results)
+            summary = ', '.join(f"{name}={result['chars_per_s']:.0f}/s" if result['ok'] else f"{name}=×"
+                                for name, result in results.items())
+            self.log(f"输入后端校准完成: {summary}")
+            return results
+        finally:
+            self.window.destroy()
+
+    def _open_window(self):
+        self.window = tk.Toplevel(self.root)
+        self.window.title("输入后端校准")
+        self.window.geometry("480x220")
+        self.window.attributes('-topmost', True)
+        self.text = tk.Text(self.window, font=("Courier New", 10), undo=False, autoseparators=False)
+        self.text.pack(fill=tk.BOTH, expand=True)
+        self.window.update()
+
+    def _focus_capture(self):
+        """把焦点给捕获窗口的文本框；失败时后端的输入会落到别的窗口，不能继续"""
+        deadline = time.monotonic() + 1.0
+        while time.monotonic() < deadline:
+            self.window.lift()
+            self.window.focus_force()
+            self.text.focus_set()
+            self.window.update()
+            if self.window.focus_get() is self.text:
+                return True
+            time.sleep(0.05)
+        return False
+
+    def _reopen(self, name, previous):
+        """保留当前最快的逐键后端，供剪贴板后端发送 Ctrl+V"""
+        if previous is not None:
+            previous.close()
+        try:
+            return open_backend(name, self.setting)
+        except Exception:
+            return previous
+
+    def _measure(self, name, key_backend):
+        try:
+            backend = open_backend(name, self.setting, key_backend=key_backend, root=self.root)
+        except Exception as e:
+            return self._failure(str(e))
+        self.text.delete('1.0', tk.END)
+        self.window.update()
+        try:
+            started = time.perf_counter()
+            if backend.kind == 'paste':
+                backend.write(SAMPLE)
+            else:
+                for line in SAMPLE_LINES:
+                    backend.write(line)
+                    backend.key('enter')
+            received = self._wait_for(SAMPLE)
+            elapsed = time.perf_counter() - started
+        except Exception as e:
+            return self._failure(str(e))
+        finally:
+            if backend.kind == 'keys':
+                backend.close()
+        accuracy = difflib.SequenceMatcher(None, SAMPLE, received).ratio()
+        ok = received == SAMPLE
+        return {
+            'ok': ok,
+            'accuracy': round(accuracy, 4),
+            'chars_per_s': round(len(SAMPLE) / elapsed, 1) if ok else 0.0,
+            'elapsed_ms': round(elapsed * 1000, 1),
+            'error': '' if ok else '捕获窗口收到的内容与示例不一致',
+        }
+
+    def _wait_for(self, expected):
+        """处理窗口事件直到收到全部内容，或超时"""
+        deadline = time.monotonic() + RESULT_TIMEOUT
+        received = ''
+        while time.monotonic() < deadline:
+            self.window.update()
+            # Text 总是在末尾多出一个换行
+            received = self.text.get('1.0', 'end-1c')
+            if received == expected or len(received) > len(expected):
+                break
+            time.sleep(0.01)
+        return received
+
+    @staticmethod
+    def _failure(error):
+        return {'ok': False, 'accuracy': 0.0, 'chars_per_s': 0.0, 'elapsed_ms': 0.0, 'error': error}
+
+
+def calibrate_if_needed(root, config_manager, log=None):
+    """
+    [INPUT] calibrate_on_startup 开启（默认）且没有本环境的有效结果时校准
+    :return: 新的 BackendCalibration；无需或无法校准时返回 None
+    """
+    if config_manager.get_setting('calibrate_on_startup', 'True', 'INPUT') != 'True':
+        return None
+    calibration = BackendCalibration.from_config(config_manager, log=log)
+    if calibration.is_fresh():
+        return None
+    setting = lambda key, default: config_manager.get_setting(key, default, 'INPUT')
+    if InputCalibration(root, calibration, setting, log=log).run() is None:
+        return None
+    return calibration
+
+
+def main():
+    from utils.config import ConfigManager
+
+    root = tk.Tk()
+    root.withdraw()
+    config_manager = ConfigManager()
+    calibration = BackendCalibration.from_config(config_manager)
+    setting = lambda key, default: config_manager.get_setting(key, default, 'INPUT')
+    results = InputCalibration(root, calibration, setting).run()
+    root.destroy()
+    if results is None:
+        return 1
+    for name, result in results.items():
+        print(f"{name:<10} ok={result['ok']!s:<6} accuracy={result['accuracy']:<7} "
+              f"chars/s={result['chars_per_s']:<8} {result['error']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,10 +1,11 @@
-import threading
 import time
 import tkinter as tk
 from tkinter import ttk, messagebox
 
 import keyboard
 
+from utils.input_service import PRIORITY_USER, InputQueueFull, input_service
+
 
 class TestInputDialog:
     def __init__(self, parent):
@@ -196,15 +197,28 @@ class TestInputDialog:
         self._add_log(f"开始测试 - 等待时间: {delay}秒, 输入间隔: {interval}秒")
         self._add_log(f"特殊字符处理: {'启用' if self.special_chars_var.get() else '禁用'}")
 
-        # 在新线程中执行测试
-        threading.Thread(
-            target=self._run_test,
-            args=(content, delay, interval),
-            daemon=True
-        ).start()
+        # 提交到输入服务，在其工作线程中执行测试
+        try:
+            job = input_service().submit(lambda token: self._run_test(content, delay, interval, token),
+                                         PRIORITY_USER, name='input_test', owner=self)
+            job.future.add_done_callback(self._on_test_job_done)
+        except InputQueueFull:
+            self.test_running = False
+            self.start_btn.config(state="normal")
+            self.stop_btn.config(state="disabled")
+            messagebox.showerror("输入错误", "输入任务过多，请稍后重试")
+
+    def _on_test_job_done(self, future):
+        """排队中被取消的测试不会执行 _run_test，在这里恢复按钮"""
+        if future.cancelled():
+            self.test_running = False
+            self.parent.after(0, lambda: self.start_btn.config(state="normal"))
+            self.parent.after(0, lambda: self.stop_btn.config(state="disabled"))
 
-    def _run_test(self, content, delay, interval):
-        """实际执行输入测试的线程"""
+    def _run_test(self, content, delay, interval, token=None):
+        """实际执行输入测试（在输入服务的工作线程中）"""
+        if token is not None:
+            token.on_cancel(lambda reason: setattr(self, 'test_running', False))
         try:
             # 等待指定时间
             for i in range(int(delay * 10)):  # 每0.1秒检查一次
@@ -297,6 +311,7 @@ class TestInputDialog:
     def stop_test(self):
         """停止测试"""
         self.test_running = False
+        input_service().cancel_owner(self, "用户停止测试")
         self._update_status("正在停止测试...", warning=True)
         self._add_log("用户请求停止测试")
 
@@ -329,6 +344,7 @@ class TestInputDialog:
         """窗口关闭时的处理"""
         # 停止正在进行的测试
         self.test_running = False
+        input_service().cancel_owner(self, "输入测试窗口已关闭")
         time.sleep(0.1)  # 给线程一点时间响应
         self.dialog.destroy()
 
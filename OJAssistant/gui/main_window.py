@@ -1,4 +1,5 @@
 import atexit
+import concurrent.futures
 import json
 import os
 import queue
@@ -24,10 +25,12 @@ except ImportError:
 
 from __init__ import version
 from core.server import ServerManager
+from gui.input_calibration import calibrate_if_needed
 from gui.input_test import TestInputDialog
 from gui.language_manager import LanguageManager
 from gui.update_window import UpdateWindow
 from utils.config import ConfigManager
+from utils.input_service import input_service
 
 
 class OJGUI:
@@ -44,6 +47,8 @@ class OJGUI:
         # 初始化变量
         self.server_manager = None
         self.log_queue = queue.Queue()
+        # 输入服务中任务失败等日志写入主窗口日志（输入测试、远程协助在服务器启动前也会提交任务）
+        input_service(log=self.log)
         self.use_copy_paste = tk.BooleanVar(value=False)
         self.config_manager = ConfigManager()
         self.show_log_var = tk.BooleanVar(value=False)  # 默认不显示日志
@@ -143,6 +148,23 @@ class OJGUI:
         self.log(f"初始语言设置为: {self.selected_language.get().upper()}")
         self.status_var.set("界面已就绪，正在加载模型列表...")
         self.load_models(async_load=True)
+        self.root.after(1000, self._calibrate_input_backends)
+
+    def _calibrate_input_backends(self):
+        """首次在本环境运行时测量各输入后端（见 gui/input_calibration.py），之后输入使用最快且准确的后端"""
+        try:
+            calibration = calibrate_if_needed(self.root, self.config_manager, log=self.log)
+        except Exception as e:
+            self.log(f"输入后端校准失败: {e}")
+            return
+        if calibration is None:
+            return
+        assistant = getattr(self.server_manager, 'assistant', None)
+        if assistant is not None:
+            assistant.input_simulator.use_calibration(calibration)
+        dialog = self.remote_assist_dialog
+        if dialog is not None and dialog.input_simulator is not None:
+            dialog.input_simulator.use_calibration(calibration)
 
     def _reset_grid_weights(self, frame, max_columns=6):
         for index in range(max_columns):
@@ -1223,9 +1245,8 @@ class OJGUI:
 
         if server_was_running:
             self.log("检测到服务器正在运行，正在停止服务器以切换模型...")
-            self.stop_server()
-            # 等待服务器完全停止
-            time.sleep(0.5)
+            # 不等待旧服务器停止：进行中的生成立即取消，重启后由任务队列用新模型继续
+            self.stop_server(grace=0.2)
 
         selected_model_name = self.selected_model.get()
 
@@ -1281,8 +1302,8 @@ class OJGUI:
             # 如果服务器之前是运行状态，尝试重新启动
             if server_was_running:
                 self.log("模型已切换，正在尝试重新启动服务器...")
-                # 延迟一点时间确保UI更新
-                self.root.after(100, self._restart_server_after_model_change)
+                # 界面更新后立即重启；新服务器在后台等旧服务器释放端口后再监听
+                self.root.after_idle(self._restart_server_after_model_change)
         else:
             self.model_info_var.set("请选择有效的模型")
             self.log("请选择有效的模型")
@@ -1951,13 +1972,12 @@ class OJGUI:
                 messagebox.showwarning("检查中", "请等待会员状态检查完成后再启动服务器")
                 return False
 
-        # 检查服务器是否已经在运行，如果是，先关闭
+        # 检查服务器是否已经在运行，如果是，先关闭（新服务器在后台线程中等它停止，不阻塞界面）
+        previous_stopped = None
         if self.server_manager is not None:
             self.log("检测到服务器已在运行，正在停止现有服务器...")
-            self.stop_server()
-            # 等待服务器完全停止
-            time.sleep(0.1)
-            self.log("现有服务器已停止，准备启动新服务器")
+            previous_stopped = self.stop_server()
+            self.log("新服务器将在现有服务器停止后启动")
 
         try:
             # 传递模型信息给ServerManager
@@ -1969,7 +1989,7 @@ class OJGUI:
                     'api_key': self.model_api_key
                 }
             )
-            if self.server_manager.start():
+            if self.server_manager.start(wait_for=previous_stopped):
                 self.start_button.config(state="disabled")
                 self.stop_button.config(state="normal")
                 self.server_status_var.set("服务器状态: 启动中...")
@@ -1988,10 +2008,14 @@ class OJGUI:
             self.status_var.set("启动服务器失败")
             return False
 
-    def stop_server(self):
-        """停止WebSocket服务器"""
+    def stop_server(self, grace=None):
+        """
+        停止WebSocket服务器（立即返回）
+        :param grace: 等待进行中请求的秒数，默认使用配置
+        :return: 服务器完全停止后完成的 Future，没有服务器时为 None
+        """
         if self.server_manager:
-            self.server_manager.stop()
+            stopped = self.server_manager.stop(grace)
             # 根据会员状态和模型类型决定是否启用启动按钮
             current_model = self.selected_model.get()
             if current_model and current_model in self.model_info:
@@ -2011,6 +2035,8 @@ class OJGUI:
             self.server_status_var.set("服务器状态: 停止中...")
             self.status_var.set("服务器停止中...")
             self.log("正在停止服务器...")
+            return stopped
+        return None
 
     def log(self, message):
         """添加日志消息"""
@@ -2051,8 +2077,8 @@ class OJGUI:
             return
 
         if self.server_manager:
-            self.server_manager.stop()
-            time.sleep(0.1)  # 给服务器停止一点时间
+            # 退出前等待服务器停止（停止后立即返回，最多1秒）
+            concurrent.futures.wait([self.server_manager.stop(grace=0.5)], timeout=1)
 
         # 清理托盘图标
         if self.tray_icon:
@@ -18,6 +18,11 @@ import qrcode
 import websockets
 from PIL import ImageTk
 
+from utils.input_plan import InputPlan
+from utils.input_service import PRIORITY_USER, InputQueueFull, input_service
+from utils.input_simulator import InputSimulator
+from utils.keystroke_planner import verbatim_actions
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -52,10 +57,11 @@ class RemoteAssistDialog:
         # 自动输入相关变量
         self.auto_input_enabled = tk.BooleanVar(value=True)  # 默认启用自动输入
         self.auto_input_delay = tk.DoubleVar(value=0)  # 等待时间
-        self.auto_input_interval = tk.DoubleVar(value=0.001)  # 字符间隔
+        self.auto_input_interval = tk.DoubleVar(value=0.001)  # 每段（约50个按键）输入后的间隔
         self.auto_input_special = tk.BooleanVar(value=True)  # 特殊字符处理
         self.auto_input_running = False
         self.stop_requested = False  # ESC键停止标志
+        self.input_simulator = None  # 自动输入使用的输入模拟器（utils.input_simulator）
 
         # 截图相关变量
         self.screenshot_enabled = tk.BooleanVar(value=True)  # 默认启用截图快捷键
@@ -296,7 +302,7 @@ class RemoteAssistDialog:
             width=8
         ).pack(side=tk.LEFT, padx=(0, 10))
 
-        ttk.Label(params_frame, text="字符间隔(秒)").pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Label(params_frame, text="输入间隔(秒)").pack(side=tk.LEFT, padx=(0, 5))
         ttk.Spinbox(
             params_frame,
             from_=0.01,
@@ -513,42 +519,19 @@ class RemoteAssistDialog:
         self.dialog.after(0, add)
 
     def _auto_input_message(self, message: str):
-        """自动输入消息"""
-        if self.auto_input_running:
-            return
-
-        threading.Thread(
-            target=self._run_auto_input,
-            args=(message,),
-            daemon=True
-        ).start()
+        """自动输入消息：提交到输入服务，多条消息按到达顺序依次输入"""
+        try:
+            input_service().submit(lambda token: self._run_auto_input(message, token),
+                                   PRIORITY_USER, name='remote_assist', owner=self)
+        except InputQueueFull:
+            self._add_message("输入任务过多，本条消息未自动输入", is_info=True)
 
-    def _run_auto_input(self, message: str):
-        """执行自动输入"""
+    def _run_auto_input(self, message: str, token=None):
+        """执行自动输入（在输入服务的工作线程中）：消息一次性编译为输入计划，由输入模拟器逐段执行"""
         self.auto_input_running = True
         self.stop_requested = False
-
-        esc_hook = None
-        try:
-            esc_hook = keyboard.on_press_key('esc', self._stop_auto_input_handler)
-        except Exception as e:
-            self.dialog.after(0, lambda: self._add_message(
-                f"ESC全局监听不可用，将继续输入但无法ESC停止: {e}", is_info=True
-            ))
-
-        def safe_write(char):
-            try:
-                keyboard.write(char)
-            except Exception:
-                pyautogui.write(char, interval=0)
-
-        def safe_press(key):
-            try:
-                keyboard.press_and_release(key)
-                return
-            except Exception:
-                pass
-            pyautogui.press(key)
+        if token is not None:
+            token.on_cancel(lambda reason: self._stop_auto_input_handler(None))
 
         try:
             # 等待用户切换到目标窗口
@@ -559,53 +542,24 @@ class RemoteAssistDialog:
                         break
                     time.sleep(0.1)
 
-            # 输入消息（只输入纯文本，不包含时间信息）
+            # 输入消息（只输入纯文本，不包含时间信息）：特殊字符处理时换行按回车键输入，否则整段按原文输入
+            if self.auto_input_special.get():
+                plan = InputPlan(verbatim_actions(message), code=message)
+            else:
+                plan = InputPlan([('type', message)], code=message)
             interval = self.auto_input_interval.get()
-            special_chars = self.auto_input_special.get()
 
-            if special_chars:
-                # 处理特殊字符
-                for char in message:
-                    if self.stop_requested:
-                        break
+            completed = False
+            if not self.stop_requested:
+                # ESC 由输入模拟器监听；停止按钮与关闭窗口通过取消令牌在下一个动作前停止
+                completed = self._input_simulator().type_plan(
+                    plan, focus=False, on_segment=lambda index, total: time.sleep(interval)
+                )
 
-                    try:
-                        if char == '\n':
-                            safe_press('enter')
-                        elif char == '\t':
-                            safe_press('tab')
-                        elif char == ' ':
-                            safe_press('space')
-                        elif len(char) == 1 and ord(char) < 128:
-                            safe_write(char)
-                        else:
-                            safe_write(char)
-
-                        time.sleep(interval)
-                    except Exception as e:
-                        self.dialog.after(0, lambda: self._add_message(
-                            f"输入字符出错: {repr(char)} - {str(e)}", is_info=True
-                        ))
-                        time.sleep(interval)
+            if completed:
+                self.dialog.after(0, lambda: self._add_message("自动输入完成", is_info=True))
             else:
-                # 简单输入
-                for char in message:
-                    if self.stop_requested:
-                        break
-
-                    try:
-                        safe_write(char)
-                        time.sleep(interval)
-                    except Exception as e:
-                        self.dialog.after(0, lambda: self._add_message(
-                            f"输入字符出错: {char} - {str(e)}", is_info=True
-                        ))
-                        time.sleep(interval)
-
-            if self.stop_requested:
                 self.dialog.after(0, lambda: self._add_message("自动输入已停止", is_info=True))
-            else:
-                self.dialog.after(0, lambda: self._add_message("自动输入完成", is_info=True))
 
         except Exception as e:
             self.dialog.after(0, lambda: self._add_message(
@@ -613,12 +567,18 @@ class RemoteAssistDialog:
             ))
         finally:
             self.auto_input_running = False
-            # 仅移除本次自动输入注册的ESC监听，避免影响其他热键
-            if esc_hook is not None:
-                try:
-                    keyboard.unhook(esc_hook)
-                except Exception:
-                    pass
+
+    def _input_simulator(self):
+        """
+        远程协助自动输入使用的输入模拟器：服务器运行时与解题输入共用（已打开按校准结果选出的后端），
+        否则首次输入时创建本窗口自己的模拟器，同样按校准结果选择最快且准确的后端（utils/input_backends.py）
+        """
+        assistant = getattr(getattr(self.main_window, 'server_manager', None), 'assistant', None)
+        if assistant is not None:
+            return assistant.input_simulator
+        if self.input_simulator is None:
+            self.input_simulator = InputSimulator(self.main_window)
+        return self.input_simulator
 
     def _stop_auto_input_handler(self, event):
         """ESC键处理函数"""
@@ -800,14 +760,22 @@ class RemoteAssistDialog:
         self._add_message(f"自动输入已{status} (按ESC键停止)", is_info=True)
 
     def stop_auto_input(self):
-        """停止自动输入"""
+        """停止自动输入，并丢弃排队中的消息"""
         self.stop_requested = True
         self.auto_input_running = False
+        input_service().cancel_owner(self, "远程协助窗口停止自动输入")
 
     def on_closing(self):
         """窗口关闭处理"""
         # 停止自动输入
         self.stop_auto_input()
+        if self.input_simulator is not None:
+            # 在输入服务中释放输入后端，等正在停止的输入结束后再关闭
+            simulator, self.input_simulator = self.input_simulator, None
+            try:
+                input_service().submit(lambda token: simulator.close(), PRIORITY_USER, name='remote_assist_close')
+            except (InputQueueFull, RuntimeError):
+                pass
 
         # 注销截图快捷键
         if self.screenshot_hotkey_registered:
@@ -12,16 +12,23 @@ from utils.crypto import crypto_manager
 
 
 class ConfigManager:
-    def __init__(self):
+    def __init__(self, config_file=None, data_dir=None):
+        """
+        :param config_file: 指定配置文件（无头模式），默认为数据目录下的 config.ini
+        :param data_dir: 指定数据目录，默认为 AppData/OJAssistant；指定了配置文件时默认为其所在目录
+        """
         # 获取 AppData 目录
         self.appdata_dir = self._get_appdata_dir()
 
         # 确保数据目录存在
-        self.data_dir = os.path.join(self.appdata_dir, "OJAssistant")
+        if data_dir is None:
+            data_dir = os.path.dirname(os.path.abspath(config_file)) if config_file \
+                else os.path.join(self.appdata_dir, "OJAssistant")
+        self.data_dir = data_dir
         os.makedirs(self.data_dir, exist_ok=True)
 
         # 文件路径
-        self.config_file = os.path.join(self.data_dir, 'config.ini')
+        self.config_file = os.path.abspath(config_file) if config_file else os.path.join(self.data_dir, 'config.ini')
         self.credentials_file = os.path.join(self.data_dir, 'credentials.bin')
         self.session_file = os.path.join(self.data_dir, 'session.bin')
         self.machine_id_file = os.path.join(self.data_dir, 'machine_id.bin')
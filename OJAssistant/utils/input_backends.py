@@ -0,0 +1,403 @@
+"""
+输入后端注册表与校准结果
+后端:
+- xtest: 持久 X 连接发送按键（Linux，见 utils/x11_input.py）
+- xdotool: 每次调用启动一个 xdotool 进程（Linux）
+- keyboard: keyboard 库（Windows / macOS；Linux 下需要 root）
+- pyautogui: PyAutoGUI（只能输入 ASCII）
+- tk_clipboard: 由本进程的 Tk 根窗口持有剪贴板并直接提供内容，再按 Ctrl+V 粘贴（用于 paste 输入方式）
+- clipboard: 用 pyperclip 复制到剪贴板后按 Ctrl+V 粘贴（Linux 下每次启动 xclip/xsel，没有 Tk 根窗口时使用）
+校准（gui/input_calibration.py）在本地的捕获窗口中逐个测量各后端的速度与准确性，
+结果按运行环境保存到数据目录的 input_backends.json；InputSimulator 使用最快且准确的逐键后端。
+"""
+import json
+import os
+import platform
+import shutil
+import subprocess
+import threading
+import time
+
+from utils.x11_input import KEY_NAMES, XTestKeyboard
+
+try:
+    import keyboard
+except Exception:  # Linux 下非 root 用户导入会失败
+    keyboard = None
+
+try:
+    import pyautogui
+except Exception:  # 没有图形会话时无法导入
+    pyautogui = None
+
+try:
+    import pyperclip
+except ImportError:
+    pyperclip = None
+
+try:
+    import tkinter as tk
+except ImportError:
+    tk = None
+
+# 没有校准结果时的尝试顺序（与原先按平台固定的顺序一致）
+DEFAULT_ORDER = {
+    'Linux': ('xtest', 'xdotool', 'keyboard', 'pyautogui'),
+    'default': ('keyboard', 'pyautogui'),
+}
+
+
+class InputBackend:
+    """逐键输入后端：write 输入一段文本，key 按键或组合键（enter、ctrl+a 等）"""
+    name = ''
+    kind = 'keys'
+    # 回车后的等待：每次按键是独立调用的后端需要给编辑器留出处理时间
+    newline_delay = 0.05
+
+    def __init__(self, setting):
+        """
+        :param setting: 读取 [INPUT] 配置的函数 setting(key, default)；后端不可用时抛出 RuntimeError
+        """
+        self.setting = setting
+
+    def write(self, text):
+        raise NotImplementedError
+
+    def key(self, name):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class XTestBackend(InputBackend):
+    name = 'xtest'
+
+    def __init__(self, setting):
+        super().__init__(setting)
+        if os.getenv("XDG_SESSION_TYPE", "").lower() == "wayland" or not os.getenv("DISPLAY"):
+            raise RuntimeError("没有可用的 X11 会话")
+        self.keyboard = XTestKeyboard(key_delay=float(setting('x11_key_delay_ms', '1')) / 1000.0)
+        # XTest 事件按序进入同一连接，不需要额外等待
+        self.newline_delay = float(setting('x11_newline_delay_ms', '0')) / 1000.0
+
+    def write(self, text):
+        self.keyboard.type_text(text)
+
+    def key(self, name):
+        self.keyboard.press_key(name)
+
+    def close(self):
+        self.keyboard.close()
+
+
+class XdotoolBackend(InputBackend):
+    name = 'xdotool'
+
+    def __init__(self, setting):
+        super().__init__(setting)
+        self.path = shutil.which("xdotool")
+        if not self.path:
+            raise RuntimeError("未安装xdotool")
+
+    def write(self, text):
+        subprocess.run(
+            [self.path, "type", "--clearmodifiers", "--delay", "1", "--", text],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+
+    def key(self, name):
+        xdotool_key = '+'.join(KEY_NAMES.get(part.lower(), part) for part in name.split('+'))
+        subprocess.run(
+            [self.path, "key", "--clearmodifiers", xdotool_key],
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+
+
+class KeyboardBackend(InputBackend):
+    name = 'keyboard'
+
+    def __init__(self, setting):
+        super().__init__(setting)
+        if keyboard is None:
+            raise RuntimeError("keyboard 库不可用")
+
+    def write(self, text):
+        keyboard.write(text)
+
+    def key(self, name):
+        keyboard.press_and_release(name)
+
+
+class PyAutoGUIBackend(InputBackend):
+    name = 'pyautogui'
+
+    def __init__(self, setting):
+        super().__init__(setting)
+        if pyautogui is None:
+            raise RuntimeError("PyAutoGUI 不可用")
+
+    def write(self, text):
+        pyautogui.write(text, interval=0)
+
+    def key(self, name):
+        if '+' in name:
+            pyautogui.hotkey(*name.split('+'))
+        else:
+            pyautogui.press(name)
+
+
+class ClipboardBackend(InputBackend):
+    """复制到剪贴板后粘贴；按键交给逐键后端"""
+    name = 'clipboard'
+    kind = 'paste'
+
+    def __init__(self, setting, key_backend, root=None):
+        super().__init__(setting)
+        if pyperclip is None:
+            raise RuntimeError("pyperclip 不可用")
+        self.key_backend = key_backend
+
+    def write(self, text):
+        pyperclip.copy(text)
+        time.sleep(0.05)
+        self.key_backend.key('ctrl+v')
+        time.sleep(0.05)
+
+    def key(self, name):
+        self.key_backend.key(name)
+
+
+class TkClipboardBackend(InputBackend):
+    """
+    由本进程的 Tk 根窗口持有剪贴板：确认取得剪贴板后按 Ctrl+V，
+    X11 下等到编辑器读取完内容（selection_handle 被调用）再把剪贴板恢复为原来的文本，不做固定等待
+    """
+    name = 'tk_clipboard'
+    kind = 'paste'
+
+    def __init__(self, setting, key_backend, root=None):
+        super().__init__(setting)
+        if tk is None or not isinstance(root, tk.Misc):
+            raise RuntimeError("没有可用的 Tk 根窗口")
+        self.key_backend = key_backend
+        self.root = root
+        self.text = ''
+        self.served = threading.Event()
+        self.x11 = self._call(lambda: root.tk.call('tk', 'windowingsystem')) == 'x11'
+        # 编辑器读取剪贴板的最长等待；非 X11 下无法得知何时读取完，按 Ctrl+V 后等待这么久再恢复
+        self.serve_timeout = float(setting('clipboard_serve_timeout_ms', '1000')) / 1000.0
+        self.restore_delay = float(setting('clipboard_restore_delay_ms', '100')) / 1000.0
+
+    def write(self, text):
+        self.text = text
+        self.served.clear()
+        previous = self._call(self._take)
+        try:
+            self.key_backend.key('ctrl+v')
+            if not self.x11:
+                time.sleep(self.restore_delay)
+            elif not self._wait_served():
+                raise RuntimeError("粘贴目标没有读取剪贴板")
+        finally:
+            self._call(self._restore, previous)
+
+    def key(self, name):
+        self.key_backend.key(name)
+
+    def _take(self):
+        """在 Tk 线程中：记下原来的剪贴板文本，取得剪贴板并确认"""
+        try:
+            previous = self.root.clipboard_get()
+        except tk.TclError:
+            previous = None  # 剪贴板为空或不是文本，无法恢复
+        if self.x11:
+            self.root.selection_handle(self._serve, selection='CLIPBOARD')
+            self.root.selection_own(selection='CLIPBOARD')
+            try:
+                owner = self.root.selection_own_get(selection='CLIPBOARD')
+            except (tk.TclError, KeyError):
+                owner = None
+            if owner is None or str(owner) != str(self.root):
+                raise RuntimeError("未能取得剪贴板")
+        else:
+            self.root.clipboard_clear()
+            self.root.clipboard_append(self.text)
+            if self.root.clipboard_get() != self.text:
+                raise RuntimeError("写入剪贴板后读回的内容不一致")
+        return previous
+
+    def _serve(self, offset, length):
+        """
+        编辑器读取剪贴板时由 Tk 调用，分段返回内容
+        offset 是字符偏移，length 是本段最多可放的字节数：Tk 把返回值截断到 length 字节，
+        下次从截断处的字符继续请求；返回不足 length 字节即为最后一段（Tk 也据此结束传输）
+        """
+        offset, length = int(offset), int(length)
+        chunk = self.text[offset:offset + length]
+        if len(chunk.encode('utf-8')) < length:
+            self.served.set()
+        return chunk
+
+    def _restore(self, previous):
+        self.root.clipboard_clear()
+        if previous is not None:
+            self.root.clipboard_append(previous)
+
+    def _wait_served(self):
+        if threading.current_thread() is not threading.main_thread():
+            return self.served.wait(self.serve_timeout)
+        # 在 Tk 线程中（如启动校准）需要自己处理事件，选择请求才会被响应
+        deadline = time.monotonic() + self.serve_timeout
+        while not self.served.is_set() and time.monotonic() < deadline:
+            self.root.update()
+            time.sleep(0.001)
+        return self.served.is_set()
+
+    def _call(self, func, *args):
+        """在 Tk 线程中执行并返回结果；从其他线程调用时通过 after 交给 Tk 线程"""
+        if threading.current_thread() is threading.main_thread():
+            return func(*args)
+        done = threading.Event()
+        outcome = {}
+
+        def run():
+            try:
+                outcome['result'] = func(*args)
+            except Exception as e:
+                outcome['error'] = e
+            done.set()
+
+        self.root.after(0, run)
+        if not done.wait(2.0):
+            raise RuntimeError("Tk 主线程没有响应")
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome.get('result')
+
+
+BACKENDS = {
+    'xtest': XTestBackend,
+    'xdotool': XdotoolBackend,
+    'keyboard': KeyboardBackend,
+    'pyautogui': PyAutoGUIBackend,
+    'tk_clipboard': TkClipboardBackend,
+    'clipboard': ClipboardBackend,
+}
+
+
+def default_order():
+    """本平台逐键后端的默认顺序"""
+    return DEFAULT_ORDER.get(platform.system(), DEFAULT_ORDER['default'])
+
+
+def paste_order():
+    """粘贴后端的尝试顺序"""
+    return [name for name, backend_class in BACKENDS.items() if backend_class.kind == 'paste']
+
+
+def open_backend(name, setting, key_backend=None, root=None):
+    """
+    创建后端；不可用时抛出 RuntimeError（或导入、连接相关的异常）
+    :param key_backend: 粘贴后端用来按 Ctrl+V 的逐键后端
+    :param root: Tk 根窗口，tk_clipboard 用它持有剪贴板
+    """
+    backend_class = BACKENDS[name]
+    if backend_class.kind == 'paste':
+        return backend_class(setting, key_backend, root)
+    return backend_class(setting)
+
+
+def environment_fingerprint():
+    """校准结果对应的运行环境：平台与图形会话，变化后需要重新校准"""
+    return '|'.join((
+        platform.system(),
+        platform.release(),
+        os.getenv("XDG_SESSION_TYPE", ""),
+        'display' if os.getenv("DISPLAY") else '',
+    ))
+
+
+class BackendCalibration:
+    def __init__(self, path=None, max_age=30 * 24 * 3600, log=None):
+        """
+        校准结果
+        :param path: JSON 文件路径，None 表示只保存在内存中
+        :param max_age: 结果的有效期（秒），过期或运行环境变化后需要重新校准
+        """
+        self.path = path
+        self.max_age = max_age
+        self.log = log or print
+        self.lock = threading.Lock()
+        self.data = self._load()
+
+    @classmethod
+    def from_config(cls, config_manager, log=None):
+        """根据配置文件 [INPUT] 创建"""
+        path = os.path.join(config_manager.get_data_dir(), 'input_backends.json')
+        max_age_days = float(config_manager.get_setting('calibration_ttl_days', '30', 'INPUT'))
+        return cls(path, max_age=max_age_days * 24 * 3600, log=log)
+
+    def is_fresh(self):
+        """是否有本运行环境下、仍在有效期内的校准结果"""
+        data = self.data
+        return bool(data) and data.get('fingerprint') == environment_fingerprint() \
+            and time.time() - data.get('measured_at', 0) < self.max_age
+
+    def results(self):
+        return self.data.get('results', {}) if self.is_fresh() else {}
+
+    def ranking(self):
+        """准确的逐键后端按速度从快到慢；没有有效结果时返回 None"""
+        results = self.results()
+        if not results:
+            return None
+        accurate = [name for name, result in results.items()
+                    if result.get('ok') and BACKENDS.get(name) is not None and BACKENDS[name].kind == 'keys']
+        return sorted(accurate, key=lambda name: -results[name].get('chars_per_s', 0))
+
+    def is_accurate(self, name):
+        """后端在校准中是否准确；没有校准结果时返回 None"""
+        result = self.results().get(name)
+        return None if result is None else bool(result.get('ok'))
+
+    def save(self, results):
+        """
+        保存一次校准
+        :param results: 后端名 -> {'ok', 'accuracy', 'chars_per_s', 'elapsed_ms', 'error'}
+        """
+        with self.lock:
+            self.data = {
+                'fingerprint': environment_fingerprint(),
+                'measured_at': time.time(),
+                'results': results,
+            }
+            self._save()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError) as e:
+            self.log(f"读取输入后端校准结果失败，将重新校准: {e}")
+            return {}
+
+    def _save(self):
+        if not self.path:
+            return
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=1)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            self.log(f"保存输入后端校准结果失败: {e}")
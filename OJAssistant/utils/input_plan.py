@@ -0,0 +1,192 @@
+"""
+输入计划与执行器
+代码在输入前一次性编译为扁平的动作列表（InputPlan），执行器按顺序消费，规划与键盘 I/O 分离：
+    ('type', 文本)  连续输入一段文本
+    ('key', 按键名) 按一次键或组合键（enter、end、ctrl+shift+end 等）
+InputSimulator 使用真实键盘的执行器；RecordingExecutor 只记录动作、NullExecutor 只计数，
+用于在没有图形会话的机器上测试与压测规划和执行流程（InputSimulator(gui, executor=RecordingExecutor())）。
+计划记录已执行（提交）的动作数 committed：输入被 ESC、取消或异常中断后，可以从该位置继续，不必清空编辑器重输。
+纠错时可用 compile_edit 编译只修改变化行的计划（base 为编辑器中已有的代码），不清空编辑器。
+"""
+import time
+
+from utils.keystroke_planner import EditorModel, KeystrokePlanner, count_keystrokes, plan_edit, replay, same_code
+
+# 进度分段：约每输入这么多按键汇报一次进度、检查一次 ESC（与原来每 50 字符一块相同）
+SEGMENT_KEYSTROKES = 50
+
+
+class InputPlan:
+    """一次输入的完整动作序列"""
+    __slots__ = ('actions', 'profile', 'language', 'keystrokes', 'verbatim_keystrokes', 'compile_ms', 'committed',
+                 'code', 'base')
+
+    def __init__(self, actions, profile='verbatim', language=None, verbatim_keystrokes=None, compile_ms=0.0, code=None,
+                 base=None):
+        self.actions = actions
+        self.profile = profile
+        self.language = language
+        self.keystrokes = count_keystrokes(actions)
+        self.verbatim_keystrokes = self.keystrokes if verbatim_keystrokes is None else verbatim_keystrokes
+        self.compile_ms = compile_ms
+        self.committed = 0  # 已执行的动作数
+        self.code = code  # 编译前的代码，续输入时用于确认仍是同一段代码
+        self.base = base  # 计划修改的编辑器中已有的代码；None 表示先清空编辑器再输入
+
+    @classmethod
+    def compile(cls, code, profile='verbatim', language=None):
+        """
+        编译整段代码
+        :param code: 要输入的代码；与原来的分块输入一致，末尾补一个换行
+        :param profile: 编辑器配置名（见 utils/keystroke_planner.py）
+        """
+        started = time.perf_counter()
+        planner = KeystrokePlanner(profile, language)
+        text = code if code.endswith('\n') else code + '\n'
+        actions = planner.feed(text)
+        actions.extend(planner.finish())
+        return cls(actions, planner.profile.name, language, planner.stats['verbatim_keystrokes'],
+                   (time.perf_counter() - started) * 1000, code)
+
+    @classmethod
+    def compile_edit(cls, base, code, profile='verbatim', language=None):
+        """
+        编译把编辑器中的 base 改为 code 的计划，只删除并重新输入变化的行
+        verbatim_keystrokes 为清空后整段输入所需的按键数
+        :return: InputPlan；模型执行结果与 code 不一致或不比整段输入省按键时返回 None
+        """
+        started = time.perf_counter()
+        text = code if code.endswith('\n') else code + '\n'
+        full = cls.compile(code, profile, language)
+        actions = plan_edit(base, text, full.profile, language)
+        if not same_code(text, replay(actions, full.profile, language, base), language):
+            return None
+        # 整段输入前还要全选并删除
+        if count_keystrokes(actions) >= full.keystrokes + 2:
+            return None
+        return cls(actions, full.profile, language, full.keystrokes + 2, (time.perf_counter() - started) * 1000, code,
+                   base)
+
+    def __len__(self):
+        return len(self.actions)
+
+    @property
+    def finished(self):
+        return self.committed >= len(self.actions)
+
+    def commit(self, count):
+        """记录又执行了 count 个动作"""
+        self.committed = min(len(self.actions), self.committed + count)
+
+    def committed_chars(self):
+        """已提交的动作输入到的代码位置（字符偏移），即编辑器模型中光标之前的文本长度"""
+        model = EditorModel(self.profile, self.language)
+        model.after = (self.base or '').replace('\r\n', '\n')
+        for action in self.actions[:self.committed]:
+            model.apply(action)
+        return len(model.before)
+
+    def segments(self, size=SEGMENT_KEYSTROKES):
+        """把尚未提交的动作按行切分为若干段，每段约 size 个按键；段内不拆开一行"""
+        segments = []
+        current = []
+        count = 0
+        for action in self.actions[self.committed:]:
+            kind, value = action
+            if current and count >= size and kind == 'key' and value in ('enter', 'down'):
+                segments.append(current)
+                current = []
+                count = 0
+            current.append(action)
+            count += len(value) if kind == 'type' else 1
+        if current:
+            segments.append(current)
+        return segments
+
+    def result(self):
+        """按编辑器模型执行计划后编辑器中的文本"""
+        return replay(self.actions, self.profile, self.language, self.base or '')
+
+    def describe(self):
+        saved = 1 - self.keystrokes / self.verbatim_keystrokes if self.verbatim_keystrokes else 0.0
+        return {
+            'profile': self.profile,
+            'actions': len(self.actions),
+            'keystrokes': self.keystrokes,
+            'verbatim_keystrokes': self.verbatim_keystrokes,
+            'saved': round(saved, 3),
+            'compile_ms': round(self.compile_ms, 2),
+        }
+
+
+class Executor:
+    """执行器：逐个消费动作，子类实现 write / key"""
+    # 是否操作真实键盘；非真实执行器跳过环境检查、聚焦点击与 ESC 监听
+    live = False
+
+    def __init__(self):
+        self.stats = {'writes': 0, 'keys': 0, 'chars': 0}
+        # 最近一次 execute 完整执行的动作数；动作抛出异常时不计入该动作
+        self.done = 0
+
+    def execute(self, actions, should_stop=None):
+        """
+        按顺序执行动作
+        :param should_stop: 每个动作前调用，返回 True 时停止（用于 ESC 中止）
+        :return: 已执行的动作数
+        """
+        for index, (kind, value) in enumerate(actions):
+            self.done = index
+            if should_stop is not None and should_stop():
+                return index
+            if kind == 'type':
+                self.write(value)
+                self.stats['writes'] += 1
+                self.stats['chars'] += len(value)
+            else:
+                self.key(value)
+                self.stats['keys'] += 1
+        self.done = len(actions)
+        return len(actions)
+
+    def write(self, text):
+        raise NotImplementedError
+
+    def key(self, name):
+        raise NotImplementedError
+
+
+class NullExecutor(Executor):
+    """不做任何输入，只统计"""
+
+    def write(self, text):
+        pass
+
+    def key(self, name):
+        pass
+
+
+class RecordingExecutor(Executor):
+    """记录执行的动作及其时间，可按编辑器模型还原编辑器中的文本"""
+
+    def __init__(self):
+        super().__init__()
+        self.actions = []
+        self.timestamps = []
+
+    def write(self, text):
+        self._record(('type', text))
+
+    def key(self, name):
+        self._record(('key', name))
+
+    def text(self, profile='verbatim', language=None):
+        return replay(self.actions, profile, language)
+
+    def clear(self):
+        self.actions.clear()
+        self.timestamps.clear()
+
+    def _record(self, action):
+        self.actions.append(action)
+        self.timestamps.append(time.perf_counter())
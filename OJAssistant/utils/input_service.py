@@ -0,0 +1,231 @@
+"""
+键盘输入服务
+模拟键盘输入作用于同一个系统焦点，所有输入（扩展解题、远程协助、输入测试）都提交到这里，
+由唯一的工作线程按优先级、同优先级先进先出依次执行，Tk 主线程与 asyncio 线程不再直接输入。
+- 每个任务是一次完整的输入（例如一整段代码），任务之间不会交错
+- 任务带取消令牌：排队中的任务直接丢弃，执行中的任务在下一个动作前停止（InputSimulator 会检查 current_token）
+- 排队任务数有上限，超出时 submit 抛出 InputQueueFull，由提交方告知用户稍后重试
+"""
+import asyncio
+import concurrent.futures
+import itertools
+import queue
+import threading
+import time
+
+# 数值越小越先执行
+PRIORITY_USER = 0      # 用户在本机界面上手动发起的输入（输入测试、远程协助窗口）
+PRIORITY_SOLVE = 10    # 扩展解题后的代码输入
+PRIORITY_REMOTE = 20   # 手机端远程发送的文本
+
+DEFAULT_MAX_PENDING = 16
+
+
+class InputQueueFull(RuntimeError):
+    """排队的输入任务已达上限"""
+
+
+class CancelToken:
+    __slots__ = ('cancelled', 'reason', 'callbacks', 'lock')
+
+    def __init__(self):
+        self.cancelled = False
+        self.reason = ''
+        self.callbacks = []
+        self.lock = threading.Lock()
+
+    def cancel(self, reason=''):
+        """取消任务；可在任意线程调用，回调在调用线程中执行"""
+        with self.lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            self.reason = reason
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            try:
+                callback(reason)
+            except Exception:
+                pass
+
+    def on_cancel(self, callback):
+        """注册取消时的回调 callback(reason)；已取消时立即调用"""
+        with self.lock:
+            if not self.cancelled:
+                self.callbacks.append(callback)
+                return
+        callback(self.reason)
+
+    def __bool__(self):
+        return self.cancelled
+
+
+class InputJob:
+    __slots__ = ('job_id', 'func', 'priority', 'name', 'owner', 'token', 'future', 'submitted_at', 'started_at')
+
+    def __init__(self, job_id, func, priority, name, owner):
+        self.job_id = job_id
+        self.func = func
+        self.priority = priority
+        self.name = name
+        self.owner = owner
+        self.token = CancelToken()
+        self.future = concurrent.futures.Future()
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+
+    def cancel(self, reason=''):
+        """只设置取消令牌；需要同时移出队列时用 InputService.cancel"""
+        self.token.cancel(reason)
+
+    @property
+    def wait_ms(self):
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return int((end - self.submitted_at) * 1000)
+
+
+_current = threading.local()
+
+
+def current_token():
+    """当前线程正在执行的输入任务的取消令牌；不在任务中时返回 None"""
+    return getattr(_current, 'token', None)
+
+
+class InputService:
+    def __init__(self, max_pending=DEFAULT_MAX_PENDING, log=None):
+        """
+        初始化输入服务
+        :param max_pending: 最多排队（不含正在执行）的任务数
+        :param log: 日志函数
+        """
+        self.max_pending = max_pending
+        self.log = log or print
+        self.queue = queue.PriorityQueue()
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.active = None
+        self.closed = False
+        self.stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'cancelled': 0, 'rejected': 0, 'max_wait_ms': 0}
+        self.worker = threading.Thread(target=self._run, name='input-service', daemon=True)
+        self.worker.start()
+
+    def submit(self, func, priority=PRIORITY_SOLVE, name='', owner=None):
+        """
+        提交一次输入
+        :param func: 在工作线程中调用 func(token)，返回值作为任务结果
+        :param owner: 提交方，用于 cancel_owner
+        :return: InputJob，结果通过 job.future 获取
+        """
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("输入服务已关闭")
+            if len(self.pending) >= self.max_pending:
+                self.stats['rejected'] += 1
+                raise InputQueueFull(f"排队的输入任务已达上限（{self.max_pending}）")
+            job_id = next(self.sequence)
+            job = InputJob(job_id, func, priority, name, owner)
+            self.pending[job_id] = job
+            self.stats['submitted'] += 1
+        self.queue.put((priority, job_id, job))
+        return job
+
+    async def run(self, func, priority=PRIORITY_SOLVE, name='', owner=None):
+        """在 asyncio 中提交并等待结果；任务在排队中被取消时返回 None，等待方被取消时同时取消任务"""
+        job = self.submit(func, priority, name, owner)
+        done = asyncio.wrap_future(job.future)
+        try:
+            await asyncio.wait({done})
+        except asyncio.CancelledError:
+            self.cancel(job, '等待方已取消')
+            raise
+        return None if done.cancelled() else done.result()
+
+    def cancel(self, job, reason=''):
+        """取消任务：排队中的立即移出队列，执行中的在下一个动作前停止"""
+        with self.lock:
+            queued = self.pending.pop(job.job_id, None) is not None
+            if queued:
+                self.stats['cancelled'] += 1
+        job.cancel(reason)
+        if queued:
+            job.future.cancel()
+
+    def cancel_owner(self, owner, reason=''):
+        """取消某个提交方排队中与正在执行的全部任务，返回取消的任务数"""
+        with self.lock:
+            jobs = [job for job in self.pending.values() if job.owner is owner]
+            if self.active is not None and self.active.owner is owner:
+                jobs.append(self.active)
+        for job in jobs:
+            self.cancel(job, reason)
+        return len(jobs)
+
+    def is_worker_thread(self):
+        return threading.current_thread() is self.worker
+
+    @property
+    def busy(self):
+        return self.active is not None
+
+    def close(self):
+        """取消全部任务并停止工作线程"""
+        with self.lock:
+            self.closed = True
+            jobs = list(self.pending.values())
+            if self.active is not None:
+                jobs.append(self.active)
+        for job in jobs:
+            self.cancel(job, '输入服务已关闭')
+        self.queue.put((float('inf'), -1, None))
+
+    def _run(self):
+        while True:
+            _, _, job = self.queue.get()
+            if job is None:
+                break
+            with self.lock:
+                if self.pending.pop(job.job_id, None) is None:
+                    continue  # 排队时已取消
+                self.active = job
+            if not job.future.set_running_or_notify_cancel():
+                # 等待方已放弃（future 被取消）
+                with self.lock:
+                    self.active = None
+                    self.stats['cancelled'] += 1
+                continue
+            job.started_at = time.monotonic()
+            self.stats['max_wait_ms'] = max(self.stats['max_wait_ms'], job.wait_ms)
+            _current.token = job.token
+            try:
+                result = job.func(job.token)
+            except Exception as e:
+                self.stats['failed'] += 1
+                self.log(f"输入任务 {job.name or job.job_id} 失败: {e}")
+                job.future.set_exception(e)
+            else:
+                self.stats['cancelled' if job.token.cancelled else 'completed'] += 1
+                job.future.set_result(result)
+            finally:
+                _current.token = None
+                with self.lock:
+                    self.active = None
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def input_service(log=None):
+    """
+    进程内唯一的输入服务，首次调用时启动
+    :param log: 宿主的日志函数（主窗口或守护进程的日志）；传入时替换服务当前的日志函数
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = InputService(log=log)
+        elif log is not None:
+            _service.log = log
+        return _service
@@ -3,15 +3,53 @@ import platform
 import os
 import shutil
 import subprocess
-from tkinter import messagebox
 
-import keyboard
-import pyautogui
-import pyperclip
+from utils.input_backends import BACKENDS, BackendCalibration, default_order, open_backend, paste_order
+from utils.input_plan import Executor, InputPlan
+from utils.input_service import current_token
+from utils.x11_input import FocusWatcher
+
+try:
+    import keyboard
+except Exception:  # 无头机器或没有权限时不可用，ESC 监听会被跳过；取消与计划执行不依赖它
+    keyboard = None
+
+try:
+    import pyautogui
+except Exception:  # 没有图形会话时（例如在服务器上以无头模式运行）无法导入，点击聚焦会被跳过
+    pyautogui = None
+
+try:
+    from tkinter import messagebox
+except ImportError:  # 无头模式可能没有安装 Tk
+    messagebox = None
+
+# 按窗口 id 重新激活目标窗口后，等待窗口管理器切换焦点的时间（秒）
+WINDOW_ACTIVATE_SETTLE = 0.05
+
+
+class LiveExecutor(Executor):
+    """通过 InputSimulator 选定的输入后端（见 utils/input_backends.py）真实输入"""
+    live = True
+
+    def __init__(self, simulator):
+        super().__init__()
+        self.simulator = simulator
+
+    def write(self, text):
+        self.simulator._write_text(text)
+
+    def key(self, name):
+        self.simulator._press_key(name)
+        if name == 'enter' and self.simulator.newline_delay:
+            time.sleep(self.simulator.newline_delay)  # 换行后的短暂等待
 
 
 class InputSimulator:
-    def __init__(self, gui):
+    def __init__(self, gui, executor=None):
+        """
+        :param executor: 输入计划的执行器，默认真实输入；传入 RecordingExecutor / NullExecutor 时只记录不输入
+        """
         self.gui = gui
         self.typing_active = True
         self.left_brace_count = 0
@@ -21,13 +59,109 @@ class InputSimulator:
         self.is_linux = platform.system() == "Linux"
         self.xdotool_path = shutil.which("xdotool") if self.is_linux else None
         self.xdotool_available = bool(self.xdotool_path)
+        # 逐键输入后端（见 utils/input_backends.py），首次输入时按校准结果选择最快且准确的后端
+        self.backend = None
+        config_manager = getattr(gui, 'config_manager', None)
+        self.calibration = BackendCalibration.from_config(config_manager, log=gui.log) \
+            if config_manager is not None else BackendCalibration(log=gui.log)
+        self.calibration_changed = False
+        # 环境检查通过后缓存 [INPUT] env_check_ttl 秒，流式输入的每个分块不再重复检查
+        self.env_checked_at = None
+        # 本次输入会话的目标窗口 id（Linux）：开始时绑定，之后焦点离开时暂停输入（没有焦点监听时按 id 重新激活）
+        self.target_window = None
+        # Linux 下监听激活窗口变化：焦点离开目标窗口时暂停输入而不是把按键发到别的窗口
+        self.focus_watcher = None
+        self.focus_watcher_failed = False
+        self.paused_ms = 0  # 本次输入因焦点离开而暂停的时间
+        self.stats = {'env_checks': 0, 'window_binds': 0, 'reactivations': 0, 'focus_pauses': 0, 'paused_ms': 0}
+        self.executor = executor or LiveExecutor(self)
+
+    def _input_setting(self, key, default):
+        config_manager = getattr(self.gui, 'config_manager', None)
+        if config_manager is None:
+            return default
+        return config_manager.get_setting(key, default, 'INPUT')
+
+    @property
+    def x11_keyboard(self):
+        """使用 XTest 后端时的持久 X 连接，用于读取与激活窗口"""
+        backend = self.backend
+        return backend.keyboard if backend is not None and backend.name == 'xtest' else None
+
+    @property
+    def newline_delay(self):
+        """换行后的等待，由后端决定（独立进程的后端需要给编辑器留出处理时间）"""
+        return self.backend.newline_delay if self.backend is not None else 0.05
+
+    def _backend_order(self):
+        """
+        逐键后端的尝试顺序：[INPUT] backend 指定时只用该后端；
+        否则校准中准确的后端按速度在前，未校准的后端按平台默认顺序在后，校准中不准确的后端不再使用
+        """
+        configured = self._input_setting('backend', 'auto').lower()
+        if configured == 'auto' and self._input_setting('x11_backend', 'auto').lower() == 'xdotool':
+            configured = 'xdotool'  # 兼容旧配置 x11_backend = xdotool
+        if configured in BACKENDS and BACKENDS[configured].kind == 'keys':
+            return [configured]
+        ranking = self.calibration.ranking()
+        if not ranking:
+            return list(default_order())
+        return ranking + [name for name in default_order()
+                          if name not in ranking and self.calibration.is_accurate(name) is None]
+
+    def _get_backend(self):
+        """当前的逐键后端，首次调用时按顺序建立；全部不可用时返回 None"""
+        if self.backend is not None:
+            return self.backend
+        errors = []
+        for name in self._backend_order():
+            try:
+                self.backend = open_backend(name, self._input_setting)
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                continue
+            self.gui.log(f"使用输入后端: {name}")
+            return self.backend
+        self.gui.log(f"没有可用的输入后端（{'；'.join(errors)}）")
+        return None
+
+    def _drop_backend(self, error):
+        """后端出错（如 X 服务器重启）时关闭，下次输入重新选择"""
+        backend, self.backend = self.backend, None
+        self.env_checked_at = None
+        if backend is None:
+            return
+        self.gui.log(f"输入后端 {backend.name} 出错，下次输入时重新选择: {error}")
+        try:
+            backend.close()
+        except Exception:
+            pass
+
+    def use_calibration(self, calibration):
+        """换用新的校准结果（可在其他线程调用），下一次输入开始时按其重新选择后端"""
+        self.calibration = calibration
+        self.calibration_changed = True
+
+    def close(self):
+        """释放输入后端与焦点监听"""
+        if self.backend is not None:
+            self.backend.close()
+            self.backend = None
+        if self.focus_watcher is not None:
+            self.focus_watcher.close()
+            self.focus_watcher = None
 
     def _check_xdotool_environment(self):
-        """检查Linux下xdotool可用性与会话环境。"""
+        """检查Linux下输入工具与会话环境；通过的结果缓存 [INPUT] env_check_ttl 秒（默认30）"""
         if not self.is_linux:
             return True
 
-        if not self.xdotool_available:
+        if self.env_checked_at is not None and \
+                time.monotonic() - self.env_checked_at < float(self._input_setting('env_check_ttl', '30')):
+            return True
+        self.stats['env_checks'] += 1
+
+        if self._get_backend() is None:
             self.gui.log("检测到Linux环境但未安装xdotool，无法执行自动输入")
             self.gui.log("请先安装xdotool: sudo apt install xdotool")
             return False
@@ -43,30 +177,116 @@ class InputSimulator:
             self.gui.log("未检测到DISPLAY环境变量，xdotool无法连接图形会话")
             return False
 
+        self.env_checked_at = time.monotonic()
+        return True
+
+    def _bind_target_window(self):
+        """输入会话开始时记录当前激活窗口（目标编辑器所在窗口），没有激活窗口时不开始输入"""
+        self.target_window = None
+        if not self.is_linux:
+            return True
+
         try:
-            result = subprocess.run(
-                [self.xdotool_path, "getactivewindow"],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-            )
-            window_id = result.stdout.strip()
-            if not window_id:
-                self.gui.log("未检测到激活窗口，请先激活目标编辑器窗口")
-                return False
+            window_id = self._active_window()
         except Exception as e:
             self.gui.log(f"无法获取当前激活窗口，自动输入无法开始: {e}")
             return False
+        if window_id is None:
+            # 所用后端无法读取激活窗口（既没有 XTest 连接也没有 xdotool），不绑定
+            return True
+        if not window_id:
+            self.gui.log("未检测到激活窗口，请先激活目标编辑器窗口")
+            return False
 
+        self.target_window = window_id
+        self.stats['window_binds'] += 1
+        watcher = self._get_focus_watcher()
+        if watcher is not None:
+            watcher.watch(window_id)
+        return True
+
+    def _get_focus_watcher(self):
+        """焦点监听（[INPUT] pause_on_focus_loss，默认开启）；不可用时返回 None，之后不再尝试"""
+        if self.focus_watcher is not None and not self.focus_watcher.alive:
+            self.focus_watcher = None
+        if self.focus_watcher is not None or self.focus_watcher_failed:
+            return self.focus_watcher
+        if self._input_setting('pause_on_focus_loss', 'True') != 'True':
+            return None
+        try:
+            self.focus_watcher = FocusWatcher(log=self.gui.log)
+        except Exception as e:
+            self.focus_watcher_failed = True
+            self.gui.log(f"焦点监听不可用，焦点离开时将重新激活目标窗口: {e}")
+        return self.focus_watcher
+
+    def _wait_for_focus(self, watcher):
+        """焦点离开目标窗口：暂停输入直到焦点回来；ESC、任务取消或超过 [INPUT] focus_pause_timeout 秒时放弃"""
+        self.gui.log("焦点离开了目标窗口，输入已暂停，切回编辑器窗口后继续")
+        started = time.monotonic()
+        regained = watcher.wait_for_focus(
+            should_abort=lambda: self.esc_pressed or bool(current_token()),
+            timeout=float(self._input_setting('focus_pause_timeout', '120')),
+        )
+        paused_ms = int((time.monotonic() - started) * 1000)
+        self.paused_ms += paused_ms
+        self.stats['focus_pauses'] += 1
+        self.stats['paused_ms'] += paused_ms
+        if not regained:
+            if not self.esc_pressed and not current_token():
+                self.gui.log("等待焦点回到目标窗口超时，输入已中断，可稍后继续输入")
+            return False
+        # 给窗口管理器与编辑器一点时间恢复键盘焦点
+        time.sleep(WINDOW_ACTIVATE_SETTLE)
+        self.gui.log(f"焦点已回到目标窗口，继续输入（暂停 {paused_ms / 1000:.1f} 秒）")
         return True
 
+    def _active_window(self):
+        """当前激活窗口的 id：有 XTest 连接时读取窗口属性，否则调用 xdotool；两者都没有时返回 None"""
+        self._get_backend()
+        x11_keyboard = self.x11_keyboard
+        if x11_keyboard is not None:
+            return x11_keyboard.active_window()
+        if not self.xdotool_available:
+            return None
+        result = subprocess.run(
+            [self.xdotool_path, "getactivewindow"],
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        return int(result.stdout.strip() or 0)
+
+    def _keep_target_window(self):
+        """
+        分块之间焦点离开了目标窗口时按 id 重新激活
+        只在有 XTest 连接时检查（一次属性读取）；xdotool 下每次检查都要启动进程，不做检查
+        """
+        x11_keyboard = self.x11_keyboard
+        if not self.target_window or x11_keyboard is None:
+            return
+        if self.focus_watcher is not None and self.focus_watcher.alive:
+            return  # 焦点监听会在焦点离开时暂停输入，不抢回焦点
+        try:
+            if x11_keyboard.active_window() == self.target_window:
+                return
+            x11_keyboard.activate_window(self.target_window)
+        except Exception as e:
+            self._drop_backend(e)
+            return
+        time.sleep(WINDOW_ACTIVATE_SETTLE)
+        self.stats['reactivations'] += 1
+        self.gui.log("输入过程中焦点离开了目标窗口，已重新激活")
+
     def reset(self):
         """重置状态"""
         self.typing_active = True
         self.left_brace_count = 0
         self.line_count = 0
         self.esc_pressed = False
+        self.target_window = None
+        self.paused_ms = 0
 
     def set_esc_pressed(self, event=None):
         """设置ESC键按下标志"""
@@ -74,9 +294,24 @@ class InputSimulator:
             self.esc_pressed = True
             self.typing_active = False
 
+    def _should_stop(self):
+        """
+        按下 ESC，或所在的输入任务已被取消（见 utils/input_service.py）；
+        焦点离开目标窗口时在这里暂停，焦点回来后返回 False 继续输入
+        """
+        if self.esc_pressed or current_token():
+            return True
+        watcher = self.focus_watcher
+        if watcher is not None and self.target_window and not watcher.has_focus:
+            return not self._wait_for_focus(watcher)
+        return False
+
     def _install_esc_hook(self):
         """安装ESC监听（失败时降级，不中断主流程）。"""
         self._remove_esc_hook()
+        if keyboard is None:
+            self.gui.log("未安装 keyboard 模块，无法ESC中止，可在界面上取消输入")
+            return
         try:
             self.esc_hook = keyboard.on_press_key('esc', self.set_esc_pressed, suppress=False)
         except Exception as e:
@@ -93,107 +328,83 @@ class InputSimulator:
             self.esc_hook = None
 
     def _write_text(self, text):
-        """Linux优先使用xdotool输入，其他平台使用keyboard。"""
-        if self.is_linux and self.xdotool_available:
-            self._xdotool_type(text)
-            return
-
+        """用当前后端输入文本；后端出错时关闭它并抛出异常，下次输入重新选择"""
+        backend = self._get_backend()
+        if backend is None:
+            raise RuntimeError("没有可用的输入后端")
         try:
-            keyboard.write(text)
+            backend.write(text)
         except Exception as e:
-            if self.is_linux:
-                raise RuntimeError(f"keyboard输入失败，且xdotool不可用: {e}")
-            pyautogui.write(text, interval=0)
+            self._drop_backend(e)
+            raise
 
     def _press_key(self, key):
-        """按键封装：Linux优先xdotool。"""
-        if self.is_linux and self.xdotool_available:
-            self._xdotool_key(key)
-            return
-
+        """用当前后端按键或组合键（如 enter、ctrl+a）"""
+        backend = self._get_backend()
+        if backend is None:
+            raise RuntimeError("没有可用的输入后端")
         try:
-            keyboard.press_and_release(key)
-            return
+            backend.key(key)
         except Exception as e:
-            if self.is_linux:
-                raise RuntimeError(f"keyboard按键失败，且xdotool不可用: {e}")
-            pass
-
-        if '+' in key:
-            pyautogui.hotkey(*key.split('+'))
-        else:
-            pyautogui.press(key)
-
-    def _xdotool_type(self, text):
-        """使用xdotool输入文本。"""
-        subprocess.run(
-            [self.xdotool_path, "type", "--clearmodifiers", "--delay", "1", "--", text],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
-
-    def _xdotool_key(self, key):
-        """使用xdotool发送按键。"""
-        xdotool_key = key.replace('+', '+')
-        subprocess.run(
-            [self.xdotool_path, "key", "--clearmodifiers", xdotool_key],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
+            self._drop_backend(e)
+            raise
 
     def _clear_editor_before_input(self):
         """在输入前清空当前编辑器内容，避免旧代码残留。"""
         try:
-            self._press_key('ctrl+a')
-            time.sleep(0.05)
-            self._press_key('delete')
-            time.sleep(0.05)
+            self.executor.key('ctrl+a')
+            self._pause(0.05)
+            self.executor.key('delete')
+            self._pause(0.05)
             return True
         except Exception as e:
             self.gui.log(f"清空编辑器失败: {e}")
             return False
 
+    def _pause(self, seconds):
+        """真实输入时给编辑器留出处理时间；空执行时不等待"""
+        if self.executor.live:
+            time.sleep(seconds)
+
+    def _prepare_input(self, click=True):
+        """
+        检查环境、绑定目标窗口、安装ESC监听并点击屏幕中央聚焦编辑器；非真实执行器跳过
+        :param click: 续输入时为 False，点击会移动编辑器中的光标
+        """
+        if not self.executor.live:
+            return True
+        if self.calibration_changed:
+            self.calibration_changed = False
+            self.close()
+        if not self._check_xdotool_environment() or not self._bind_target_window():
+            return False
+
+        # 安装ESC键监听
+        self._install_esc_hook()
+
+        if not click:
+            return True
+
+        # 先聚焦到目标编辑器，再清空现有内容
+        try:
+            screen_width, screen_height = pyautogui.size()
+            pyautogui.click(x=screen_width // 2, y=screen_height // 2)
+            time.sleep(0.08)
+        except Exception:
+            pass
+        return True
+
     def paste_code(self, code):
         """使用复制粘贴方式输入代码"""
         try:
-            if not self._check_xdotool_environment():
+            if not self._prepare_input():
                 return False
 
-            # 安装ESC键监听
-            self._install_esc_hook()
-
-            # 先聚焦到目标编辑器，再清空现有内容
-            try:
-                screen_width, screen_height = pyautogui.size()
-                pyautogui.click(x=screen_width // 2, y=screen_height // 2)
-                time.sleep(0.08)
-            except Exception:
-                pass
-
             # 输入前先清空编辑器
             self._clear_editor_before_input()
 
-            # 激活编辑器（点击屏幕中央）
-            """
-            screen_width, screen_height = pyautogui.size()
-            x = screen_width // 2
-            y = screen_height // 2
-            pyautogui.click(x=x, y=y)
-            time.sleep(0.05)
-
-            # 清空编辑器内容
-            keyboard.press_and_release('ctrl+a')
-            time.sleep(0.05)
-            keyboard.press_and_release('delete')
-            time.sleep(0.05)
-            """
-
             # 检查ESC键
-            if self.esc_pressed:
+            if self._should_stop():
                 self.gui.log("用户按下了ESC键，终止代码粘贴")
                 # self._show_termination_message()
                 self._remove_esc_hook()
@@ -202,10 +413,10 @@ class InputSimulator:
             pasted = False
             try:
                 # 复制代码到剪贴板并粘贴
-                pyperclip.copy(code)
-                time.sleep(0.05)
-                self._press_key('ctrl+v')
-                time.sleep(0.05)
+                if not self.executor.live:
+                    self.executor.key('ctrl+v')
+                else:
+                    self._paste(code)
                 pasted = True
                 self.gui.log("代码已通过复制粘贴完成输入")
             except Exception as e:
@@ -213,8 +424,8 @@ class InputSimulator:
                 self.gui.log(f"复制粘贴不可用，回退到直接输入: {e}")
 
             if not pasted:
-                self._write_text(code)
-                self.gui.log("代码已通过xdotool直接输入完成")
+                self.executor.write(code)
+                self.gui.log("代码已通过直接输入完成")
 
             # 移除ESC键监听
             self._remove_esc_hook()
@@ -223,84 +434,124 @@ class InputSimulator:
 
         except Exception as e:
             self.gui.log(f"复制粘贴失败: {e}")
+            self.env_checked_at = None
             self._remove_esc_hook()
             return False
 
-    def simulate_typing(self, text, is_first_chunk=False):
-        """模拟键盘输入代码"""
+    def _paste(self, code):
+        """
+        用第一个可用的粘贴后端粘贴：优先由本进程的 Tk 根窗口直接提供剪贴板内容，其次 pyperclip；
+        校准中粘贴不准确的后端跳过。粘贴失败时 Ctrl+V 可能已经发出，先重新清空编辑器再换下一个后端
+        """
+        errors = []
+        for name in paste_order():
+            if self.calibration.is_accurate(name) is False:
+                errors.append(f"{name}: 校准结果显示在本机不可用")
+                continue
+            try:
+                backend = open_backend(name, self._input_setting, key_backend=self.executor,
+                                       root=getattr(self.gui, 'root', None))
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                continue
+            started = time.perf_counter()
+            try:
+                backend.write(code)
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                self.gui.log(f"通过 {name} 粘贴失败，尝试下一种方式: {e}")
+                self._clear_editor_before_input()
+                continue
+            self.gui.log(f"已通过 {name} 粘贴（{(time.perf_counter() - started) * 1000:.0f} 毫秒）")
+            return
+        raise RuntimeError('；'.join(errors))
+
+    def _editor_profile(self, editor):
+        """按键规划使用的编辑器配置：[INPUT] editor_profile，auto 表示使用扩展报告的编辑器"""
+        profile = self._input_setting('editor_profile', 'auto').lower()
+        if profile == 'auto':
+            return editor or 'verbatim'
+        return profile
+
+    def compile_plan(self, code, language=None, editor=None, base=None):
+        """
+        把代码一次性编译为输入计划（见 utils/input_plan.py）
+        :param language: 代码语言
+        :param editor: 扩展报告的编辑器（monaco / codemirror），用于选择按键规划的编辑器配置
+        :param base: 编辑器中已有的代码；[INPUT] minimal_edit 开启（默认）时只修改变化的行，不清空重输
+        """
+        if base and self._input_setting('minimal_edit', 'True') == 'True':
+            plan = InputPlan.compile_edit(base, code, self._editor_profile(editor), language)
+            if plan is not None:
+                stats = plan.describe()
+                self.gui.log(f"只修改变化的行：按键 {stats['keystrokes']} 次（清空重输需 {stats['verbatim_keystrokes']} 次）")
+                return plan
+            self.gui.log("无法只修改变化的行，清空编辑器后重新输入")
+        plan = InputPlan.compile(code, self._editor_profile(editor), language)
+        if plan.profile != 'verbatim':
+            stats = plan.describe()
+            self.gui.log(f"按 {plan.profile} 编辑器的自动缩进与括号补全规划按键："
+                         f"{stats['keystrokes']} 次（逐字输入需 {stats['verbatim_keystrokes']} 次）")
+        return plan
+
+    def begin_typing(self, resume=False, clear=True, focus=True):
+        """
+        开始一次模拟键盘输入：准备输入环境并清空编辑器，返回是否可以开始
+        :param resume: 从中断处继续输入，不点击编辑器也不清空，光标需仍停在中断的位置
+        :param clear: 是否清空编辑器；修改已有代码的计划（InputPlan.base）不清空
+        :param focus: 是否点击屏幕中央聚焦编辑器；为 False 时不点击也不清空，在当前光标处输入（远程协助消息）
+        """
         try:
-            if not self._check_xdotool_environment():
+            self.line_count = 0
+            self.esc_pressed = False
+            self.paused_ms = 0
+            if not self._prepare_input(click=focus and not resume):
                 return False
+            if resume:
+                self.gui.log("从中断处继续模拟键盘输入...")
+                return not self._should_stop()
+            self.gui.log("开始模拟键盘输入代码...")
 
-            # 如果是第一个块，开始模拟键盘输入
-            if is_first_chunk:
-                self.gui.log("开始模拟键盘输入代码...")
-                self.line_count = 0
-                self.esc_pressed = False
-
-                # 安装ESC键监听
-                self._install_esc_hook()
-
-                # 先聚焦到目标编辑器，再清空现有内容
-                try:
-                    screen_width, screen_height = pyautogui.size()
-                    pyautogui.click(x=screen_width // 2, y=screen_height // 2)
-                    time.sleep(0.08)
-                except Exception:
-                    pass
-
-                # 检查ESC键
-                if self.esc_pressed:
-                    self.gui.log("用户按下了ESC键，终止代码输入")
-                    # self._show_termination_message()
-                    self._remove_esc_hook()
-                    return False
+            # 检查ESC键
+            if self._should_stop():
+                self.gui.log("用户按下了ESC键，终止代码输入")
+                self._remove_esc_hook()
+                return False
 
-                # 输入前先清空编辑器
+            # 输入前先清空编辑器
+            if clear and focus:
                 self._clear_editor_before_input()
-                """
-                # 激活编辑器（点击屏幕中央）
-                screen_width, screen_height = pyautogui.size()
-                x = screen_width // 2
-                y = screen_height // 2
-                pyautogui.click(x=x, y=y)
-                time.sleep(0.05)
-
-                # 清空编辑器内容
-                keyboard.press_and_release('ctrl+a')
-                time.sleep(0.05)
-                keyboard.press_and_release('delete')
-                time.sleep(0.05)
-                """
-
-            # 使用批量输入
-            lines = text.split('\n')
-            for line_index, line in enumerate(lines):
-                # 检查ESC键
+            return True
+        except Exception as e:
+            self.gui.log(f"准备模拟键盘输入失败: {e}")
+            self.env_checked_at = None
+            self._remove_esc_hook()
+            return False
+
+    def execute(self, actions):
+        """执行输入计划中的一段动作（begin_typing 之后调用），返回是否全部执行"""
+        try:
+            self.executor.done = 0
+            if self.executor.live:
+                self._keep_target_window()
+            done = self.executor.execute(actions, should_stop=self._should_stop)
+            # 记录行数（包括空行）
+            self.line_count += sum(1 for action in actions[:done] if action == ('key', 'enter'))
+            if done < len(actions):
+                token = current_token()
                 if self.esc_pressed:
                     self.gui.log("用户按下了ESC键，终止代码输入")
-                    # self._show_termination_message()
-                    self._remove_esc_hook()
-                    return False
-
-                # 处理当前行：按原文本逐字符含空白输入，避免人为改缩进
-                if line:
-                    self._write_text(line)
-
-                # 如果是最后一行且为空行，不需要处理
-                # 如果不是最后一行，添加换行
-                if line_index < len(lines) - 1:
-                    self._press_key('enter')
-                    time.sleep(0.05)  # 换行后的短暂等待
-
-                # 记录行数（包括空行）
-                if line_index < len(lines) - 1:
-                    self.line_count += 1
-
+                elif token:
+                    self.gui.log(f"输入任务已取消，终止代码输入: {token.reason}")
+                # self._show_termination_message()
+                self._remove_esc_hook()
+                return False
             return True
 
         except Exception as e:
             self.gui.log(f"模拟键盘输入失败: {e}")
+            # 环境可能已变化（如X服务器重启），下次输入重新检查
+            self.env_checked_at = None
             if self.is_linux:
                 self.gui.log("Linux自动输入依赖xdotool和目标窗口焦点，请确认已安装xdotool且编辑器窗口处于激活状态")
             else:
@@ -308,13 +559,40 @@ class InputSimulator:
             self._remove_esc_hook()
             return False
 
+    def type_plan(self, plan, resume=False, on_segment=None, focus=True):
+        """
+        逐段执行输入计划中尚未提交的动作，每段执行后更新 plan.committed
+        :param resume: 从 plan.committed 处继续（不清空编辑器）；否则从头输入（plan.base 为空时先清空编辑器）
+        :param on_segment: 每段完成后的回调 on_segment(段序号, 段数)
+        :param focus: 为 False 时不点击、不清空，在当前光标处输入
+        :return: 是否全部输入完成
+        """
+        if not resume:
+            plan.committed = 0
+        if not self.begin_typing(resume=resume, clear=plan.base is None, focus=focus):
+            return False
+        segments = plan.segments()
+        for index, segment in enumerate(segments):
+            success = self.execute(segment)
+            plan.commit(self.executor.done)
+            if not success:
+                return False
+            if on_segment is not None:
+                on_segment(index, len(segments))
+        self._remove_esc_hook()
+        return True
+
+    def simulate_typing(self, text, language=None, editor=None, base=None):
+        """模拟键盘输入一段文本：编译输入计划后逐段执行；给出编辑器中已有的代码 base 时只修改变化的行"""
+        return self.type_plan(self.compile_plan(text, language, editor, base))
+
     def finalize_formatting(self):
         """完成代码输入后的格式化操作"""
         try:
             self.gui.log(f"代码输入完成，共处理了{self.line_count}行")
             # 移除ESC键监听
             self._remove_esc_hook()
-            self.gui.root.after(0, lambda: messagebox.showinfo("提示", "代码输入已完成。"))
+            self._show_info("代码输入已完成。")
             return True
 
         except Exception as e:
@@ -324,4 +602,11 @@ class InputSimulator:
 
     def _show_termination_message(self):
         """显示终止消息"""
-        self.gui.root.after(0, lambda: messagebox.showinfo("提示", "用户已终止代码输入"))
\ No newline at end of file
+        self._show_info("用户已终止代码输入")
+
+    def _show_info(self, message):
+        """弹出提示框；无头模式下只记录日志"""
+        if getattr(self.gui, 'headless', False) or messagebox is None:
+            self.gui.log(message)
+            return
+        self.gui.root.after(0, lambda: messagebox.showinfo("提示", message))
\ No newline at end of file
@@ -0,0 +1,482 @@
+"""
+按键规划：把代码编译为在目标编辑器中输入所需的最少按键序列
+在线编辑器（CodeMirror / Monaco）会在回车后自动缩进、输入左括号时自动补全右括号，
+逐字输入原文会多打缩进和右括号，并使编辑器内容与代码不一致（重复的右括号、加倍的缩进）。
+规划器用一个简化的编辑器模型模拟这些行为：跳过编辑器会自动插入的缩进，用光标移动越过编辑器已补全的右括号，
+保证输入结束后编辑器内容与代码一致（忽略行尾空白；非 Python 代码中由编辑器决定缩进的右花括号行忽略缩进差异）。
+
+动作为 ('type', 文本) 或 ('key', 按键名)，按键名与 InputSimulator._press_key 相同。
+编辑器配置见 PROFILES；verbatim 为不做任何自动处理的纯文本编辑器，按原文逐字输入（原有行为）。
+plan_edit 规划把编辑器中已有的代码改为新代码的按键（纠错时只修改变化的行，不清空重输）。
+"""
+import difflib
+import re
+
+PAIRS = {'(': ')', '[': ']', '{': '}'}
+CLOSERS = set(PAIRS.values())
+QUOTES = ('"', "'")
+WORD_CHAR = re.compile(r'\w')
+
+
+class EditorProfile:
+    """编辑器的自动编辑行为（按各编辑器的默认配置近似）"""
+    __slots__ = ('name', 'auto_indent', 'auto_close', 'close_before', 'explode', 'electric', 'indent_unit',
+                 'trim_auto_whitespace', 'backspace_unit')
+
+    def __init__(self, name, auto_indent=False, auto_close='', close_before='', explode='', electric='',
+                 indent_unit='    ', trim_auto_whitespace=False, backspace_unit=False):
+        self.name = name
+        self.auto_indent = auto_indent  # 回车后沿用上一行缩进，行尾为 { 时再缩进一级
+        self.auto_close = auto_close  # 输入后自动补全右半边的字符
+        self.close_before = close_before  # 光标后为这些字符（或行尾、空白）时才自动补全
+        self.explode = explode  # 在这些括号对之间回车时，右括号移到下一行并与左括号所在行对齐
+        self.electric = electric  # 在空白行输入时重新缩进到与匹配的左括号所在行一致
+        self.indent_unit = indent_unit
+        self.trim_auto_whitespace = trim_auto_whitespace  # 在只有自动缩进的行上回车时删除该行的空白
+        self.backspace_unit = backspace_unit  # 行首空白中退格一次删除一级缩进
+
+
+PROFILES = {
+    'verbatim': EditorProfile('verbatim'),
+    # CodeMirror 5（educoder 等）：closebrackets 插件与 C 类语言模式的默认行为
+    'codemirror': EditorProfile(
+        'codemirror', auto_indent=True, auto_close='()[]{}\'\'""', close_before=')]}\'":;>',
+        explode='[{', electric='}',
+    ),
+    # Monaco（leetcode、新版 educoder）：默认 autoClosingBrackets / autoIndent / trimAutoWhitespace
+    'monaco': EditorProfile(
+        'monaco', auto_indent=True, auto_close='()[]{}\'\'""', close_before=';:.,=}])>',
+        explode='([{', electric='}', trim_auto_whitespace=True, backspace_unit=True,
+    ),
+}
+
+
+def get_profile(name):
+    """按名称取编辑器配置，未知名称按 verbatim 处理"""
+    if isinstance(name, EditorProfile):
+        return name
+    return PROFILES.get((name or '').lower(), PROFILES['verbatim'])
+
+
+def profile_for_source(source):
+    """根据扩展读取编辑器代码的方式（editor_code_source，如 monaco_editor_getValue）推断编辑器配置名"""
+    source = (source or '').lower()
+    if 'monaco' in source:
+        return 'monaco'
+    if 'codemirror' in source:
+        return 'codemirror'
+    return 'verbatim'
+
+
+def is_python(language):
+    return (language or '').lower() in ('python', 'python3', 'py')
+
+
+def _leading_ws(line):
+    return line[:len(line) - len(line.lstrip(' \t'))]
+
+
+def _in_literal(line, language):
+    """光标前的本行文本是否停在字符串或注释中（只看本行，足以决定引号是否自动补全）"""
+    comment = '#' if is_python(language) else '//'
+    quote = None
+    index = 0
+    while index < len(line):
+        char = line[index]
+        if quote:
+            if char == '\\':
+                index += 1
+            elif char == quote:
+                quote = None
+        elif line.startswith(comment, index):
+            return True
+        elif char in QUOTES:
+            quote = char
+        index += 1
+    return quote is not None
+
+
+class EditorModel:
+    """
+    编辑器内容的简化模型：光标前的文本 before 与光标后编辑器自动插入的文本 after
+    规划与校验都在这个模型上进行
+    """
+
+    def __init__(self, profile, language=None):
+        self.profile = get_profile(profile)
+        self.language = language
+        self.before = ''
+        self.after = ''
+        self.selected = False  # ctrl+shift+end 选中了光标后的全部内容
+        self.selection = 0  # shift+down / shift+end 选中的光标后的字符数
+
+    def text(self):
+        return self.before + self.after
+
+    def current_line(self):
+        return self.before[self.before.rfind('\n') + 1:]
+
+    def after_line(self):
+        """光标后、本行内的自动插入文本"""
+        end = self.after.find('\n')
+        return self.after if end < 0 else self.after[:end]
+
+    def type_char(self, char):
+        profile = self.profile
+        next_char = self.after[:1]
+        prev_char = self.before[-1:]
+        if char == '\n':
+            self.enter()
+        elif next_char == char and char in profile.auto_close and (char in CLOSERS or prev_char != '\\'):
+            # 越过编辑器补全的右半边
+            self.before += char
+            self.after = self.after[1:]
+        elif char in PAIRS and char in profile.auto_close and self._may_close(next_char):
+            self.before += char
+            self.after = PAIRS[char] + self.after
+        elif char in QUOTES and char in profile.auto_close and self._may_close(next_char) \
+                and not WORD_CHAR.match(prev_char or ' ') \
+                and not _in_literal(self.current_line(), self.language):
+            self.before += char
+            self.after = char + self.after
+        elif char in profile.electric and not is_python(self.language) and not self.current_line().strip():
+            indent = self._matching_indent()
+            if indent is not None:
+                self.before = self.before[:len(self.before) - len(self.current_line())] + indent
+            self.before += char
+        else:
+            self.before += char
+
+    def enter(self):
+        profile = self.profile
+        line = self.current_line()
+        outer = _leading_ws(line)
+        indent = ''
+        if profile.auto_indent:
+            indent = outer
+            stripped = line.rstrip()
+            if stripped.endswith(':' if is_python(self.language) else '{'):
+                indent += profile.indent_unit
+        if profile.trim_auto_whitespace and line and not line.strip():
+            self.before = self.before[:len(self.before) - len(line)]
+        prev_char = self.before[-1:]
+        if prev_char in profile.explode and self.after[:1] == PAIRS.get(prev_char):
+            self.before += '\n' + outer + profile.indent_unit
+            self.after = '\n' + outer + self.after
+        else:
+            self.before += '\n' + indent
+
+    def backspace(self):
+        line = self.current_line()
+        unit = self.profile.indent_unit
+        if self.profile.backspace_unit and line and not line.strip() and line.endswith(unit) \
+                and len(line) % len(unit) == 0:
+            self.before = self.before[:-len(unit)]
+        else:
+            self.before = self.before[:-1]
+
+    def end(self):
+        """光标移到行尾"""
+        tail = self.after_line()
+        self.before += tail
+        self.after = self.after[len(tail):]
+
+    def down(self):
+        """光标移到下一行（模型只在光标位于行尾时使用，之后总是接 End）"""
+        self.end()
+        if self.after.startswith('\n'):
+            self.before += '\n'
+            self.after = self.after[1:]
+
+    def delete(self):
+        if self.selected:
+            self.after = ''
+            self.selected = False
+        elif self.selection:
+            self.after = self.after[self.selection:]
+            self.selection = 0
+        else:
+            self.after = self.after[1:]
+
+    def document_start(self):
+        """ctrl+home：光标移到文档开头"""
+        self.after = self.before + self.after
+        self.before = ''
+
+    def select_down(self):
+        """shift+down：选区延伸到下一行（模型只在随后接 shift+end 或从行首开始时使用，列位置不影响结果）"""
+        end = self.after.find('\n', self.selection)
+        self.selection = len(self.after) if end < 0 else end + 1
+
+    def select_end(self):
+        """shift+end：选区延伸到所在行的行尾"""
+        end = self.after.find('\n', self.selection)
+        self.selection = len(self.after) if end < 0 else end
+
+    def apply(self, action):
+        kind, value = action
+        if kind == 'type':
+            for char in value:
+                self.type_char(char)
+            return
+        handler = {
+            'enter': self.enter,
+            'backspace': self.backspace,
+            'end': self.end,
+            'down': self.down,
+            'delete': self.delete,
+            'ctrl+home': self.document_start,
+            'shift+down': self.select_down,
+            'shift+end': self.select_end,
+        }.get(value)
+        if value == 'ctrl+shift+end':
+            self.selected = True
+        elif handler is not None:
+            handler()
+        else:
+            raise ValueError(f"模型不支持的按键: {value}")
+
+    def _may_close(self, next_char):
+        return not next_char or next_char.isspace() or next_char in self.profile.close_before
+
+    def _matching_indent(self):
+        """与光标前未闭合的左花括号所在行的缩进（忽略字符串与注释中的括号不做处理，足以应对常见代码）"""
+        depth = 0
+        for index in range(len(self.before) - 1, -1, -1):
+            char = self.before[index]
+            if char == '}':
+                depth += 1
+            elif char == '{':
+                if depth == 0:
+                    line_start = self.before.rfind('\n', 0, index) + 1
+                    return _leading_ws(self.before[line_start:index])
+                depth -= 1
+        return None
+
+
+class KeystrokePlanner:
+    """
+    流式规划：代码可以分块送入（InputSimulator 按块输入），每块返回可以立即执行的动作
+    行与行之间的回车推迟到下一行到来时再决定（回车，或移到编辑器已插入的下一行）
+    """
+
+    def __init__(self, profile='verbatim', language=None):
+        self.profile = get_profile(profile)
+        self.language = language
+        self.model = EditorModel(self.profile, language)
+        self.carry = ''
+        self.started = False
+        self.finished = False
+        self.stats = {'lines': 0, 'keystrokes': 0, 'verbatim_keystrokes': 0}
+
+    @property
+    def verbatim(self):
+        return self.profile.name == 'verbatim'
+
+    def feed(self, text):
+        """送入一段代码，返回动作列表；最后一行不完整时留到下一块"""
+        lines = (self.carry + text).split('\n')
+        self.carry = lines.pop()
+        actions = []
+        for line in lines:
+            actions.extend(self._plan_line(line))
+        return actions
+
+    def finish(self):
+        """代码送完：输入剩余的行并删除编辑器多插入的内容"""
+        if self.finished:
+            return []
+        self.finished = True
+        actions = []
+        if self.carry or self.started:
+            actions.extend(self._plan_line(self.carry))
+            self.carry = ''
+        if self.model.after:
+            actions.append(self._apply(('key', 'ctrl+shift+end')))
+            actions.append(self._apply(('key', 'delete')))
+        return actions
+
+    def _plan_line(self, line):
+        model = self.model
+        actions = []
+        self.stats['lines'] += 1
+        self.stats['verbatim_keystrokes'] += len(line) + (1 if self.started else 0)
+
+        content = line
+        if self.started:
+            matched = self._pending_line_match(line)
+            if matched is not None:
+                actions.append(self._apply(('key', 'down')))
+                actions.append(self._apply(('key', 'end')))
+                content = matched
+            else:
+                actions.append(self._apply(('key', 'enter')))
+                content = self._plan_indent(line, actions)
+        self.started = True
+
+        typed = []
+        for index, char in enumerate(content):
+            tail = model.after_line()
+            if len(tail) > 1 and content[index:] == tail:
+                # 行尾剩下的正好是编辑器补全的右括号：一次 End 越过
+                self._flush_typed(typed, actions)
+                actions.append(self._apply(('key', 'end')))
+                break
+            model.type_char(char)
+            typed.append(char)
+        self._flush_typed(typed, actions)
+        return actions
+
+    def _pending_line_match(self, line):
+        """
+        光标位于行尾且下一行是编辑器插入的内容（如回车拆开花括号后的 }）时，
+        若该内容是目标行的开头，返回目标行剩余部分；否则返回 None
+        """
+        model = self.model
+        if self.verbatim or model.after_line() or not model.after.startswith('\n'):
+            return None
+        end = model.after.find('\n', 1)
+        pending = model.after[1:] if end < 0 else model.after[1:end]
+        if not pending.strip():
+            return None
+        if line.startswith(pending):
+            return line[len(pending):]
+        if not is_python(self.language) and line.lstrip().startswith(pending.lstrip()):
+            # 花括号语言中缩进不影响语义，接受编辑器的缩进
+            return line.lstrip()[len(pending.lstrip()):]
+        return None
+
+    def _plan_indent(self, line, actions):
+        """回车后把编辑器自动插入的缩进调整为目标缩进，返回还需输入的内容"""
+        model = self.model
+        want = _leading_ws(line)
+        content = line[len(want):]
+        if not content:
+            # 空行：行尾空白不影响代码，保留编辑器的缩进（Monaco 下一次回车时会自动删除）
+            return ''
+        if content[0] in self.profile.electric and not is_python(self.language):
+            # 输入右花括号时编辑器会自动调整缩进
+            return content
+        current = model.current_line()
+        while current and not want.startswith(current):
+            actions.append(self._apply(('key', 'backspace')))
+            current = model.current_line()
+        return want[len(current):] + content
+
+    def _flush_typed(self, typed, actions):
+        """记录已在模型上逐字执行的输入"""
+        if not typed:
+            return
+        text = ''.join(typed)
+        typed.clear()
+        self.stats['keystrokes'] += len(text)
+        actions.append(('type', text))
+
+    def _apply(self, action):
+        self.model.apply(action)
+        if action[0] == 'key':
+            self.stats['keystrokes'] += 1
+        return action
+
+
+def plan(code, profile='verbatim', language=None):
+    """一次性规划整段代码，返回 (动作列表, 规划器)"""
+    planner = KeystrokePlanner(profile, language)
+    actions = planner.feed(code)
+    actions.extend(planner.finish())
+    return actions, planner
+
+
+def plan_edit(old, new, profile='verbatim', language=None):
+    """
+    规划把编辑器中的 old 改为 new 的按键：按行比较，只删除并重新输入变化的行
+    先 ctrl+home 回到开头，用 down / end 移到每处改动上一行的行尾，shift+down / shift+end 选中旧行后 delete，
+    再逐行回车输入新行（与整段输入相同的缩进与括号处理），最后删除编辑器在这些行之后多补全的右括号
+    :return: 动作列表
+    """
+    old_lines = old.replace('\r\n', '\n').split('\n')
+    new_lines = new.split('\n')
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    actions = [('key', 'ctrl+home')]
+    line = 0  # 光标所在行（已改动部分按新代码计）
+    at_end = False  # 光标在该行行尾；否则在行首
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        planner = KeystrokePlanner(profile, language)
+        if i1 == 0:
+            if j1 == j2:
+                # 删除开头的若干行：从行首选到第 i2 行行首
+                actions.extend([('key', 'shift+down')] * i2)
+                actions.append(('key', 'delete'))
+                continue
+            if i2 == 0:
+                # 在开头插入：连同原来的第一行一起重输，避免在已有文本前回车（编辑器会重新缩进被拆开的行）
+                i2, j2 = 1, j2 + 1
+            # 选中开头的旧行并删除，在空出的第一行上输入
+            actions.extend([('key', 'shift+down')] * (i2 - 1))
+            actions.append(('key', 'shift+end'))
+            if '\n'.join(old_lines[:i2]):
+                actions.append(('key', 'delete'))
+        else:
+            target = j1 - 1  # 改动上一行（当前内容中的行号）
+            actions.extend([('key', 'down')] * (target - line))
+            if not at_end or target != line:
+                actions.append(('key', 'end'))
+            if i2 > i1:
+                # 从上一行行尾选到最后一个旧行的行尾，连同换行一起删除
+                actions.extend([('key', 'shift+down')] * (i2 - i1))
+                actions.append(('key', 'shift+end'))
+                actions.append(('key', 'delete'))
+            planner.model.before = '\n'.join(new_lines[:j1])
+            planner.started = True
+        if j2 > j1:
+            actions.extend(planner.feed('\n'.join(new_lines[j1:j2]) + '\n'))
+            # 编辑器在新行之后补全、但新代码中没有的右括号
+            actions.extend([('key', 'delete')] * len(planner.model.after))
+        line, at_end = max(j2, j1) - 1, True
+        if line < 0:
+            line, at_end = 0, False
+    return actions
+
+
+def replay(actions, profile='verbatim', language=None, initial=''):
+    """
+    在编辑器模型上执行动作，返回编辑器中的最终文本
+    :param initial: 编辑器中原有的文本（光标在开头），用于 plan_edit 的动作
+    """
+    model = EditorModel(profile, language)
+    model.after = initial.replace('\r\n', '\n')
+    for action in actions:
+        model.apply(action)
+    return model.text()
+
+
+def verbatim_actions(code):
+    """原有的逐字输入方式：每行原文，行间回车"""
+    actions = []
+    for index, line in enumerate(code.split('\n')):
+        if index:
+            actions.append(('key', 'enter'))
+        if line:
+            actions.append(('type', line))
+    return actions
+
+
+def same_code(expected, actual, language=None):
+    """编辑器内容是否与代码一致：忽略行尾空白；非 Python 代码中以右花括号开头的行忽略缩进"""
+    expected_lines = [line.rstrip() for line in expected.rstrip().split('\n')]
+    actual_lines = [line.rstrip() for line in actual.rstrip().split('\n')]
+    if len(expected_lines) != len(actual_lines):
+        return False
+    for want, got in zip(expected_lines, actual_lines):
+        if want == got:
+            continue
+        if not is_python(language) and want.lstrip().startswith('}') and want.lstrip() == got.lstrip():
+            continue
+        return False
+    return True
+
+
+def count_keystrokes(actions):
+    return sum(len(value) if kind == 'type' else 1 for kind, value in actions)
@@ -0,0 +1,286 @@
+"""
+Linux X11 下的持久键盘注入通道
+通过一个长期保持的 X 连接使用 XTest 扩展发送按键，不再每输入一行、每按一次回车都启动一个 xdotool 进程。
+不在当前键盘映射中的字符（如中文注释）临时映射到一个空闲键码后发送（与 xdotool 的做法相同），关闭时恢复。
+FocusWatcher 在独立的连接与线程上监听激活窗口的变化（根窗口 _NET_ACTIVE_WINDOW 的 PropertyNotify 事件），
+焦点离开目标窗口时输入暂停，回到目标窗口后继续。
+依赖 Xlib 模块（PyAutoGUI 在 Linux 上已依赖 python3-xlib，也可使用 python-xlib）。
+"""
+import select
+import threading
+import time
+
+try:
+    from Xlib import X, XK
+    from Xlib import display as xdisplay
+    from Xlib.ext import xtest
+    from Xlib.protocol import event as xevent
+except ImportError:
+    X = XK = xdisplay = xtest = xevent = None
+
+# keyboard / xdotool 写法的按键名 -> keysym 名
+KEY_NAMES = {
+    'enter': 'Return',
+    'return': 'Return',
+    'delete': 'Delete',
+    'backspace': 'BackSpace',
+    'tab': 'Tab',
+    'esc': 'Escape',
+    'escape': 'Escape',
+    'space': 'space',
+    'home': 'Home',
+    'end': 'End',
+    'up': 'Up',
+    'down': 'Down',
+    'left': 'Left',
+    'right': 'Right',
+    'pageup': 'Prior',
+    'pagedown': 'Next',
+    'ctrl': 'Control_L',
+    'control': 'Control_L',
+    'shift': 'Shift_L',
+    'alt': 'Alt_L',
+    'super': 'Super_L',
+}
+# 需要按功能键输入的字符
+CHAR_KEY_NAMES = {'\n': 'Return', '\t': 'Tab'}
+# 重新映射空闲键码后等待客户端处理 MappingNotify 的时间（秒）
+REMAP_SETTLE = 0.005
+
+
+def char_to_keysym(char):
+    """字符对应的 keysym：Latin-1 与其码位相同，其余 Unicode 字符为 0x01000000 + 码位"""
+    if char in CHAR_KEY_NAMES:
+        return XK.string_to_keysym(CHAR_KEY_NAMES[char])
+    code = ord(char)
+    if 0x20 <= code <= 0x7e or 0xa0 <= code <= 0xff:
+        return code
+    return 0x01000000 | code
+
+
+def key_to_keysym(name):
+    """按键名（如 ctrl、enter、a、F5）对应的 keysym"""
+    lowered = name.lower()
+    if lowered in KEY_NAMES:
+        return XK.string_to_keysym(KEY_NAMES[lowered])
+    if len(name) == 1:
+        return char_to_keysym(name)
+    keysym = XK.string_to_keysym(name)
+    if not keysym:
+        raise ValueError(f"未知按键: {name}")
+    return keysym
+
+
+class XTestKeyboard:
+    def __init__(self, display_name=None, key_delay=0.001):
+        """
+        打开 X 连接
+        :param display_name: X 显示名，默认使用环境变量 DISPLAY
+        :param key_delay: 每个按键之间的间隔（秒），0 表示一段文本发送完再统一刷新
+        """
+        if xtest is None:
+            raise RuntimeError("未安装 Xlib（python3-xlib / python-xlib）")
+        self.display = xdisplay.Display(display_name)
+        if not self.display.has_extension('XTEST'):
+            self.display.close()
+            raise RuntimeError("X 服务器不支持 XTEST 扩展")
+        self.key_delay = key_delay
+        self.keycodes = {}  # keysym -> (键码, 是否需要 Shift)
+        self.shift_keycode = self.display.keysym_to_keycode(XK.XK_Shift_L)
+        self.spare_keycode, self.spare_original = self._find_spare_keycode()
+        self.spare_keysym = None
+        self.stats = {'keys': 0, 'remaps': 0}
+
+    def type_text(self, text):
+        """输入一段文本（换行与制表符按回车、Tab 键发送）"""
+        for char in text:
+            keycode, shift = self._lookup(char_to_keysym(char))
+            if shift:
+                xtest.fake_input(self.display, X.KeyPress, self.shift_keycode)
+            xtest.fake_input(self.display, X.KeyPress, keycode)
+            xtest.fake_input(self.display, X.KeyRelease, keycode)
+            if shift:
+                xtest.fake_input(self.display, X.KeyRelease, self.shift_keycode)
+            self.stats['keys'] += 1
+            if self.key_delay:
+                self.display.sync()
+                time.sleep(self.key_delay)
+        self.display.sync()
+
+    def press_key(self, combo):
+        """按下组合键，如 ctrl+a、enter、delete"""
+        keycodes = []
+        for name in combo.split('+'):
+            keycode, shift = self._lookup(key_to_keysym(name.strip()))
+            if shift:
+                keycodes.append(self.shift_keycode)
+            keycodes.append(keycode)
+        for keycode in keycodes:
+            xtest.fake_input(self.display, X.KeyPress, keycode)
+        for keycode in reversed(keycodes):
+            xtest.fake_input(self.display, X.KeyRelease, keycode)
+        self.stats['keys'] += 1
+        self.display.sync()
+
+    def active_window(self):
+        """当前激活窗口的 id（_NET_ACTIVE_WINDOW），窗口管理器不支持时返回 0"""
+        root = self.display.screen().root
+        prop = root.get_full_property(self.display.intern_atom('_NET_ACTIVE_WINDOW'), X.AnyPropertyType)
+        return int(prop.value[0]) if prop is not None and len(prop.value) else 0
+
+    def activate_window(self, window_id):
+        """请求窗口管理器激活指定窗口（EWMH _NET_ACTIVE_WINDOW，与 xdotool windowactivate 相同）"""
+        root = self.display.screen().root
+        message = xevent.ClientMessage(
+            window=self.display.create_resource_object('window', window_id),
+            client_type=self.display.intern_atom('_NET_ACTIVE_WINDOW'),
+            data=(32, [2, X.CurrentTime, 0, 0, 0]),
+        )
+        root.send_event(message, event_mask=X.SubstructureRedirectMask | X.SubstructureNotifyMask)
+        self.display.sync()
+
+    def close(self):
+        """恢复临时映射的键码并关闭连接"""
+        if self.display is None:
+            return
+        try:
+            if self.spare_keysym is not None:
+                self.display.change_keyboard_mapping(self.spare_keycode, [self.spare_original])
+                self.display.sync()
+        finally:
+            self.display.close()
+            self.display = None
+
+    def _lookup(self, keysym):
+        cached = self.keycodes.get(keysym)
+        if cached is not None:
+            return cached
+        for keycode, index in self.display.keysym_to_keycodes(keysym):
+            if index in (0, 1):
+                result = self.keycodes[keysym] = (keycode, index == 1)
+                return result
+        return self._remap(keysym)
+
+    def _remap(self, keysym):
+        """把不在键盘映射中的 keysym 临时映射到空闲键码"""
+        if self.spare_keycode is None:
+            raise RuntimeError(f"没有空闲键码，无法输入字符 U+{keysym & 0xFFFFFF:04X}")
+        if self.spare_keysym != keysym:
+            # 先让已发送的按键生效，再改映射
+            self.display.sync()
+            self.display.change_keyboard_mapping(
+                self.spare_keycode, [(keysym,) * len(self.spare_original)]
+            )
+            self.display.sync()
+            time.sleep(REMAP_SETTLE)
+            self.spare_keysym = keysym
+            self.stats['remaps'] += 1
+        return self.spare_keycode, False
+
+    def _find_spare_keycode(self):
+        """从高到低找一个没有映射任何 keysym 的键码"""
+        info = self.display.display.info
+        count = info.max_keycode - info.min_keycode + 1
+        mapping = self.display.get_keyboard_mapping(info.min_keycode, count)
+        for offset in range(count - 1, -1, -1):
+            if not any(mapping[offset]):
+                return info.min_keycode + offset, tuple(mapping[offset])
+        return None, ()
+
+
+class FocusWatcher:
+    def __init__(self, display_name=None, log=None):
+        """
+        打开独立的 X 连接并启动监听线程（Xlib 连接不是线程安全的，不能与 XTestKeyboard 共用）
+        :param display_name: X 显示名，默认使用环境变量 DISPLAY
+        """
+        if xdisplay is None:
+            raise RuntimeError("未安装 Xlib（python3-xlib / python-xlib）")
+        self.log = log or print
+        self.display = xdisplay.Display(display_name)
+        self.root = self.display.screen().root
+        self.atom = self.display.intern_atom('_NET_ACTIVE_WINDOW')
+        self.root.change_attributes(event_mask=X.PropertyChangeMask)
+        self.display.sync()
+        self.active = self._read_active()
+        self.target = None
+        self.focused = threading.Event()
+        self.focused.set()
+        self.closed = False
+        self.stats = {'focus_changes': 0, 'pauses': 0, 'paused_ms': 0}
+        self.thread = threading.Thread(target=self._run, name='x11-focus-watcher', daemon=True)
+        self.thread.start()
+
+    def watch(self, window_id):
+        """开始关注该窗口是否处于激活状态"""
+        self.target = window_id
+        self._update(self.active)
+
+    def unwatch(self):
+        self.target = None
+        self.focused.set()
+
+    @property
+    def alive(self):
+        return not self.closed and self.thread.is_alive()
+
+    @property
+    def has_focus(self):
+        return self.focused.is_set()
+
+    def wait_for_focus(self, should_abort=None, timeout=None):
+        """
+        目标窗口失去焦点时阻塞，直到焦点回到目标窗口
+        :param should_abort: 等待期间定期调用，返回 True 时放弃等待
+        :param timeout: 最长等待秒数，None 表示一直等待
+        :return: 目标窗口是否已重新获得焦点
+        """
+        if self.focused.is_set():
+            return True
+        started = time.monotonic()
+        self.stats['pauses'] += 1
+        try:
+            while not self.focused.wait(0.05):
+                if should_abort is not None and should_abort():
+                    return False
+                if timeout is not None and time.monotonic() - started >= timeout:
+                    return False
+            return True
+        finally:
+            self.stats['paused_ms'] += int((time.monotonic() - started) * 1000)
+
+    def close(self):
+        self.closed = True
+        self.focused.set()
+        self.thread.join(timeout=1)
+
+    def _read_active(self):
+        prop = self.root.get_full_property(self.atom, X.AnyPropertyType)
+        return int(prop.value[0]) if prop is not None and len(prop.value) else 0
+
+    def _update(self, active):
+        if active != self.active:
+            self.stats['focus_changes'] += 1
+        self.active = active
+        # 窗口管理器短暂报告“没有激活窗口”（0）时不算离开
+        if self.target is None or active in (self.target, 0):
+            self.focused.set()
+        else:
+            self.focused.clear()
+
+    def _run(self):
+        try:
+            fd = self.display.fileno()
+            while not self.closed:
+                readable, _, _ = select.select([fd], [], [], 0.5)
+                if not readable:
+                    continue
+                while self.display.pending_events():
+                    event = self.display.next_event()
+                    if event.type == X.PropertyNotify and event.atom == self.atom:
+                        self._update(self._read_active())
+        except Exception as e:
+            self.log(f"焦点监听已停止: {e}")
+            self.unwatch()
+        finally:
+            self.display.close()
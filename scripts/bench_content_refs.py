@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Wire size and JSON cost of correction rounds with and without content references.
+
+Simulates the solve/correct loop: the server sends code_solution, then each round
+the extension reports test_results with the editor code and the server answers with
+code_revision that changes a few lines. With content_refs the code fields are replaced
+by a hash (code the peer already holds) or a line diff against a recent version.
+
+"ms" is the best of --repeat runs of encoding, JSON round-tripping and decoding every message
+of the conversation; generating the conversation itself is not timed.
+
+Example:
+    python scripts/bench_content_refs.py --lines 400 --rounds 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "OJAssistant"))
+
+from core.content_refs import ContentRefs  # noqa: E402
+
+
+def make_code(lines: int, rng: random.Random) -> str:
+    body = [f"    int v{i} = compute({i}, {rng.randint(0, 999)}); // 第{i}步" for i in range(lines)]
+    return "#include <stdio.h>\nint main() {\n" + "\n".join(body) + "\n    return 0;\n}\n"
+
+
+def revise(code: str, edits: int, rng: random.Random) -> str:
+    lines = code.split("\n")
+    for _ in range(edits):
+        index = rng.randrange(2, len(lines) - 3)
+        lines[index] = lines[index].replace("compute", "compute_fixed", 1) + " // 修正"
+    return "\n".join(lines)
+
+
+def conversation(lines: int, rounds: int, edits: int, seed: int):
+    """Yields (direction, message type, code) for one solve plus correction rounds."""
+    rng = random.Random(seed)
+    code = make_code(lines, rng)
+    yield "server", "code_solution", code
+    for _ in range(rounds):
+        yield "client", "test_results", code
+        code = revise(code, edits, rng)
+        yield "server", "code_revision", code
+
+
+def build_message(message_type: str, code: str) -> dict:
+    if message_type == "test_results":
+        return {"type": message_type, "results": {"text": "测试集 1\n预期输出: 3\n实际输出: 4\n"},
+                "currentCode": code, "current_code": code, "existing_code": code, "editor_code": code,
+                "has_error": True}
+    field = "code" if message_type == "code_solution" else "revised_code"
+    return {"type": message_type, field: code, "retry_count": 1}
+
+
+def run(messages: list[tuple[str, str, str]], use_refs: bool):
+    server, client = ContentRefs(), ContentRefs()
+    total_bytes = 0
+    started = time.perf_counter()
+    for direction, message_type, code in messages:
+        message = build_message(message_type, code)
+        sender, receiver = (server, client) if direction == "server" else (client, server)
+        if use_refs:
+            field = "current_code" if message_type == "test_results" else \
+                ("code" if message_type == "code_solution" else "revised_code")
+            ref, send_full = sender.encode(code)
+            message["code_ref"] = ref
+            if not send_full:
+                for key in ("currentCode", "current_code", "existing_code", "editor_code", field):
+                    message.pop(key, None)
+        raw = json.dumps(message, ensure_ascii=False)
+        total_bytes += len(raw.encode("utf-8"))
+        decoded = json.loads(raw)
+        if use_refs:
+            text = decoded.get(field)
+            restored = receiver.decode(decoded["code_ref"], text if isinstance(text, str) else None)
+            assert restored == code
+    return total_bytes, (time.perf_counter() - started) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--edits", type=int, default=4, help="lines changed per revision")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per mode (best is reported)")
+    args = parser.parse_args()
+
+    messages = list(conversation(args.lines, args.rounds, args.edits, args.seed))
+    print(f"{'mode':<10}{'wire bytes':>12}{'ms':>10}")
+    baseline = None
+    for name, use_refs in (("full", False), ("refs", True)):
+        runs = [run(messages, use_refs) for _ in range(max(1, args.repeat))]
+        total_bytes, elapsed = runs[0][0], min(ms for _, ms in runs)
+        baseline = baseline or total_bytes
+        print(f"{name:<10}{total_bytes:>12}{elapsed:>10.2f}   ({total_bytes / baseline:.1%} of full)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Microbenchmark for parse-and-dispatch cost per extension message.
+
+Compares the previous if/elif chain (with per-handler alias probing) against the
+precompiled dispatch table with lazily normalized message classes.
+Handlers are no-ops so only parsing, normalization and dispatch are measured;
+both paths make the same handler call per message.
+
+Rounds of both paths are interleaved and the fastest round is reported, so a
+noisy or frequency-scaling machine affects both columns alike.
+
+Example:
+    python scripts/bench_dispatch.py --iterations 2000 --repeat 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "OJAssistant"))
+
+from core.messages import MESSAGE_CLASSES, build_dispatch_table  # noqa: E402
+
+CODE = "#include <stdio.h>\nint main() {\n    int a, b;\n    scanf(\"%d %d\", &a, &b);\n    printf(\"%d\\n\", a + b);\n}\n"
+
+SAMPLES = {
+    "progress_request": {"type": "progress_request"},
+    "ready_for_input": {"type": "ready_for_input", "code": CODE, "is_retry": False, "retry_count": 0},
+    "content": {
+        "type": "educoder_content_auto_input",
+        "content": {"text": "输入两个整数a和b，输出a+b。" * 20, "current_code": CODE, "existing_code": CODE},
+        "current_code": CODE, "existing_code": CODE, "editor_code": CODE,
+        "editor_code_source": "monaco_model", "editor_code_reason": "", "auto_input": True,
+    },
+    "test_results": {
+        "type": "test_results", "results": {"text": "测试集 1\n预期输出: 3\n实际输出: 4\n" * 10},
+        "currentCode": CODE, "current_code": CODE, "existing_code": CODE, "editor_code": CODE,
+        "editor_code_source": "monaco_model", "editor_code_reason": "", "has_error": True,
+    },
+    "unknown": {"type": "debug_ping", "payload": "x"},
+}
+
+
+class NullTarget:
+    """Exposes a no-op handler for every message class."""
+
+    def __init__(self):
+        for message_class in MESSAGE_CLASSES:
+            setattr(self, message_class.handler, self._noop)
+
+    @staticmethod
+    def _noop(websocket, message):
+        return message
+
+
+def legacy_dispatch(raw: str) -> object:
+    """Shape of the previous dispatch: chain of comparisons, each handler re-probing aliases."""
+    handler = NullTarget._noop
+    data = json.loads(raw)
+    if data.get('type') in ('OJ_content_auto_input', 'educoder_content_auto_input'):
+        question_content = data.get('content', {}) or {}
+        existing_code = (data.get('current_code') or data.get('existing_code') or data.get('editor_code')
+                         or question_content.get('current_code') or question_content.get('existing_code') or '')
+        ack = json.dumps({"type": "server_ack", "existing_code_length": len(existing_code)}, ensure_ascii=False)
+        question_content = data.get('content', {})
+        existing_code = (data.get('current_code') or data.get('existing_code') or data.get('editor_code')
+                         or question_content.get('current_code') or question_content.get('existing_code') or '')
+        return handler(None, (ack, question_content.get('text', ''), existing_code))
+    elif data.get('type') == 'test_results':
+        test_results = data.get('results', {})
+        current_code = (data.get('currentCode') or data.get('current_code') or data.get('existing_code')
+                        or data.get('editor_code') or '')
+        return handler(None, (test_results.get('text', ''), current_code, data.get('has_error', False)))
+    elif data.get('type') == 'ready_for_input':
+        return handler(None, (data.get('code', ''), data.get('is_retry', False), data.get('retry_count', 0)))
+    elif data.get('type') == 'direct_input_complete':
+        return handler(None, data)
+    elif data.get('type') == 'progress_request':
+        return handler(None, data)
+    elif data.get('type') == 'speculative_prefetch':
+        return handler(None, data.get('content', {}))
+    elif data.get('type') == 'speculative_cancel':
+        return handler(None, data)
+    else:
+        # 旧实现会把未知消息原样回显
+        return f"服务器回复: {raw}"
+
+
+def make_table_dispatch():
+    table = build_dispatch_table(NullTarget())
+
+    def dispatch(raw: str) -> object:
+        data = json.loads(raw)
+        try:
+            entry = table.get(data.get('type'))
+        except AttributeError:
+            entry = None
+        if entry is None:
+            return None
+        message_class, handler = entry
+        return handler(None, message_class.from_dict(data))
+
+    return dispatch
+
+
+def per_call_ns(func, raw: str, iterations: int) -> float:
+    started = time.perf_counter_ns()
+    for _ in range(iterations):
+        func(raw)
+    return (time.perf_counter_ns() - started) / iterations
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000, help="calls per timed round")
+    parser.add_argument("--repeat", type=int, default=40, help="interleaved rounds; the fastest is reported")
+    args = parser.parse_args()
+
+    table_dispatch = make_table_dispatch()
+    print(f"{'message':<18}{'bytes':>8}{'legacy ns':>12}{'table ns':>12}{'parse-only ns':>15}")
+    for name, sample in SAMPLES.items():
+        raw = json.dumps(sample, ensure_ascii=False)
+        legacy = table = parse_only = float('inf')
+        for _ in range(args.repeat):
+            legacy = min(legacy, per_call_ns(legacy_dispatch, raw, args.iterations))
+            table = min(table, per_call_ns(table_dispatch, raw, args.iterations))
+            parse_only = min(parse_only, per_call_ns(json.loads, raw, args.iterations))
+        print(f"{name:<18}{len(raw.encode('utf-8')):>8}{legacy:>12.0f}{table:>12.0f}{parse_only:>15.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
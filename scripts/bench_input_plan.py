@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Cost of compiling input plans and of the InputSimulator execution path, without a keyboard.
+
+Each solution is compiled once into an InputPlan (utils/input_plan.py) and then driven through
+InputSimulator.begin_typing / execute segment by segment, exactly as the server does, but with a
+RecordingExecutor instead of real key events. The recorded actions are replayed on the editor
+model and compared with the plan's expected result, so the whole path is checked headless.
+
+Reports per profile: compile time, segments per solution, executor overhead per segment (the
+time spent outside key I/O), and whether the recorded input reproduces the code.
+
+Example:
+    python scripts/bench_input_plan.py --repeat 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "OJAssistant"))
+
+from utils.input_plan import InputPlan, NullExecutor, RecordingExecutor  # noqa: E402
+from utils.input_simulator import InputSimulator  # noqa: E402
+from utils.keystroke_planner import PROFILES, same_code  # noqa: E402
+
+LANGUAGES = {".c": "c", ".cpp": "cpp", ".java": "java", ".py": "python"}
+
+
+class QuietGui:
+    """The parts of the GUI InputSimulator touches; no config, so [INPUT] defaults apply."""
+
+    def log(self, message: str) -> None:
+        pass
+
+
+def load_dir(directory: Path) -> list[tuple[str, str, str]]:
+    return [(path.name, LANGUAGES[path.suffix], path.read_text(encoding="utf-8").rstrip("\n"))
+            for path in sorted(directory.iterdir()) if path.suffix in LANGUAGES]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", type=Path, default=ROOT_DIR / "scripts" / "corpus" / "solutions")
+    parser.add_argument("--repeat", type=int, default=10, help="runs per solution and profile")
+    args = parser.parse_args()
+
+    corpus = load_dir(args.dir)
+    print(f"{len(corpus)} solutions, {args.repeat} runs each")
+    print(f"{'profile':<12}{'compile ms':>12}{'segments':>10}{'null us/seg':>13}{'sim us/seg':>12}{'recorded ok':>13}")
+    mismatches = 0
+    for profile in PROFILES:
+        compile_s = null_s = sim_s = 0.0
+        segments_total = recorded_ok = 0
+        for _, language, code in corpus:
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                plan = InputPlan.compile(code, profile, language)
+                compile_s += time.perf_counter() - started
+                segments = plan.segments()
+                segments_total += len(segments)
+
+                null = NullExecutor()
+                started = time.perf_counter()
+                for segment in segments:
+                    null.execute(segment)
+                null_s += time.perf_counter() - started
+
+                recorder = RecordingExecutor()
+                simulator = InputSimulator(QuietGui(), executor=recorder)
+                started = time.perf_counter()
+                simulator.begin_typing()
+                for segment in segments:
+                    simulator.execute(segment)
+                sim_s += time.perf_counter() - started
+                # begin_typing records the editor clear (ctrl+a, delete) before the plan
+                recorded = recorder.actions[2:]
+                recorded_ok += recorded == plan.actions and same_code(plan.result(), code + "\n", language)
+        runs = len(corpus) * args.repeat
+        mismatches += runs - recorded_ok
+        print(f"{profile:<12}{compile_s / runs * 1000:>12.3f}{segments_total / runs:>10.1f}"
+              f"{null_s / segments_total * 1e6:>13.1f}{sim_s / segments_total * 1e6:>12.1f}"
+              f"{recorded_ok:>8}/{runs:<4}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
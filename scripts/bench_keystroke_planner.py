@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Keystrokes needed to type a corpus of solutions into auto-indenting, auto-closing editors.
+
+For every solution and editor profile the planner (utils/keystroke_planner.py) compiles the
+code into an action sequence, which is then replayed on the same editor model to check the
+editor ends up holding the code. The verbatim baseline is what InputSimulator typed before:
+every line as-is plus Enter. "verbatim ok" shows whether that baseline survives the editor's
+auto-indent and bracket completion (it does not: indentation doubles and braces repeat).
+
+--edits N switches to the minimal-edit mode used by correction rounds instead: each solution
+gets N random revisions of 1-3 changed, inserted or deleted lines. InputPlan.compile_edit plans
+the edit from the original to the revision, the plan is replayed on the editor model starting
+from the original text and checked with same_code, and its keystrokes are compared with clearing
+the editor and retyping the revision. "fallback" counts revisions where compile_edit declined
+and the simulator would retype in full.
+
+The corpus is scripts/corpus/solutions by default. Use --dir for any directory of sources,
+or --jobs-db for the solutions the assistant actually generated (jobs.db in the data dir).
+
+Example:
+    python scripts/bench_keystroke_planner.py
+    python scripts/bench_keystroke_planner.py --jobs-db ~/.config/OJAssistant/jobs.db --limit 200
+    python scripts/bench_keystroke_planner.py --edits 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "OJAssistant"))
+
+from utils.input_plan import InputPlan  # noqa: E402
+from utils.keystroke_planner import (  # noqa: E402
+    PROFILES, count_keystrokes, plan, replay, same_code, verbatim_actions,
+)
+
+LANGUAGES = {".c": "c", ".h": "c", ".cpp": "cpp", ".cc": "cpp", ".java": "java", ".py": "python"}
+
+
+def load_dir(directory: Path) -> list[tuple[str, str, str]]:
+    corpus = []
+    for path in sorted(directory.iterdir()):
+        language = LANGUAGES.get(path.suffix.lower())
+        if language:
+            corpus.append((path.name, language, path.read_text(encoding="utf-8").rstrip("\n")))
+    return corpus
+
+
+def load_jobs(db_path: Path, limit: int) -> list[tuple[str, str, str]]:
+    conn = sqlite3.connect(str(db_path))
+    try:
+        rows = conn.execute(
+            "SELECT job_id, language, result FROM jobs WHERE result IS NOT NULL ORDER BY created_at DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+    finally:
+        conn.close()
+    # result holds the generated code as stored by JobQueue.transition(..., result=code)
+    return [(job_id, language or "c", result.rstrip("\n")) for job_id, language, result in rows if result.strip()]
+
+
+def revise(code: str, language: str, rng: random.Random) -> str:
+    """A correction-sized revision: 1-3 lines changed, duplicated elsewhere or deleted."""
+    lines = code.split("\n")
+    comment = "  # fix" if language == "python" else "  // fix"
+    for _ in range(rng.randint(1, 3)):
+        index = rng.randrange(len(lines))
+        kind = rng.choice("cid") if len(lines) > 1 else "c"
+        if kind == "c":
+            lines[index] = lines[index].rstrip() + comment if lines[index].strip() else lines[index]
+        elif kind == "i":
+            lines.insert(index, lines[rng.randrange(len(lines))])
+        else:
+            del lines[index]
+    return "\n".join(lines)
+
+
+def bench_edits(corpus: list[tuple[str, str, str]], trials: int, seed: int, verbose: bool) -> int:
+    rng = random.Random(seed)
+    revisions = [(label, language, code, revise(code, language, rng))
+                 for label, language, code in corpus for _ in range(trials)]
+    print(f"{len(revisions)} revisions of {len(corpus)} solutions (seed {seed})")
+    print(f"{'profile':<12}{'retype':>10}{'edited':>10}{'saved':>8}{'edit ok':>12}{'fallback':>10}{'plan ms':>9}")
+    failures = []
+    for name in PROFILES:
+        retype = edited = edit_ok = fallbacks = 0
+        elapsed = 0.0
+        for label, language, code, revision in revisions:
+            # the editor holds the previous round's code as typed (with its trailing newline)
+            base = code + "\n"
+            started = time.perf_counter()
+            edit = InputPlan.compile_edit(base, revision, name, language)
+            elapsed += time.perf_counter() - started
+            full = InputPlan.compile(revision, name, language).keystrokes + 2  # ctrl+a, delete
+            retype += full
+            if edit is None:
+                fallbacks += 1
+                edited += full
+                continue
+            ok = same_code(revision + "\n", replay(edit.actions, name, language, base), language)
+            edited += edit.keystrokes
+            edit_ok += ok
+            if not ok:
+                failures.append((name, label))
+            if verbose:
+                print(f"  {name:<12}{label:<40}{full:>7}{edit.keystrokes:>7}{(1 - edit.keystrokes / full) * 100:>7.1f}%"
+                      f"  {'ok' if ok else 'MISMATCH'}")
+        checked = len(revisions) - fallbacks
+        print(f"{name:<12}{retype:>10}{edited:>10}{(1 - edited / retype) * 100:>7.1f}%"
+              f"{edit_ok:>6}/{checked:<5}{fallbacks:>10}{elapsed * 1000:>9.1f}")
+    for name, label in failures:
+        print(f"edit mismatch: {name} {label}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", type=Path, default=ROOT_DIR / "scripts" / "corpus" / "solutions")
+    parser.add_argument("--jobs-db", type=Path, help="read generated solutions from a jobs.db instead")
+    parser.add_argument("--limit", type=int, default=500, help="max jobs to read from --jobs-db")
+    parser.add_argument("--verbose", action="store_true", help="print one row per solution")
+    parser.add_argument("--edits", type=int, default=0, help="random revisions per solution (minimal-edit mode)")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for --edits")
+    args = parser.parse_args()
+
+    corpus = load_jobs(args.jobs_db, args.limit) if args.jobs_db else load_dir(args.dir)
+    if not corpus:
+        print("corpus is empty", file=sys.stderr)
+        return 2
+    if args.edits:
+        return bench_edits(corpus, args.edits, args.seed, args.verbose)
+    print(f"{len(corpus)} solutions, {sum(code.count(chr(10)) + 1 for _, _, code in corpus)} lines")
+    print(f"{'profile':<12}{'verbatim':>10}{'planned':>10}{'saved':>8}{'plan ok':>9}{'verbatim ok':>13}{'plan ms':>9}")
+    failures = []
+    for name in PROFILES:
+        baseline = planned = plan_ok = verbatim_ok = 0
+        elapsed = 0.0
+        for label, language, code in corpus:
+            # InputSimulator receives the code with a trailing newline (one per chunk line)
+            target = code + "\n"
+            started = time.perf_counter()
+            actions, _ = plan(target, name, language)
+            elapsed += time.perf_counter() - started
+            verbatim = count_keystrokes(verbatim_actions(target))
+            keystrokes = count_keystrokes(actions)
+            ok = same_code(target, replay(actions, name, language), language)
+            baseline += verbatim
+            planned += keystrokes
+            plan_ok += ok
+            verbatim_ok += same_code(target, replay(verbatim_actions(target), name, language), language)
+            if not ok:
+                failures.append((name, label))
+            if args.verbose:
+                print(f"  {name:<12}{label:<40}{verbatim:>7}{keystrokes:>7}{(1 - keystrokes / verbatim) * 100:>7.1f}%"
+                      f"  {'ok' if ok else 'MISMATCH'}")
+        print(f"{name:<12}{baseline:>10}{planned:>10}{(1 - planned / baseline) * 100:>7.1f}%"
+              f"{plan_ok:>5}/{len(corpus):<3}{verbatim_ok:>9}/{len(corpus):<3}{elapsed * 1000:>9.1f}")
+    for name, label in failures:
+        print(f"plan mismatch: {name} {label}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Concurrency benchmark for the LLM backend layer using the in-process mock backend.
+
+Example:
+    python scripts/bench_llm_backend.py --requests 500 --concurrency 100 --mode stream
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import math
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "OJAssistant"))
+
+from core.llm_backend import MockBackend, MockBackendError  # noqa: E402
+
+MESSAGES = [
+    {"role": "system", "content": "你是一个专业的编程助手，负责生成C语言代码。"},
+    {"role": "user", "content": "输入两个整数a和b，输出a+b。"},
+]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def one_request(backend: MockBackend, mode: str) -> tuple[float, float | None, bool]:
+    started = time.perf_counter()
+    first_token = None
+    try:
+        if mode == "stream":
+            stream = backend.stream(MESSAGES)
+            async for _ in stream:
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+        else:
+            await backend.complete(MESSAGES)
+        return time.perf_counter() - started, first_token, True
+    except MockBackendError:
+        return time.perf_counter() - started, first_token, False
+
+
+async def run(args: argparse.Namespace) -> None:
+    backend = MockBackend(
+        first_token_latency=args.first_token_ms / 1000.0,
+        tokens_per_second=args.tps,
+        failure_rate=args.failure_rate,
+        seed=1,
+    )
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded() -> tuple[float, float | None, bool]:
+        async with semaphore:
+            return await one_request(backend, args.mode)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(bounded() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency * 1000 for latency, _, ok in results if ok]
+    first_tokens = [ttft * 1000 for _, ttft, ok in results if ok and ttft is not None]
+    failures = sum(1 for _, _, ok in results if not ok)
+
+    print(f"mode={args.mode} requests={args.requests} concurrency={args.concurrency}")
+    print(f"wall time: {elapsed:.2f}s  throughput: {args.requests / elapsed:.1f} req/s  failures: {failures}")
+    print(f"latency ms: p50={percentile(latencies, 50):.0f} p95={percentile(latencies, 95):.0f} "
+          f"max={max(latencies, default=float('nan')):.0f}")
+    if first_tokens:
+        print(f"first token ms: p50={percentile(first_tokens, 50):.0f} p95={percentile(first_tokens, 95):.0f}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mode", choices=["complete", "stream"], default="complete")
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--tps", type=float, default=80.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Wire-size and codec-time benchmark for the extension protocol on port 8000.
+
+Compares plain JSON text frames with the negotiated binary frames, each with and without
+permessage-deflate (websockets' default 12-bit window vs. the configured 15-bit window),
+for code_solution / code_revision / test_results messages in several size classes.
+
+Example:
+    python scripts/bench_protocol.py --iterations 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+import zlib
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "OJAssistant"))
+
+from core import protocol  # noqa: E402
+
+SIZE_CLASSES = {"1KB": 1024, "8KB": 8 * 1024, "64KB": 64 * 1024, "512KB": 512 * 1024}
+
+
+def make_code(size: int, rng: random.Random) -> str:
+    lines = ["#include <stdio.h>", "#include <string.h>", "", "int main() {"]
+    total = sum(len(line) + 1 for line in lines)
+    i = 0
+    while total < size:
+        line = f'    int value_{i} = compute({rng.randint(0, 999)}, "样例{i % 7}") * {rng.randint(1, 9)};'
+        if i % 5 == 4:
+            line = f'    printf("%d\\n", value_{i - 1});'
+        lines.append(line)
+        total += len(line) + 1
+        i += 1
+    lines.append("}")
+    return "\n".join(lines)
+
+
+def make_test_output(size: int, rng: random.Random) -> str:
+    parts = []
+    total = 0
+    case = 1
+    while total < size:
+        expected = " ".join(str(rng.randint(0, 99)) for _ in range(8))
+        part = f"测试集 {case}\n输入:\n{expected}\n预期输出:\n{expected}\n实际输出:\n{expected[:-2]}\n\n"
+        parts.append(part)
+        total += len(part)
+        case += 1
+    return "".join(parts)
+
+
+def make_messages(size: int, rng: random.Random) -> dict[str, dict]:
+    code = make_code(size, rng)
+    return {
+        "code_solution": {"type": "code_solution", "code": code, "timestamp": "2026-01-01T00:00:00"},
+        "code_revision": {
+            "type": "code_revision", "revised_code": code, "retry_count": 1, "failure_count": 0,
+            "revision_notes": "第1次纠错，修正了测试失败", "timestamp": "2026-01-01T00:00:00",
+        },
+        # 扩展发送的纠错请求会把同一份编辑器代码放在多个别名字段中
+        "test_results": {
+            "type": "test_results",
+            "results": {"text": make_test_output(size // 2, rng), "rawHtml": ""},
+            "currentCode": code, "current_code": code, "existing_code": code, "editor_code": code,
+            "editor_code_source": "monaco_model", "editor_code_reason": "", "has_error": True,
+        },
+    }
+
+
+def deflate_size(payload: bytes, window_bits: int, mem_level: int) -> int:
+    """Size of one permessage-deflate compressed message (no context takeover)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -window_bits, mem_level)
+    data = compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    return len(data) - 4  # the trailing 00 00 ff ff is stripped on the wire
+
+
+def time_per_call(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    print(f"{'class':<7}{'message':<15}{'json':>9}{'binary':>9}{'json+d12':>10}{'json+d15':>10}"
+          f"{'bin+d15':>9}{'json enc/dec us':>17}{'bin enc/dec us':>16}")
+    for label, size in SIZE_CLASSES.items():
+        iterations = max(5, args.iterations * 1024 // size)
+        for kind, message in make_messages(size, rng).items():
+            text = json.dumps(message, ensure_ascii=False).encode("utf-8")
+            binary = protocol.encode_binary_frame(message)
+            assert protocol.decode_binary_frame(binary) == message
+
+            json_enc = time_per_call(lambda: json.dumps(message, ensure_ascii=False).encode("utf-8"), iterations)
+            json_dec = time_per_call(lambda: json.loads(text.decode("utf-8")), iterations)
+            bin_enc = time_per_call(lambda: protocol.encode_binary_frame(message), iterations)
+            bin_dec = time_per_call(lambda: protocol.decode_binary_frame(binary), iterations)
+
+            print(f"{label:<7}{kind:<15}{len(text):>9}{len(binary):>9}"
+                  f"{deflate_size(text, 12, 5):>10}{deflate_size(text, 15, 8):>10}{deflate_size(binary, 15, 8):>9}"
+                  f"{f'{json_enc:.0f}/{json_dec:.0f}':>17}{f'{bin_enc:.0f}/{bin_dec:.0f}':>16}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
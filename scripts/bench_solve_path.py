@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""End-to-end solve-path benchmark: extension protocol -> ServerManager -> OJAssistant -> model.
+
+Start the bundled mock model server, add a custom model pointing at it in the GUI
+(base URL http://127.0.0.1:8100/v1, model mock-coder), start the WebSocket server, then run:
+
+    python -m core.mock_llm_server --port 8100 --profile typical   # from OJAssistant/
+    python scripts/bench_solve_path.py --requests 20 --concurrency 5
+
+Each client sends educoder_content_auto_input and measures the time until the
+server_ack and the code_solution arrive. Typing is never triggered.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import time
+
+import websockets
+
+QUESTION = "输入两个整数a和b，输出a+b。\n样例输入：1 2\n样例输出：3"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def one_solve(uri: str, index: int, timeout: float) -> tuple[float | None, float | None, str | None]:
+    started = time.perf_counter()
+    ack_at = None
+    async with websockets.connect(uri, max_size=None) as websocket:
+        await websocket.send(json.dumps({
+            "type": "educoder_content_auto_input",
+            "content": {"text": f"{QUESTION}\n(bench #{index})"},
+            "existing_code": "",
+            "auto_input": False,
+        }, ensure_ascii=False))
+
+        deadline = started + timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return ack_at, None, "timeout"
+            raw = await asyncio.wait_for(websocket.recv(), remaining)
+            if isinstance(raw, bytes):
+                continue
+            try:
+                data = json.loads(raw)
+            except json.JSONDecodeError:
+                # 生成失败时服务器回复纯文本
+                if raw.startswith(("代码生成失败", "处理失败", "未找到有效的题目内容")):
+                    return ack_at, None, raw
+                continue
+            kind = data.get("type")
+            if kind == "server_ack" and ack_at is None:
+                ack_at = time.perf_counter() - started
+            elif kind == "code_solution":
+                return ack_at, time.perf_counter() - started, None
+
+
+async def run(args: argparse.Namespace) -> None:
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(index: int):
+        async with semaphore:
+            try:
+                return await one_solve(args.uri, index, args.timeout)
+            except (OSError, asyncio.TimeoutError, websockets.exceptions.WebSocketException) as e:
+                return None, None, str(e) or type(e).__name__
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(bounded(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    acks = [ack * 1000 for ack, _, _ in results if ack is not None]
+    solves = [solve * 1000 for _, solve, error in results if solve is not None and error is None]
+    errors = [error for _, _, error in results if error]
+
+    print(f"uri={args.uri} requests={args.requests} concurrency={args.concurrency}")
+    print(f"wall time: {elapsed:.2f}s  completed: {len(solves)}  errors: {len(errors)}")
+    if acks:
+        print(f"server_ack ms: p50={percentile(acks, 50):.0f} p95={percentile(acks, 95):.0f}")
+    if solves:
+        print(f"code_solution ms: p50={percentile(solves, 50):.0f} p95={percentile(solves, 95):.0f} "
+              f"max={max(solves):.0f}")
+    for error in sorted(set(errors)):
+        print(f"  error x{errors.count(error)}: {error}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="ws://localhost:8000")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""Typing throughput of the Linux input paths: one xdotool process per call vs a persistent XTest connection.
+
+Types a generated C solution line by line the way InputSimulator.simulate_typing does
+(text of the line, then Enter, then the newline pause) and reports chars/s and the
+fixed overhead per line. Keystrokes go to whatever window has focus, so run it on a
+throwaway display:
+
+    xvfb-run -a python scripts/bench_x11_input.py --lines 200
+    python scripts/bench_x11_input.py --backend xtest --key-delay-ms 0
+
+With --verify the keystrokes go to a Tk text window opened by the benchmark and the
+received text is compared with what was typed, so the numbers come with a correctness
+check. --focus-check measures how quickly FocusWatcher notices _NET_ACTIVE_WINDOW
+changes; Xvfb has no window manager, so the benchmark sets the property itself:
+
+    xvfb-run -a python scripts/bench_x11_input.py --verify --focus-check
+
+The xdotool backend matches the current defaults: `xdotool type --delay 1` per line,
+`xdotool key Return` per newline and a 50 ms pause after each newline.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "OJAssistant"))
+
+from utils.x11_input import FocusWatcher, XTestKeyboard  # noqa: E402
+
+
+def make_code(lines: int) -> list[str]:
+    body = []
+    for i in range(max(lines - 6, 1)):
+        comment = f" // 第{i}项" if i % 10 == 9 else ""  # non-ASCII goes through the spare-keycode remap
+        body.append(f"    total += values[{i}] * {i % 7};{comment}")
+    return ["#include <stdio.h>", "int main(void) {", "    int values[1024] = {0};", "    long total = 0;"] + \
+        body + ["    printf(\"%ld\\n\", total);", "}"]
+
+
+class XdotoolBackend:
+    name = "xdotool"
+
+    def __init__(self, key_delay_ms: int, newline_delay_ms: float):
+        self.path = shutil.which("xdotool")
+        if not self.path:
+            raise RuntimeError("xdotool not installed")
+        self.key_delay_ms = key_delay_ms
+        self.newline_delay = newline_delay_ms / 1000.0
+
+    def type_text(self, text: str) -> None:
+        subprocess.run([self.path, "type", "--clearmodifiers", "--delay", str(self.key_delay_ms), "--", text],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    def press_enter(self) -> None:
+        subprocess.run([self.path, "key", "--clearmodifiers", "Return"],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    def close(self) -> None:
+        pass
+
+
+class XTestBackend:
+    name = "xtest"
+
+    def __init__(self, key_delay_ms: int, newline_delay_ms: float):
+        self.keyboard = XTestKeyboard(key_delay=key_delay_ms / 1000.0)
+        self.newline_delay = newline_delay_ms / 1000.0
+
+    def type_text(self, text: str) -> None:
+        self.keyboard.type_text(text)
+
+    def press_enter(self) -> None:
+        self.keyboard.press_key("enter")
+
+    def close(self) -> None:
+        self.keyboard.close()
+
+
+class TextTarget:
+    """A focused Tk text window that receives the keystrokes."""
+
+    def __init__(self):
+        import tkinter as tk
+
+        self.root = tk.Tk()
+        self.root.title("bench_x11_input")
+        self.text = tk.Text(self.root, width=120, height=40)
+        self.text.pack()
+        self.root.update()
+        self.reset()
+
+    def reset(self) -> None:
+        self.text.delete("1.0", "end")
+        self.text.focus_force()
+        self.pump()
+
+    def pump(self, seconds: float = 0.0) -> None:
+        deadline = time.perf_counter() + seconds
+        while True:
+            self.root.update()
+            if time.perf_counter() >= deadline:
+                return
+            time.sleep(0.005)
+
+    def received(self) -> str:
+        self.pump(0.3)
+        return self.text.get("1.0", "end-1c")
+
+    def close(self) -> None:
+        self.root.destroy()
+
+
+def run(backend, lines: list[str], target: TextTarget | None = None) -> dict:
+    chars = 0
+    started = time.perf_counter()
+    for index, line in enumerate(lines):
+        if line:
+            backend.type_text(line)
+            chars += len(line)
+        if index < len(lines) - 1:
+            backend.press_enter()
+            if backend.newline_delay:
+                time.sleep(backend.newline_delay)
+        if target is not None:
+            target.pump()
+    elapsed = time.perf_counter() - started
+
+    result = {"elapsed": elapsed, "chars": chars}
+    if target is not None:
+        expected = "\n".join(lines)
+        received = target.received()
+        result["ok"] = received == expected
+        if not result["ok"]:
+            mismatch = next((i for i, (a, b) in enumerate(zip(received, expected)) if a != b),
+                            min(len(received), len(expected)))
+            result["mismatch"] = f"first difference at char {mismatch}: got {received[mismatch:mismatch + 20]!r}, " \
+                                 f"expected {expected[mismatch:mismatch + 20]!r} ({len(received)}/{len(expected)} chars)"
+        target.reset()
+
+    # fixed cost of one call, independent of text length
+    probes = 20
+    probe_started = time.perf_counter()
+    for _ in range(probes):
+        backend.type_text("x")
+    result["per_call_ms"] = (time.perf_counter() - probe_started) / probes * 1000
+    if target is not None:
+        target.reset()
+    return result
+
+
+def focus_check(rounds: int) -> None:
+    """Switch _NET_ACTIVE_WINDOW away from and back to a watched window and time FocusWatcher's reaction."""
+    from Xlib import X, Xatom, display as xdisplay
+
+    conn = xdisplay.Display()
+    root = conn.screen().root
+    atom = conn.intern_atom("_NET_ACTIVE_WINDOW")
+    target, other = 0x1000001, 0x1000002
+
+    def activate(window: int) -> None:
+        root.change_property(atom, Xatom.WINDOW, 32, [window], X.PropModeReplace)
+        conn.sync()
+
+    def wait(predicate, timeout: float = 1.0) -> float | None:
+        started = time.perf_counter()
+        while time.perf_counter() - started < timeout:
+            if predicate():
+                return (time.perf_counter() - started) * 1000
+            time.sleep(0.0005)
+        return None
+
+    activate(target)
+    watcher = FocusWatcher(log=lambda message: print(message, file=sys.stderr))
+    try:
+        wait(lambda: watcher.active == target)
+        watcher.watch(target)
+        lost, regained = [], []
+        for _ in range(rounds):
+            activate(other)
+            lost.append(wait(lambda: not watcher.has_focus))
+            activate(target)
+            regained.append(wait(lambda: watcher.has_focus))
+        missed = sum(value is None for value in lost + regained)
+        lost_ms = sorted(value for value in lost if value is not None)
+        regained_ms = sorted(value for value in regained if value is not None)
+        print(f"focus watcher: {rounds} switches, missed {missed}, "
+              f"lost p50 {lost_ms[len(lost_ms) // 2] if lost_ms else float('nan'):.2f} ms "
+              f"max {max(lost_ms, default=float('nan')):.2f} ms, "
+              f"regained p50 {regained_ms[len(regained_ms) // 2] if regained_ms else float('nan'):.2f} ms "
+              f"max {max(regained_ms, default=float('nan')):.2f} ms, stats {watcher.stats}")
+    finally:
+        watcher.close()
+        root.delete_property(atom)
+        conn.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--backend", choices=("all", "xdotool", "xtest"), default="all")
+    parser.add_argument("--key-delay-ms", type=int, default=1, help="pause between keystrokes (xdotool --delay)")
+    parser.add_argument("--xdotool-newline-ms", type=float, default=50)
+    parser.add_argument("--xtest-newline-ms", type=float, default=0)
+    parser.add_argument("--verify", action="store_true", help="type into a Tk text window and compare the result")
+    parser.add_argument("--focus-check", action="store_true", help="time FocusWatcher on _NET_ACTIVE_WINDOW changes")
+    parser.add_argument("--focus-rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    if not os.getenv("DISPLAY"):
+        print("DISPLAY is not set; run under an X session or xvfb-run", file=sys.stderr)
+        return 2
+
+    lines = make_code(args.lines)
+    candidates = [("xdotool", XdotoolBackend, args.xdotool_newline_ms), ("xtest", XTestBackend, args.xtest_newline_ms)]
+    target = TextTarget() if args.verify else None
+    print(f"{len(lines)} lines, {sum(len(line) for line in lines)} chars, key delay {args.key_delay_ms} ms")
+    verified_header = f"{'verified':>10}" if target else ""
+    print(f"{'backend':<10}{'total s':>10}{'chars/s':>10}{'ms/line':>10}{'ms/call':>10}{verified_header}")
+    for name, backend_class, newline_ms in candidates:
+        if args.backend not in ("all", name):
+            continue
+        try:
+            backend = backend_class(args.key_delay_ms, newline_ms)
+        except Exception as e:
+            print(f"{name:<10}unavailable: {e}")
+            continue
+        try:
+            result = run(backend, lines, target)
+        finally:
+            backend.close()
+        verified = f"{'ok' if result['ok'] else 'MISMATCH':>10}" if target else ""
+        print(f"{name:<10}{result['elapsed']:>10.2f}{result['chars'] / result['elapsed']:>10.0f}"
+              f"{result['elapsed'] / len(lines) * 1000:>10.1f}{result['per_call_ms']:>10.2f}{verified}")
+        if target and not result["ok"]:
+            print(f"{'':<10}{result['mismatch']}")
+    if target:
+        target.close()
+    if args.focus_check:
+        focus_check(args.focus_rounds)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,37 @@
+from collections import deque
+import sys
+
+
+def shortest_path(grid, start, goal):
+    rows, cols = len(grid), len(grid[0])
+    dist = [[-1] * cols for _ in range(rows)]
+    queue = deque([start])
+    dist[start[0]][start[1]] = 0
+    while queue:
+        r, c = queue.popleft()
+        if (r, c) == goal:
+            return dist[r][c]
+        for dr, dc in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < rows and 0 <= nc < cols and grid[nr][nc] != '#' and dist[nr][nc] < 0:
+                dist[nr][nc] = dist[r][c] + 1
+                queue.append((nr, nc))
+    return -1
+
+
+def main():
+    data = sys.stdin.read().split()
+    n, m = int(data[0]), int(data[1])
+    grid = data[2:2 + n]
+    start = goal = None
+    for i, row in enumerate(grid):
+        for j, ch in enumerate(row):
+            if ch == 'S':
+                start = (i, j)
+            elif ch == 'E':
+                goal = (i, j)
+    print(shortest_path(grid, start, goal))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+def solve():
+    n, capacity = map(int, input().split())
+    items = []
+    for _ in range(n):
+        weight, value = map(int, input().split())
+        items.append((weight, value))
+    dp = [0] * (capacity + 1)
+    for weight, value in items:
+        for c in range(capacity, weight - 1, -1):
+            if dp[c - weight] + value > dp[c]:
+                dp[c] = dp[c - weight] + value
+    print(dp[capacity])
+
+
+solve()
@@ -0,0 +1,30 @@
+#include <iostream>
+#include <vector>
+#include <algorithm>
+using namespace std;
+
+class Solution {
+public:
+    int lengthOfLIS(vector<int>& nums) {
+        vector<int> tails;
+        for (int x : nums) {
+            auto it = lower_bound(tails.begin(), tails.end(), x);
+            if (it == tails.end()) {
+                tails.push_back(x);
+            } else {
+                *it = x;
+            }
+        }
+        return (int)tails.size();
+    }
+};
+
+int main() {
+    int n;
+    cin >> n;
+    vector<int> a(n);
+    for (auto &x : a) cin >> x;
+    Solution sol;
+    cout << sol.lengthOfLIS(a) << endl;
+    return 0;
+}
@@ -0,0 +1,39 @@
+#include <stdio.h>
+
+int grid[105][105];
+
+int main() {
+    int m, n;
+    scanf("%d%d", &m, &n);
+    for (int i = 0; i < m; i++)
+        for (int j = 0; j < n; j++)
+            scanf("%d", &grid[i][j]);
+
+    int top = 0, bottom = m - 1, left = 0, right = n - 1;
+    int first = 1;
+    while (top <= bottom && left <= right) {
+        for (int j = left; j <= right; j++) {
+            printf(first ? "%d" : " %d", grid[top][j]);
+            first = 0;
+        }
+        top++;
+        for (int i = top; i <= bottom; i++) {
+            printf(" %d", grid[i][right]);
+        }
+        right--;
+        if (top <= bottom) {
+            for (int j = right; j >= left; j--) {
+                printf(" %d", grid[bottom][j]);
+            }
+            bottom--;
+        }
+        if (left <= right) {
+            for (int i = bottom; i >= top; i--) {
+                printf(" %d", grid[i][left]);
+            }
+            left++;
+        }
+    }
+    printf("\n");
+    return 0;
+}
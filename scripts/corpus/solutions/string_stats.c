@@ -0,0 +1,30 @@
+#include <stdio.h>
+#include <string.h>
+#include <ctype.h>
+
+int main() {
+    char line[1005];
+    int letters = 0, digits = 0, spaces = 0, others = 0;
+    if (fgets(line, sizeof(line), stdin) == NULL) {
+        return 0;
+    }
+    size_t len = strlen(line);
+    if (len > 0 && line[len - 1] == '\n') {
+        line[--len] = '\0';
+    }
+    for (size_t i = 0; i < len; i++) {
+        char c = line[i];
+        if (isalpha((unsigned char)c)) {
+            letters++;
+        } else if (isdigit((unsigned char)c)) {
+            digits++;
+        } else if (c == ' ') {
+            spaces++;
+        } else {
+            others++;
+        }
+    }
+    // 按题目要求的格式输出
+    printf("letters=%d, digits=%d, spaces=%d, others=%d\n", letters, digits, spaces, others);
+    return 0;
+}
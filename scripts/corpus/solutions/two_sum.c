@@ -0,0 +1,46 @@
+#include <stdio.h>
+#include <stdlib.h>
+
+typedef struct {
+    int value;
+    int index;
+} Item;
+
+int cmp(const void *a, const void *b) {
+    const Item *x = (const Item *)a;
+    const Item *y = (const Item *)b;
+    if (x->value != y->value) {
+        return x->value < y->value ? -1 : 1;
+    }
+    return x->index - y->index;
+}
+
+int main(void) {
+    int n, target;
+    if (scanf("%d %d", &n, &target) != 2) {
+        return 0;
+    }
+    Item *items = (Item *)malloc(sizeof(Item) * n);
+    for (int i = 0; i < n; i++) {
+        scanf("%d", &items[i].value);
+        items[i].index = i;
+    }
+    qsort(items, n, sizeof(Item), cmp);
+    int left = 0, right = n - 1;
+    while (left < right) {
+        int sum = items[left].value + items[right].value;
+        if (sum == target) {
+            int a = items[left].index, b = items[right].index;
+            printf("%d %d\n", a < b ? a : b, a < b ? b : a);
+            free(items);
+            return 0;
+        } else if (sum < target) {
+            left++;
+        } else {
+            right--;
+        }
+    }
+    printf("-1\n");
+    free(items);
+    return 0;
+}
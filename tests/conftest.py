@@ -0,0 +1,25 @@
+"""Shared setup for the test suite: make the OJAssistant package importable and expose the corpus."""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "OJAssistant"))
+
+CORPUS_DIR = ROOT / "scripts" / "corpus" / "solutions"
+LANGUAGES = {".c": "c", ".cpp": "cpp", ".java": "java", ".py": "python"}
+
+
+def load_corpus() -> list[tuple[str, str, str]]:
+    """(file name, language, code) for every solution in scripts/corpus/solutions."""
+    return [(path.name, LANGUAGES[path.suffix], path.read_text(encoding="utf-8").rstrip("\n"))
+            for path in sorted(CORPUS_DIR.iterdir()) if path.suffix in LANGUAGES]
+
+
+@pytest.fixture(scope="session")
+def corpus() -> list[tuple[str, str, str]]:
+    return load_corpus()
@@ -0,0 +1,117 @@
+"""An editor that does nothing on its own, written independently of utils/keystroke_planner.py.
+
+It behaves like a browser <textarea>: a text buffer, a caret, a selection anchor and the column
+Up/Down try to keep. Replaying planned actions here checks the cursor and selection keys the
+planner emits against real textarea semantics instead of against the planner's own EditorModel.
+"""
+
+from __future__ import annotations
+
+import random
+
+
+class PlainEditor:
+    def __init__(self, text: str = ""):
+        self.text = text
+        self.caret = 0
+        self.anchor = None  # start of the selection, None when nothing is selected
+        self.goal = None  # column kept across consecutive Up/Down presses
+
+    def run(self, actions) -> str:
+        for kind, value in actions:
+            if kind == "type":
+                for char in value:
+                    self.insert(char)
+            else:
+                self.press(value)
+        return self.text
+
+    def insert(self, char: str) -> None:
+        self.delete_selection()
+        self.text = self.text[:self.caret] + char + self.text[self.caret:]
+        self.caret += 1
+        self.goal = None
+
+    def press(self, key: str) -> None:
+        shift = key.startswith("ctrl+shift+") or key.startswith("shift+")
+        name = key.rsplit("+", 1)[-1]
+        if key == "enter":
+            self.insert("\n")
+        elif key in ("backspace", "delete"):
+            if not self.delete_selection():
+                if key == "backspace" and self.caret:
+                    self.text = self.text[:self.caret - 1] + self.text[self.caret:]
+                    self.caret -= 1
+                elif key == "delete":
+                    self.text = self.text[:self.caret] + self.text[self.caret + 1:]
+            self.goal = None
+        elif name in ("home", "end", "down"):
+            if shift and self.anchor is None:
+                self.anchor = self.caret
+            elif not shift:
+                self.anchor = None
+            if name == "down":
+                self.move_down()
+            elif key.startswith("ctrl+"):
+                self.caret = 0 if name == "home" else len(self.text)
+                self.goal = None
+            else:
+                newline = self.text.find("\n", self.caret)
+                self.caret = len(self.text) if newline < 0 else newline
+                self.goal = None
+        else:
+            raise ValueError(f"unsupported key: {key}")
+
+    def move_down(self) -> None:
+        line_start = self.text.rfind("\n", 0, self.caret) + 1
+        if self.goal is None:
+            self.goal = self.caret - line_start
+        newline = self.text.find("\n", self.caret)
+        if newline < 0:
+            self.caret = len(self.text)  # Down on the last line goes to its end
+            return
+        next_end = self.text.find("\n", newline + 1)
+        next_end = len(self.text) if next_end < 0 else next_end
+        self.caret = min(newline + 1 + self.goal, next_end)
+
+    def delete_selection(self) -> bool:
+        if self.anchor is None:
+            return False
+        start, end = sorted((self.anchor, self.caret))
+        self.anchor = None
+        if start == end:
+            return False
+        self.text = self.text[:start] + self.text[end:]
+        self.caret = start
+        return True
+
+
+def lines(text: str) -> list[str]:
+    """Lines without trailing whitespace: the planner leaves whitespace-only lines to the editor."""
+    return [line.rstrip() for line in text.split("\n")]
+
+
+def revise(code: str, rng: random.Random, comment: str = "  // fix") -> str:
+    """A correction-sized random revision: 1-3 lines changed, duplicated, inserted, emptied or deleted."""
+    lines = code.split("\n")
+    for _ in range(rng.randint(1, 3)):
+        index = rng.randrange(len(lines) + 1)
+        kind = rng.choice("cidnb")
+        if kind == "i" or index == len(lines):
+            lines.insert(index, lines[rng.randrange(len(lines))] if lines else "x")
+        elif kind == "c":
+            lines[index] = lines[index].rstrip() + comment if lines[index].strip() else "    " + comment.strip()
+        elif kind == "n":
+            lines.insert(index, "")
+        elif kind == "b":
+            lines[index] = ""
+        elif len(lines) > 1:
+            del lines[index]
+    return "\n".join(lines)
+
+
+def random_text(rng: random.Random, max_lines: int = 8) -> str:
+    """Arbitrary multi-line text, including empty lines, indentation and bracket/quote characters."""
+    alphabet = "ab {}()[]\"';:\t"
+    return "\n".join("".join(rng.choice(alphabet) for _ in range(rng.randint(0, 10)))
+                     for _ in range(rng.randint(0, max_lines)))
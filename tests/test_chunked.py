@@ -0,0 +1,121 @@
+"""Regression tests for core/chunked.py."""
+
+from __future__ import annotations
+
+import hashlib
+import random
+
+import pytest
+
+from core import chunked
+from core.chunked import ChunkAssembler, ChunkError
+from core.protocol import decode_chunk, encode_chunk
+
+
+def split(payload: bytes, chunk_size: int) -> list[bytes]:
+    return [payload[start:start + chunk_size] for start in range(0, len(payload), chunk_size)]
+
+
+def sha256(payload: bytes) -> str:
+    return hashlib.sha256(payload).hexdigest()
+
+
+def test_random_transfers_reassemble_in_any_order():
+    """Chunks arriving in any order, with duplicates, through the chunk frame codec rebuild the message."""
+    rng = random.Random(3400)
+    assembler = ChunkAssembler(max_chunk_size=64)
+    for transfer_id in range(300):
+        payload = rng.randbytes(rng.randint(1, 1000))
+        chunk_size = rng.randint(1, 64)
+        chunks = list(enumerate(split(payload, chunk_size)))
+        chunks += rng.sample(chunks, rng.randint(0, min(3, len(chunks) - 1)))  # redelivered chunks
+        rng.shuffle(chunks)
+        while chunks[-1][0] in {index for index, _ in chunks[:-1]}:
+            rng.shuffle(chunks)  # the last frame must be the first copy of the final missing chunk
+        assembler.begin('conn', 'owner', transfer_id, len(payload), chunk_size, sha256(payload).upper(),
+                        rng.choice(('json', 'binary')))
+        result = None
+        for position, (index, data) in enumerate(chunks):
+            frame_id, frame_index, view = decode_chunk(encode_chunk(transfer_id, index, data))
+            assert (frame_id, frame_index) == (transfer_id, index)
+            result = assembler.add('conn', frame_id, frame_index, view)
+            if position < len(chunks) - 1:
+                assert result is None
+        assert result is not None and bytes(result[1]) == payload
+    assert assembler.stats['completed'] == 300 and assembler.stats['failed'] == 0
+    assert assembler.transfers == {} and assembler.owner_bytes == {}
+
+
+def test_hash_mismatch_fails_and_releases_memory():
+    assembler = ChunkAssembler()
+    assembler.begin('conn', 'owner', 1, 4, 2, sha256(b'abcd'))
+    assembler.add('conn', 1, 0, b'ab')
+    with pytest.raises(ChunkError):
+        assembler.add('conn', 1, 1, b'xx')
+    assert assembler.stats['failed'] == 1 and assembler.owner_bytes == {}
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'total_size': 0},
+    {'total_size': 101},
+    {'chunk_size': 0},
+    {'chunk_size': 17},
+    {'sha256': 'abc'},
+    {'encoding': 'xml'},
+])
+def test_begin_rejects_invalid_transfers(kwargs):
+    assembler = ChunkAssembler(max_transfer_size=100, max_chunk_size=16)
+    args = {'total_size': 10, 'chunk_size': 4, 'sha256': sha256(b'x' * 10), 'encoding': 'json', **kwargs}
+    with pytest.raises(ChunkError):
+        assembler.begin('conn', 'owner', 1, **args)
+    assert assembler.stats['rejected'] == 1
+    assert assembler.add('conn', 1, 0, b'xxxx') is None  # later chunks of a rejected transfer are dropped
+    assert assembler.stats['discarded_chunks'] == 1
+
+
+def test_owner_memory_cap_is_shared_across_connections():
+    assembler = ChunkAssembler(owner_memory_cap=100)
+    assembler.begin('tab-1', 'session', 1, 60, 10, sha256(b'x' * 60))
+    with pytest.raises(ChunkError):
+        assembler.begin('tab-2', 'session', 1, 50, 10, sha256(b'x' * 50))
+    assembler.begin('tab-2', 'other', 1, 50, 10, sha256(b'x' * 50))
+    assembler.drop_connection('tab-1')
+    assert assembler.owner_bytes == {'other': 50}
+    assembler.begin('tab-2', 'session', 2, 50, 10, sha256(b'x' * 50))
+    assert assembler.owner_bytes == {'other': 50, 'session': 50}
+
+
+def test_bad_chunks_fail_the_transfer():
+    assembler = ChunkAssembler()
+    payload = b'abcdefghij'
+    assembler.begin('conn', 'owner', 1, len(payload), 4, sha256(payload))
+    with pytest.raises(ChunkError):
+        assembler.add('conn', 1, 2, b'ijk')  # the last chunk is 2 bytes
+    assert assembler.add('conn', 1, 0, b'abcd') is None and assembler.stats['discarded_chunks'] == 1
+    assembler.begin('conn', 'owner', 2, len(payload), 4, sha256(payload))
+    with pytest.raises(ChunkError):
+        assembler.add('conn', 2, 3, b'')
+    with pytest.raises(ChunkError):
+        assembler.add('conn', 99, 0, b'abcd')  # never announced
+    assert assembler.owner_bytes == {}
+
+
+def test_duplicate_transfer_id_fails_both():
+    assembler = ChunkAssembler()
+    assembler.begin('conn', 'owner', 1, 8, 4, sha256(b'x' * 8))
+    with pytest.raises(ChunkError):
+        assembler.begin('conn', 'owner', 1, 8, 4, sha256(b'x' * 8))
+    assert assembler.transfers == {} and assembler.owner_bytes == {}
+    assembler.begin('other', 'owner', 1, 8, 4, sha256(b'x' * 8))  # ids are per connection
+
+
+def test_stale_transfers_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(chunked.time, 'monotonic', lambda: now[0])
+    assembler = ChunkAssembler(timeout=60, owner_memory_cap=10)
+    assembler.begin('conn', 'owner', 1, 10, 5, sha256(b'x' * 10))
+    now[0] += 61
+    assembler.begin('conn', 'owner', 2, 10, 5, sha256(b'y' * 10))  # the expired transfer freed the cap
+    assert assembler.add('conn', 1, 0, b'xxxxx') is None
+    assert assembler.add('conn', 2, 0, b'yyyyy') is None
+    assert bytes(assembler.add('conn', 2, 1, b'yyyyy')[1]) == b'y' * 10
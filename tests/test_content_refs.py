@@ -0,0 +1,136 @@
+"""Regression tests for core/content_refs.py."""
+
+from __future__ import annotations
+
+import json
+import random
+
+import pytest
+
+from core.content_refs import (
+    MIN_REF_CHARS, PEER_CAPACITY, ContentMiss, ContentRefs, _matching_blocks, apply_ops, content_hash, diff_lines,
+)
+from plain_editor import revise
+
+
+def random_lines(rng: random.Random, count: int) -> list[str]:
+    """Lines from a small vocabulary, so that repeated lines (braces, blanks) are common as in real code."""
+    vocabulary = ["", "}", "{", "    return 0;", "x += 1;", "if (x) {"] + [f"line {n}" for n in range(30)]
+    return [rng.choice(vocabulary) for _ in range(count)]
+
+
+def mutate(rng: random.Random, lines: list[str]) -> list[str]:
+    lines = list(lines)
+    for _ in range(rng.randint(0, 6)):
+        index = rng.randint(0, len(lines))
+        kind = rng.random()
+        if kind < 0.3 or not lines:
+            lines[index:index] = random_lines(rng, rng.randint(1, 4))
+        elif kind < 0.6:
+            del lines[index:index + rng.randint(1, 4)]
+        elif kind < 0.8 and index < len(lines):
+            lines[index] = rng.choice(random_lines(rng, 1) + ["changed"])
+        else:
+            start = rng.randrange(len(lines))
+            lines[index:index] = lines[start:start + rng.randint(1, 5)]  # moved or duplicated block
+    return lines
+
+
+def test_diff_round_trip_random(corpus):
+    """apply_ops(base, diff_lines(base, text)) == text, with sorted non-overlapping ops and genuine matches."""
+    rng = random.Random(3500)
+    pairs = [(code, revise(code, rng)) for _, _, code in corpus for _ in range(20)]
+    for _ in range(2000):
+        base = random_lines(rng, rng.randint(0, 40))
+        text = mutate(rng, base) if rng.random() < 0.8 else random_lines(rng, rng.randint(0, 40))
+        pairs.append(("\n".join(base), "\n".join(text)))
+    for base, text in pairs:
+        ops = diff_lines(base, text)
+        assert apply_ops(base, ops) == text, (base, text)
+        starts = [start for start, _, _ in ops]
+        assert all(a[0] + a[1] <= b[0] for a, b in zip(ops, ops[1:])), ops
+        assert starts == sorted(starts)
+        a, b = base.split("\n"), text.split("\n")
+        last_i = last_j = 0
+        for i, j, count in _matching_blocks(a, b):
+            assert i >= last_i and j >= last_j and a[i:i + count] == b[j:j + count]
+            last_i, last_j = i + count, j + count
+
+
+def test_diff_of_small_revision_is_small(corpus):
+    """Patience diffs are not minimal, but a correction-sized revision stays well under the half-text cut-off."""
+    rng = random.Random(3501)
+    for label, _, code in corpus:
+        for _ in range(50):
+            revision = revise(code, rng)
+            ops = diff_lines(code, revision)
+            assert len(json.dumps(ops, ensure_ascii=False)) < len(revision) // 2, label
+            assert sum(len(new) for _, _, new in ops) <= 8, label  # 3 changed lines, hunks may widen around them
+    assert diff_lines("a\nb\nc", "a\nb\nc") == []
+
+
+def test_apply_ops_rejects_out_of_range():
+    with pytest.raises(ValueError):
+        apply_ops("a\nb", [[1, 5, []]])
+    with pytest.raises(ValueError):
+        apply_ops("a\nb\nc", [[1, 2, []], [2, 1, []]])  # overlapping
+
+
+def test_peers_stay_in_sync_over_random_revisions(corpus):
+    """A server and an extension exchanging random revisions (and reverts) never miss a reference."""
+    rng = random.Random(3502)
+    server = ContentRefs()
+    extension = ContentRefs(max_entries=PEER_CAPACITY)
+    history = []
+    for _ in range(600):
+        if history and rng.random() < 0.2:
+            text = rng.choice(history[-PEER_CAPACITY // 2:])  # resend a recent version
+        elif history and rng.random() < 0.7:
+            text = revise(history[-1], rng)
+        else:
+            text = rng.choice(corpus)[2] + "\n// " + str(rng.random())
+        history.append(text)
+        ref, send_full = server.encode(text)
+        assert extension.decode(ref, text if send_full else None) == text
+        assert ref["hash"] == content_hash(text)
+    stats = server.stats
+    assert stats["sent_ref"] and stats["sent_diff"] and stats["sent_full"] and stats["chars_saved"] > 0
+    assert extension.stats["misses"] == 0
+
+
+def test_short_texts_are_sent_in_full():
+    refs = ContentRefs()
+    text = "x" * (MIN_REF_CHARS - 1)
+    assert refs.encode(text) == ({"hash": content_hash(text)}, True)
+    assert refs.encode(text) == ({"hash": content_hash(text)}, True)
+
+
+def test_decode_misses_and_bad_hashes():
+    refs = ContentRefs()
+    with pytest.raises(ContentMiss):
+        refs.decode({"hash": "0" * 32})
+    with pytest.raises(ContentMiss):
+        refs.decode({"hash": "0" * 32, "base": "1" * 32, "ops": []})
+    with pytest.raises(ValueError):
+        refs.decode({})
+    base = refs.add("a\nb")
+    with pytest.raises(ValueError):
+        refs.decode({"hash": "0" * 32, "base": base, "ops": [[1, 1, ["c"]]]})
+    assert refs.decode({"hash": content_hash("a\nc"), "base": base, "ops": [[1, 1, ["c"]]]}) == "a\nc"
+    # a full text with a stale hash is stored under its real hash
+    assert refs.decode({"hash": "0" * 32}, "full") == "full"
+    assert refs.get(content_hash("full")) == "full" and refs.get("0" * 32) is None
+    assert refs.stats["misses"] == 2 and refs.stats["received_diff"] == 1
+
+
+def test_store_limits_and_peer_reset():
+    refs = ContentRefs(max_entries=3, max_chars=10)
+    ids = [refs.add(text) for text in ("aaaa", "bbbb", "cc")]
+    assert list(refs.texts) == ids
+    refs.add("dddd")  # 14 characters: the oldest goes
+    assert list(refs.texts) == ids[1:] + [content_hash("dddd")]
+    assert refs.total_chars == 10 and "aaaa" not in refs.ids
+    refs.add("e" * 50)  # the newest entry is always kept
+    assert list(refs.texts) == [content_hash("e" * 50)]
+    refs.reset_peer(["h%d" % n for n in range(PEER_CAPACITY + 4)] + [None])
+    assert list(refs.peer) == ["h%d" % n for n in range(5, PEER_CAPACITY + 4)]
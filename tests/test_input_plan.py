@@ -0,0 +1,111 @@
+"""Regression tests for utils/input_plan.py."""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from plain_editor import PlainEditor, lines, random_text, revise
+from utils.input_plan import InputPlan, RecordingExecutor
+from utils.keystroke_planner import PROFILES, count_keystrokes, replay, same_code
+
+
+def comment_for(language: str) -> str:
+    return "  # fix" if language == "python" else "  // fix"
+
+
+def typed(code: str) -> str:
+    """The text InputPlan types for code: with exactly the trailing newline it adds when missing."""
+    return code if code.endswith("\n") else code + "\n"
+
+
+@pytest.mark.parametrize("profile", list(PROFILES))
+def test_compile_edit_random_revisions(corpus, profile):
+    """compile_edit either declines or returns a verified plan cheaper than clearing and retyping."""
+    rng = random.Random(4400)
+    accepted = 0
+    for label, language, code in corpus:
+        base = code + "\n"
+        for _ in range(30):
+            revision = revise(code, rng, comment_for(language))
+            edit = InputPlan.compile_edit(base, revision, profile, language)
+            if edit is None:
+                continue
+            accepted += 1
+            full = InputPlan.compile(revision, profile, language)
+            assert edit.keystrokes < full.keystrokes + 2, label
+            assert edit.verbatim_keystrokes == full.keystrokes + 2, label
+            assert edit.base == base and edit.code == revision, label
+            assert same_code(typed(revision), edit.result(), language), (label, revision)
+            if profile == "verbatim":
+                assert lines(PlainEditor(base).run(edit.actions)) == lines(typed(revision)), (label, revision)
+    # correction-sized revisions of real solutions are exactly the case compile_edit is for
+    assert accepted >= len(corpus) * 25
+
+
+def test_compile_edit_random_texts():
+    """On arbitrary texts a verbatim edit plan, when offered, still produces the new text on a plain textarea."""
+    rng = random.Random(4401)
+    for _ in range(500):
+        base = random_text(rng) + "\n"
+        code = revise(base.rstrip("\n"), rng) if rng.random() < 0.7 else random_text(rng)
+        edit = InputPlan.compile_edit(base, code, "verbatim")
+        if edit is not None:
+            assert lines(PlainEditor(base).run(edit.actions)) == lines(typed(code)), (base, code)
+
+
+def test_compile_edit_unchanged_and_rewritten():
+    unchanged = InputPlan.compile_edit("int a;\nint b;\n", "int a;\nint b;", "monaco", "c")
+    assert unchanged.actions == [("key", "ctrl+home")]
+    assert InputPlan.compile_edit("x = 1\ny = 2\n", "print(42)\nfor i in range(3):\n    pass",
+                                  "monaco", "python") is None
+
+
+@pytest.mark.parametrize("profile", list(PROFILES))
+def test_compile_matches_planner(corpus, profile):
+    for label, language, code in corpus:
+        compiled = InputPlan.compile(code, profile, language)
+        assert compiled.profile == profile and compiled.base is None
+        assert compiled.keystrokes == count_keystrokes(compiled.actions)
+        assert same_code(code, compiled.result(), language), label
+        assert compiled.describe()["keystrokes"] == compiled.keystrokes
+
+
+def test_segments_cover_remaining_actions(corpus):
+    """Segments split only before Enter/Down, cover exactly the uncommitted actions and follow committed."""
+    for label, language, code in corpus:
+        compiled = InputPlan.compile(code, "monaco", language)
+        for size in (1, 7, 50, 10 ** 6):
+            segments = compiled.segments(size)
+            assert [action for segment in segments for action in segment] == compiled.actions, label
+            for segment in segments[1:]:
+                assert segment[0] in (("key", "enter"), ("key", "down")), label
+        compiled.commit(len(compiled) // 2)
+        rest = [action for segment in compiled.segments(7) for action in segment]
+        assert rest == compiled.actions[len(compiled) // 2:], label
+
+
+def test_commit_and_resume(corpus):
+    """Stopping mid-plan and resuming from committed types the same text as an uninterrupted run."""
+    for label, language, code in corpus:
+        compiled = InputPlan.compile(code, "codemirror", language)
+        executor = RecordingExecutor()
+        stop_after = len(compiled) // 3
+        done = executor.execute(compiled.actions, should_stop=lambda: len(executor.actions) >= stop_after)
+        assert done == stop_after
+        compiled.commit(done)
+        assert not compiled.finished
+        resumed_at = compiled.committed_chars()
+        # the caret has passed exactly the committed prefix of the code
+        prefix = lines(executor.text("codemirror", language)[:resumed_at])
+        expected = lines(code)[:len(prefix)]
+        assert prefix[:-1] == expected[:-1] and expected[-1].startswith(prefix[-1]), label
+        for segment in compiled.segments():
+            compiled.commit(executor.execute(segment))
+            assert compiled.committed_chars() >= resumed_at, label
+        assert compiled.finished
+        compiled.commit(5)
+        assert compiled.committed == len(compiled)
+        assert executor.actions == compiled.actions, label
+        assert same_code(code, executor.text("codemirror", language), language), label
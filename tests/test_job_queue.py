@@ -0,0 +1,157 @@
+"""Regression tests for core/job_queue.py."""
+
+from __future__ import annotations
+
+import random
+import sqlite3
+
+import pytest
+
+from core import job_queue
+from core.job_queue import HAS_RESULT, UNFINISHED, JobQueue, correction_job_id, main
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(job_queue.time, 'time', lambda: now[0])
+    return now
+
+
+def events(db_path, job_id):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [state for (state,) in conn.execute("SELECT state FROM job_events WHERE job_id = ? ORDER BY id",
+                                                   (job_id,))]
+    finally:
+        conn.close()
+
+
+def test_lifecycle_and_event_log(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    queue = JobQueue(db_path)
+    queue.create('s1', 's1', 'solve', {'question': '题目'}, host='oj.example', language='cpp', model='m')
+    queue.transition('s1', 'running')
+    queue.transition('s1', 'succeeded', result='int main() {}')
+    queue.transition('s1', 'delivered')
+    queue.complete('s1')
+    queue.complete('s1')  # typing the same code again records nothing
+    job = queue.get('s1')
+    assert job['state'] == 'done' and job['attempts'] == 1 and job['result'] == 'int main() {}'
+    assert job['payload'] == {'question': '题目'} and job['host'] == 'oj.example'
+    assert events(db_path, 's1') == ['queued', 'running', 'succeeded', 'delivered', 'done']
+    assert queue.get('missing') is None
+    queue.close()
+    queue.close()
+
+
+def test_fail_keeps_results_and_latest_follows_corrections(tmp_path, clock):
+    queue = JobQueue(str(tmp_path / 'jobs.db'))
+    queue.create('s1', 's1', 'solve', {})
+    queue.transition('s1', 'running')
+    queue.transition('s1', 'succeeded', result='code')
+    queue.fail('s1', 'connection lost')  # the result is still there to be fetched
+    assert queue.get('s1')['state'] == 'succeeded'
+    clock[0] += 1
+    correction = correction_job_id('s1', 1)
+    assert correction == 's1.1'
+    queue.create(correction, 's1', 'correction', {'retry': 1})
+    queue.transition(correction, 'running')
+    queue.fail(correction, 'x' * 1000)
+    failed = queue.get(correction)
+    assert failed['state'] == 'failed' and len(failed['error']) == 500
+    assert queue.latest('s1')['job_id'] == correction
+    queue.complete(correction)  # no result: stays failed
+    assert queue.get(correction)['state'] == 'failed'
+
+
+def test_restart_replays_unfinished_jobs(tmp_path, clock):
+    db_path = str(tmp_path / 'jobs.db')
+    queue = JobQueue(db_path, replay_max_age=600, max_attempts=2)
+    for job_id in ('fresh', 'stale', 'crashy', 'finished'):
+        queue.create(job_id, job_id, 'solve', {'n': job_id})
+    queue.transition('finished', 'running')
+    queue.transition('finished', 'succeeded', result='ok')
+    clock[0] += 500
+    queue.transition('fresh', 'running')
+    queue.transition('crashy', 'running')
+    queue.transition('crashy', 'running')
+    queue.close()
+
+    clock[0] += 200  # 'stale' was last touched 700 seconds ago, the others 200
+    restarted = JobQueue(db_path, replay_max_age=600, max_attempts=2)
+    replayed = restarted.take_unfinished()
+    assert [job['job_id'] for job in replayed] == ['fresh']
+    assert replayed[0]['payload'] == {'n': 'fresh'}
+    assert restarted.get('stale')['state'] == 'expired'
+    assert restarted.get('crashy')['state'] == 'failed'
+    assert restarted.get('finished')['state'] == 'succeeded'
+    assert restarted.stats['replayed'] == 1 and restarted.stats['expired'] == 1
+    assert restarted.take_unfinished() == replayed  # still unfinished until the replay runs
+
+
+def test_retention_removes_only_ended_jobs(tmp_path, clock):
+    db_path = str(tmp_path / 'jobs.db')
+    queue = JobQueue(db_path, retention_days=1)
+    queue.create('old-done', 'a', 'solve', {})
+    queue.transition('old-done', 'failed', error='e')
+    queue.create('old-queued', 'b', 'solve', {})
+    queue.close()
+    clock[0] += 2 * 86400
+    queue = JobQueue(db_path, retention_days=1)
+    assert queue.get('old-done') is None and events(db_path, 'old-done') == []
+    assert queue.get('old-queued')['state'] == 'queued'
+
+
+def test_unopenable_database_degrades_to_memoryless(tmp_path):
+    logs = []
+    queue = JobQueue(str(tmp_path / 'missing-dir' / 'jobs.db'), log=logs.append)
+    assert queue.conn is None and len(logs) == 1
+    queue.create('s1', 's1', 'solve', {})
+    queue.transition('s1', 'running')
+    assert queue.get('s1') is None and queue.take_unfinished() == []
+
+
+def test_random_state_sequences_match_model(tmp_path, clock):
+    """Random create / transition / fail / complete sequences leave the states the rules predict, across restarts."""
+    rng = random.Random(3800)
+    db_path = str(tmp_path / 'jobs.db')
+    queue = JobQueue(db_path, replay_max_age=10 ** 9, max_attempts=10 ** 9)
+    expected = {}
+    for step in range(400):
+        clock[0] += 1
+        job_id = f"job{rng.randrange(12)}"
+        action = rng.random()
+        if job_id not in expected or action < 0.1:
+            queue.create(job_id, job_id.rstrip('0123456789'), 'solve', {'step': step})
+            expected[job_id] = 'queued'
+        elif action < 0.4:
+            state = rng.choice(('running', 'succeeded', 'delivered'))
+            queue.transition(job_id, state, result='r' if state == 'succeeded' else None)
+            expected[job_id] = state
+        elif action < 0.7:
+            queue.fail(job_id, 'boom')
+            if expected[job_id] in UNFINISHED:
+                expected[job_id] = 'failed'
+        elif action < 0.95:
+            queue.complete(job_id)
+            if expected[job_id] in HAS_RESULT:
+                expected[job_id] = 'done'
+        else:
+            queue.close()
+            queue = JobQueue(db_path, replay_max_age=10 ** 9, max_attempts=10 ** 9)
+            replayed = {job['job_id'] for job in queue.take_unfinished()}
+            assert replayed == {job_id for job_id, state in expected.items() if state in UNFINISHED}
+        assert queue.get(job_id)['state'] == expected[job_id]
+    assert {job_id: queue.get(job_id)['state'] for job_id in expected} == expected
+
+
+def test_list_command(tmp_path, capsys):
+    db_path = str(tmp_path / 'jobs.db')
+    queue = JobQueue(db_path)
+    queue.create('s1', 's1', 'solve', {}, model='demo-model')
+    queue.transition('s1', 'failed', error='网络错误')
+    queue.close()
+    main(['list', '--db', db_path])
+    output = capsys.readouterr().out
+    assert 's1' in output and 'demo-model' in output and '网络错误' in output and 'queued' in output
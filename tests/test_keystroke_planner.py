@@ -0,0 +1,135 @@
+"""Regression tests for utils/keystroke_planner.py."""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from plain_editor import PlainEditor, lines, random_text, revise
+from utils.keystroke_planner import (
+    PROFILES, KeystrokePlanner, count_keystrokes, get_profile, plan, plan_edit, profile_for_source,
+    replay, same_code, verbatim_actions,
+)
+
+AUTO_PROFILES = [name for name in PROFILES if name != "verbatim"]
+C_FUNCTION = 'int main() {\n    if (x) {\n        f(a[0], "s");\n    }\n    return 0;\n}'
+PY_FUNCTION = "def f(x):\n    if x:\n        return [x]\n    return 0\n"
+
+
+def comment_for(language: str) -> str:
+    return "  # fix" if language == "python" else "  // fix"
+
+
+@pytest.mark.parametrize("profile", list(PROFILES))
+def test_plan_reproduces_corpus(corpus, profile):
+    """Typing the planned actions leaves every corpus solution in the editor."""
+    for label, language, code in corpus:
+        actions, planner = plan(code, profile, language)
+        assert same_code(code, replay(actions, profile, language), language), label
+        assert planner.stats["keystrokes"] == count_keystrokes(actions), label
+
+
+@pytest.mark.parametrize("profile", AUTO_PROFILES)
+def test_plan_saves_keystrokes_and_verbatim_does_not_survive(corpus, profile):
+    """Auto-indenting editors need fewer keystrokes than verbatim typing, which corrupts their content."""
+    for label, language, code in corpus:
+        actions, planner = plan(code, profile, language)
+        assert count_keystrokes(actions) < count_keystrokes(verbatim_actions(code)), label
+        assert planner.stats["verbatim_keystrokes"] == count_keystrokes(verbatim_actions(code)), label
+        assert not same_code(code, replay(verbatim_actions(code), profile, language), language), label
+
+
+def test_verbatim_plan_on_plain_textarea(corpus):
+    """The verbatim plan types the code line for line into an editor with no automatic behaviour."""
+    rng = random.Random(43)
+    texts = [code for _, _, code in corpus] + [random_text(rng) for _ in range(300)]
+    for text in texts:
+        actions, _ = plan(text, "verbatim")
+        assert lines(PlainEditor().run(actions)) == lines(text)
+        assert count_keystrokes(actions) <= count_keystrokes(verbatim_actions(text))
+
+
+@pytest.mark.parametrize("profile", list(PROFILES))
+def test_streaming_matches_one_shot(corpus, profile):
+    """Feeding the code in arbitrary chunks plans exactly the same actions as planning it at once."""
+    rng = random.Random(431)
+    for label, language, code in corpus:
+        expected, _ = plan(code, profile, language)
+        for _ in range(5):
+            planner = KeystrokePlanner(profile, language)
+            actions = []
+            offset = 0
+            while offset < len(code):
+                size = rng.randint(1, 40)
+                actions.extend(planner.feed(code[offset:offset + size]))
+                offset += size
+            actions.extend(planner.finish())
+            assert actions == expected, label
+            assert planner.finish() == []
+
+
+@pytest.mark.parametrize("profile", AUTO_PROFILES)
+def test_braces_rely_on_editor(profile):
+    """Indentation after { and the completed } are left to the editor: } is passed over with Down/End."""
+    actions, _ = plan(C_FUNCTION, profile, "c")
+    assert actions == [
+        ("type", "int main() {"), ("key", "enter"),
+        ("type", "if (x) {"), ("key", "enter"),
+        ("type", 'f(a[0], "s");'), ("key", "down"), ("key", "end"), ("key", "enter"),
+        ("type", "return 0;"), ("key", "down"), ("key", "end"),
+    ]
+
+
+def test_python_dedent_uses_backspace():
+    """Python blocks are closed with Backspace: per character in CodeMirror, per indent unit in Monaco."""
+    codemirror, _ = plan(PY_FUNCTION, "codemirror", "python")
+    monaco, _ = plan(PY_FUNCTION, "monaco", "python")
+    prefix = [("type", "def f(x):"), ("key", "enter"), ("type", "if x:"), ("key", "enter"),
+              ("type", "return [x]"), ("key", "enter")]
+    assert codemirror == prefix + [("key", "backspace")] * 4 + [("type", "return 0"), ("key", "enter")]
+    assert monaco == prefix + [("key", "backspace"), ("type", "return 0"), ("key", "enter")]
+
+
+def test_same_code_semantics():
+    assert same_code("a\nb", "a  \nb\n\n")
+    assert not same_code("a\nb", "a\n\nb")
+    assert same_code("if (x) {\n    }", "if (x) {\n}", "c")
+    assert not same_code("if x:\n    }", "if x:\n}", "python")
+    assert not same_code("    x;", "x;", "c")
+
+
+def test_profile_lookup():
+    assert get_profile("Monaco") is PROFILES["monaco"]
+    assert get_profile(None) is PROFILES["verbatim"]
+    assert get_profile(PROFILES["codemirror"]) is PROFILES["codemirror"]
+    assert profile_for_source("monaco_editor_getValue") == "monaco"
+    assert profile_for_source("codemirror_getValue") == "codemirror"
+    assert profile_for_source("textarea") == "verbatim"
+
+
+def test_plan_edit_on_plain_textarea(corpus):
+    """Edits planned for a plain editor turn the old text into the new one on a real textarea model."""
+    rng = random.Random(4300)
+    pairs = []
+    for _, language, code in corpus:
+        pairs.extend((code + "\n", revise(code, rng, comment_for(language))) for _ in range(20))
+    for _ in range(500):
+        old = random_text(rng)
+        pairs.append((old, revise(old, rng) if rng.random() < 0.7 else random_text(rng)))
+    pairs.extend([("", "a\nb"), ("a\nb", ""), ("a\nb", "a\nb"), ("a\n", "b\na\n"), ("a\nb\n", "b\n")])
+    for old, new in pairs:
+        actions = plan_edit(old, new, "verbatim")
+        assert lines(PlainEditor(old).run(actions)) == lines(new), (old, new)
+
+
+@pytest.mark.parametrize("profile", list(PROFILES))
+def test_plan_edit_random_revisions(corpus, profile):
+    """Minimal edits reach every random revision of the corpus from the previously typed code."""
+    rng = random.Random(4301)
+    for label, language, code in corpus:
+        base = code + "\n"
+        for _ in range(30):
+            revision = revise(code, rng, comment_for(language))
+            actions = plan_edit(base, revision, profile, language)
+            assert same_code(revision, replay(actions, profile, language, base), language), (label, revision)
@@ -0,0 +1,149 @@
+"""Regression tests for core/sessions.py."""
+
+from __future__ import annotations
+
+import gc
+import random
+
+from core import sessions
+from core.sessions import SessionStore
+
+
+class Socket:
+    """Stands in for a websocket: the store only looks at .closed and keeps weak references."""
+
+    def __init__(self):
+        self.closed = False
+
+
+def result(code: str) -> dict:
+    return {'type': 'code_solution', 'code': code}
+
+
+def test_new_session_and_resume_redelivers_unacknowledged():
+    store = SessionStore()
+    first = Socket()
+    session, resumed, pending = store.attach(first)
+    assert not resumed and pending == []
+    assert store.get(first) is session
+    sent = [store.record(session, result(str(index))) for index in range(4)]
+    assert [message['session_seq'] for message in sent] == [1, 2, 3, 4]
+
+    store.detach(first)
+    second = Socket()
+    again, resumed, pending = store.attach(second, session.token, last_seq=2)
+    assert again is session and resumed
+    assert pending == sent[2:]
+    assert [seq for seq, _, _ in session.buffer] == [3, 4]  # 1 and 2 were acknowledged
+    assert session.find(3) == sent[2] and session.find(1) is None
+    assert store.stats == {'created': 1, 'resumed': 1, 'redelivered': 2, 'evicted': 0}
+    assert store.get(second) is session
+
+
+def test_live_connection_is_not_taken_over():
+    """A duplicated tab presenting the same token gets its own session while the first one is connected."""
+    store = SessionStore()
+    first = Socket()
+    session, _, _ = store.attach(first)
+    other, resumed, _ = store.attach(Socket(), session.token)
+    assert other is not session and not resumed
+    first.closed = True  # closed without detach: the token may be resumed
+    third, resumed, _ = store.attach(Socket(), session.token)
+    assert third is session and resumed
+
+
+def test_detach_ignores_stale_connection():
+    store = SessionStore()
+    old = Socket()
+    session, _, _ = store.attach(old)
+    old.closed = True
+    new = Socket()
+    store.attach(new, session.token)
+    store.detach(old)
+    assert session.websocket is new
+
+
+def test_unknown_token_starts_new_session():
+    store = SessionStore()
+    session, resumed, pending = store.attach(Socket(), 'no-such-token', last_seq=10)
+    assert not resumed and pending == [] and session.token != 'no-such-token'
+
+
+def test_buffer_limits():
+    size = sessions._message_size(result('x'))  # every string field counts, 'type' included
+    store = SessionStore(max_buffer=3, max_buffer_chars=3 * size + 5)
+    session, _, _ = store.attach(Socket())
+    for _ in range(5):
+        store.record(session, result('x'))
+    assert [seq for seq, _, _ in session.buffer] == [3, 4, 5]
+    store.record(session, result('y' * 8))  # 7 more characters: the two oldest no longer fit
+    assert [seq for seq, _, _ in session.buffer] == [5, 6]
+    store.record(session, result('z' * 50))  # always keep the newest message
+    assert [seq for seq, _, _ in session.buffer] == [7]
+    assert session.buffer_size == sum(size for _, _, size in session.buffer)
+
+
+def test_ttl_and_capacity_eviction(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessions.time, 'time', lambda: now[0])
+    store = SessionStore(max_sessions=2, ttl=60)
+    sockets = [Socket() for _ in range(3)]
+    opened = [store.attach(socket)[0] for socket in sockets]
+    assert len(store.sessions) == 3  # connected sessions are never evicted for capacity
+
+    store.detach(sockets[0])
+    store.attach(Socket())
+    assert opened[0].token not in store.sessions and len(store.sessions) == 3
+
+    store.detach(sockets[1])
+    now[0] += 30
+    store._prune()
+    assert opened[1].token not in store.sessions and len(store.sessions) == 2
+    store.detach(sockets[2])
+    now[0] += 59
+    store._prune()
+    assert opened[2].token in store.sessions
+    now[0] += 2
+    store._prune()
+    assert opened[2].token not in store.sessions
+    assert store.stats['evicted'] == 3
+
+
+def test_connection_map_is_weak():
+    store = SessionStore()
+    socket = Socket()
+    store.attach(socket)
+    assert len(store.connections) == 1
+    store.detach(socket)
+    del socket
+    gc.collect()
+    assert len(store.connections) == 0
+
+
+def test_random_reconnects_redeliver_in_order():
+    """Across random record / disconnect / reconnect sequences the client never misses or repeats a result."""
+    rng = random.Random(3300)
+    for _ in range(200):
+        max_buffer = rng.randint(1, 6)
+        store = SessionStore(max_buffer=max_buffer)
+        session, _, _ = store.attach(Socket())
+        received = 0  # highest seq the client has seen
+        recorded = 0
+        for _ in range(rng.randint(1, 30)):
+            if rng.random() < 0.7:
+                message = store.record(session, result(str(rng.random())))
+                recorded = message['session_seq']
+                if rng.random() < 0.5:  # delivered before the connection dropped
+                    received = recorded
+                continue
+            store.detach(session.websocket)
+            again, resumed, pending = store.attach(Socket(), session.token, last_seq=received)
+            assert again is session and resumed
+            seqs = [message['session_seq'] for message in pending]
+            assert seqs == sorted(seqs) and all(seq > received for seq in seqs)
+            assert len(seqs) <= max_buffer
+            if recorded - received <= max_buffer:
+                assert seqs == list(range(received + 1, recorded + 1))
+            elif seqs:
+                assert seqs[-1] == recorded
+            received = recorded
@@ -0,0 +1,186 @@
+"""Regression tests for core/speculative.py."""
+
+from __future__ import annotations
+
+import asyncio
+
+from core import speculative
+from core.speculative import SpeculativeGenerator
+
+
+class Gui:
+    def __init__(self):
+        self.logs = []
+
+    def log(self, message):
+        self.logs.append(message)
+
+
+class Model:
+    """A fake generate coroutine: each call blocks until released, records concurrency and fails on request."""
+
+    def __init__(self):
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+        self.release = asyncio.Event()
+
+    async def generate(self, question_text, existing_code):
+        self.calls.append((question_text, existing_code))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await self.release.wait()
+        finally:
+            self.running -= 1
+        if 'fail' in question_text:
+            raise RuntimeError('model error')
+        return f"// {question_text}\n{existing_code}".rstrip()
+
+
+def run(scenario):
+    """Run scenario(generator, model, gui) on a fresh event loop."""
+    async def main():
+        model = Model()
+        gui = Gui()
+        generator = SpeculativeGenerator(gui, model.generate, enabled=True)
+        return await scenario(generator, model, gui)
+    return asyncio.run(main())
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_key_ignores_whitespace_and_existing_code():
+    """A next-task prefetch (no editor code yet) and the later click hash the same question to the same key."""
+    make_key = SpeculativeGenerator.make_key
+    assert make_key('cpp', 'm', '两数之和\n  给定数组') == make_key('cpp', 'm', ' 两数之和 给定数组\t')
+    assert make_key('cpp', 'm', 'q') != make_key('java', 'm', 'q')
+    assert make_key('cpp', 'm', 'q') != make_key('cpp', 'other', 'q')
+    assert make_key('cpp', 'm', None) == make_key('cpp', 'm', '')
+
+
+def test_disabled_generator_does_nothing():
+    async def scenario(generator, model, gui):
+        generator.enabled = False
+        assert generator.submit('k', 'q') == 'disabled'
+        assert await generator.take('k') is None
+        await settle()
+        assert model.calls == []
+    run(scenario)
+
+
+def test_hit_when_ready_and_while_generating():
+    async def scenario(generator, model, gui):
+        key = generator.make_key('c', 'm', 'q')
+        assert generator.submit(key, 'q', 'int x;') == 'started'
+        assert generator.submit(key, 'q', 'int x;') == 'running'
+        await settle()
+        waiting = asyncio.ensure_future(generator.take(key, '  int x;\n'))  # same code modulo surrounding blanks
+        await settle()
+        model.release.set()
+        assert await waiting == '// q\nint x;'
+        assert '等待生成完成' in gui.logs[-1]
+
+        generator.submit('ready', 'q2')
+        await settle()
+        assert generator.submit('ready', 'q2') == 'cached'
+        assert await generator.take('ready') == '// q2'
+        assert await generator.take('ready') is None  # taken once
+        assert generator.stats['hits'] == 2 and generator.stats['misses'] == 1
+    run(scenario)
+
+
+def test_queued_entry_is_cancelled_for_foreground():
+    """While a foreground generation runs, a speculative entry never reaches the model and take() cancels it."""
+    async def scenario(generator, model, gui):
+        generator.begin_foreground()
+        generator.submit('k', 'q')
+        await settle()
+        assert model.calls == []
+        assert await generator.take('k') is None
+        assert generator.stats['cancelled'] == 1
+        generator.end_foreground()
+        await settle()
+        assert model.calls == []
+    run(scenario)
+
+
+def test_existing_code_reconciliation():
+    async def scenario(generator, model, gui):
+        model.release.set()
+        generator.max_pending = 3
+        for key in ('accepted', 'rejected', 'unchecked'):
+            assert generator.submit(key, key) == 'started'  # prefetched before the editor code was known
+        await settle()
+        assert await generator.take('accepted', 'int main;', accept=lambda code: True) == '// accepted'
+        assert await generator.take('rejected', 'int main;', accept=lambda code: False) is None
+        assert await generator.take('unchecked', 'int main;') is None
+        assert generator.stats['reconciled'] == 1 and generator.stats['hits'] == 1
+        assert gui.logs.count("推测生成时的已有代码与编辑器中的不一致，改为重新生成") == 2
+    run(scenario)
+
+
+def test_mismatch_without_accept_cancels_running_generation():
+    async def scenario(generator, model, gui):
+        generator.submit('k', 'q', 'old code')
+        await settle()
+        assert model.running == 1
+        assert await generator.take('k', 'new code') is None
+        await settle()
+        assert model.running == 0 and generator.stats['cancelled'] == 1
+    run(scenario)
+
+
+def test_failed_generation_is_a_miss():
+    async def scenario(generator, model, gui):
+        model.release.set()
+        generator.submit('k', 'fail')
+        await settle()
+        assert await generator.take('k') is None
+        assert any('model error' in message for message in gui.logs)
+        assert generator.stats['misses'] == 1
+    run(scenario)
+
+
+def test_budget_concurrency_and_serial_execution():
+    async def scenario(generator, model, gui):
+        generator.max_per_hour = 3
+        generator.max_pending = 2
+        assert [generator.submit(f'k{n}', f'q{n}') for n in range(3)] == ['started', 'started', 'busy']
+        await settle()
+        assert model.max_running == 1  # speculative generations run one at a time
+        model.release.set()
+        await settle()
+        assert generator.submit('k2', 'q2') == 'started'
+        await settle()
+        assert generator.submit('k3', 'q3') == 'budget_exhausted'
+        assert generator.budget_left() == 0 and generator.stats['rejected'] == 2
+    run(scenario)
+
+
+def test_expiry_and_capacity(monkeypatch):
+    now = [5000.0]
+    monkeypatch.setattr(speculative.time, 'time', lambda: now[0])
+
+    async def scenario(generator, model, gui):
+        generator.max_entries = 2
+        generator.max_pending = 5
+        for n in range(3):
+            generator.submit(f'k{n}', f'q{n}')
+        assert list(generator.entries) == ['k1', 'k2']  # the oldest was dropped and cancelled
+        assert generator.stats['cancelled'] == 1
+        now[0] += generator.ttl + 1
+        assert await generator.take('k2') is None
+        assert generator.entries == {}
+        now[0] += 3600
+        assert generator.budget_left() == generator.max_per_hour
+        generator.submit('a', 'qa')
+        generator.submit('b', 'qb')
+        generator.cancel('a')
+        generator.cancel_all()
+        assert generator.entries == {}
+        await settle()
+    run(scenario)